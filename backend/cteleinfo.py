@@ -6,13 +6,38 @@ Teleinfo cleep application
 Named Cteleinfo because of used teleinfo library that have the same name
 """
 
+import os
 import time
 import glob
+import json
+import base64
+import termios
+import grp
+from functools import partial
+from threading import Lock, RLock, Thread
+from concurrent.futures import ThreadPoolExecutor
 from cleep.libs.internals.task import Task
 from cleep.core import CleepModule
 from cleep.common import CATEGORIES
-from teleinfo import Parser
-from teleinfo.hw_vendors import UTInfo2
+from cleep.exception import MissingParameter, InvalidParameter, CommandError
+from serial import Serial, PARITY_EVEN, STOPBITS_ONE, SEVENBITS
+from .teleinforeader import TeleinfoReader
+from .teleinfodecoder import TeleinfoDecoder, MODE_HISTORIC, MODE_STANDARD
+from .teleinfoasyncingestion import TeleinfoAsyncIngestion
+from .teleinfostore import TeleinfoStore
+from .teleinforollups import TeleinfoRollups, PERIODS
+from .teleinfoeventpolicy import TeleinfoEventPolicy
+from .teleinfowritebehind import TeleinfoWriteBehind
+from .teleinfoprofile import TeleinfoProfile
+from .teleinfocapture import TeleinfoCaptureWriter
+from .teleinfostats import TeleinfoStats
+from .teleinfometer import TeleinfoMeter
+from .teleinfowatcher import TeleinfoWatcher
+from .teleinfopower import TeleinfoPower
+from .teleinfoframe import TeleinfoFrame
+from .teleinfostreamer import TeleinfoStreamer
+from .teleinfopowerstats import WINDOWS
+from .teleinfoexport import TeleinfoExport, FORMATS, FORMAT_BINARY
 
 __all__ = ['Cteleinfo']
 
@@ -22,9 +47,16 @@ class Cteleinfo(CleepModule):
     Returns current France Enedis electricity provider.
     This application uses MicroTeleinfo dongle built by Charles Hallard (http://hallard.me/utinfo/)
 
+    Both historic (1200 bauds) and standard (9600 bauds, Linky only) teleinfo modes are supported. Mode is
+    detected automatically when serial port is opened.
+
+    All connected dongles are read in parallel, each one being a separate meter with its own devices. Primary
+    meter (first dongle found, or the one previously used) keeps legacy configuration, devices and store.
+    Dongles can be plugged and unplugged at any time: serial port is reopened automatically.
+
     Note:
-        python library: https://github.com/demikl/python-teleinfo
         Teleinfo protocol description: https://www.planete-domotique.com/blog/2010/03/30/la-teleinformation-edf/
+        Linky standard mode description: resources/Enedis-NOI-CPT_54E.pdf
     """
     MODULE_AUTHOR = 'Cleep'
     MODULE_VERSION = '1.1.1'
@@ -45,13 +77,54 @@ class Cteleinfo(CleepModule):
     MODULE_CONFIG_FILE = 'teleinfo.conf'
     DEFAULT_CONFIG = {
         'port': None,
+        'baudrate': None,
+        'mode': None,
+        'ingestionmode': 'thread',
+        'powereventdeadband': 500,
+        'powereventdeadbandpercent': 20,
+        'powereventheartbeat': 60,
+        'overloadheadroom': 10,
+        'overloadramp': 3000,
+        'overloadrampwindow': 10,
+        'prices': {},
+        'writeinterval': 300,
+        'streamgroup': None,
         'previousconsoheurespleines': None,
         'previousconsoheurescreuses': None,
+        'meters': {},
     }
 
-    TELEINFO_TASK_DELAY = 60 # seconds
+    TELEINFO_TASK_DELAY = 1 # seconds (power is sampled at this rate, events are emitted according to event policy)
+    HARDWARE_TASK_DELAY = 1 # seconds
+    PERSISTENCE_TASK_DELAY = 5 # seconds
+    INGESTION_THREAD = 'thread'
+    INGESTION_ASYNCIO = 'asyncio'
+    FIRST_FRAME_TIMEOUT = 10.0 # seconds
     USB_PATH = '/dev/serial/by-id/'
-    VA_FACTOR = 220
+    SERIAL_BAUDRATES = {
+        MODE_HISTORIC: 1200,
+        MODE_STANDARD: 9600,
+    }
+    SERIAL_TIMEOUT = 1.0 # seconds
+    PROBE_TIMEOUT = 5.0 # seconds
+    VA_FACTOR = TeleinfoPower.VA_FACTOR
+    HISTORY_SIZE = 86400 # samples (24 hours at one frame per second)
+    STORE_PATH = '/var/opt/cleep/teleinfo/'
+    STORE_MAX_SEGMENTS = 90 # days (one segment per day at one frame per second)
+    CAPTURE_PATH = '/var/opt/cleep/teleinfo/captures/'
+    STREAM_SOCKET = 'stream.sock' # in STORE_PATH
+    STREAM_SOCKET_MODE = 0o600 # owner only (stream contains meter identifiers)
+    STREAM_SOCKET_GROUP_MODE = 0o660 # owner and stream group
+    STATE_FILE = 'state.json' # in STORE_PATH
+    PRIMARY_METER = 'main'
+    STANDARD_TARIFF_MODES = {
+        'BASE': ['TH..'],
+        'HC': ['HC..', 'HP..'],
+        'EJP': ['HN..', 'PM..'],
+        'TEMPO': ['HCJB', 'HPJB', 'HCJW', 'HPJW', 'HCJR', 'HPJR'],
+    }
+    STANDARD_NEXT_DAY_COLORS = ['----', 'BLEU', 'BLAN', 'ROUG']
+    WRITE_CRITICAL_FIELDS = ['currentmode', 'nextmode', 'previousconsoheurescreuses', 'previousconsoheurespleines', 'meters']
 
     def __init__(self, bootstrap, debug_enabled):
         """
@@ -66,40 +139,293 @@ class Cteleinfo(CleepModule):
 
         # members
         self.teleinfo_task = None
-        self.instant_power_device_uuid = None
-        self.power_consumption_device_uuid = None
-        self.last_raw = {}
-        self.__teleinfo_parser = None
-        self.__last_conso_heures_creuses = 0
-        self.__last_conso_heures_pleines = 0
+        self.hardware_task = None
+        self.persistence_task = None
+        self.watcher = None
+        self.async_ingestion = None
+        self.streamer = None
+        self.startup_thread = None
+        self.stats = TeleinfoStats()
+        self.write_behind = TeleinfoWriteBehind(
+            self._update_device,
+            self._update_config,
+            self.logger,
+            self.DEFAULT_CONFIG['writeinterval'],
+            self.WRITE_CRITICAL_FIELDS,
+        )
+        self.primary_meter = self._create_meter(self.PRIMARY_METER, None, True)
+        self.meters = {self.PRIMARY_METER: self.primary_meter}
+        self.__hardware_lock = RLock()
+        self.__teleinfo_task_lock = Lock()
 
         # events
         self.power_update_event = self._get_event('teleinfo.power.update')
         self.consumption_update_event = self._get_event('teleinfo.consumption.update')
+        self.overload_event = self._get_event('teleinfo.overload')
 
     def _configure(self):
         """
         Configure module
         """
-        # configure devices
+        # configure meters (one per connected dongle) and their devices
+        ports = self._scan_ports()
+        self._configure_meters(ports)
         self._configure_devices()
 
-        # configure hardware
-        if self._configure_hardware():
-            #update values at startup
-            self.logger.debug('Update data at startup')
-            self._teleinfo_task()
+        self.write_behind.interval = self._get_config_field('writeinterval')
+        self._start_persistence_task()
 
-        # start teleinfo task
-        self._start_teleinfo_task()
+        # open on-disk stores
+        self._open_stores()
+
+        # answer with state of previous run until live frames are received
+        self._load_state()
+
+        # stream frames to local processes
+        self._start_streamer()
+
+        # watch dongles plug and unplug, configure hardware and start reading frames in background
+        if not ports:
+            self.logger.warning('No Teleinfo hardware found, waiting for dongle')
+        self._start_hardware_watch(ports)
+        self.startup_thread = Thread(target=self._startup, name='teleinfostartup', daemon=True)
+        self.startup_thread.start()
+
+    def _startup(self):
+        """
+        Connect dongles, update data with first frames and start teleinfo task. Run in background so module
+        startup never waits for serial ports probing and first frames (data of previous run is returned meanwhile)
+        """
+        with self.__hardware_lock:
+            if self.watcher is None:
+                # module stopped
+                return
+            try:
+                connected = self._connect_meters([meter for meter in list(self.meters.values()) if meter.port and not meter.serial])
+            except Exception:
+                # teleinfo task must be started anyway, meters are reconnected by hardware task
+                self.logger.exception('Error connecting teleinfo dongles at startup:')
+                connected = []
+
+        # update values at startup (all meters are waited at the same time)
+        deadline = time.time() + self.FIRST_FRAME_TIMEOUT
+        received = [meter.reader.wait_frame(max(0.0, deadline - time.time())) for meter in connected if meter.reader]
+
+        with self.__hardware_lock:
+            if self.watcher is None or self._is_async_ingestion():
+                # module stopped or asyncio ingestion updates device by itself
+                return
+            if any(received):
+                self.logger.debug('Update data at startup')
+                self._teleinfo_task()
+            self._start_teleinfo_task()
+
+    def _scan_ports(self):
+        """
+        Scan dongle ports
+
+        Returns:
+            list: sorted list of dongle serial port paths
+        """
+        self.logger.trace('Scanning "%s" for devices' % self.USB_PATH)
+        ports = sorted([path for path in glob.glob(self.USB_PATH + '*') if path.find('TINFO')>0])
+        self.logger.debug('Found devices: %s' % ports)
+
+        return ports
+
+    def _create_meter(self, name, port, primary):
+        """
+        Create meter instance
+
+        Args:
+            name (string): meter name
+            port (string): dongle serial port path
+            primary (bool): True for primary meter
+
+        Returns:
+            TeleinfoMeter: meter instance
+        """
+        event_policy = TeleinfoEventPolicy(
+            self.DEFAULT_CONFIG['powereventdeadband'],
+            self.DEFAULT_CONFIG['powereventdeadbandpercent'],
+            self.DEFAULT_CONFIG['powereventheartbeat'],
+        )
+        meter = TeleinfoMeter(name, port, primary, event_policy, self.HISTORY_SIZE)
+        meter.stats = self.stats
+        meter.overload.configure(
+            self.DEFAULT_CONFIG['overloadheadroom'],
+            self.DEFAULT_CONFIG['overloadramp'],
+            self.DEFAULT_CONFIG['overloadrampwindow'],
+        )
+
+        return meter
+
+    def _configure_meters(self, ports):
+        """
+        Create one meter per dongle port. Primary meter is created even if no dongle is connected and uses
+        previously configured port if still connected (first port otherwise)
+
+        Args:
+            ports (list): list of dongle serial port paths
+        """
+        ports = list(ports)
+        primary_port = self._get_config_field('port')
+        if primary_port not in ports:
+            primary_port = ports[0] if ports else None
+        if primary_port:
+            ports.remove(primary_port)
+            self._set_config_field('port', primary_port)
+
+        self.primary_meter = self._create_meter(self.PRIMARY_METER, primary_port, True)
+        self.meters = {self.PRIMARY_METER: self.primary_meter}
+        for port in ports:
+            name = os.path.basename(port)
+            self.meters[name] = self._create_meter(name, port, False)
+
+        for meter in self.meters.values():
+            self._load_meter_config(meter)
+
+    def _load_meter_config(self, meter):
+        """
+        Load meter configuration (last probed mode) and configure its power event policy and overload rules
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+        """
+        meter_config = self._get_meter_config(meter)
+        meter.baudrate = meter_config['baudrate']
+        meter.mode = meter_config['mode']
+        meter.event_policy.configure(
+            self._get_config_field('powereventdeadband'),
+            self._get_config_field('powereventdeadbandpercent'),
+            self._get_config_field('powereventheartbeat'),
+        )
+        meter.overload.configure(
+            self._get_config_field('overloadheadroom'),
+            self._get_config_field('overloadramp'),
+            self._get_config_field('overloadrampwindow'),
+        )
+
+    def _add_meter(self, port):
+        """
+        Add meter of dongle plugged after module startup
+
+        Args:
+            port (string): dongle serial port path
+
+        Returns:
+            TeleinfoMeter: meter instance
+        """
+        name = os.path.basename(port)
+        meter = self._create_meter(name, port, False)
+        self._load_meter_config(meter)
+        self._configure_meter_devices(meter, self._get_devices())
+        self._open_store(meter)
+        self.meters[name] = meter
+        self.logger.info('New meter "%s" added' % name)
+
+        return meter
+
+    def _get_meter_config(self, meter):
+        """
+        Return meter configuration. Primary meter uses legacy configuration fields, other meters are
+        configured in "meters" field
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+
+        Returns:
+            dict: meter configuration::
+
+                {
+                    baudrate (int): last probed baudrate,
+                    mode (string): last detected teleinfo mode,
+                    previousconsoheurescreuses (int): heures creuses index saved at midnight,
+                    previousconsoheurespleines (int): heures pleines index saved at midnight,
+                }
+
+        """
+        config = self._get_config()
+        meter_config = config if meter.primary else config.get('meters', {}).get(meter.name, {})
+
+        return {
+            'baudrate': meter_config.get('baudrate'),
+            'mode': meter_config.get('mode'),
+            'previousconsoheurescreuses': meter_config.get('previousconsoheurescreuses'),
+            'previousconsoheurespleines': meter_config.get('previousconsoheurespleines'),
+        }
+
+    def _build_meter_config(self, meter, values):
+        """
+        Build configuration update of specified meter
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+            values (dict): meter configuration fields to update
+
+        Returns:
+            dict: configuration fields to update
+        """
+        if meter.primary:
+            return values
+
+        meters = dict(self._get_config_field('meters') or {})
+        meters[meter.name] = dict(meters.get(meter.name, {}), **values)
+
+        return {'meters': meters}
+
+    def _get_meter(self, name):
+        """
+        Return meter
+
+        Args:
+            name (string): meter name. None for primary meter
+
+        Returns:
+            TeleinfoMeter: meter instance
+
+        Raises:
+            InvalidParameter: if meter does not exist
+        """
+        if name is None:
+            return self.primary_meter
+        meter = self.meters.get(name)
+        if meter is None:
+            raise InvalidParameter('Parameter "meter" must be an existing meter name')
+
+        return meter
+
+    def _get_connected_meters(self):
+        """
+        Return meters with opened serial port
+
+        Returns:
+            list: list of meters (TeleinfoMeter)
+        """
+        return [meter for meter in list(self.meters.values()) if meter.serial]
 
     def _configure_devices(self):
         """
-        Configure teleinfo devices
+        Configure teleinfo devices of all meters. Primary meter devices are not bound to meter name
+        """
+        devices = self._get_devices()
+        for meter in self.meters.values():
+            self._configure_meter_devices(meter, devices)
+
+    def _configure_meter_devices(self, meter, devices):
+        """
+        Configure teleinfo devices of specified meter
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+            devices (dict): existing devices
         """
+        meter_name = None if meter.primary else meter.name
+        suffix = '' if meter.primary else ' (%s)' % meter.name
         instant_power_default_device = {
             'type': 'teleinfoinstantpower',
-            'name': 'Instant power',
+            'name': 'Instant power' + suffix,
+            'meter': meter_name,
             'lastupdate': None,
             'power': 0,
             'currentmode': None,
@@ -107,267 +433,1788 @@ class Cteleinfo(CleepModule):
         }
         power_consumption_default_device = {
             'type': 'teleinfopowerconsumption',
-            'name': 'Power consumption',
+            'name': 'Power consumption' + suffix,
+            'meter': meter_name,
             'lastupdate': None,
             'heurescreuses': 0,
             'heurespleines': 0,
         }
 
         # get devices
-        for uuid, device in self._get_devices().items():
+        for uuid, device in devices.items():
+            if device.get('meter')!=meter_name:
+                continue
             if device['type']=='teleinfoinstantpower':
-                self.instant_power_device_uuid = uuid
+                meter.instant_power_device_uuid = uuid
             elif device['type']=='teleinfopowerconsumption':
-                self.power_consumption_device_uuid = uuid
+                meter.power_consumption_device_uuid = uuid
 
         # add missing devices
-        if not self.instant_power_device_uuid:
-            self.logger.debug('Adding new instant power device')
+        if not meter.instant_power_device_uuid:
+            self.logger.debug('Adding new instant power device for meter "%s"' % meter.name)
             device = self._add_device(instant_power_default_device)
             if not device: # pragma: no cover
                 raise Exception('Unable to add new device')
-            self.instant_power_device_uuid = device['uuid']
-        if not self.power_consumption_device_uuid:
-            self.logger.debug('Adding new power consumption device')
+            meter.instant_power_device_uuid = device['uuid']
+        if not meter.power_consumption_device_uuid:
+            self.logger.debug('Adding new power consumption device for meter "%s"' % meter.name)
             device = self._add_device(power_consumption_default_device)
             if not device: # pragma: no cover
                 raise Exception('Unable to add new device')
-            self.power_consumption_device_uuid = device['uuid']
+            meter.power_consumption_device_uuid = device['uuid']
 
-        self.logger.debug('Found instant power device "%s"' % self.instant_power_device_uuid)
-        self.logger.debug('Found power consumption device "%s"' % self.power_consumption_device_uuid)
+        self.logger.debug('Found instant power device "%s" for meter "%s"' % (meter.instant_power_device_uuid, meter.name))
+        self.logger.debug('Found power consumption device "%s" for meter "%s"' % (meter.power_consumption_device_uuid, meter.name))
 
-    def _configure_hardware(self):
+    def _connect_meters(self, meters):
         """
-        Configure hardware
-        Search device (device path) and initialize parser
+        Open and probe serial ports of specified meters in parallel (so duration does not depend on number of
+        dongles) and start ingestion of connected meters. Next connection attempt of failed meters is scheduled
+        according to reconnection backoff
+
+        Args:
+            meters (list): list of meters (TeleinfoMeter) to connect
 
         Returns:
-            bool: True if hardware configured successfully, False otherwise
+            list: list of connected meters
         """
-        # scan dongle port
-        self.logger.trace('Scanning "%s" for devices' % self.USB_PATH)
-        devices = [path for path in glob.glob(self.USB_PATH + '*') if path.find('TINFO')>0]
-        self.logger.debug('Found devices: %s' % devices)
-        if len(devices)==0:
-            self.logger.warning('No Teleinfo hardware found, teleinfo disabled')
-            return False
+        if not meters:
+            return []
+
+        with ThreadPoolExecutor(max_workers=len(meters)) as executor:
+            results = list(executor.map(self._configure_hardware, meters))
+
+        connected = []
+        now = time.time()
+        for meter, result in zip(meters, results):
+            if not result:
+                delay = meter.schedule_reconnect(now)
+                self.logger.info('Next connection attempt of meter "%s" in %s seconds' % (meter.name, delay))
+                continue
+
+            # save probed mode (config is only updated from caller thread)
+            if meter.mode:
+                self._update_config(self._build_meter_config(meter, {
+                    'baudrate': meter.baudrate,
+                    'mode': meter.mode,
+                }))
+            connected.append(meter)
+
+        if connected and self._is_async_ingestion():
+            self._start_async_ingestion()
+        for meter in list(connected):
+            try:
+                self._start_meter_ingestion(meter)
+            except Exception:
+                # one failing meter must not prevent other meters from being read
+                self.logger.exception('Unable to start ingestion of meter "%s":' % meter.name)
+                self._disconnect_meter(meter)
+                delay = meter.schedule_reconnect(now)
+                self.logger.info('Next connection attempt of meter "%s" in %s seconds' % (meter.name, delay))
+                connected.remove(meter)
+
+        return connected
+
+    def _disconnect_meter(self, meter):
+        """
+        Stop meter ingestion and close its serial port
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+        """
+        self._stop_meter_ingestion(meter)
+        try:
+            meter.close_serial()
+        except Exception:
+            self.logger.exception('Error closing serial port of meter "%s":' % meter.name)
+            meter.serial = None
+
+    def _start_hardware_watch(self, ports):
+        """
+        Start dongle directory watcher and hardware task
+
+        Args:
+            ports (list): dongle ports already handled
+        """
+        if self.watcher is None:
+            self.watcher = TeleinfoWatcher(self.USB_PATH, self.logger, self._on_ports_changed, ports)
+            self.watcher.start()
+        if self.hardware_task is None:
+            self.hardware_task = Task(self.HARDWARE_TASK_DELAY, self._check_hardware, self.logger)
+            self.hardware_task.start()
+
+    def _stop_hardware_watch(self):
+        """
+        Stop dongle directory watcher and hardware task. Pending hardware check is waited
+        """
+        with self.__hardware_lock:
+            if self.hardware_task is not None:
+                self.hardware_task.stop()
+                self.hardware_task = None
+            if self.watcher is not None:
+                self.watcher.stop()
+                self.watcher = None
+
+    def _start_streamer(self):
+        """
+        Start frames streamer on local Unix domain socket
+        """
+        if self.streamer is None:
+            group = self._get_config_field('streamgroup')
+            self.streamer = TeleinfoStreamer(
+                os.path.join(self.STORE_PATH, self.STREAM_SOCKET),
+                self.logger,
+                self.STREAM_SOCKET_GROUP_MODE if group else self.STREAM_SOCKET_MODE,
+                group,
+            )
+            self.streamer.start()
+
+    def _stop_streamer(self):
+        """
+        Stop frames streamer. Streamer is waited so its socket file is removed
+        """
+        if self.streamer is not None:
+            self.streamer.stop()
+            self.streamer.join(TeleinfoStreamer.SELECT_TIMEOUT * 2)
+            self.streamer = None
+
+    def _find_meter(self, port):
+        """
+        Return meter using specified dongle port
+
+        Args:
+            port (string): dongle serial port path
+
+        Returns:
+            TeleinfoMeter: meter instance or None if no meter uses this port
+        """
+        for meter in list(self.meters.values()):
+            if meter.port==port:
+                return meter
 
-        # get only one device
-        port = devices[0]
-        self._set_config_field('port', port)
-        self.logger.info('Using device "%s" as teleinfo port' % port)
+        return None
 
-        # init parser
+    def _on_ports_changed(self, added, removed):
+        """
+        Handle dongles plugged or unplugged (called by watcher). Unplugged meters are disconnected, plugged
+        ones are connected immediately (new meter is created for unknown dongle)
+
+        Args:
+            added (list): list of plugged dongle ports
+            removed (list): list of unplugged dongle ports
+        """
+        with self.__hardware_lock:
+            if self.watcher is None:
+                # watch stopped
+                return
+
+            for port in removed:
+                meter = self._find_meter(port)
+                if meter and meter.serial:
+                    self.logger.info('Dongle of meter "%s" unplugged' % meter.name)
+                    self._disconnect_meter(meter)
+
+            for port in added:
+                meter = self._find_meter(port)
+                if meter is None and not self.primary_meter.port:
+                    meter = self.primary_meter
+                    meter.port = port
+                    self._set_config_field('port', port)
+                elif meter is None:
+                    meter = self._add_meter(port)
+                self.logger.info('Dongle of meter "%s" plugged' % meter.name)
+                meter.reset_reconnect()
+
+            self._check_hardware()
+
+    def _on_meter_error(self, meter_name, error):
+        """
+        Handle meter serial port failure (called by reader or asyncio ingestion). Meter is disconnected and
+        reconnected by hardware task
+
+        Args:
+            meter_name (string): meter name
+            error (Exception): read error
+        """
+        meter = self.meters.get(meter_name)
+        if meter:
+            meter.failed = True
+
+    def _check_hardware(self):
+        """
+        Hardware task: disconnect failed meters and reconnect meters whose dongle is plugged, according to
+        reconnection backoff
+        """
+        with self.__hardware_lock:
+            if self.watcher is None:
+                # watch stopped
+                return
+
+            now = time.time()
+            for meter in list(self.meters.values()):
+                if meter.failed:
+                    meter.failed = False
+                    self._disconnect_meter(meter)
+                    delay = meter.schedule_reconnect(now)
+                    self.logger.warning('Serial port of meter "%s" failed, reconnecting in %s seconds' % (meter.name, delay))
+                elif meter.reconnect_attempts and meter.reader and meter.reader.frames_count:
+                    # frames received since reconnection
+                    meter.reset_reconnect()
+
+            meters = [
+                meter for meter in list(self.meters.values())
+                if meter.port and not meter.serial and meter.reconnect_at<=now and os.path.exists(meter.port)
+            ]
+            self._connect_meters(meters)
+
+    def _configure_hardware(self, meter):
+        """
+        Configure meter hardware: open serial port and detect teleinfo mode. Serial port is closed if it cannot
+        be probed, so meter is connected again by hardware task
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+
+        Returns:
+            bool: True if hardware configured successfully, False otherwise
+        """
+        self.logger.info('Using device "%s" as teleinfo port of meter "%s"' % (meter.port, meter.name))
+
+        # open serial port
         try:
-            self.__teleinfo_parser = Parser(UTInfo2(port=port))
-            return True
+            meter.serial = Serial(
+                port=meter.port,
+                baudrate=self.SERIAL_BAUDRATES[MODE_HISTORIC],
+                parity=PARITY_EVEN,
+                stopbits=STOPBITS_ONE,
+                bytesize=SEVENBITS,
+                timeout=self.SERIAL_TIMEOUT,
+            )
+        except Exception:
+            self.logger.exception('Fatal error opening teleinfo serial port. Are you using MicroTeleinfo dongle?')
+            meter.serial = None
+            return False
 
+        # detect teleinfo mode
+        try:
+            mode = self._probe_serial(meter)
+            if not mode:
+                self._set_serial_baudrate(meter, self.SERIAL_BAUDRATES[MODE_HISTORIC])
         except Exception:
-            self.logger.exception('Fatal error initializing teleinfo parser. Are you using MicroTeleinfo dongle?')
+            self.logger.exception('Error probing teleinfo serial port of meter "%s":' % meter.name)
+            try:
+                meter.close_serial()
+            except Exception:
+                meter.serial = None
             return False
 
+        if mode:
+            self.logger.info('Teleinfo %s mode detected for meter "%s"' % (mode, meter.name))
+        else:
+            self.logger.warning('No teleinfo frame received on meter "%s", check dongle wiring. Historic mode is used' % meter.name)
+
+        return True
+
+    def _probe_serial(self, meter):
+        """
+        Probe meter serial port with all supported baudrates and detect teleinfo mode from first valid frame.
+        Last detected baudrate is probed first. Detected baudrate and mode are stored in meter
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+
+        Returns:
+            string: detected mode (MODE_HISTORIC or MODE_STANDARD) or None if no valid frame received
+        """
+        baudrates = list(self.SERIAL_BAUDRATES.values())
+        if meter.baudrate in baudrates:
+            baudrates.remove(meter.baudrate)
+            baudrates.insert(0, meter.baudrate)
+
+        for baudrate in baudrates:
+            self.logger.debug('Probing serial port of meter "%s" at %s bauds' % (meter.name, baudrate))
+            self._set_serial_baudrate(meter, baudrate)
+            meter.serial.reset_input_buffer()
+            decoder = TeleinfoDecoder()
+            end = time.time() + self.PROBE_TIMEOUT
+            while time.time() < end:
+                if decoder.feed(meter.read_serial()):
+                    meter.baudrate = baudrate
+                    meter.mode = decoder.mode
+                    return decoder.mode
+
+        return None
+
+    def _set_serial_baudrate(self, meter, baudrate):
+        """
+        Set meter serial port baudrate. Port whose line settings cannot be changed (like pseudo terminal served
+        by teleinforeplay tool, kernel may reject 7E1 framing) keeps its current settings and is read as is
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+            baudrate (int): serial port baudrate
+        """
+        try:
+            meter.serial.baudrate = baudrate
+        except termios.error as error:
+            self.logger.debug('Unable to set baudrate of meter "%s" serial port, current settings are kept: %s' % (meter.name, error))
+
     def _stop(self):
         """
         Stop module
         """
+        self._stop_hardware_watch()
         self._stop_teleinfo_task()
+        self._stop_persistence_task()
+        self._stop_ingestion()
+        self._stop_streamer()
+        for meter in list(self.meters.values()):
+            meter.close_serial()
+            self.stop_capture(meter.name)
+        self.write_behind.flush()
+        self._save_state()
+        self._close_stores()
 
-    def _start_teleinfo_task(self):
+    def _save_state(self):
         """
-        Start teleinfo task
+        Persist last frame and consumption indexes of all meters, so next startup answers immediately with them.
+        Devices values are persisted by write-behind cache. File is replaced atomically so a crash never corrupts it
         """
-        if self.teleinfo_task is None:
-            self.teleinfo_task = Task(self.TELEINFO_TASK_DELAY, self._teleinfo_task, self.logger)
-            self.teleinfo_task.start()
+        state = {'meters': {}}
+        for meter in list(self.meters.values()):
+            if not meter.last_raw:
+                continue
+            state['meters'][meter.name] = {
+                'sequence': meter.snapshot.sequence,
+                'frame': dict(meter.last_raw),
+                'heurescreuses': meter.last_conso_heures_creuses,
+                'heurespleines': meter.last_conso_heures_pleines,
+                'indexes': list(meter.last_indexes),
+            }
 
-    def _stop_teleinfo_task(self):
+        path = os.path.join(self.STORE_PATH, self.STATE_FILE)
+        try:
+            if not os.path.exists(self.STORE_PATH):
+                os.makedirs(self.STORE_PATH)
+            temp_path = path + '.tmp'
+            with open(temp_path, 'w') as fd:
+                json.dump(state, fd)
+                fd.flush()
+                os.fsync(fd.fileno())
+            os.replace(temp_path, path)
+        except Exception:
+            self.logger.exception('Unable to save teleinfo state:')
+
+    def _load_state(self):
         """
-        Stop weather task
+        Restore last frame and consumption indexes persisted by previous run. Restored data is flagged stale
+        until first live frame is received
         """
-        if self.teleinfo_task is not None:
-            self.teleinfo_task.stop()
-            self.teleinfo_task = None
+        path = os.path.join(self.STORE_PATH, self.STATE_FILE)
+        if not os.path.exists(path):
+            return
 
-    def _restart_teleinfo_task(self):
+        try:
+            with open(path, 'r') as fd:
+                state = json.load(fd)
+        except Exception:
+            self.logger.exception('Unable to load teleinfo state, state is ignored:')
+            return
+
+        for name, meter_state in state.get('meters', {}).items():
+            meter = self.meters.get(name)
+            if meter is None or meter.last_raw:
+                continue
+            try:
+                frame = TeleinfoFrame(meter_state['frame'])
+                sequence = int(meter_state['sequence'])
+                heures_creuses = int(meter_state['heurescreuses'])
+                heures_pleines = int(meter_state['heurespleines'])
+                indexes = [int(index) for index in meter_state['indexes']]
+            except (KeyError, TypeError, ValueError, AttributeError):
+                self.logger.warning('Invalid teleinfo state of meter "%s", state is ignored' % name)
+                continue
+            meter.snapshot.restore(frame, sequence)
+            meter.last_conso_heures_creuses = heures_creuses
+            meter.last_conso_heures_pleines = heures_pleines
+            meter.last_indexes = indexes
+
+    def _open_stores(self):
         """
-        Restart teleinfo task
+        Open on-disk store and load consumption rollups of all meters
         """
-        self._stop_teleinfo_task()
-        self._start_teleinfo_task()
+        for meter in self.meters.values():
+            self._open_store(meter)
 
-    def event_received(self, event):
+    def _open_store(self, meter):
         """
-        Event received from bus
+        Open meter on-disk store and load its consumption rollups. Samples are not persisted if store cannot
+        be opened. Primary meter uses STORE_PATH, other meters use a sub directory named as meter
 
-        Params:
-            event (MessageRequest): event data
+        Args:
+            meter (TeleinfoMeter): meter instance
         """
-        self.logger.trace('Event received %s' % event)
-        # compute and send consumption event once a day at midnight
-        # previous day consumption is stored in configuration file to take care of device reboot
-        if event['event']=='parameters.time.now' and event['params']['hour']==0 and event['params']['minute']==0:
-            config = self._get_config()
-            if config['previousconsoheurescreuses'] is not None and config['previousconsoheurespleines'] is not None:
-                params = {
-                    'lastupdate': int(time.time()),
-                    'heurescreuses': (self.__last_conso_heures_creuses - config['previousconsoheurescreuses']),
-                    'heurespleines': (self.__last_conso_heures_pleines - config['previousconsoheurespleines']),
-                }
-
-                # send consumption event and update device
-                self.logger.trace('Send consumption update event with params: %s' % params)
-                self._update_device(self.instant_power_device_uuid, params)
-                self.consumption_update_event.send(params=params, device_id=self.power_consumption_device_uuid)
+        path = self.STORE_PATH if meter.primary else os.path.join(self.STORE_PATH, meter.name)
+        try:
+            store = TeleinfoStore(path, self.logger, self.STORE_MAX_SEGMENTS)
+            store.open()
+            meter.store = store
+        except Exception:
+            self.logger.exception('Unable to open teleinfo store of meter "%s", samples will not be persisted:' % meter.name)
 
-            # save last power consumption in config file
-            self.logger.info('Save last power consumption of the day')
-            self._update_config({
-                'previousconsoheurescreuses': self.__last_conso_heures_creuses,
-                'previousconsoheurespleines': self.__last_conso_heures_pleines,
-            })
+        meter.rollups = TeleinfoRollups(os.path.join(path, 'rollups.json'), self.logger)
+        meter.rollups.load()
+        self._set_meter_prices(meter)
 
-    def _teleinfo_task(self):
+    def _set_meter_prices(self, meter):
         """
-        Teleinfo task reads data from dongle and store current consumption.
-        It also emit power event.
+        Cache prices of meter tariff indexes in its rollups, according to configured price table and meter
+        tariff registers. Called only when price table or tariff option changes
+
+        Args:
+            meter (TeleinfoMeter): meter instance
         """
-        try:
-            if not self._get_config_field('port'):
-                return
+        rollups = meter.rollups
+        if not rollups:
+            return
 
-            self.logger.trace('Update teleinfo')
+        prices = self._get_config_field('prices') or {}
+        registers = meter.profile.registers if meter.profile else ()
+        rollups.set_prices([prices.get(register, 0.0) for register in registers] if prices else None)
+
+    def _close_stores(self):
+        """
+        Flush pending samples, close on-disk stores and checkpoint consumption rollups of all meters
+        """
+        for meter in list(self.meters.values()):
+            self._close_store(meter)
 
-            # read teleinfo data
-            raw = self._get_teleinfo_raw_data()
-            self.logger.debug('Raw teleinfo: %s' % raw)
+    def _close_store(self, meter):
+        """
+        Flush pending samples, close meter on-disk store and checkpoint its consumption rollups
 
-            # compute some values
-            if not raw:
-                return
+        Args:
+            meter (TeleinfoMeter): meter instance
+        """
+        if meter.store:
+            try:
+                meter.store.close()
+            except Exception:
+                self.logger.exception('Unable to close teleinfo store of meter "%s":' % meter.name)
+            meter.store = None
+        if meter.rollups:
+            try:
+                meter.rollups.save()
+            except Exception:
+                self.logger.exception('Unable to save consumption rollups of meter "%s":' % meter.name)
+            meter.rollups = None
 
-            # save as soon as possible some data
-            if not self.last_raw:
-                self.last_raw = raw
-
-            keys = set(raw.keys())
-            # power consumption
-            if set(['HCHC', 'HCHP']).issubset(keys):
-                # handle heures creuses/pleines
-                self.logger.trace('Handle heures creuses/pleines')
-                ints = Cteleinfo.to_int(raw, ['HCHC', 'HCHP'])
-                if ints:
-                    self.__last_conso_heures_creuses = ints['HCHC']
-                    self.__last_conso_heures_pleines = ints['HCHP']
-            elif set(['EJPHN', 'EJPHPM']).issubset(keys):
-                # handle EJP
-                self.logger.trace('Handle EJP')
-                ints = Cteleinfo.to_int(raw, ['EJPHN', 'EJPHPM'])
-                if ints:
-                    self.__last_conso_heures_creuses = ints['EJPHN']
-                    self.__last_conso_heures_pleines = ints['EJPHPM']
-            elif set(['BBRHCJB', 'BBRHPJB', 'BBRHCJW', 'BBRHPJW', 'BBRHCJR', 'BBRHPJR']).issubset(keys):
-                # handle Tempo
-                self.logger.trace('Handle Tempo')
-                ints = Cteleinfo.to_int(raw, ['BBRHCJB', 'BBRHPJB', 'BBRHCJW', 'BBRHPJW', 'BBRHCJR', 'BBRHPJR'])
-                if ints:
-                    self.__last_conso_heures_creuses = ints['BBRHCJB'] + ints['BBRHCJW'] + ints['BBRHCJR']
-                    self.__last_conso_heures_pleines = ints['BBRHPJB'] + ints['BBRHPJW'] + ints['BBRHPJR']
-            elif set(['BASE']).issubset(keys):
-                # handle Base
-                self.logger.trace('Handle Base')
-                ints = Cteleinfo.to_int(raw, ['BASE'])
-                if ints:
-                    self.__last_conso_heures_creuses = ints['BASE']
-                    self.__last_conso_heures_pleines = 0
-            else:
-                self.logger.debug('No consumption value in raw data %s' % raw)
-
-            # instant power
-            if set(['IINST']).issubset(keys):
-                ints = Cteleinfo.to_int(raw, ['IINST'])
-            elif set(['IINST1', 'IINST2', 'IINST3']).issubset(keys):
-                ints = Cteleinfo.to_int(raw, ['IINST1', 'IINST2', 'IINST3'])
-                ints['IINST'] = ints['IINST1'] + ints['IINST2'] + ints['IINST3']
-            else:
-                ints = None
-            if ints:
-                # handle next mode
-                next_mode = None
-                if set(['DEMAIN']).issubset(keys):
-                    next_mode = raw['DEMAIN']
-                elif set(['PEJP']).issubset(keys):
-                    next_mode = 'EJP in %s mins' % raw['PEJP']
-
-                params = {
-                    'lastupdate': int(time.time()),
-                    'power': ints['IINST'] * self.VA_FACTOR,
-                    'currentmode': raw['PTEC'] if 'PTEC' in raw else None,
-                    'nextmode': next_mode,
-                    'heurescreuses': self.__last_conso_heures_creuses,
-                    'heurespleines': self.__last_conso_heures_pleines,
-                    'subscription': raw['ISOUSC'] if 'ISOUSC' in raw else None,
-                }
+    def _is_async_ingestion(self):
+        """
+        Return True if asyncio ingestion mode is configured
 
-                # and emit events
-                self.logger.trace('Send power update event with params: %s' % params)
-                self._update_device(self.instant_power_device_uuid, params)
-                self.power_update_event.send(params=params, device_id=self.instant_power_device_uuid)
+        Returns:
+            bool: True if asyncio ingestion mode is configured
+        """
+        return self._get_config_field('ingestionmode')==self.INGESTION_ASYNCIO
 
-            # save last raw
-            self.last_raw = raw
+    def _start_ingestion(self):
+        """
+        Start serial ingestion of all connected meters according to configured mode
+        """
+        if self._is_async_ingestion():
+            self._start_async_ingestion()
+        for meter in self._get_connected_meters():
+            self._start_meter_ingestion(meter)
 
-        except Exception: # pragma: no cover
-            self.logger.exception('Exception during teleinfo task:')
+    def _stop_ingestion(self):
+        """
+        Stop serial ingestion of all meters whatever the running mode
+        """
+        for meter in list(self.meters.values()):
+            self._stop_meter_ingestion(meter)
+        self._stop_async_ingestion()
 
-    def _get_teleinfo_raw_data(self):
+    def _start_meter_ingestion(self, meter):
         """
-        Get teleinfo raw data from power meter
+        Start meter serial ingestion. In thread mode each meter has its own reader thread (blocked on its serial
+        port), in asyncio mode meter is added to shared event loop and reader is only used to decode frames
 
-        Returns:
-            dict: raw teleinfo data or empty if no dongle connected
+        Args:
+            meter (TeleinfoMeter): meter instance
         """
-        self.logger.trace('Parser= %s' % self.__teleinfo_parser)
-        if self.__teleinfo_parser:
-            return self.__teleinfo_parser.get_frame()
+        if meter.reader is not None:
+            return
 
-        return {}
+        # frame processed before ingestion restart must not be taken as new one by teleinfo task
+        meter.processed = None
+        if self.async_ingestion is not None:
+            reader = TeleinfoReader(meter.read_serial, self.logger)
+            reader.capture = meter.capture
+            reader.stats = self.stats
+            meter.reader = reader
+            self.async_ingestion.add_meter(meter.name, meter.serial, reader)
+        else:
+            reader = TeleinfoReader(
+                meter.read_serial,
+                self.logger,
+                partial(self._on_reader_frame, meter),
+                partial(self._on_meter_error, meter.name),
+            )
+            reader.capture = meter.capture
+            reader.stats = self.stats
+            meter.reader = reader
+            reader.start()
 
-    def get_teleinfo(self):
+    def _stop_meter_ingestion(self, meter):
         """
-        Return latest teleinfo data
+        Stop meter serial ingestion whatever the running mode
 
-        Returns:
-            dict: dict of teleinfo data according to user subscription (can be empty if no dongle configured)::
+        Args:
+            meter (TeleinfoMeter): meter instance
+        """
+        reader = meter.reader
+        if reader is None:
+            return
 
-                [
-                    {
-                        key (string): key of teleinfo item (IINST, DEMAIN, HCHC...),
-                        value (string): value of teleinfo item
-                    },
-                    ...
-                ]
+        meter.reader = None
+        if self.async_ingestion is not None:
+            self.async_ingestion.remove_meter(meter.name)
+        reader.stop()
+        if reader.is_alive():
+            reader.join(self.SERIAL_TIMEOUT * 2)
+        meter.processed = None
 
+    def _start_async_ingestion(self):
+        """
+        Start asyncio ingestion. Serial ports of all meters are read by the same event loop, frames processing,
+        device updates and event sends are executed in thread pools
         """
-        return [{'key':k, 'value':v} for k,v in self.last_raw.items()]
+        if self.async_ingestion is None:
+            self.async_ingestion = TeleinfoAsyncIngestion(
+                self.logger,
+                self._process_async_frame,
+                self._async_update_device,
+                self._async_send_event,
+                self._on_meter_error,
+            )
+            self.async_ingestion.stats = self.stats
+            self.async_ingestion.start()
 
-    @staticmethod
-    def to_int(raw, keys):
+    def _stop_async_ingestion(self):
         """
-        Convert all values from raw to integer
-        This function is useful to check values are valid
+        Stop asyncio ingestion
+        """
+        if self.async_ingestion is not None:
+            self.async_ingestion.stop()
+            self.async_ingestion.join(self.SERIAL_TIMEOUT * 2)
+            self.async_ingestion = None
+
+    def _process_async_frame(self, meter_name, raw):
+        """
+        Process frame decoded by asyncio ingestion. Power device is updated according to power event policy
 
         Args:
-            raw (dict): raw data from teleinfo
-            keys (list): list of keys available in raw to convert
+            meter_name (string): meter name
+            raw (dict): raw teleinfo data
+
         Returns:
-            dict: dict of key-int or None if error occured
+            dict: power device params or None if device must not be updated
         """
-        try:
-            out = {}
-            for key in keys:
-                out[key] = int(raw[key])
-            return out
-        except Exception: # pragma: no cover
+        meter = self.meters[meter_name]
+        params = self._on_teleinfo_frame(meter, raw)
+        meter.last_raw = raw
+
+        if not params or not meter.event_policy.check(params):
             return None
 
+        return params
+
+    def _async_update_device(self, meter_name, params):
+        """
+        Update instant power device (asyncio ingestion stage). Device is persisted by write-behind cache
+
+        Args:
+            meter_name (string): meter name
+            params (dict): power device params
+        """
+        start = time.perf_counter()
+        self.write_behind.update_device(self.meters[meter_name].instant_power_device_uuid, params)
+        self.stats.add('device', time.perf_counter() - start)
+
+    def _async_send_event(self, meter_name, params):
+        """
+        Send power update event (asyncio ingestion stage)
+
+        Args:
+            meter_name (string): meter name
+            params (dict): power device params
+        """
+        self.logger.trace('Send power update event of meter "%s" with params: %s' % (meter_name, params))
+        start = time.perf_counter()
+        self.power_update_event.send(params=params, device_id=self.meters[meter_name].instant_power_device_uuid)
+        self.stats.add('event', time.perf_counter() - start)
+
+    def _start_teleinfo_task(self):
+        """
+        Start teleinfo task
+        """
+        if self.teleinfo_task is None:
+            self.teleinfo_task = Task(self.TELEINFO_TASK_DELAY, self._teleinfo_task, self.logger)
+            self.teleinfo_task.start()
+
+    def _stop_teleinfo_task(self):
+        """
+        Stop teleinfo task. Pending teleinfo task run is waited
+        """
+        if self.teleinfo_task is not None:
+            self.teleinfo_task.stop()
+            self.teleinfo_task = None
+        with self.__teleinfo_task_lock:
+            pass
+
+    def _start_persistence_task(self):
+        """
+        Start persistence task
+        """
+        if self.persistence_task is None:
+            self.persistence_task = Task(self.PERSISTENCE_TASK_DELAY, self._persistence_task, self.logger)
+            self.persistence_task.start()
+
+    def _stop_persistence_task(self):
+        """
+        Stop persistence task
+        """
+        if self.persistence_task is not None:
+            self.persistence_task.stop()
+            self.persistence_task = None
+
+    def _persistence_task(self):
+        """
+        Persistence task writes device and config changes kept by write-behind cache once write interval ran
+        out, whatever the ingestion mode and even if no other change is queued meanwhile. It also checkpoints
+        consumption rollups, so checkpoint files are never written in ingestion hot path
+        """
+        self.write_behind.flush_if_due()
+
+        for meter in list(self.meters.values()):
+            rollups = meter.rollups
+            if not rollups:
+                continue
+            try:
+                rollups.checkpoint_if_due()
+            except Exception:
+                self.logger.exception('Unable to checkpoint consumption rollups of meter "%s":' % meter.name)
+
+    def _restart_teleinfo_task(self):
+        """
+        Restart teleinfo task
+        """
+        self._stop_teleinfo_task()
+        self._start_teleinfo_task()
+
+    def event_received(self, event):
+        """
+        Event received from bus
+
+        Params:
+            event (MessageRequest): event data
+        """
+        self.logger.trace('Event received %s' % event)
+        # compute and send consumption event once a day at midnight
+        # previous day consumption is stored in configuration file to take care of device reboot
+        if event['event']=='parameters.time.now' and event['params']['hour']==0 and event['params']['minute']==0:
+            for meter in list(self.meters.values()):
+                self._update_meter_daily_consumption(meter)
+
+    def _update_meter_daily_consumption(self, meter):
+        """
+        Send meter consumption of previous day and save current indexes
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+        """
+        meter_config = self._get_meter_config(meter)
+        if meter_config['previousconsoheurescreuses'] is not None and meter_config['previousconsoheurespleines'] is not None:
+            params = {
+                'lastupdate': int(time.time()),
+                'heurescreuses': (meter.last_conso_heures_creuses - meter_config['previousconsoheurescreuses']),
+                'heurespleines': (meter.last_conso_heures_pleines - meter_config['previousconsoheurespleines']),
+            }
+
+            # send consumption event and update device
+            self.logger.trace('Send consumption update event of meter "%s" with params: %s' % (meter.name, params))
+            self.write_behind.update_device(meter.instant_power_device_uuid, params)
+            self.consumption_update_event.send(params=params, device_id=meter.power_consumption_device_uuid)
+
+        # save last power consumption in config file (critical fields, written immediately)
+        self.logger.info('Save last power consumption of the day of meter "%s"' % meter.name)
+        self.write_behind.update_config(self._build_meter_config(meter, {
+            'previousconsoheurescreuses': meter.last_conso_heures_creuses,
+            'previousconsoheurespleines': meter.last_conso_heures_pleines,
+        }))
+
+    def _teleinfo_task(self):
+        """
+        Teleinfo task updates power device of each meter with latest frame processed by its reader and
+        emits power event according to power event policy.
+        """
+        with self.__teleinfo_task_lock:
+            if self._is_async_ingestion():
+                # late run of stopped task, asyncio ingestion updates devices by itself
+                return
+
+            for meter in list(self.meters.values()):
+                if not meter.reader:
+                    continue
+                try:
+                    self._update_meter(meter)
+                except Exception: # pragma: no cover
+                    self.logger.exception('Exception during teleinfo task of meter "%s":' % meter.name)
+
+    def _update_meter(self, meter):
+        """
+        Send overload events and update power device with latest frame processed by reader thread of specified
+        meter, according to power event policy. Power device is not updated if no frame was received since last call
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+        """
+        self.logger.trace('Update teleinfo of meter "%s"' % meter.name)
+
+        # overload events raised by reader thread
+        while meter.overload_events:
+            self._send_overload_event(meter, meter.overload_events.popleft())
+
+        # frame is already processed by reader thread
+        processed = meter.processed
+        if processed is None:
+            return
+        raw, params = processed
+        self.logger.trace('Raw teleinfo: %s' % raw)
+
+        # save as soon as possible some data
+        if not meter.snapshot.update(raw):
+            # no new frame since last task run, nothing to check
+            return
+
+        if params and meter.event_policy.check(params):
+            self._update_power_device(meter, params)
+
+    def _process_raw_data(self, meter, raw):
+        """
+        Process teleinfo raw data: store current consumption and compute power device values
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+            raw (dict): raw teleinfo data
+
+        Returns:
+            dict: power device params or None if no power data in raw data
+        """
+        try:
+            consumption, current = self._extract_values(self._get_profile(meter, raw), raw)
+        except KeyError:
+            # frame layout changed, detect profile again
+            consumption, current = self._extract_values(self._get_profile(meter, raw, force=True), raw)
+
+        # power consumption
+        if consumption:
+            meter.last_conso_heures_creuses, meter.last_conso_heures_pleines, meter.last_indexes = consumption
+        else:
+            self.logger.debug('No consumption value in raw data %s' % raw)
+
+        # instant power
+        power, _ = meter.power.update(time.monotonic(), raw, consumption[2] if consumption else None, current)
+        if power is None:
+            return None
+
+        if 'NTARF' in raw:
+            current_mode, next_mode, subscription = Cteleinfo.get_standard_modes(raw)
+        else:
+            # handle next mode
+            next_mode = None
+            if 'DEMAIN' in raw:
+                next_mode = raw['DEMAIN']
+            elif 'PEJP' in raw:
+                next_mode = 'EJP in %s mins' % raw['PEJP']
+            current_mode = raw.get('PTEC')
+            subscription = raw.get('ISOUSC')
+
+        params = {
+            'lastupdate': int(time.time()),
+            'power': power,
+            'currentmode': current_mode,
+            'nextmode': next_mode,
+            'heurescreuses': meter.last_conso_heures_creuses,
+            'heurespleines': meter.last_conso_heures_pleines,
+            'subscription': subscription,
+        }
+
+        return params
+
+    def _extract_values(self, profile, raw):
+        """
+        Extract consumption and instant current from frame using specified profile
+
+        Args:
+            profile (TeleinfoProfile): teleinfo profile
+            raw (dict): raw teleinfo data
+
+        Returns:
+            tuple: consumption (see TeleinfoProfile.extract_consumption) and instant current (consumption, current).
+                   Each value is None if not available or invalid
+
+        Raises:
+            KeyError: if frame does not match profile
+        """
+        try:
+            consumption = profile.extract_consumption(raw)
+        except ValueError:
+            consumption = None
+        try:
+            current = profile.extract_current(raw)
+        except ValueError:
+            current = None
+
+        return consumption, current
+
+    def _get_profile(self, meter, raw, force=False):
+        """
+        Return teleinfo profile used to extract values from meter frame. Profile is detected again only
+        when tariff option changes or when previous frames were incomplete
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+            raw (dict): raw teleinfo data
+            force (bool): force profile detection
+
+        Returns:
+            TeleinfoProfile: teleinfo profile
+        """
+        profile = meter.profile
+        if force or profile is None or not profile.is_valid(raw):
+            profile = TeleinfoProfile.detect(raw, Cteleinfo.get_standard_tariff_option(raw) if 'NGTF' in raw else None)
+            if profile.complete:
+                self.logger.info('Teleinfo profile of meter "%s" detected: consumption=%s current=%s' % (
+                    meter.name, profile.consumption, profile.current))
+            indexes_changed = meter.profile is None or profile.consumption!=meter.profile.consumption
+            meter.profile = profile
+            if indexes_changed:
+                meter.power.reset()
+                self._set_meter_prices(meter)
+
+        return profile
+
+    def _on_teleinfo_frame(self, meter, raw):
+        """
+        Process each decoded frame of meter: stream it to local subscribers, store current consumption, check
+        overload rules, append power sample to history and rolling stats, persist it in on-disk store and update
+        consumption rollups
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+            raw (dict): raw teleinfo data
+
+        Returns:
+            dict: power device params or None if no instant power in raw data
+        """
+        start = time.perf_counter()
+        streamer = self.streamer
+        if streamer:
+            streamer.publish(meter.name, raw)
+        params = self._process_raw_data(meter, raw)
+        if meter.overload.check(time.monotonic(), raw, params['power'] if params else None):
+            self._queue_overload_event(meter, params)
+        if params:
+            meter.history.append(params['lastupdate'], params['power'], params['heurescreuses'], params['heurespleines'])
+            meter.power_stats.add(time.monotonic(), params['power'])
+            if meter.store:
+                meter.store.append(params['lastupdate'], params['power'], meter.last_indexes)
+            if meter.rollups and meter.last_indexes:
+                meter.rollups.update(params['lastupdate'], meter.last_indexes)
+        self.stats.add('process', time.perf_counter() - start)
+
+        return params
+
+    def _on_reader_frame(self, meter, raw):
+        """
+        Process frame decoded by reader thread (thread ingestion mode). Frame is published with its power
+        device params to teleinfo task, that updates power device according to power event policy
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+            raw (dict): raw teleinfo data
+        """
+        meter.processed = (raw, self._on_teleinfo_frame(meter, raw))
+
+    def _queue_overload_event(self, meter, params):
+        """
+        Queue overload event of meter. It is queued on the frame raising or clearing an overload rule and sent
+        outside of frame processing, so bus send never delays serial reads: by thread pool in asyncio mode,
+        by teleinfo task in thread mode
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+            params (dict): power device params or None if no instant power in raw data
+        """
+        overload = meter.overload.to_dict()
+        if overload['overload']:
+            self.logger.warning('Overload of meter "%s" detected: %s' % (meter.name, overload['rules']))
+        else:
+            self.logger.info('Overload of meter "%s" cleared' % meter.name)
+        event_params = {
+            'lastupdate': params['lastupdate'] if params else int(time.time()),
+            'meter': meter.name,
+            'overload': overload['overload'],
+            'rules': overload['rules'],
+            'headroom': overload['headroom'],
+            'power': params['power'] if params else None,
+        }
+
+        async_ingestion = self.async_ingestion
+        if async_ingestion is not None:
+            async_ingestion.execute(meter.name, self._send_overload_event, meter, event_params)
+        else:
+            meter.overload_events.append(event_params)
+
+    def _send_overload_event(self, meter, params):
+        """
+        Send overload event of meter
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+            params (dict): overload event params
+        """
+        self.overload_event.send(params=params, device_id=meter.instant_power_device_uuid)
+
+    def _update_power_device(self, meter, params):
+        """
+        Update meter instant power device and emit power event. Device is persisted by write-behind cache
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+            params (dict): power device params
+        """
+        self.logger.trace('Send power update event of meter "%s" with params: %s' % (meter.name, params))
+        start = time.perf_counter()
+        self.write_behind.update_device(meter.instant_power_device_uuid, params)
+        device_end = time.perf_counter()
+        self.power_update_event.send(params=params, device_id=meter.instant_power_device_uuid)
+        self.stats.add('device', device_end - start)
+        self.stats.add('event', time.perf_counter() - device_end)
+
+    def _get_teleinfo_raw_data(self, meter):
+        """
+        Get latest teleinfo raw data read from power meter
+        This function does not access serial port, it returns latest frame published by reader
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+
+        Returns:
+            dict: raw teleinfo data or empty if no dongle connected
+        """
+        return meter.get_frame()
+
+    def get_meters(self):
+        """
+        Return meters
+
+        Returns:
+            list: list of meters infos (see TeleinfoMeter.to_dict), primary meter first
+        """
+        return [meter.to_dict() for meter in sorted(self.meters.values(), key=lambda meter: (not meter.primary, meter.name))]
+
+    def get_teleinfo(self, meter=None, since=None):
+        """
+        Return latest teleinfo data. Until first frame is received after startup, last frame of previous run
+        is returned (flagged stale in items, in changes and in get_meters)
+
+        Args:
+            meter (string): meter name. Default to primary meter
+            since (int): sequence number returned by previous call. If specified only items changed since
+                         this sequence are returned
+
+        Returns:
+            list: list of teleinfo data according to user subscription (can be empty if no dongle configured)::
+
+                [
+                    {
+                        key (string): key of teleinfo item (IINST, DEMAIN, HCHC...),
+                        value (string): value of teleinfo item,
+                        stale (bool): True if item was restored from previous run (only set in restored items),
+                    },
+                    ...
+                ]
+
+            dict: if since is specified, changes since this sequence::
+
+                {
+                    sequence (int): sequence number of latest frame,
+                    unchanged (bool): True if nothing changed since specified sequence,
+                    full (bool): True if items contain all teleinfo data (unknown sequence, after restart),
+                    items (list): changed items (same format as above),
+                    removed (list): keys of removed items,
+                    stale (bool): True if data was restored from previous run (no frame received yet),
+                }
+
+        Raises:
+            InvalidParameter: if parameter is invalid
+        """
+        snapshot = self._get_meter(meter).snapshot
+        if since is None:
+            return snapshot.get()
+        if not isinstance(since, int) or since<0:
+            raise InvalidParameter('Parameter "since" must be a positive sequence number')
+
+        return snapshot.get_changes(since)
+
+    def get_power_history(self, start=None, end=None, resolution=1, meter=None):
+        """
+        Return instant power history kept in memory (last 24 hours at full frame rate).
+        History is downsampled to requested resolution
+
+        Args:
+            start (int): start timestamp. Default to one hour ago
+            end (int): end timestamp. Default to now
+            resolution (int): history resolution in seconds. Default to 1 second
+            meter (string): meter name. Default to primary meter
+
+        Returns:
+            list: list of samples::
+
+                [
+                    {
+                        timestamp (int): sample timestamp,
+                        power (int): average instant power during resolution,
+                        heurescreuses (int): heures creuses (or base) index,
+                        heurespleines (int): heures pleines index,
+                    },
+                    ...
+                ]
+
+        Raises:
+            InvalidParameter: if parameter is invalid
+        """
+        start, end = self._check_time_range(start, end, 3600)
+        self._check_resolution(resolution)
+
+        return self._get_meter(meter).history.get(start, end, resolution)
+
+    def get_meter_history(self, start=None, end=None, resolution=60, meter=None):
+        """
+        Return meter history persisted in on-disk store (up to STORE_MAX_SEGMENTS days).
+        History is downsampled to requested resolution
+
+        Args:
+            start (int): start timestamp. Default to one day ago
+            end (int): end timestamp. Default to now
+            resolution (int): history resolution in seconds. Default to 1 minute
+            meter (string): meter name. Default to primary meter
+
+        Returns:
+            list: list of samples::
+
+                [
+                    {
+                        timestamp (int): sample timestamp,
+                        power (int): average instant power during resolution,
+                        indexes (list): raw tariff indexes (HCHC/HCHP, EJPHN/EJPHPM, BBR*, BASE or EASF01..06)
+                    },
+                    ...
+                ]
+
+        Raises:
+            InvalidParameter: if parameter is invalid
+        """
+        start, end = self._check_time_range(start, end, 86400)
+        self._check_resolution(resolution)
+        store = self._get_meter(meter).store
+        if not store:
+            return []
+
+        return store.get(start, end, resolution)
+
+    def get_power_stats(self, window, meter=None):
+        """
+        Return instant power stats over rolling window (1m, 15m, 1h or 1d). Stats are maintained on each frame
+
+        Args:
+            window (string): rolling window (1m, 15m, 1h or 1d)
+            meter (string): meter name. Default to primary meter
+
+        Returns:
+            dict: power stats::
+
+                {
+                    window (string): window,
+                    count (int): number of samples,
+                    min (int): min power (VA),
+                    max (int): max power (VA),
+                    mean (float): mean power (VA),
+                    stddev (float): power standard deviation (VA),
+                    p50 (int): median power (VA),
+                    p95 (int): 95th percentile of power (VA),
+                    p99 (int): 99th percentile of power (VA),
+                }
+
+        Raises:
+            MissingParameter: if parameter is missing
+            InvalidParameter: if parameter is invalid
+        """
+        if window is None:
+            raise MissingParameter('Parameter "window" is missing')
+        if window not in WINDOWS:
+            raise InvalidParameter('Parameter "window" must be "%s"' % '", "'.join(WINDOWS))
+
+        return self._get_meter(meter).power_stats.get(window, time.monotonic())
+
+    def get_consumption(self, period, start=None, end=None, meter=None):
+        """
+        Return consumption rollups of specified period (hour, day, week or month)
+
+        Args:
+            period (string): rollup period (hour, day, week or month)
+            start (int): start timestamp. Bucket containing start timestamp is returned. Default to current bucket
+            end (int): end timestamp. Default to now
+            meter (string): meter name. Default to primary meter
+
+        Returns:
+            list: list of buckets::
+
+                [
+                    {
+                        timestamp (int): bucket start timestamp,
+                        consumption (list): consumption per tariff index (Wh),
+                        total (int): total consumption (Wh),
+                    },
+                    ...
+                ]
+
+        Raises:
+            MissingParameter: if parameter is missing
+            InvalidParameter: if parameter is invalid
+        """
+        if period is None:
+            raise MissingParameter('Parameter "period" is missing')
+        if period not in PERIODS:
+            raise InvalidParameter('Parameter "period" must be "%s"' % '", "'.join(PERIODS))
+        start, end = self._check_time_range(start, end, 0)
+        rollups = self._get_meter(meter).rollups
+        if not rollups:
+            return []
+
+        return rollups.get(period, start, end)
+
+    def set_prices(self, prices):
+        """
+        Set price table used to compute consumption cost. Price applies to consumption from now on, cost
+        already accounted is kept
+
+        Args:
+            prices (dict): price of one kWh per tariff register (HC, HP, HN, PM, HCJB, HPJB, HCJW, HPJW, HCJR,
+                           HPJR, BASE or EASF01 to EASF06 in standard mode). Missing registers are free
+
+        Raises:
+            MissingParameter: if parameter is missing
+            InvalidParameter: if parameter is invalid
+        """
+        if prices is None:
+            raise MissingParameter('Parameter "prices" is missing')
+        if not isinstance(prices, dict) or any(
+            not isinstance(price, (int, float)) or isinstance(price, bool) or price<0 for price in prices.values()
+        ):
+            raise InvalidParameter('Parameter "prices" must be a dict of positive prices per tariff register')
+
+        self._set_config_field('prices', prices)
+        for meter in list(self.meters.values()):
+            self._set_meter_prices(meter)
+
+    def get_prices(self):
+        """
+        Return price table
+
+        Returns:
+            dict: price of one kWh per tariff register
+        """
+        return self._get_config_field('prices') or {}
+
+    def get_cost(self, period, meter=None):
+        """
+        Return consumption and cost of current period (hour, day, week or month) per tariff register. Values are
+        maintained on each frame, nothing is computed from history
+
+        Args:
+            period (string): rollup period (hour, day, week or month)
+            meter (string): meter name. Default to primary meter
+
+        Returns:
+            dict: current period consumption and cost::
+
+                {
+                    timestamp (int): period start timestamp,
+                    consumption (int): total consumption (Wh),
+                    cost (float): total cost,
+                    registers (list): [
+                        {
+                            name (string): tariff register (HCJB, HPJB...),
+                            consumption (int): register consumption (Wh),
+                            cost (float): register cost,
+                        },
+                        ...
+                    ],
+                }
+
+        Raises:
+            MissingParameter: if parameter is missing
+            InvalidParameter: if parameter is invalid
+        """
+        if period is None:
+            raise MissingParameter('Parameter "period" is missing')
+        if period not in PERIODS:
+            raise InvalidParameter('Parameter "period" must be "%s"' % '", "'.join(PERIODS))
+        meter = self._get_meter(meter)
+        rollups = meter.rollups
+        if not rollups:
+            return {'timestamp': None, 'consumption': 0, 'cost': 0.0, 'registers': []}
+
+        current = rollups.get_current(period)
+        names = meter.profile.registers if meter.profile else ()
+        registers = [
+            {
+                'name': names[position] if position<len(names) else 'INDEX%d' % (position + 1),
+                'consumption': consumption,
+                'cost': round(cost, 4),
+            }
+            for position, (consumption, cost) in enumerate(zip(current['consumption'], current['cost']))
+        ]
+
+        return {
+            'timestamp': current['timestamp'],
+            'consumption': sum(current['consumption']),
+            'cost': round(sum(current['cost']), 4),
+            'registers': registers,
+        }
+
+    def export_history(self, start=None, end=None, data='samples', export_format='csv', cursor=None, meter=None):
+        """
+        Export stored samples or consumption rollups of a time range, one chunk per call. Call again with
+        returned cursor to get next chunk until cursor is None. Interrupted export is resumed the same way
+
+        Args:
+            start (int): start timestamp. Default to one day ago
+            end (int): end timestamp. Default to now
+            data (string): exported data: samples (on-disk store) or rollup period (hour, day, week or month)
+            export_format (string): csv or binary (columnar, see TeleinfoExport)
+            cursor (string): cursor returned by previous call (None for first chunk)
+            meter (string): meter name. Default to primary meter
+
+        Returns:
+            dict: export chunk::
+
+                {
+                    data (string): CSV text or base64 encoded binary chunk,
+                    cursor (string): cursor of next chunk (None if export is complete),
+                }
+
+        Raises:
+            MissingParameter: if parameter is missing
+            InvalidParameter: if parameter is invalid
+        """
+        if data is None:
+            raise MissingParameter('Parameter "data" is missing')
+        if data!='samples' and data not in PERIODS:
+            raise InvalidParameter('Parameter "data" must be "samples", "%s"' % '", "'.join(PERIODS))
+        if export_format not in FORMATS:
+            raise InvalidParameter('Parameter "export_format" must be "%s"' % '", "'.join(FORMATS))
+        start, end = self._check_time_range(start, end, 86400)
+        if cursor is not None:
+            try:
+                start = TeleinfoExport.parse_cursor(cursor)[0]
+            except (AttributeError, ValueError):
+                raise InvalidParameter('Parameter "cursor" is invalid')
+        meter = self._get_meter(meter)
+
+        chunks = TeleinfoExport(self._get_export_columns(meter, data), export_format).iter_chunks(
+            self._iter_export_rows(meter, data, start, end),
+            cursor,
+        )
+        try:
+            chunk, next_cursor = next(chunks)
+        finally:
+            chunks.close()
+
+        return {
+            'data': base64.b64encode(chunk).decode('ascii') if export_format==FORMAT_BINARY else chunk.decode('ascii'),
+            'cursor': next_cursor,
+        }
+
+    def _get_export_columns(self, meter, data):
+        """
+        Return export column names. Indexes are named after meter tariff registers when known
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+            data (string): exported data (samples or rollup period)
+
+        Returns:
+            list: column names
+        """
+        registers = list(meter.profile.registers if meter.profile else ())
+        if not registers:
+            registers = ['index%d' % (position + 1) for position in range(TeleinfoStore.INDEXES_COUNT)]
+
+        return ['timestamp', 'power'] + registers if data=='samples' else ['timestamp'] + registers
+
+    def _iter_export_rows(self, meter, data, start, end):
+        """
+        Iterate over exported rows. Rows are read lazily from on-disk store or rollups
+
+        Args:
+            meter (TeleinfoMeter): meter instance
+            data (string): exported data (samples or rollup period)
+            start (int): start timestamp (included)
+            end (int): end timestamp (included)
+
+        Yields:
+            tuple: row (timestamp, [power,] index1, ..., indexN). Rows are padded to export columns by encoder
+        """
+        width = len(self._get_export_columns(meter, data))
+        if data=='samples':
+            store = meter.store
+            rows = store.iter_records(start, end) if store else ()
+        else:
+            rollups = meter.rollups
+            rows = rollups.iter_buckets(data, TeleinfoRollups.get_bucket_bounds(data, start)[0], end) if rollups else ()
+        padding = (0,) * width
+        for row in rows:
+            yield row if len(row)>=width else row + padding[len(row):]
+
+    def _check_time_range(self, start, end, default_duration):
+        """
+        Check history time range parameters
+
+        Args:
+            start (int): start timestamp or None
+            end (int): end timestamp or None
+            default_duration (int): range duration in seconds used when start is not specified
+
+        Returns:
+            tuple: start and end timestamps (start, end)
+
+        Raises:
+            InvalidParameter: if parameter is invalid
+        """
+        end = int(time.time()) if end is None else end
+        if not isinstance(end, int):
+            raise InvalidParameter('Parameter "end" must be a timestamp')
+        start = end - default_duration if start is None else start
+        if not isinstance(start, int):
+            raise InvalidParameter('Parameter "start" must be a timestamp')
+        if start>end:
+            raise InvalidParameter('Parameter "start" must be lower than "end"')
+
+        return start, end
+
+    def _check_resolution(self, resolution):
+        """
+        Check history resolution parameter
+
+        Args:
+            resolution (int): resolution in seconds
+
+        Raises:
+            InvalidParameter: if parameter is invalid
+        """
+        if not isinstance(resolution, int) or resolution<1:
+            raise InvalidParameter('Parameter "resolution" must be a positive number of seconds')
+
+    def set_ingestion_mode(self, mode):
+        """
+        Set serial ingestion mode. Ingestion of connected meters is restarted
+
+        Args:
+            mode (string): ingestion mode (thread or asyncio)
+
+        Raises:
+            MissingParameter: if parameter is missing
+            InvalidParameter: if parameter is invalid
+        """
+        if mode is None:
+            raise MissingParameter('Parameter "mode" is missing')
+        if mode not in (self.INGESTION_THREAD, self.INGESTION_ASYNCIO):
+            raise InvalidParameter('Parameter "mode" must be "%s" or "%s"' % (self.INGESTION_THREAD, self.INGESTION_ASYNCIO))
+
+        # restart ingestion (startup and hardware task must not connect meters meanwhile). Teleinfo task is
+        # stopped (and its pending run waited) before ingestion is switched, so meter snapshot is never updated
+        # by both task and event loop
+        with self.__hardware_lock:
+            self._set_config_field('ingestionmode', mode)
+            self._stop_teleinfo_task()
+            if self._get_connected_meters():
+                self._stop_ingestion()
+                self._start_ingestion()
+            if mode==self.INGESTION_THREAD:
+                self._start_teleinfo_task()
+
+    def set_stream_group(self, group):
+        """
+        Set group of local users allowed to connect to frames stream socket. Frames streamer is restarted
+
+        Args:
+            group (string): group name. None to allow only module owner
+
+        Raises:
+            InvalidParameter: if parameter is invalid
+        """
+        if group is not None and (not isinstance(group, str) or group not in [entry.gr_name for entry in grp.getgrall()]):
+            raise InvalidParameter('Parameter "group" must be an existing group name')
+
+        self._set_config_field('streamgroup', group)
+        self._stop_streamer()
+        self._start_streamer()
+
+    def start_capture(self, meter=None):
+        """
+        Start recording raw serial stream of meter with timestamps in a capture file. Capture can be replayed
+        with teleinforeplay tool
+
+        Args:
+            meter (string): meter name. Default to primary meter
+
+        Returns:
+            string: capture file path
+
+        Raises:
+            InvalidParameter: if meter does not exist
+            CommandError: if no dongle connected or capture already running
+        """
+        meter = self._get_meter(meter)
+        if not meter.reader:
+            raise CommandError('No teleinfo dongle connected')
+        if meter.capture:
+            raise CommandError('Capture is already running')
+
+        if not os.path.exists(self.CAPTURE_PATH):
+            os.makedirs(self.CAPTURE_PATH)
+        filename = 'capture_%s.tic' % time.strftime('%Y%m%d_%H%M%S')
+        if not meter.primary:
+            filename = '%s_%s' % (meter.name, filename)
+        path = os.path.join(self.CAPTURE_PATH, filename)
+        capture = TeleinfoCaptureWriter(path, meter.baudrate or self.SERIAL_BAUDRATES[MODE_HISTORIC])
+        capture.open()
+        meter.capture = capture
+        meter.reader.capture = capture
+        self.logger.info('Teleinfo capture of meter "%s" started in "%s"' % (meter.name, path))
+
+        return path
+
+    def stop_capture(self, meter=None):
+        """
+        Stop recording raw serial stream of meter
+
+        Args:
+            meter (string): meter name. Default to primary meter
+
+        Returns:
+            dict: capture infos or None if no capture running::
+
+                {
+                    path (string): capture file path,
+                    size (int): capture file size in bytes,
+                    chunks (int): number of recorded chunks,
+                }
+
+        Raises:
+            InvalidParameter: if meter does not exist
+        """
+        meter = self._get_meter(meter)
+        capture = meter.capture
+        if not capture:
+            return None
+
+        if meter.reader:
+            meter.reader.capture = None
+        meter.capture = None
+        capture.close()
+        self.logger.info('Teleinfo capture of meter "%s" stopped (%s bytes)' % (meter.name, capture.size))
+
+        return {
+            'path': capture.path,
+            'size': capture.size,
+            'chunks': capture.chunks_count,
+        }
+
+    def set_power_event_policy(self, deadband, deadband_percent, heartbeat):
+        """
+        Set power update event emission policy of all meters. Event is emitted when power moves more than deadband
+        (VA) or deadband percent, when current or next mode changes, or when heartbeat interval runs out
+
+        Args:
+            deadband (int): power deadband in VA (0 to disable)
+            deadband_percent (int): power deadband in percent (0 to disable)
+            heartbeat (int): max interval between 2 events in seconds
+
+        Raises:
+            MissingParameter: if parameter is missing
+            InvalidParameter: if parameter is invalid
+        """
+        if deadband is None:
+            raise MissingParameter('Parameter "deadband" is missing')
+        if deadband_percent is None:
+            raise MissingParameter('Parameter "deadband_percent" is missing')
+        if heartbeat is None:
+            raise MissingParameter('Parameter "heartbeat" is missing')
+        if not isinstance(deadband, int) or deadband<0:
+            raise InvalidParameter('Parameter "deadband" must be a positive number of VA')
+        if not isinstance(deadband_percent, int) or deadband_percent<0:
+            raise InvalidParameter('Parameter "deadband_percent" must be a positive percentage')
+        if not isinstance(heartbeat, int) or heartbeat<self.TELEINFO_TASK_DELAY:
+            raise InvalidParameter('Parameter "heartbeat" must be greater or equal to %s seconds' % self.TELEINFO_TASK_DELAY)
+
+        self._update_config({
+            'powereventdeadband': deadband,
+            'powereventdeadbandpercent': deadband_percent,
+            'powereventheartbeat': heartbeat,
+        })
+        for meter in list(self.meters.values()):
+            meter.event_policy.configure(deadband, deadband_percent, heartbeat)
+
+    def set_overload_rules(self, headroom, ramp, ramp_window):
+        """
+        Set overload rules of all meters. Overload event is sent when meter reports subscribed power is exceeded
+        (ADPS), when load headroom falls below headroom percent of subscription or when power increases by more
+        than ramp VA within ramp window
+
+        Args:
+            headroom (int): minimum load headroom in percent of subscription (0 to disable)
+            ramp (int): power increase in VA (0 to disable)
+            ramp_window (int): power increase window in seconds
+
+        Raises:
+            MissingParameter: if parameter is missing
+            InvalidParameter: if parameter is invalid
+        """
+        if headroom is None:
+            raise MissingParameter('Parameter "headroom" is missing')
+        if ramp is None:
+            raise MissingParameter('Parameter "ramp" is missing')
+        if ramp_window is None:
+            raise MissingParameter('Parameter "ramp_window" is missing')
+        if not isinstance(headroom, int) or headroom<0 or headroom>=100:
+            raise InvalidParameter('Parameter "headroom" must be a percentage lower than 100')
+        if not isinstance(ramp, int) or ramp<0:
+            raise InvalidParameter('Parameter "ramp" must be a positive number of VA')
+        if not isinstance(ramp_window, int) or ramp_window<1:
+            raise InvalidParameter('Parameter "ramp_window" must be greater or equal to 1 second')
+
+        self._update_config({
+            'overloadheadroom': headroom,
+            'overloadramp': ramp,
+            'overloadrampwindow': ramp_window,
+        })
+        for meter in list(self.meters.values()):
+            meter.overload.configure(headroom, ramp, ramp_window)
+
+    def get_overload_rules(self):
+        """
+        Return overload rules and current overload state of all meters
+
+        Returns:
+            dict: rules and state::
+
+                {
+                    headroom (int): minimum load headroom in percent of subscription,
+                    ramp (int): power increase in VA,
+                    rampwindow (int): power increase window in seconds,
+                    meters (dict): overload state of each meter (see TeleinfoOverload.to_dict),
+                }
+
+        """
+        return {
+            'headroom': self._get_config_field('overloadheadroom'),
+            'ramp': self._get_config_field('overloadramp'),
+            'rampwindow': self._get_config_field('overloadrampwindow'),
+            'meters': {name: meter.overload.to_dict() for name, meter in list(self.meters.items())},
+        }
+
+    def set_write_interval(self, interval):
+        """
+        Set interval between 2 writes of device and config changes on storage. Changes of critical fields
+        (current and next modes, previous day indexes) are always written immediately
+
+        Args:
+            interval (int): write interval in seconds
+
+        Raises:
+            MissingParameter: if parameter is missing
+            InvalidParameter: if parameter is invalid
+        """
+        if interval is None:
+            raise MissingParameter('Parameter "interval" is missing')
+        if not isinstance(interval, int) or interval<0:
+            raise InvalidParameter('Parameter "interval" must be a positive number of seconds')
+
+        self._set_config_field('writeinterval', interval)
+        self.write_behind.interval = interval
+        self.write_behind.flush()
+
+    def get_stats(self):
+        """
+        Return ingestion hot path stats (all meters)
+
+        Returns:
+            dict: stats::
+
+                {
+                    stages (dict): latency stats of read, decode, process, device and event stages
+                                   (see TeleinfoStats.get),
+                    counters (dict): {
+                        framesread (int): number of decoded frames,
+                        checksumerrors (int): number of groups with invalid checksum,
+                        droppedframes (int): number of frames dropped by decoder (too big frames),
+                        droppeditems (int): number of items dropped by asyncio ingestion queues,
+                        eventssent (int): number of power events sent,
+                        eventssuppressed (int): number of power events suppressed by event policy,
+                        queuedepth (int): number of items waiting in asyncio ingestion queues,
+                        writes (int): number of device and config writes,
+                        streamclients (int): number of clients connected to frames stream socket,
+                        streamdropped (int): number of frames and lines dropped by frames streamer,
+                    },
+                }
+
+        """
+        readers = [meter.reader for meter in list(self.meters.values()) if meter.reader]
+        policies = [meter.event_policy for meter in list(self.meters.values())]
+        async_ingestion = self.async_ingestion
+        queues = async_ingestion.get_queues_size() if async_ingestion else {}
+        streamer = self.streamer
+
+        return {
+            'stages': self.stats.get(),
+            'counters': {
+                'framesread': sum([reader.frames_count for reader in readers]),
+                'checksumerrors': sum([reader.decoder.checksum_errors for reader in readers]),
+                'droppedframes': sum([reader.decoder.dropped_frames for reader in readers]),
+                'droppeditems': async_ingestion.dropped if async_ingestion else 0,
+                'eventssent': sum([policy.emitted for policy in policies]),
+                'eventssuppressed': sum([policy.suppressed for policy in policies]),
+                'queuedepth': sum([sum(sizes) for sizes in queues.values()]),
+                'writes': self.write_behind.writes_count,
+                'streamclients': streamer.clients_count if streamer else 0,
+                'streamdropped': streamer.dropped if streamer else 0,
+            },
+        }
+
+    def reset_stats(self):
+        """
+        Reset ingestion hot path latency stats
+        """
+        self.stats.reset()
+
+    def get_power_event_policy(self):
+        """
+        Return power update event emission policy and statistics (all meters)
+
+        Returns:
+            dict: policy and statistics::
+
+                {
+                    deadband (int): power deadband in VA,
+                    deadbandpercent (int): power deadband in percent,
+                    heartbeat (int): max interval between 2 events in seconds,
+                    emitted (int): number of emitted events,
+                    suppressed (int): number of suppressed events,
+                }
+
+        """
+        policies = [meter.event_policy for meter in list(self.meters.values())]
+
+        return {
+            'deadband': self._get_config_field('powereventdeadband'),
+            'deadbandpercent': self._get_config_field('powereventdeadbandpercent'),
+            'heartbeat': self._get_config_field('powereventheartbeat'),
+            'emitted': sum([policy.emitted for policy in policies]),
+            'suppressed': sum([policy.suppressed for policy in policies]),
+        }
+
+    @staticmethod
+    def to_int(raw, keys):
+        """
+        Convert all values from raw to integer
+        This function is useful to check values are valid. Numeric values already parsed in decoded frame
+        (see TeleinfoFrame) are not converted again
+
+        Args:
+            raw (dict): raw data from teleinfo
+            keys (list): list of keys available in raw to convert
+
+        Returns:
+            dict: dict of key-int or None if error occured
+        """
+        numbers = getattr(raw, 'numbers', {})
+        try:
+            out = {}
+            for key in keys:
+                value = numbers.get(key)
+                out[key] = int(raw[key]) if value is None else value
+            return out
+        except Exception:
+            return None
+
+    @staticmethod
+    def get_standard_tariff_option(raw):
+        """
+        Return tariff option of standard mode frame according to supplier tariff name (NGTF)
+
+        Args:
+            raw (dict): raw data from teleinfo
+
+        Returns:
+            string: tariff option (BASE, HC, EJP or TEMPO)
+        """
+        name = raw.get('NGTF', '').upper()
+        for option in ('TEMPO', 'EJP', 'BASE'):
+            if name.find(option)>=0:
+                return option
+        return 'HC'
+
+    @staticmethod
+    def get_standard_modes(raw):
+        """
+        Convert standard mode frame tariff infos to historic ones
+
+        Args:
+            raw (dict): raw data from teleinfo
+
+        Returns:
+            tuple: current mode (PTEC like), next mode (DEMAIN like) and subscription (ISOUSC like)
+        """
+        option = Cteleinfo.get_standard_tariff_option(raw)
+        modes = Cteleinfo.STANDARD_TARIFF_MODES[option]
+        numbers = TeleinfoFrame.get_numbers(raw)
+
+        # current tariff index (NTARF) starts at 1
+        try:
+            index = numbers['NTARF'] - 1
+            current_mode = modes[index] if 0<=index<len(modes) else None
+        except Exception:
+            current_mode = None
+
+        # next day color is stored in bits 26-27 of status register (STGE)
+        next_mode = None
+        if option=='TEMPO' and 'STGE' in raw:
+            try:
+                next_mode = Cteleinfo.STANDARD_NEXT_DAY_COLORS[(int(raw['STGE'], 16) >> 26) & 0x3]
+            except Exception:
+                pass
+
+        # subscribed power (PREF) is in kVA while historic subscription (ISOUSC) is in A
+        try:
+            subscription = str(numbers['PREF'] * 5)
+        except Exception:
+            subscription = None
+
+        return current_mode, next_mode, subscription
+
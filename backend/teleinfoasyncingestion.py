@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo asyncio ingestion
+
+Serial ingestion running on an asyncio event loop
+"""
+
+import time
+import asyncio
+from functools import partial
+from threading import Thread, Event
+from concurrent.futures import ThreadPoolExecutor
+
+class TeleinfoAsyncIngestion(Thread):
+    """
+    Teleinfo asyncio ingestion
+
+    A single event loop (running in its own thread) serves all registered meters. For each meter,
+    ingestion is split in separate stages joined by bounded queues::
+
+        serial reader -> [chunks] -> decoding -> [updates] -> device update -> [events] -> event emission
+
+    Serial port is read without blocking when its file descriptor is readable. Frame processing, device update
+    and event emission are blocking calls executed in thread pools (frame processing has its own one), so
+    they never delay serial reads of any meter.
+
+    Raw chunks are never dropped (it would corrupt frames): when chunks queue is full, serial port is not
+    read anymore until decoding stage catches up, bytes waiting in serial port buffer. When updates or events
+    queue is full its oldest item (superseded by newer one) is dropped.
+    """
+
+    QUEUE_SIZE = 32
+    EXECUTOR_WORKERS = 2
+    PROCESS_WORKERS = 1
+
+    def __init__(self, logger, process_frame, update_device, send_event, on_error=None):
+        """
+        Constructor
+
+        Args:
+            logger (Logger): logger instance
+            process_frame (function): blocking function called for each decoded frame (meter, frame), frames of
+                                      a meter are processed in order. It must return params to update device
+                                      with or None if nothing has to be updated
+            update_device (function): blocking function to update device (meter, params)
+            send_event (function): blocking function to send event (meter, params)
+            on_error (function): function called in loop when meter serial port read fails and meter is
+                                 unregistered (meter, exception). It must not block
+        """
+        Thread.__init__(self, daemon=True, name='teleinfoasyncingestion')
+
+        # members
+        self.logger = logger
+        self.process_frame = process_frame
+        self.update_device = update_device
+        self.send_event = send_event
+        self.on_error = on_error
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=self.EXECUTOR_WORKERS)
+        self.process_executor = ThreadPoolExecutor(max_workers=self.PROCESS_WORKERS)
+        self.meters = {}
+        self.dropped = 0
+        self.stats = None
+        self.__started = Event()
+
+    def run(self):
+        """
+        Event loop main function
+        """
+        self.logger.debug('Teleinfo asyncio ingestion started')
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self.__started.set)
+        try:
+            self.loop.run_forever()
+        finally:
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+            self.executor.shutdown(wait=False)
+            self.process_executor.shutdown(wait=False)
+        self.logger.debug('Teleinfo asyncio ingestion stopped')
+
+    def wait_started(self, timeout=None):
+        """
+        Wait until event loop is running
+
+        Args:
+            timeout (float): max time to wait (in seconds)
+
+        Returns:
+            bool: True if loop is running
+        """
+        return self.__started.wait(timeout)
+
+    def stop(self):
+        """
+        Stop ingestion (thread safe)
+        """
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.__stop)
+
+    def __stop(self):
+        """
+        Unregister all meters and stop loop
+        """
+        for name in list(self.meters.keys()):
+            self.__remove_meter(name)
+        self.loop.stop()
+
+    def add_meter(self, name, serial, reader):
+        """
+        Register meter (thread safe)
+
+        Args:
+            name (string): meter name
+            serial (Serial): opened serial port
+            reader (TeleinfoReader): reader instance (not started) used to decode and publish frames
+        """
+        self.loop.call_soon_threadsafe(self.__add_meter, name, serial, reader)
+
+    def remove_meter(self, name):
+        """
+        Unregister meter (thread safe)
+
+        Args:
+            name (string): meter name
+        """
+        self.loop.call_soon_threadsafe(self.__remove_meter, name)
+
+    def execute(self, name, function, *args):
+        """
+        Execute blocking function in thread pool without waiting for it. Used for events that are not part of
+        meter stages, so they never delay serial reads
+
+        Args:
+            name (string): meter name
+            function (function): blocking function
+            *args: function arguments
+        """
+        future = self.executor.submit(function, *args)
+        future.add_done_callback(partial(self.__on_executed, name))
+
+    def __on_executed(self, name, future):
+        """
+        Log failure of function executed in thread pool
+        """
+        if not future.cancelled() and future.exception() is not None:
+            self.logger.error('Error executing task for meter "%s": %s' % (name, future.exception()))
+
+    def __add_meter(self, name, serial, reader):
+        """
+        Register meter in loop
+        """
+        if name in self.meters:
+            self.__remove_meter(name)
+
+        chunks = asyncio.Queue(self.QUEUE_SIZE)
+        updates = asyncio.Queue(self.QUEUE_SIZE)
+        events = asyncio.Queue(self.QUEUE_SIZE)
+        fd = serial.fileno()
+        self.meters[name] = {
+            'fd': fd,
+            'serial': serial,
+            'paused': False,
+            'queues': (chunks, updates, events),
+            'tasks': [
+                self.loop.create_task(self.__decoding_stage(name, reader, chunks, updates)),
+                self.loop.create_task(self.__device_stage(name, updates, events)),
+                self.loop.create_task(self.__event_stage(name, events)),
+            ],
+        }
+        self.loop.add_reader(fd, self.__read_serial, name, serial, chunks)
+        self.logger.debug('Meter "%s" added to asyncio ingestion' % name)
+
+    def __remove_meter(self, name):
+        """
+        Unregister meter in loop
+        """
+        meter = self.meters.pop(name, None)
+        if not meter:
+            return
+        if not meter['paused']:
+            self.loop.remove_reader(meter['fd'])
+        for task in meter['tasks']:
+            task.cancel()
+        self.logger.debug('Meter "%s" removed from asyncio ingestion' % name)
+
+    def get_queues_size(self):
+        """
+        Return current queues size of all meters
+
+        Returns:
+            dict: number of items in chunks, updates and events queues by meter name
+        """
+        return {
+            name: [queue.qsize() for queue in meter['queues']]
+            for name, meter in list(self.meters.items())
+        }
+
+    def __put(self, queue, item):
+        """
+        Put item in queue dropping oldest item if queue is full
+        """
+        if queue.full():
+            queue.get_nowait()
+            self.dropped += 1
+        queue.put_nowait(item)
+
+    def __read_serial(self, name, serial, chunks):
+        """
+        Read available bytes from serial port. Called by loop when serial port is readable
+        """
+        try:
+            start = time.perf_counter()
+            chunk = serial.read(serial.in_waiting or 1)
+            if self.stats:
+                self.stats.add('read', time.perf_counter() - start)
+        except Exception as error:
+            self.logger.warning('Error reading teleinfo data for meter "%s", meter removed: %s' % (name, error))
+            self.__remove_meter(name)
+            if self.on_error:
+                try:
+                    self.on_error(name, error)
+                except Exception:
+                    self.logger.exception('Error handling read error of meter "%s":' % name)
+            return
+
+        if not chunk:
+            return
+        chunks.put_nowait(chunk)
+        if chunks.full():
+            # decoding stage is late: stop reading serial port until it catches up
+            meter = self.meters[name]
+            meter['paused'] = True
+            self.loop.remove_reader(meter['fd'])
+
+    def __resume_reading(self, name):
+        """
+        Read serial port again if it was paused because chunks queue was full
+        """
+        meter = self.meters.get(name)
+        if meter and meter['paused']:
+            meter['paused'] = False
+            self.loop.add_reader(meter['fd'], self.__read_serial, name, meter['serial'], meter['queues'][0])
+
+    async def __decoding_stage(self, name, reader, chunks, updates):
+        """
+        Decode chunks and process decoded frames
+        """
+        while True:
+            chunk = await chunks.get()
+            self.__resume_reading(name)
+            try:
+                frames = reader.feed(chunk)
+            except Exception:
+                self.logger.exception('Error decoding teleinfo data for meter "%s":' % name)
+                continue
+
+            for frame in frames:
+                try:
+                    params = await self.loop.run_in_executor(self.process_executor, self.process_frame, name, frame)
+                except Exception:
+                    self.logger.exception('Error processing teleinfo frame for meter "%s":' % name)
+                    continue
+                if params:
+                    self.__put(updates, params)
+
+    async def __device_stage(self, name, updates, events):
+        """
+        Update device
+        """
+        while True:
+            params = await updates.get()
+            try:
+                await self.loop.run_in_executor(self.executor, self.update_device, name, params)
+            except Exception:
+                self.logger.exception('Error updating device for meter "%s":' % name)
+            self.__put(events, params)
+
+    async def __event_stage(self, name, events):
+        """
+        Send event
+        """
+        while True:
+            params = await events.get()
+            try:
+                await self.loop.run_in_executor(self.executor, self.send_event, name, params)
+            except Exception:
+                self.logger.exception('Error sending event for meter "%s":' % name)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo capture
+
+Record raw serial byte stream with timestamps to a compact file and read it back
+"""
+
+import struct
+import time
+from threading import Lock
+
+class TeleinfoCaptureWriter():
+    """
+    Teleinfo capture writer
+
+    File starts with a header (magic, version, baudrate, capture start timestamp) followed by one record per
+    chunk read from serial port: elapsed time since previous chunk in milliseconds, chunk size and raw bytes.
+    Record overhead is 6 bytes, so a historic mode capture is only a few percent bigger than the raw stream.
+    """
+
+    MAGIC = b'TICP'
+    VERSION = 1
+    HEADER = struct.Struct('<4sBId')
+    RECORD = struct.Struct('<IH')
+    MAX_CHUNK_SIZE = 65535
+
+    def __init__(self, path, baudrate):
+        """
+        Constructor
+
+        Args:
+            path (string): capture file path
+            baudrate (int): serial port baudrate
+        """
+        self.path = path
+        self.baudrate = baudrate
+        self.size = 0
+        self.chunks_count = 0
+        self.__fd = None
+        self.__last_timestamp = None
+        self.__lock = Lock()
+
+    def open(self, timestamp=None):
+        """
+        Create capture file and write header
+
+        Args:
+            timestamp (float): capture start timestamp. Default to now
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        self.__fd = open(self.path, 'wb')
+        self.__fd.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.baudrate, timestamp))
+        self.size = self.HEADER.size
+        self.__last_timestamp = timestamp
+
+    def close(self):
+        """
+        Close capture file
+        """
+        with self.__lock:
+            if self.__fd:
+                self.__fd.close()
+                self.__fd = None
+
+    def write(self, chunk, timestamp=None):
+        """
+        Record chunk read from serial port
+
+        Args:
+            chunk (bytes): raw bytes
+            timestamp (float): read timestamp. Default to now
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.__lock:
+            if not self.__fd:
+                return
+            for offset in range(0, len(chunk), self.MAX_CHUNK_SIZE):
+                part = bytes(chunk[offset:offset + self.MAX_CHUNK_SIZE])
+                delay = max(0, int(round((timestamp - self.__last_timestamp) * 1000)))
+                self.__fd.write(self.RECORD.pack(delay, len(part)))
+                self.__fd.write(part)
+                self.__last_timestamp += delay / 1000.0
+                self.size += self.RECORD.size + len(part)
+                self.chunks_count += 1
+
+class TeleinfoCaptureReader():
+    """
+    Teleinfo capture reader
+    """
+
+    def __init__(self, path):
+        """
+        Constructor
+
+        Args:
+            path (string): capture file path
+
+        Raises:
+            ValueError: if file is not a teleinfo capture
+        """
+        self.path = path
+        with open(path, 'rb') as fd:
+            header = fd.read(TeleinfoCaptureWriter.HEADER.size)
+        if len(header)!=TeleinfoCaptureWriter.HEADER.size:
+            raise ValueError('Invalid teleinfo capture file')
+        magic, version, self.baudrate, self.timestamp = TeleinfoCaptureWriter.HEADER.unpack(header)
+        if magic!=TeleinfoCaptureWriter.MAGIC or version!=TeleinfoCaptureWriter.VERSION:
+            raise ValueError('Invalid teleinfo capture file')
+
+    def __iter__(self):
+        """
+        Iterate over recorded chunks. Truncated last record (capture interrupted) is ignored
+
+        Yields:
+            tuple: elapsed time since previous chunk in seconds and raw bytes (delay, chunk)
+        """
+        with open(self.path, 'rb') as fd:
+            fd.seek(TeleinfoCaptureWriter.HEADER.size)
+            while True:
+                record = fd.read(TeleinfoCaptureWriter.RECORD.size)
+                if len(record)!=TeleinfoCaptureWriter.RECORD.size:
+                    return
+                delay, size = TeleinfoCaptureWriter.RECORD.unpack(record)
+                chunk = fd.read(size)
+                if len(chunk)!=size:
+                    return
+                yield delay / 1000.0, chunk
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo decoder
+
+Incremental decoder of teleinfo serial stream
+"""
+
+import sys
+from .teleinfoframe import TeleinfoFrame
+
+STX = 0x02
+ETX = 0x03
+EOT = 0x04
+HT = 0x09
+LF = 0x0A
+CR = 0x0D
+SP = 0x20
+
+MODE_HISTORIC = 'historic'
+MODE_STANDARD = 'standard'
+
+class TeleinfoDecoder():
+    """
+    Teleinfo incremental decoder
+
+    Bytes read from serial port are given in chunks of any size. Chunks are appended to a reusable
+    buffer and frames are searched in place (no intermediate copy): frame boundaries (STX/ETX) and
+    group boundaries (LF/CR) are found directly in the buffer and group checksums are computed over
+    a memoryview of the buffer.
+
+    Frame format::
+
+        STX
+        LF label SP value SP checksum CR                    (historic mode)
+        LF label HT [timestamp HT] value HT checksum CR     (standard mode)
+        ...
+        ETX
+
+    Mode is detected on each group using separator placed before checksum. Last decoded frame
+    mode is available in mode member.
+
+    Decoded frames are TeleinfoFrame instances: numeric values are parsed here once and labels are interned.
+
+    Note:
+        Teleinfo protocol description: https://www.enedis.fr/media/2035/download
+    """
+
+    MAX_FRAME_SIZE = 4096 # bytes
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.buffer = bytearray()
+        self.frames_count = 0
+        self.checksum_errors = 0
+        self.dropped_frames = 0
+        self.mode = None
+
+    def reset(self):
+        """
+        Reset decoder state (drop pending bytes)
+        """
+        del self.buffer[:]
+
+    def feed(self, chunk):
+        """
+        Feed decoder with new bytes
+
+        Args:
+            chunk (bytes): bytes read from serial port
+
+        Returns:
+            list: list of decoded frames (TeleinfoFrame). Can be empty if no complete frame is available
+        """
+        buffer = self.buffer
+        buffer += chunk
+        frames = []
+
+        consumed = 0
+        while True:
+            start = buffer.find(STX, consumed)
+            if start < 0:
+                # no frame start, drop garbage
+                consumed = len(buffer)
+                break
+            end = buffer.find(ETX, start + 1)
+            if end < 0:
+                # incomplete frame, keep it for next feed
+                consumed = start
+                if len(buffer) - start > self.MAX_FRAME_SIZE:
+                    self.dropped_frames += 1
+                    consumed = len(buffer)
+                break
+
+            # frame restarted (STX) before its end: drop partial frame
+            restart = buffer.rfind(STX, start + 1, end)
+            if restart >= 0:
+                self.dropped_frames += 1
+                start = restart
+
+            # frame interrupted (EOT): drop it
+            if buffer.find(EOT, start + 1, end) >= 0:
+                self.dropped_frames += 1
+                consumed = end + 1
+                continue
+
+            frame, mode = self._decode_frame(start + 1, end)
+            if frame:
+                self.frames_count += 1
+                self.mode = mode
+                frames.append(frame)
+            consumed = end + 1
+
+        # release consumed bytes (buffer keeps its allocation)
+        del buffer[:consumed]
+
+        return frames
+
+    def _decode_frame(self, start, end):
+        """
+        Decode frame groups located in buffer between specified positions
+
+        In historic mode checksum covers label, separator and value. In standard mode it also covers the
+        separator placed before checksum. For timestamped groups without value (like DATE) timestamp is
+        returned as value.
+
+        Args:
+            start (int): frame content start position (after STX)
+            end (int): frame content end position (ETX position)
+
+        Returns:
+            tuple: decoded frame (TeleinfoFrame) and frame mode. Groups with invalid checksum are dropped
+        """
+        buffer = self.buffer
+        find = buffer.find
+        intern = sys.intern
+        numeric_labels = TeleinfoFrame.NUMERIC_LABELS
+        frame = TeleinfoFrame()
+        numbers = frame.numbers
+        mode = None
+        with memoryview(buffer) as view:
+            pos = find(LF, start, end)
+            while pos >= 0:
+                group_start = pos + 1
+                group_end = find(CR, group_start, end)
+                if group_end < 0:
+                    break
+                pos = find(LF, group_end + 1, end)
+
+                # checksum char is the last one
+                checksum_sep = group_end - 2
+                separator = buffer[checksum_sep]
+                if separator == SP:
+                    checksum_end = checksum_sep
+                    mode = MODE_HISTORIC
+                elif separator == HT:
+                    checksum_end = checksum_sep + 1
+                    mode = MODE_STANDARD
+                else:
+                    self.checksum_errors += 1
+                    continue
+
+                label_sep = find(separator, group_start, checksum_sep)
+                if (
+                    label_sep < 0
+                    or ((sum(view[group_start:checksum_end]) & 0x3F) + 0x20) != buffer[group_end - 1]
+                ):
+                    self.checksum_errors += 1
+                    continue
+
+                value_start = label_sep + 1
+                if separator == HT:
+                    # skip timestamp if any
+                    timestamp_sep = find(HT, value_start, checksum_sep)
+                    if timestamp_sep >= 0 and timestamp_sep + 1 < checksum_sep:
+                        value_start = timestamp_sep + 1
+                    elif timestamp_sep >= 0:
+                        checksum_sep = timestamp_sep
+
+                # same as TeleinfoFrame.add, inlined
+                label = intern(str(view[group_start:label_sep], 'ascii', 'replace'))
+                value = str(view[value_start:checksum_sep], 'ascii', 'replace')
+                frame[label] = value
+                if label in numeric_labels:
+                    try:
+                        numbers[label] = int(value)
+                    except ValueError:
+                        numbers[label] = None
+
+        return frame, mode
+
+    @staticmethod
+    def checksum(data):
+        """
+        Compute group checksum (same algorithm for both modes, only covered data differs)
+
+        Args:
+            data (bytes): group data covered by checksum
+
+        Returns:
+            int: checksum char code
+        """
+        return (sum(data) & 0x3F) + 0x20
+
+    @staticmethod
+    def encode_frame(frame, mode=MODE_HISTORIC):
+        """
+        Encode frame (useful for tests and simulation)
+
+        Args:
+            frame (dict): frame label-value. In standard mode value can be a tuple (timestamp, value)
+            mode (string): frame mode (MODE_HISTORIC or MODE_STANDARD)
+
+        Returns:
+            bytes: encoded frame
+        """
+        out = bytearray([STX])
+        for label, value in frame.items():
+            out.append(LF)
+            if mode == MODE_STANDARD:
+                fields = [label] + (list(value) if isinstance(value, tuple) else [value])
+                data = ('\t'.join(fields) + '\t').encode('ascii')
+                out += data
+            else:
+                data = ('%s %s' % (label, value)).encode('ascii')
+                out += data
+                out.append(SP)
+            out.append(TeleinfoDecoder.checksum(data))
+            out.append(CR)
+        out.append(ETX)
+
+        return bytes(out)
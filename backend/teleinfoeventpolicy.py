@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo event policy
+
+Decide when power update event must be emitted
+"""
+
+import time
+
+class TeleinfoEventPolicy():
+    """
+    Teleinfo power event emission policy
+
+    Power is sampled at high rate but event is only emitted when:
+        - instant power moves more than power deadband (VA) or percent deadband since last emitted event,
+        - current mode (PTEC) or next mode (DEMAIN) changes,
+        - heartbeat interval runs out since last emitted event.
+
+    Other samples are suppressed and counted. A null deadband disables the rule.
+    """
+
+    def __init__(self, power_deadband, percent_deadband, heartbeat):
+        """
+        Constructor
+
+        Args:
+            power_deadband (int): power deadband in VA (0 to disable)
+            percent_deadband (int): power deadband in percent of last emitted power (0 to disable)
+            heartbeat (int): max interval between 2 events in seconds
+        """
+        self.power_deadband = power_deadband
+        self.percent_deadband = percent_deadband
+        self.heartbeat = heartbeat
+        self.emitted = 0
+        self.suppressed = 0
+        self.__last_params = None
+        self.__last_emit = 0
+
+    def configure(self, power_deadband, percent_deadband, heartbeat):
+        """
+        Update policy
+
+        Args:
+            power_deadband (int): power deadband in VA (0 to disable)
+            percent_deadband (int): power deadband in percent of last emitted power (0 to disable)
+            heartbeat (int): max interval between 2 events in seconds
+        """
+        self.power_deadband = power_deadband
+        self.percent_deadband = percent_deadband
+        self.heartbeat = heartbeat
+
+    def reset(self):
+        """
+        Forget last emitted event, so next sample is emitted
+        """
+        self.__last_params = None
+
+    def check(self, params, now=None):
+        """
+        Check if event must be emitted for specified power params. If so, params are saved as
+        last emitted event
+
+        Args:
+            params (dict): power device params (power, currentmode and nextmode are used)
+            now (float): current timestamp. Default to now
+
+        Returns:
+            bool: True if event must be emitted
+        """
+        now = time.time() if now is None else now
+        if self.__must_emit(params, now):
+            self.__last_params = params
+            self.__last_emit = now
+            self.emitted += 1
+            return True
+
+        self.suppressed += 1
+        return False
+
+    def __must_emit(self, params, now):
+        """
+        Apply policy rules
+        """
+        last = self.__last_params
+        if last is None:
+            return True
+        if params['currentmode']!=last['currentmode'] or params['nextmode']!=last['nextmode']:
+            return True
+        if now - self.__last_emit >= self.heartbeat or now < self.__last_emit:
+            return True
+
+        delta = abs(params['power'] - last['power'])
+        if self.power_deadband and delta > self.power_deadband:
+            return True
+        if self.percent_deadband and delta and delta * 100 > self.percent_deadband * last['power']:
+            return True
+
+        return False
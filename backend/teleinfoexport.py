@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo export
+
+Chunked export of stored meter data as CSV or binary columnar format
+"""
+
+import struct
+
+FORMAT_CSV = 'csv'
+FORMAT_BINARY = 'binary'
+FORMATS = (FORMAT_CSV, FORMAT_BINARY)
+
+class TeleinfoExport():
+    """
+    Teleinfo export
+
+    Rows (tuples of unsigned integers starting with timestamp, sorted by timestamp) are pulled from a generator
+    and encoded by chunks of CHUNK_ROWS rows, so memory does not depend on exported range.
+
+    Each chunk comes with a cursor identifying next row (timestamp and number of rows of that timestamp already
+    exported, several samples can share the same second). Export is resumed from a cursor by reading rows again
+    from cursor timestamp.
+
+    CSV chunks are lines of comma separated values, header line is only written by first chunk (no cursor).
+
+    Binary chunks are self-described, all values are little endian::
+
+        magic (4 bytes, TIEX) | version (uint8) | columns count (uint16) | rows count (uint32)
+        names length (uint16) | column names (ascii, comma separated)
+        column 1 values (rows count * uint32) | column 2 values | ...
+    """
+
+    CHUNK_ROWS = 3600
+    MAGIC = b'TIEX'
+    VERSION = 1
+    HEADER = struct.Struct('<4sBHI')
+    NAMES_LENGTH = struct.Struct('<H')
+
+    def __init__(self, columns, export_format=FORMAT_CSV, chunk_rows=CHUNK_ROWS):
+        """
+        Constructor
+
+        Args:
+            columns (list): column names (first one is timestamp)
+            export_format (string): export format (csv or binary)
+            chunk_rows (int): max number of rows per chunk
+
+        Raises:
+            ValueError: if format is invalid
+        """
+        if export_format not in FORMATS:
+            raise ValueError('Invalid export format "%s"' % export_format)
+        self.columns = list(columns)
+        self.export_format = export_format
+        self.chunk_rows = chunk_rows
+
+    @staticmethod
+    def parse_cursor(cursor):
+        """
+        Parse export cursor
+
+        Args:
+            cursor (string): cursor returned with a chunk
+
+        Returns:
+            tuple: timestamp and number of rows of that timestamp to skip (timestamp, skip)
+
+        Raises:
+            ValueError: if cursor is invalid
+        """
+        timestamp, skip = [int(value) for value in cursor.split(':')]
+        if timestamp<0 or skip<0:
+            raise ValueError('Invalid cursor "%s"' % cursor)
+
+        return timestamp, skip
+
+    def iter_chunks(self, rows, cursor=None):
+        """
+        Encode rows by chunks
+
+        Args:
+            rows (iterable): rows to export. When resuming, rows must start at cursor timestamp
+            cursor (string): cursor to resume export from (None to start export)
+
+        Yields:
+            tuple: encoded chunk and cursor of next row (chunk, cursor). Cursor is None on last chunk
+        """
+        rows = iter(rows)
+        timestamp, skip = TeleinfoExport.parse_cursor(cursor) if cursor else (None, 0)
+        last_timestamp, last_count = timestamp, skip
+        header = cursor is None
+
+        row = next(rows, None)
+        while row is not None and skip and row[0]==timestamp:
+            skip -= 1
+            row = next(rows, None)
+
+        while True:
+            chunk = []
+            while row is not None and len(chunk)<self.chunk_rows:
+                chunk.append(row)
+                if row[0]==last_timestamp:
+                    last_count += 1
+                else:
+                    last_timestamp, last_count = row[0], 1
+                row = next(rows, None)
+
+            next_cursor = '%d:%d' % (last_timestamp, last_count) if row is not None else None
+            yield self.encode(chunk, header), next_cursor
+            if next_cursor is None:
+                return
+            header = False
+
+    def encode(self, rows, header=True):
+        """
+        Encode rows
+
+        Args:
+            rows (list): rows to encode
+            header (bool): write CSV header line (ignored for binary format)
+
+        Returns:
+            bytes: encoded rows
+        """
+        width = len(self.columns)
+        if self.export_format==FORMAT_CSV:
+            lines = [','.join(self.columns)] if header else []
+            lines.extend([','.join([str(value) for value in row[:width]]) for row in rows])
+            return ('\n'.join(lines) + '\n').encode('ascii') if lines else b''
+
+        names = ','.join(self.columns).encode('ascii')
+        out = [
+            self.HEADER.pack(self.MAGIC, self.VERSION, width, len(rows)),
+            self.NAMES_LENGTH.pack(len(names)),
+            names,
+        ]
+        column_format = struct.Struct('<%dI' % len(rows))
+        for position in range(width):
+            out.append(column_format.pack(*[row[position] for row in rows]))
+
+        return b''.join(out)
+
+    @staticmethod
+    def decode(chunk):
+        """
+        Decode binary chunk (useful for tests and clients)
+
+        Args:
+            chunk (bytes): binary chunk
+
+        Returns:
+            tuple: column names and rows (columns, rows)
+
+        Raises:
+            ValueError: if chunk is invalid
+        """
+        header_size = TeleinfoExport.HEADER.size
+        magic, version, width, count = TeleinfoExport.HEADER.unpack_from(chunk, 0)
+        if magic!=TeleinfoExport.MAGIC or version!=TeleinfoExport.VERSION:
+            raise ValueError('Invalid export chunk')
+        names_length = TeleinfoExport.NAMES_LENGTH.unpack_from(chunk, header_size)[0]
+        offset = header_size + TeleinfoExport.NAMES_LENGTH.size
+        columns = chunk[offset:offset + names_length].decode('ascii').split(',')
+        offset += names_length
+
+        values = []
+        column_format = struct.Struct('<%dI' % count)
+        for _ in range(width):
+            values.append(column_format.unpack_from(chunk, offset))
+            offset += column_format.size
+
+        return columns, list(zip(*values))
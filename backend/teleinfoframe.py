@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo frame
+
+Decoded frame with numeric values parsed once
+"""
+
+import sys
+
+class TeleinfoFrame(dict):
+    """
+    Teleinfo frame
+
+    Frame is a dict label-value (values are strings as sent by meter) so it can be used wherever a raw frame
+    is expected (get_teleinfo, snapshot, capture...). Numeric values (NUMERIC_LABELS) are parsed once when
+    frame is decoded and kept in numbers member (None if value is invalid), so consumers (tariff profile,
+    power engine, standard modes) never convert same value again. Labels are interned: all frames share
+    same label strings.
+
+    Frame uses __slots__ (no per instance __dict__) and must not be modified once built.
+    """
+
+    __slots__ = ('numbers',)
+
+    NUMERIC_LABELS = frozenset((
+        # historic mode
+        'ISOUSC', 'BASE', 'HCHC', 'HCHP', 'EJPHN', 'EJPHPM', 'BBRHCJB', 'BBRHPJB', 'BBRHCJW', 'BBRHPJW',
+        'BBRHCJR', 'BBRHPJR', 'PEJP', 'IINST', 'IINST1', 'IINST2', 'IINST3', 'ADPS', 'ADIR1', 'ADIR2', 'ADIR3',
+        'IMAX', 'IMAX1', 'IMAX2', 'IMAX3', 'PAPP', 'PMAX',
+        # standard mode
+        'EAST', 'EASF01', 'EASF02', 'EASF03', 'EASF04', 'EASF05', 'EASF06', 'EASF07', 'EASF08', 'EASF09',
+        'EASF10', 'EASD01', 'EASD02', 'EASD03', 'EASD04', 'EAIT', 'ERQ1', 'ERQ2', 'ERQ3', 'ERQ4', 'IRMS1',
+        'IRMS2', 'IRMS3', 'URMS1', 'URMS2', 'URMS3', 'UMOY1', 'UMOY2', 'UMOY3', 'PREF', 'PCOUP', 'SINSTS',
+        'SINSTS1', 'SINSTS2', 'SINSTS3', 'SMAXSN', 'SMAXSN1', 'SMAXSN2', 'SMAXSN3', 'SMAXSN-1', 'SINSTI',
+        'SMAXIN', 'SMAXIN-1', 'CCASN', 'CCASN-1', 'CCAIN', 'CCAIN-1', 'NTARF', 'NJOURF', 'NJOURF+1',
+    ))
+
+    def __init__(self, raw=None):
+        """
+        Constructor
+
+        Args:
+            raw (dict): label-value to build frame from. If not specified, frame is empty and filled with add
+        """
+        dict.__init__(self)
+        self.numbers = {}
+        if raw:
+            for label, value in raw.items():
+                self.add(sys.intern(label), value)
+
+    def add(self, label, value):
+        """
+        Add value to frame parsing it if label is numeric
+
+        Args:
+            label (string): interned label
+            value (string): value
+        """
+        self[label] = value
+        if label in self.NUMERIC_LABELS:
+            try:
+                self.numbers[label] = int(value)
+            except ValueError:
+                self.numbers[label] = None
+
+    @staticmethod
+    def get_numbers(raw):
+        """
+        Return numeric values of specified frame
+
+        Args:
+            raw (dict): TeleinfoFrame instance or plain dict (parsed on each call)
+
+        Returns:
+            dict: numeric label-value (value is None if invalid)
+        """
+        numbers = getattr(raw, 'numbers', None)
+        return TeleinfoFrame(raw).numbers if numbers is None else numbers
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo history
+
+In-memory power history stored in a fixed size ring buffer
+"""
+
+from array import array
+from threading import Lock
+
+class TeleinfoHistory():
+    """
+    Teleinfo power history
+
+    Samples (timestamp, instant power, heures creuses index, heures pleines index) are stored in
+    preallocated unsigned int arrays used as a ring buffer, so each sample uses 16 bytes and memory
+    usage never grows. When buffer is full, oldest sample is overwritten.
+
+    Samples are expected to be appended in chronological order. If timestamp goes backward (clock
+    adjustment), history is cleared to keep timestamps sorted.
+    """
+
+    def __init__(self, size):
+        """
+        Constructor
+
+        Args:
+            size (int): max number of samples
+        """
+        self.size = size
+        self.timestamps = array('I', [0]) * size
+        self.powers = array('I', [0]) * size
+        self.heurescreuses = array('I', [0]) * size
+        self.heurespleines = array('I', [0]) * size
+        self.count = 0
+        self.__head = 0
+        self.__lock = Lock()
+
+    def clear(self):
+        """
+        Remove all samples
+        """
+        with self.__lock:
+            self.count = 0
+            self.__head = 0
+
+    def append(self, timestamp, power, heurescreuses, heurespleines):
+        """
+        Append new sample
+
+        Args:
+            timestamp (int): sample timestamp (seconds)
+            power (int): instant power
+            heurescreuses (int): heures creuses (or base) index
+            heurespleines (int): heures pleines index
+        """
+        with self.__lock:
+            if self.count and timestamp < self.timestamps[(self.__head - 1) % self.size]:
+                self.count = 0
+                self.__head = 0
+
+            head = self.__head
+            self.timestamps[head] = int(timestamp)
+            self.powers[head] = power
+            self.heurescreuses[head] = heurescreuses
+            self.heurespleines[head] = heurespleines
+            self.__head = (head + 1) % self.size
+            if self.count < self.size:
+                self.count += 1
+
+    def __index(self, position):
+        """
+        Convert sample position (0 is the oldest sample) to array index
+        """
+        return (self.__head - self.count + position) % self.size
+
+    def __bisect(self, timestamp):
+        """
+        Return position of first sample with timestamp greater or equal than specified one
+        """
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamps[self.__index(middle)] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def get(self, start, end, resolution):
+        """
+        Return samples between specified timestamps downsampled to specified resolution
+
+        Args:
+            start (int): start timestamp (included)
+            end (int): end timestamp (included)
+            resolution (int): resolution in seconds. Samples in the same resolution bucket are merged:
+                              power is averaged and last indexes are kept
+
+        Returns:
+            list: list of samples::
+
+                [
+                    {
+                        timestamp (int): bucket start timestamp,
+                        power (int): average instant power,
+                        heurescreuses (int): last heures creuses index,
+                        heurespleines (int): last heures pleines index,
+                    },
+                    ...
+                ]
+
+        """
+        samples = []
+        with self.__lock:
+            position = self.__bisect(start)
+            bucket = None
+            total = 0
+            samples_count = 0
+            last = None
+            while position < self.count:
+                index = self.__index(position)
+                timestamp = self.timestamps[index]
+                if timestamp > end:
+                    break
+
+                current_bucket = timestamp - (timestamp % resolution)
+                if current_bucket != bucket and samples_count:
+                    samples.append(self.__get_bucket(bucket, total, samples_count, last))
+                    total = 0
+                    samples_count = 0
+                bucket = current_bucket
+                total += self.powers[index]
+                samples_count += 1
+                last = index
+                position += 1
+
+            if samples_count:
+                samples.append(self.__get_bucket(bucket, total, samples_count, last))
+
+        return samples
+
+    def __get_bucket(self, bucket, total, samples_count, last):
+        """
+        Build downsampled sample
+        """
+        return {
+            'timestamp': bucket,
+            'power': int(round(total / samples_count)),
+            'heurescreuses': self.heurescreuses[last],
+            'heurespleines': self.heurespleines[last],
+        }
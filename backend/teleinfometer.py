@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo meter
+
+State of a single power meter (one dongle)
+"""
+
+import time
+from collections import deque
+from .teleinfohistory import TeleinfoHistory
+from .teleinfosnapshot import TeleinfoSnapshot
+from .teleinfopower import TeleinfoPower
+from .teleinfooverload import TeleinfoOverload
+from .teleinfopowerstats import TeleinfoPowerStats
+
+class TeleinfoMeter():
+    """
+    Teleinfo meter
+
+    Everything related to one power meter is kept here: serial port, reader (and so decoder state), capture,
+    tariff profile, power engine, overload rules, last decoded values, devices, power event policy, in-memory
+    history, rolling power stats, on-disk store and consumption rollups. Meters never share state, so several meters can be processed in parallel.
+
+    Primary meter always exists (even without dongle) and uses legacy configuration fields, devices and
+    store path, so a single dongle installation behaves as before.
+
+    When serial port cannot be opened or fails, reconnection attempts are delayed with an exponential
+    backoff (RECONNECT_DELAY doubled after each failed attempt, up to RECONNECT_MAX_DELAY).
+
+    In thread ingestion mode, each frame is processed once by reader thread and published in processed
+    attribute with its power device params, so teleinfo task never processes a frame again (it is cleared
+    when ingestion is stopped or started, so a frame is never published twice). Overload events
+    raised by reader thread are queued and sent by teleinfo task.
+    """
+
+    RECONNECT_DELAY = 1.0 # seconds
+    RECONNECT_MAX_DELAY = 300.0 # seconds
+    OVERLOAD_EVENTS_SIZE = 16
+
+    def __init__(self, name, port, primary, event_policy, history_size):
+        """
+        Constructor
+
+        Args:
+            name (string): meter name
+            port (string): dongle serial port path (None if no dongle connected)
+            primary (bool): True if meter is primary one
+            event_policy (TeleinfoEventPolicy): power event policy of meter
+            history_size (int): number of samples kept in memory
+        """
+        self.name = name
+        self.port = port
+        self.primary = primary
+        self.event_policy = event_policy
+        self.history = TeleinfoHistory(history_size)
+        self.power_stats = TeleinfoPowerStats()
+        self.serial = None
+        self.baudrate = None
+        self.mode = None
+        self.reader = None
+        self.capture = None
+        self.stats = None
+        self.profile = None
+        self.power = TeleinfoPower()
+        self.overload = TeleinfoOverload()
+        self.store = None
+        self.rollups = None
+        self.instant_power_device_uuid = None
+        self.power_consumption_device_uuid = None
+        self.snapshot = TeleinfoSnapshot()
+        self.last_conso_heures_creuses = 0
+        self.last_conso_heures_pleines = 0
+        self.last_indexes = []
+        self.failed = False
+        self.reconnect_attempts = 0
+        self.reconnect_at = 0.0
+        self.processed = None # (raw, params) of latest frame processed by reader thread
+        self.overload_events = deque(maxlen=self.OVERLOAD_EVENTS_SIZE) # overload events raised by reader thread
+
+    @property
+    def last_raw(self):
+        """
+        Return last processed frame
+
+        Returns:
+            dict: last raw frame (empty if no frame processed yet)
+        """
+        return self.snapshot.raw
+
+    @last_raw.setter
+    def last_raw(self, raw):
+        """
+        Set last processed frame. Frame gets next sequence number and get_teleinfo response is built once here
+
+        Args:
+            raw (dict): raw frame
+        """
+        self.snapshot.update(raw)
+
+    def read_serial(self):
+        """
+        Read available bytes from serial port. Blocks until at least one byte is received or timeout occured.
+        Only reads of already received bytes are measured (waiting for bytes is not part of read stage)
+
+        Returns:
+            bytes: read bytes
+        """
+        serial = self.serial
+        waiting = serial.in_waiting
+        if not waiting:
+            return serial.read(1)
+
+        start = time.perf_counter()
+        chunk = serial.read(waiting)
+        if self.stats:
+            self.stats.add('read', time.perf_counter() - start)
+
+        return chunk
+
+    def schedule_reconnect(self, now):
+        """
+        Schedule next reconnection attempt according to exponential backoff
+
+        Args:
+            now (float): current timestamp
+
+        Returns:
+            float: delay before next attempt in seconds
+        """
+        delay = min(self.RECONNECT_MAX_DELAY, self.RECONNECT_DELAY * 2 ** min(self.reconnect_attempts, 32))
+        self.reconnect_attempts += 1
+        self.reconnect_at = now + delay
+
+        return delay
+
+    def reset_reconnect(self):
+        """
+        Reset reconnection backoff: next attempt can be done immediately
+        """
+        self.reconnect_attempts = 0
+        self.reconnect_at = 0.0
+
+    def close_serial(self):
+        """
+        Close serial port
+        """
+        if self.serial:
+            self.serial.close()
+            self.serial = None
+
+    def get_frame(self):
+        """
+        Return latest frame published by reader. Serial port is not accessed
+
+        Returns:
+            dict: latest frame or empty dict if meter has no reader or no frame received yet
+        """
+        reader = self.reader
+        return reader.get_frame() if reader else {}
+
+    def to_dict(self):
+        """
+        Return meter infos
+
+        Returns:
+            dict: meter infos::
+
+                {
+                    name (string): meter name,
+                    port (string): dongle serial port path (None if not connected),
+                    primary (bool): True if meter is primary one,
+                    connected (bool): True if meter is read,
+                    mode (string): teleinfo mode (historic or standard),
+                    baudrate (int): serial port baudrate,
+                    instantpowerdevice (string): instant power device uuid,
+                    powerconsumptiondevice (string): power consumption device uuid,
+                    framesread (int): number of decoded frames,
+                    reconnectattempts (int): number of failed connection attempts,
+                    sequence (int): sequence number of last processed frame,
+                    stale (bool): True if last frame was restored from previous run,
+                    powersource (string): source of instant power (apparent, index or current),
+                    overload (dict): overload state (see TeleinfoOverload.to_dict),
+                }
+
+        """
+        reader = self.reader
+        return {
+            'name': self.name,
+            'port': self.port,
+            'primary': self.primary,
+            'connected': reader is not None,
+            'mode': self.mode,
+            'baudrate': self.baudrate,
+            'instantpowerdevice': self.instant_power_device_uuid,
+            'powerconsumptiondevice': self.power_consumption_device_uuid,
+            'framesread': reader.frames_count if reader else 0,
+            'reconnectattempts': self.reconnect_attempts,
+            'sequence': self.snapshot.sequence,
+            'stale': self.snapshot.stale,
+            'powersource': self.power.source,
+            'overload': self.overload.to_dict(),
+        }
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo overload
+
+Overload rule engine checking each decoded frame of a meter
+"""
+
+from collections import deque
+from .teleinfoframe import TeleinfoFrame
+
+class TeleinfoOverload():
+    """
+    Teleinfo overload rule engine
+
+    Each frame is checked against following rules:
+
+        * adps: meter reports subscribed power is exceeded (ADPS label in historic mode, STGE bit 7 in
+          standard mode),
+        * headroom: load is above (100 - headroom) percent of subscription (highest phase current IINST over
+          ISOUSC in historic mode, apparent power SINSTS over PREF in standard mode),
+        * ramp: power increased by more than ramp VA within last ramp window seconds.
+
+    A rule is raised by the first matching frame. It is cleared only after CLEAR_FRAMES consecutive frames
+    not matching it, and headroom and ramp rules must also be cleared by a margin (HEADROOM_HYSTERESIS
+    percent, half ramp), so overload state does not flap around thresholds.
+    """
+
+    HEADROOM = 10 # percent
+    RAMP = 3000 # VA
+    RAMP_WINDOW = 10 # seconds
+    HEADROOM_HYSTERESIS = 5 # percent
+    CLEAR_FRAMES = 3
+    RULE_ADPS = 'adps'
+    RULE_HEADROOM = 'headroom'
+    RULE_RAMP = 'ramp'
+    STGE_OVERLOAD_BIT = 7
+    CURRENT_LABELS = ('IINST', 'IINST1', 'IINST2', 'IINST3')
+
+    def __init__(self, headroom=HEADROOM, ramp=RAMP, ramp_window=RAMP_WINDOW):
+        """
+        Constructor
+
+        Args:
+            headroom (int): minimum headroom in percent of subscription (0 to disable rule)
+            ramp (int): power increase in VA (0 to disable rule)
+            ramp_window (int): power increase window in seconds
+        """
+        self.headroom = headroom
+        self.ramp = ramp
+        self.ramp_window = ramp_window
+        self.rules = frozenset()
+        self.load_headroom = None
+        self.__clear_counts = {}
+        self.__samples = deque()
+
+    def configure(self, headroom, ramp, ramp_window):
+        """
+        Configure rules. Current state is kept
+
+        Args:
+            headroom (int): minimum headroom in percent of subscription (0 to disable rule)
+            ramp (int): power increase in VA (0 to disable rule)
+            ramp_window (int): power increase window in seconds
+        """
+        self.headroom = headroom
+        self.ramp = ramp
+        self.ramp_window = ramp_window
+
+    @property
+    def overload(self):
+        """
+        Return True if at least one rule is raised
+
+        Returns:
+            bool: overload state
+        """
+        return len(self.rules)>0
+
+    def check(self, timestamp, raw, power):
+        """
+        Check frame against rules
+
+        Args:
+            timestamp (float): frame reception monotonic timestamp (seconds)
+            raw (dict): raw teleinfo data
+            power (int): instant power (VA) or None if not available
+
+        Returns:
+            bool: True if raised rules changed
+        """
+        numbers = TeleinfoFrame.get_numbers(raw)
+        matches = {}
+
+        # adps
+        matches[self.RULE_ADPS] = self.__check_adps(raw)
+
+        # headroom
+        self.load_headroom = self.__get_load_headroom(numbers)
+        if self.headroom and self.load_headroom is not None:
+            matches[self.RULE_HEADROOM] = (
+                self.load_headroom<self.headroom,
+                self.load_headroom<self.headroom + self.HEADROOM_HYSTERESIS,
+            )
+
+        # ramp
+        if self.ramp and power is not None:
+            rise = self.__get_power_rise(timestamp, power)
+            matches[self.RULE_RAMP] = (rise>=self.ramp, rise>=self.ramp / 2.0)
+
+        rules = set()
+        for rule, (match, keep) in matches.items():
+            if rule not in self.rules:
+                if match:
+                    rules.add(rule)
+            elif keep:
+                self.__clear_counts[rule] = 0
+                rules.add(rule)
+            else:
+                count = self.__clear_counts.get(rule, 0) + 1
+                self.__clear_counts[rule] = count
+                if count<self.CLEAR_FRAMES:
+                    rules.add(rule)
+
+        rules = frozenset(rules)
+        if rules==self.rules:
+            return False
+        for rule in self.rules - rules:
+            self.__clear_counts.pop(rule, None)
+        self.rules = rules
+
+        return True
+
+    def __check_adps(self, raw):
+        """
+        Check subscribed power exceeded warning
+
+        Returns:
+            tuple: rule match and keep flags (same value)
+        """
+        if 'ADPS' in raw:
+            return True, True
+        status = raw.get('STGE')
+        if status is not None:
+            try:
+                exceeded = bool((int(status, 16) >> self.STGE_OVERLOAD_BIT) & 0x1)
+                return exceeded, exceeded
+            except ValueError:
+                pass
+
+        return False, False
+
+    def __get_load_headroom(self, numbers):
+        """
+        Return load headroom
+
+        Returns:
+            float: headroom in percent of subscription or None if not available
+        """
+        subscription = numbers.get('ISOUSC')
+        if subscription:
+            currents = [numbers[label] for label in self.CURRENT_LABELS if numbers.get(label) is not None]
+            if currents:
+                return 100.0 - max(currents) * 100.0 / subscription
+
+        reference = numbers.get('PREF')
+        power = numbers.get('SINSTS')
+        if reference and power is not None:
+            # PREF is in kVA
+            return 100.0 - power * 100.0 / (reference * 1000.0)
+
+        return None
+
+    def __get_power_rise(self, timestamp, power):
+        """
+        Return power rise over ramp window
+
+        Returns:
+            int: power rise in VA (difference with lowest power of window)
+        """
+        samples = self.__samples
+        samples.append((timestamp, power))
+        while samples and samples[0][0]<timestamp - self.ramp_window:
+            samples.popleft()
+
+        return power - min([sample[1] for sample in samples])
+
+    def to_dict(self):
+        """
+        Return overload state
+
+        Returns:
+            dict: overload state::
+
+                {
+                    overload (bool): True if a rule is raised,
+                    rules (list): sorted list of raised rules (adps, headroom, ramp),
+                    headroom (int): load headroom in percent of subscription (None if not available),
+                }
+
+        """
+        return {
+            'overload': self.overload,
+            'rules': sorted(self.rules),
+            'headroom': int(round(self.load_headroom)) if self.load_headroom is not None else None,
+        }
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo overload event
+"""
+
+from cleep.libs.internals.event import Event
+
+class TeleinfoOverloadEvent(Event):
+    """
+    Teleinfo.overload event
+    """
+
+    EVENT_NAME = 'teleinfo.overload'
+    EVENT_PARAMS = [
+        'lastupdate',
+        'meter', # nom du compteur
+        'overload', # surcharge en cours
+        'rules', # regles declenchees (adps, headroom, ramp)
+        'headroom', # marge restante en % de l'abonnement
+        'power', # puissance instantanée
+    ]
+    EVENT_CHARTABLE = False
+    EVENT_CHART_PARAMS = []
+    EVENT_PROPAGATE = True
+
+    def __init__(self, params):
+        """
+        Constructor
+
+        Args:
+            params (dict): event parameters
+        """
+        Event.__init__(self, params)
+
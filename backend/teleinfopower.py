@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo power
+
+Instant power estimation of a meter from apparent power, energy indexes or instant current
+"""
+
+from threading import Lock
+from .teleinfoframe import TeleinfoFrame
+
+class TeleinfoPower():
+    """
+    Teleinfo power engine
+
+    Instant power is computed on each frame from best available source:
+
+        * apparent power (PAPP in historic mode, SINSTS in standard mode) sent by meter in VA,
+        * active power estimated from energy indexes deltas (in W),
+        * instant current (IINST, IRMS) multiplied by VA_FACTOR (1A resolution), as fallback.
+
+    Energy indexes have 1Wh resolution, so active power is estimated between two index increments
+    (delta Wh * 3600 / elapsed seconds) and smoothed with an exponential moving average. While index
+    does not increase, power is known to be lower than 1Wh over elapsed time, so estimation decays
+    without waiting for next increment.
+
+    Each frame is taken into account only once: same frame processed again returns previous result.
+    """
+
+    VA_FACTOR = 220
+    SMOOTHING = 0.3
+    APPARENT_LABELS = ('PAPP', 'SINSTS')
+    SOURCE_APPARENT = 'apparent'
+    SOURCE_INDEX = 'index'
+    SOURCE_CURRENT = 'current'
+
+    def __init__(self, va_factor=VA_FACTOR, smoothing=SMOOTHING):
+        """
+        Constructor
+
+        Args:
+            va_factor (int): factor to convert instant current to power
+            smoothing (float): weight of new estimation in active power moving average (0..1)
+        """
+        self.va_factor = va_factor
+        self.smoothing = smoothing
+        self.power = None
+        self.source = None
+        self.active_power = None
+        self.__frame = None
+        self.__energy = None
+        self.__increment_time = None
+        self.__anchored = False
+        self.__lock = Lock()
+
+    def reset(self):
+        """
+        Reset estimation (meter indexes changed)
+        """
+        with self.__lock:
+            self.power = None
+            self.source = None
+            self.active_power = None
+            self.__frame = None
+            self.__energy = None
+            self.__increment_time = None
+            self.__anchored = False
+
+    def update(self, timestamp, raw, indexes, current):
+        """
+        Update power with new frame
+
+        Args:
+            timestamp (float): frame reception monotonic timestamp (seconds)
+            raw (dict): raw teleinfo data
+            indexes (list): energy indexes (Wh) extracted from frame or None if not available
+            current (int): instant current (A) extracted from frame or None if not available
+
+        Returns:
+            tuple: instant power and its source (power, source). Both are None if frame contains no power data
+        """
+        with self.__lock:
+            if raw is self.__frame:
+                return self.power, self.source
+            self.__frame = raw
+
+            self.__update_active_power(timestamp, indexes)
+
+            apparent_power = self.__get_apparent_power(raw)
+            if apparent_power is not None:
+                self.power, self.source = apparent_power, self.SOURCE_APPARENT
+            elif self.active_power is not None:
+                self.power, self.source = int(round(self.active_power)), self.SOURCE_INDEX
+            elif current is not None:
+                self.power, self.source = current * self.va_factor, self.SOURCE_CURRENT
+            else:
+                self.power, self.source = None, None
+
+            return self.power, self.source
+
+    def __get_apparent_power(self, raw):
+        """
+        Return apparent power sent by meter
+
+        Returns:
+            int: apparent power (VA) or None if not available or invalid
+        """
+        numbers = TeleinfoFrame.get_numbers(raw)
+        for label in self.APPARENT_LABELS:
+            if label in numbers:
+                return numbers[label]
+
+        return None
+
+    def __update_active_power(self, timestamp, indexes):
+        """
+        Update active power estimation with energy indexes
+        """
+        if not indexes:
+            return
+
+        energy = sum(indexes)
+        if self.__energy is None or energy<self.__energy:
+            # first frame or indexes changed
+            self.__energy = energy
+            self.__increment_time = timestamp
+            self.__anchored = False
+            self.active_power = None
+            return
+
+        elapsed = timestamp - self.__increment_time
+        if elapsed<=0:
+            return
+
+        delta = energy - self.__energy
+        if delta:
+            if self.__anchored:
+                estimation = delta * 3600.0 / elapsed
+                if self.active_power is None:
+                    self.active_power = estimation
+                else:
+                    self.active_power += self.smoothing * (estimation - self.active_power)
+            # time of first increment is unknown until index increases once
+            self.__anchored = True
+            self.__energy = energy
+            self.__increment_time = timestamp
+        elif self.active_power is not None:
+            # less than 1Wh consumed since last increment
+            self.active_power = min(self.active_power, 3600.0 / elapsed)
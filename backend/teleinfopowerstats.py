@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo power stats
+
+Constant memory rolling statistics of instant power
+"""
+
+import math
+from threading import Lock
+
+WINDOW_MINUTE = '1m'
+WINDOW_QUARTER = '15m'
+WINDOW_HOUR = '1h'
+WINDOW_DAY = '1d'
+WINDOWS = (WINDOW_MINUTE, WINDOW_QUARTER, WINDOW_HOUR, WINDOW_DAY)
+
+class TeleinfoPowerStats():
+    """
+    Teleinfo power stats
+
+    Min, max, mean, standard deviation and percentiles of instant power are maintained over rolling windows
+    (1 minute, 15 minutes, 1 hour and 1 day) with online algorithms, so memory does not depend on frame rate:
+
+        * each window is split in SLOTS slots stored in a ring, a slot is reset when it is reused,
+        * each slot keeps count, mean and sum of squared deviations updated with Welford algorithm, min and max,
+        * each slot keeps a logarithmic histogram sketch (bucket boundaries grow by a constant ratio), so any
+          percentile is estimated with a relative error lower than ACCURACY and histograms can be merged.
+
+    Window stats are computed on request by merging slots of window (parallel variance algorithm for moments,
+    bucket counts addition for sketch). Oldest slot is dropped as a whole, so window covers between
+    (SLOTS - 1) / SLOTS and 100% of its duration.
+    """
+
+    DURATIONS = {
+        WINDOW_MINUTE: 60,
+        WINDOW_QUARTER: 900,
+        WINDOW_HOUR: 3600,
+        WINDOW_DAY: 86400,
+    }
+    SLOTS = 12
+    ACCURACY = 0.02
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.gamma = (1.0 + self.ACCURACY) / (1.0 - self.ACCURACY)
+        self.__log_gamma = math.log(self.gamma)
+        self.__windows = {
+            window: (duration / float(self.SLOTS), [None] * self.SLOTS)
+            for window, duration in self.DURATIONS.items()
+        }
+        self.__lock = Lock()
+
+    def reset(self):
+        """
+        Reset stats
+        """
+        with self.__lock:
+            for _, slots in self.__windows.values():
+                slots[:] = [None] * self.SLOTS
+
+    def add(self, timestamp, power):
+        """
+        Add power sample
+
+        Args:
+            timestamp (float): sample monotonic timestamp (seconds)
+            power (int): instant power (VA)
+        """
+        bucket = int(math.ceil(math.log(power) / self.__log_gamma)) if power>0 else 0
+
+        with self.__lock:
+            for slot_duration, slots in self.__windows.values():
+                slot_id = int(timestamp // slot_duration)
+                position = slot_id % self.SLOTS
+                slot = slots[position]
+                if slot is None or slot[0]!=slot_id:
+                    # slot_id, count, mean, m2, min, max, sketch
+                    slot = [slot_id, 0, 0.0, 0.0, power, power, {}]
+                    slots[position] = slot
+
+                count = slot[1] + 1
+                delta = power - slot[2]
+                mean = slot[2] + delta / count
+                slot[1] = count
+                slot[2] = mean
+                slot[3] += delta * (power - mean)
+                if power<slot[4]:
+                    slot[4] = power
+                elif power>slot[5]:
+                    slot[5] = power
+                sketch = slot[6]
+                sketch[bucket] = sketch.get(bucket, 0) + 1
+
+    def get(self, window, timestamp):
+        """
+        Return power stats over window
+
+        Args:
+            window (string): window (1m, 15m, 1h or 1d)
+            timestamp (float): current monotonic timestamp (seconds)
+
+        Returns:
+            dict: power stats::
+
+                {
+                    window (string): window,
+                    count (int): number of samples,
+                    min (int): min power (VA),
+                    max (int): max power (VA),
+                    mean (float): mean power (VA),
+                    stddev (float): power standard deviation (VA),
+                    p50 (int): median power (VA),
+                    p95 (int): 95th percentile of power (VA),
+                    p99 (int): 99th percentile of power (VA),
+                }
+
+            All values except count are None if window contains no sample
+
+        Raises:
+            ValueError: if window is invalid
+        """
+        if window not in self.__windows:
+            raise ValueError('Invalid window "%s"' % window)
+
+        slot_duration, slots = self.__windows[window]
+        current_id = int(timestamp // slot_duration)
+        count = 0
+        mean = 0.0
+        m2 = 0.0
+        minimum = None
+        maximum = None
+        sketch = {}
+        with self.__lock:
+            for slot in slots:
+                if slot is None or not current_id - self.SLOTS<slot[0]<=current_id:
+                    continue
+                # parallel variance algorithm
+                slot_count = slot[1]
+                total = count + slot_count
+                delta = slot[2] - mean
+                mean += delta * slot_count / total
+                m2 += slot[3] + delta * delta * count * slot_count / total
+                count = total
+                minimum = slot[4] if minimum is None else min(minimum, slot[4])
+                maximum = slot[5] if maximum is None else max(maximum, slot[5])
+                for bucket, bucket_count in slot[6].items():
+                    sketch[bucket] = sketch.get(bucket, 0) + bucket_count
+
+        stats = {
+            'window': window,
+            'count': count,
+            'min': minimum,
+            'max': maximum,
+            'mean': round(mean, 1) if count else None,
+            'stddev': round(math.sqrt(m2 / count), 1) if count else None,
+        }
+        stats.update(self.__get_percentiles(sketch, count, minimum, maximum))
+
+        return stats
+
+    def __get_percentiles(self, sketch, count, minimum, maximum):
+        """
+        Estimate percentiles from merged sketch
+
+        Returns:
+            dict: percentiles (p50, p95...) clamped to min and max values
+        """
+        percentiles = {'p%d' % percentile: None for percentile in self.PERCENTILES}
+        if not count:
+            return percentiles
+
+        buckets = sorted(sketch.items())
+        position = 0
+        cumulated = buckets[0][1]
+        for percentile in self.PERCENTILES:
+            rank = percentile / 100.0 * (count - 1)
+            while cumulated<=rank:
+                position += 1
+                cumulated += buckets[position][1]
+            bucket = buckets[position][0]
+            # bucket covers ]gamma^(bucket-1), gamma^bucket], estimation is its middle
+            value = 2.0 * self.gamma ** bucket / (self.gamma + 1.0) if bucket else 0.0
+            percentiles['p%d' % percentile] = int(round(min(max(value, minimum), maximum)))
+
+        return percentiles
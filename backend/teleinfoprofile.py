@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo profile
+
+Precompiled extraction of consumption indexes and instant current according to meter tariff option
+and phase layout
+"""
+
+from operator import itemgetter
+from .teleinfoframe import TeleinfoFrame
+
+class TeleinfoProfile():
+    """
+    Teleinfo profile
+
+    Tariff option and phase layout are detected once from a frame and select precompiled getters, so
+    values are then extracted from each frame without building temporary sets or dicts. Profile stays
+    valid while its signature (OPTARIF in historic mode, NGTF in standard mode) is unchanged and
+    extraction succeeds.
+
+    Consumption profiles are (name, index labels, heures creuses positions, heures pleines positions, register
+    names), current profiles are (name, current labels summed to get instant current). Register names identify
+    each tariff index whatever the mode (tariff period names as sent in PTEC, without dots), so every index can
+    be accounted and priced separately.
+
+    Values are read from numbers parsed once by decoder (see TeleinfoFrame).
+    """
+
+    CONSUMPTIONS = (
+        ('HCHP', ('HCHC', 'HCHP'), (0,), (1,), ('HC', 'HP')),
+        ('EJP', ('EJPHN', 'EJPHPM'), (0,), (1,), ('HN', 'PM')),
+        (
+            'TEMPO', ('BBRHCJB', 'BBRHPJB', 'BBRHCJW', 'BBRHPJW', 'BBRHCJR', 'BBRHPJR'), (0, 2, 4), (1, 3, 5),
+            ('HCJB', 'HPJB', 'HCJW', 'HPJW', 'HCJR', 'HPJR'),
+        ),
+        ('BASE', ('BASE',), (0,), (), ('BASE',)),
+        (
+            'STANDARD', ('EASF01', 'EASF02', 'EASF03', 'EASF04', 'EASF05', 'EASF06'), (0,), (1,),
+            ('EASF01', 'EASF02', 'EASF03', 'EASF04', 'EASF05', 'EASF06'),
+        ),
+    )
+    STANDARD_TEMPO_CONSUMPTION = (
+        'STANDARD_TEMPO', ('EASF01', 'EASF02', 'EASF03', 'EASF04', 'EASF05', 'EASF06'), (0, 2, 4), (1, 3, 5),
+        ('HCJB', 'HPJB', 'HCJW', 'HPJW', 'HCJR', 'HPJR'),
+    )
+    CURRENTS = (
+        ('MONO', ('IINST',)),
+        ('TRI', ('IINST1', 'IINST2', 'IINST3')),
+        ('STANDARD_TRI', ('IRMS1', 'IRMS2', 'IRMS3')),
+        ('STANDARD_MONO', ('IRMS1',)),
+    )
+
+    def __init__(self, signature, consumption, current):
+        """
+        Constructor
+
+        Args:
+            signature (string): profile signature (OPTARIF or NGTF value)
+            consumption (tuple): consumption profile (see CONSUMPTIONS) or None
+            current (tuple): current profile (see CURRENTS) or None
+        """
+        self.signature = signature
+        self.consumption = consumption[0] if consumption else None
+        self.registers = consumption[4] if consumption else ()
+        self.current = current[0] if current else None
+        self.complete = consumption is not None and current is not None
+        self.__consumption_getter = TeleinfoProfile.__compile(consumption[1]) if consumption else None
+        self.__heures_creuses = consumption[2] if consumption else ()
+        self.__heures_pleines = consumption[3] if consumption else ()
+        self.__current_getter = TeleinfoProfile.__compile(current[1]) if current else None
+
+    @staticmethod
+    def __compile(labels):
+        """
+        Return getter that always returns a tuple of label values
+        """
+        if len(labels)==1:
+            label = labels[0]
+            return lambda raw: (raw[label],)
+        return itemgetter(*labels)
+
+    @staticmethod
+    def get_signature(raw):
+        """
+        Return profile signature of specified frame
+
+        Args:
+            raw (dict): raw teleinfo data
+
+        Returns:
+            string: OPTARIF (historic mode) or NGTF (standard mode) value, None if not available
+        """
+        signature = raw.get('OPTARIF')
+        return raw.get('NGTF') if signature is None else signature
+
+    @staticmethod
+    def detect(raw, standard_tariff_option=None):
+        """
+        Detect profile of specified frame
+
+        Args:
+            raw (dict): raw teleinfo data
+            standard_tariff_option (string): tariff option of standard mode frame (BASE, HC, EJP or TEMPO)
+
+        Returns:
+            TeleinfoProfile: detected profile
+        """
+        consumption = None
+        for profile in TeleinfoProfile.CONSUMPTIONS:
+            if all(label in raw for label in profile[1]):
+                consumption = profile
+                break
+        if consumption and consumption[0]=='STANDARD' and standard_tariff_option=='TEMPO':
+            consumption = TeleinfoProfile.STANDARD_TEMPO_CONSUMPTION
+
+        current = None
+        for profile in TeleinfoProfile.CURRENTS:
+            if all(label in raw for label in profile[1]):
+                current = profile
+                break
+
+        return TeleinfoProfile(TeleinfoProfile.get_signature(raw), consumption, current)
+
+    def is_valid(self, raw):
+        """
+        Return True if profile can be used to extract values of specified frame
+
+        Args:
+            raw (dict): raw teleinfo data
+
+        Returns:
+            bool: True if profile is still valid
+        """
+        return self.complete and self.signature==TeleinfoProfile.get_signature(raw)
+
+    def extract_consumption(self, raw):
+        """
+        Extract consumption indexes from frame
+
+        Args:
+            raw (dict): raw teleinfo data
+
+        Returns:
+            tuple: heures creuses index, heures pleines index and list of all tariff indexes
+                   (heurescreuses, heurespleines, indexes) or None if profile has no consumption
+
+        Raises:
+            KeyError: if a label is missing in frame
+            ValueError: if a value is invalid
+        """
+        if self.__consumption_getter is None:
+            return None
+
+        indexes = list(self.__consumption_getter(TeleinfoFrame.get_numbers(raw)))
+        if None in indexes:
+            raise ValueError('Invalid index value')
+        heures_creuses = 0
+        for position in self.__heures_creuses:
+            heures_creuses += indexes[position]
+        heures_pleines = 0
+        for position in self.__heures_pleines:
+            heures_pleines += indexes[position]
+
+        return heures_creuses, heures_pleines, indexes
+
+    def extract_current(self, raw):
+        """
+        Extract instant current from frame (sum of all phases)
+
+        Args:
+            raw (dict): raw teleinfo data
+
+        Returns:
+            int: instant current (A) or None if profile has no current
+
+        Raises:
+            KeyError: if a label is missing in frame
+            ValueError: if a value is invalid
+        """
+        if self.__current_getter is None:
+            return None
+
+        current = 0
+        for value in self.__current_getter(TeleinfoFrame.get_numbers(raw)):
+            if value is None:
+                raise ValueError('Invalid current value')
+            current += value
+
+        return current
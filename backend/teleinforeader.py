@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo reader
+
+Continuously reads frames sent by power meter and keeps the latest one
+"""
+
+import time
+from threading import Thread, Event
+from .teleinfodecoder import TeleinfoDecoder
+
+class TeleinfoReader(Thread):
+    """
+    Teleinfo reader thread
+
+    It consumes serial stream continuously, decodes all frames sent by power meter (one every 1-2 seconds)
+    and publishes the latest one in a slot that can be read at any time without touching serial port.
+
+    Note:
+        Slot is lock-free: published frame is never modified after being published and python
+        reference assignment is atomic, so readers always get a complete frame.
+    """
+
+    ERROR_DELAY = 1.0 # seconds
+    EMPTY_READ_DELAY = 0.1 # seconds
+
+    def __init__(self, read_bytes, logger, on_frame=None, on_error=None):
+        """
+        Constructor
+
+        Args:
+            read_bytes (function): function that blocks until some bytes are received from serial port. It must
+                                   return read bytes (or empty bytes on timeout)
+            logger (Logger): logger instance
+            on_frame (function): function called each time a new frame is published (frame is given as parameter)
+            on_error (function): function called when serial port read fails (exception is given as parameter). If
+                                 specified reader stops on read error, otherwise read is retried after ERROR_DELAY
+        """
+        Thread.__init__(self, daemon=True, name='teleinforeader')
+
+        # members
+        self.read_bytes = read_bytes
+        self.decoder = TeleinfoDecoder()
+        self.logger = logger
+        self.on_frame = on_frame
+        self.on_error = on_error
+        self.capture = None
+        self.stats = None
+        self.running = True
+        self.frame = None
+        self.frames_count = 0
+        self.__frame_received = Event()
+
+    def stop(self):
+        """
+        Stop reader
+        """
+        self.running = False
+
+    def run(self):
+        """
+        Reader main loop
+        """
+        self.logger.debug('Teleinfo reader started')
+        while self.running:
+            self.read_once()
+        self.logger.debug('Teleinfo reader stopped')
+
+    def read_once(self):
+        """
+        Read available bytes, decode them and publish decoded frames
+
+        Returns:
+            int: number of published frames
+        """
+        try:
+            chunk = self.read_bytes()
+        except Exception as error:
+            if self.on_error:
+                self.logger.warning('Error reading teleinfo data, reader stopped: %s' % error)
+                self.running = False
+                self.on_error(error)
+                return 0
+            self.logger.exception('Error reading teleinfo data:')
+            time.sleep(self.ERROR_DELAY)
+            return 0
+
+        if not chunk:
+            time.sleep(self.EMPTY_READ_DELAY)
+            return 0
+
+        return len(self.feed(chunk))
+
+    def feed(self, chunk):
+        """
+        Decode specified bytes and publish decoded frames.
+        This function can be used without running thread when bytes are read by someone else.
+        Bytes are also recorded if a capture is set.
+
+        Args:
+            chunk (bytes): bytes read from serial port
+
+        Returns:
+            list: list of published frames
+        """
+        capture = self.capture
+        if capture:
+            try:
+                capture.write(chunk)
+            except Exception:
+                self.logger.exception('Error recording teleinfo capture:')
+                self.capture = None
+
+        start = time.perf_counter()
+        frames = self.decoder.feed(chunk)
+        if self.stats:
+            self.stats.add('decode', time.perf_counter() - start)
+        for frame in frames:
+            self.__publish(frame)
+
+        return frames
+
+    def __publish(self, frame):
+        """
+        Publish specified frame
+
+        Args:
+            frame (dict): decoded frame
+        """
+        self.frame = frame
+        self.frames_count += 1
+        self.__frame_received.set()
+
+        if self.on_frame:
+            try:
+                self.on_frame(frame)
+            except Exception:
+                self.logger.exception('Error processing teleinfo frame:')
+
+    def get_frame(self):
+        """
+        Return latest published frame
+
+        Returns:
+            dict: latest frame or empty dict if no frame received yet
+        """
+        frame = self.frame
+        return frame if frame is not None else {}
+
+    def wait_frame(self, timeout=None):
+        """
+        Wait until a first frame is published
+
+        Args:
+            timeout (float): max time to wait (in seconds)
+
+        Returns:
+            bool: True if a frame is available, False if timeout occured
+        """
+        return self.__frame_received.wait(timeout)
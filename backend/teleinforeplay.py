@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo replay
+
+Serve a teleinfo capture through a local pseudo terminal, so it can be read as a real dongle
+
+Usage:
+    python3 -m backend.teleinforeplay capture.tic [--speed 100] [--loop] [--directory /dev/serial/by-id/]
+"""
+
+import os
+import tty
+import time
+import logging
+import argparse
+from threading import Thread
+from .teleinfocapture import TeleinfoCaptureReader
+
+class TeleinfoReplay(Thread):
+    """
+    Teleinfo replay thread
+
+    A pseudo terminal is opened and a symlink named like a MicroTeleinfo dongle (containing TINFO) is created
+    to its slave side, so Cteleinfo._configure_hardware picks it up when link is created in USB_PATH. Capture
+    chunks are written to master side respecting recorded delays divided by speed factor (0 to write as fast
+    as possible).
+    """
+
+    LINK_NAME = 'usb-Replay_TINFO-capture-if00-port0'
+
+    def __init__(self, path, logger, directory='/dev/serial/by-id/', speed=1.0, loop=False):
+        """
+        Constructor
+
+        Args:
+            path (string): capture file path
+            logger (Logger): logger instance
+            directory (string): directory where dongle symlink is created
+            speed (float): replay speed factor (1 is real time, 0 is as fast as possible)
+            loop (bool): replay capture endlessly
+        """
+        Thread.__init__(self, daemon=True, name='teleinforeplay')
+
+        self.capture = TeleinfoCaptureReader(path)
+        self.logger = logger
+        self.directory = directory
+        self.speed = speed
+        self.loop = loop
+        self.running = True
+        self.link = None
+        self.sent_bytes = 0
+        self.__master = None
+        self.__slave = None
+
+    def open(self):
+        """
+        Open pseudo terminal and create dongle symlink
+
+        Returns:
+            string: dongle symlink path
+        """
+        self.__master, self.__slave = os.openpty()
+        # no line discipline processing: bytes are received as written (CR kept, no echo)
+        tty.setraw(self.__slave)
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        self.link = os.path.join(self.directory, self.LINK_NAME)
+        if os.path.lexists(self.link):
+            os.remove(self.link)
+        os.symlink(os.ttyname(self.__slave), self.link)
+        self.logger.info('Replaying "%s" on "%s" (%s bauds)' % (self.capture.path, self.link, self.capture.baudrate))
+
+        return self.link
+
+    def close(self):
+        """
+        Remove dongle symlink and close pseudo terminal
+        """
+        if self.link and os.path.lexists(self.link):
+            os.remove(self.link)
+        for fd in (self.__master, self.__slave):
+            if fd is not None:
+                os.close(fd)
+        self.__master = None
+        self.__slave = None
+
+    def stop(self):
+        """
+        Stop replay
+        """
+        self.running = False
+
+    def run(self):
+        """
+        Replay main loop
+        """
+        try:
+            while self.running:
+                self.replay_once()
+                if not self.loop:
+                    break
+        except Exception:
+            self.logger.exception('Error replaying capture:')
+        self.running = False
+
+    def replay_once(self):
+        """
+        Replay whole capture once
+        """
+        deadline = time.time()
+        for delay, chunk in self.capture:
+            if not self.running:
+                return
+            if self.speed:
+                deadline += delay / self.speed
+                wait = deadline - time.time()
+                if wait>0:
+                    time.sleep(wait)
+            os.write(self.__master, chunk)
+            self.sent_bytes += len(chunk)
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay teleinfo capture through a virtual serial port')
+    parser.add_argument('capture', help='capture file')
+    parser.add_argument('-s', '--speed', type=float, default=1.0, help='speed factor (1 real time, 0 max speed)')
+    parser.add_argument('-l', '--loop', action='store_true', help='replay capture endlessly')
+    parser.add_argument('-d', '--directory', default='/dev/serial/by-id/', help='dongle symlink directory')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format=u'%(asctime)s %(levelname)s : %(message)s')
+    replay = TeleinfoReplay(args.capture, logging.getLogger('teleinforeplay'), args.directory, args.speed, args.loop)
+    replay.open()
+    try:
+        replay.start()
+        while replay.is_alive():
+            replay.join(0.5)
+    except KeyboardInterrupt:
+        replay.stop()
+    finally:
+        replay.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo rollups
+
+Incremental consumption and cost rollups (hour, day, week and month buckets) per tariff index
+"""
+
+import os
+import json
+import time
+from bisect import bisect_left, bisect_right
+from threading import Lock
+
+PERIOD_HOUR = 'hour'
+PERIOD_DAY = 'day'
+PERIOD_WEEK = 'week'
+PERIOD_MONTH = 'month'
+PERIODS = (PERIOD_HOUR, PERIOD_DAY, PERIOD_WEEK, PERIOD_MONTH)
+
+class TeleinfoRollups():
+    """
+    Teleinfo consumption rollups
+
+    Each time meter indexes are received, consumption since previous indexes is added to current bucket
+    of each period, so rollups are always up to date and never rebuilt from samples. Current bucket bounds
+    are cached, so an update costs a few additions until a bucket boundary is crossed. Buckets follow local
+    time (day starts at midnight, week starts on monday).
+
+    Buckets of each period are kept in sorted lists (bucket start timestamps, consumption and cost per index),
+    oldest buckets are dropped when retention is reached. Cost of each index delta is computed once with prices
+    cached at that time (see set_prices) and accumulated like consumption, so current cost of a period is read
+    without rescanning anything and price changes never modify cost already accounted. Rollups are checkpointed regularly in a json file,
+    with last indexes, so consumption occurred while application was stopped is added to first bucket after
+    restart and nothing has to be rescanned. Checkpoint is never written by update (ingestion hot path): owner
+    calls checkpoint_if_due periodically.
+    """
+
+    RETENTION = {
+        PERIOD_HOUR: 24 * 31,
+        PERIOD_DAY: 366 * 3,
+        PERIOD_WEEK: 53 * 3,
+        PERIOD_MONTH: 12 * 10,
+    }
+    CHECKPOINT_INTERVAL = 900 # seconds
+
+    def __init__(self, path, logger):
+        """
+        Constructor
+
+        Args:
+            path (string): checkpoint file path
+            logger (Logger): logger instance
+        """
+        self.path = path
+        self.logger = logger
+        self.last_indexes = None
+        self.last_timestamp = 0
+        self.starts = {period: [] for period in PERIODS}
+        self.values = {period: [] for period in PERIODS}
+        self.costs = {period: [] for period in PERIODS}
+        self.__prices = None
+        self.__bounds = {period: (0, 0) for period in PERIODS}
+        self.__last_checkpoint = time.time()
+        self.__changed = False
+        self.__lock = Lock()
+
+    def load(self):
+        """
+        Load rollups from checkpoint file
+        """
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, 'r') as fd:
+                content = json.load(fd)
+            with self.__lock:
+                self.last_indexes = content['lastindexes']
+                self.last_timestamp = content['lasttimestamp']
+                for period in PERIODS:
+                    buckets = content['buckets'][period]
+                    self.starts[period] = [bucket[0] for bucket in buckets]
+                    self.values[period] = [bucket[1] for bucket in buckets]
+                    costs = content.get('costs', {}).get(period)
+                    self.costs[period] = costs if costs and len(costs)==len(buckets) else [
+                        [0.0] * len(bucket[1]) for bucket in buckets
+                    ]
+        except Exception:
+            self.logger.exception('Unable to load consumption rollups, rollups are reset:')
+
+    def save(self):
+        """
+        Write rollups to checkpoint file. File is replaced atomically so a crash never corrupts it
+        """
+        with self.__lock:
+            content = {
+                'lastindexes': self.last_indexes,
+                'lasttimestamp': self.last_timestamp,
+                'buckets': {period: list(zip(self.starts[period], self.values[period])) for period in PERIODS},
+                'costs': {period: [list(costs) for costs in self.costs[period]] for period in PERIODS},
+            }
+            self.__changed = False
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as fd:
+            json.dump(content, fd)
+            fd.flush()
+            os.fsync(fd.fileno())
+        os.replace(temp_path, self.path)
+        self.__last_checkpoint = time.time()
+
+    def checkpoint_if_due(self):
+        """
+        Write rollups to checkpoint file if they changed and CHECKPOINT_INTERVAL ran out since last checkpoint
+
+        Returns:
+            bool: True if checkpoint file was written
+        """
+        if not self.__changed or time.time() - self.__last_checkpoint < self.CHECKPOINT_INTERVAL:
+            return False
+
+        self.save()
+        return True
+
+    @staticmethod
+    def get_bucket_bounds(period, timestamp):
+        """
+        Return bounds of bucket containing specified timestamp
+
+        Args:
+            period (string): rollup period (hour, day, week or month)
+            timestamp (int): timestamp
+
+        Returns:
+            tuple: bucket start (included) and end (excluded) timestamps (start, end)
+        """
+        now = time.localtime(timestamp)
+        if period==PERIOD_HOUR:
+            start = (now.tm_year, now.tm_mon, now.tm_mday, now.tm_hour, 0, 0, 0, 0, -1)
+            end = (now.tm_year, now.tm_mon, now.tm_mday, now.tm_hour + 1, 0, 0, 0, 0, -1)
+        elif period==PERIOD_DAY:
+            start = (now.tm_year, now.tm_mon, now.tm_mday, 0, 0, 0, 0, 0, -1)
+            end = (now.tm_year, now.tm_mon, now.tm_mday + 1, 0, 0, 0, 0, 0, -1)
+        elif period==PERIOD_WEEK:
+            start = (now.tm_year, now.tm_mon, now.tm_mday - now.tm_wday, 0, 0, 0, 0, 0, -1)
+            end = (now.tm_year, now.tm_mon, now.tm_mday - now.tm_wday + 7, 0, 0, 0, 0, 0, -1)
+        elif period==PERIOD_MONTH:
+            start = (now.tm_year, now.tm_mon, 1, 0, 0, 0, 0, 0, -1)
+            end = (now.tm_year, now.tm_mon + 1, 1, 0, 0, 0, 0, 0, -1)
+        else:
+            raise ValueError('Invalid period "%s"' % period)
+
+        return int(time.mktime(start)), int(time.mktime(end))
+
+    def set_prices(self, prices):
+        """
+        Set prices used to compute cost of next consumption
+
+        Args:
+            prices (list): price of one kWh of each tariff index (same order as indexes) or None if unknown
+        """
+        with self.__lock:
+            self.__prices = [price / 1000.0 for price in prices] if prices else None
+
+    def update(self, timestamp, indexes):
+        """
+        Add consumption since last indexes to current buckets
+
+        Args:
+            timestamp (int): indexes timestamp
+            indexes (list): tariff indexes (Wh)
+        """
+        timestamp = int(timestamp)
+        with self.__lock:
+            last_indexes = self.last_indexes
+            self.last_indexes = list(indexes)
+            self.__changed = True
+            if timestamp < self.last_timestamp:
+                # clock goes backward, keep buckets sorted
+                return
+            self.last_timestamp = timestamp
+            if last_indexes is None or len(last_indexes)!=len(indexes):
+                # first indexes or tariff option changed: nothing to add yet
+                return
+            deltas = [index - last for index, last in zip(indexes, last_indexes)]
+            if min(deltas)<0:
+                # meter replaced or indexes reset
+                self.logger.info('Meter indexes decreased, consumption rollups restart from new indexes')
+                return
+            if not any(deltas):
+                return
+
+            prices = self.__prices
+            if prices and len(prices)==len(deltas):
+                costs = [delta * price for delta, price in zip(deltas, prices)]
+            else:
+                costs = [0.0] * len(deltas)
+            for period in PERIODS:
+                self.__add(period, timestamp, deltas, costs)
+
+    def __add(self, period, timestamp, deltas, costs):
+        """
+        Add consumption and cost to bucket of specified period
+        """
+        starts = self.starts[period]
+        values = self.values[period]
+        bucket_costs = self.costs[period]
+        bucket_start, bucket_end = self.__bounds[period]
+        if not bucket_start<=timestamp<bucket_end:
+            bucket_start, bucket_end = TeleinfoRollups.get_bucket_bounds(period, timestamp)
+            self.__bounds[period] = (bucket_start, bucket_end)
+        if not starts or starts[-1]!=bucket_start:
+            starts.append(bucket_start)
+            values.append([0] * len(deltas))
+            bucket_costs.append([0.0] * len(deltas))
+            if len(starts)>self.RETENTION[period]:
+                del starts[0]
+                del values[0]
+                del bucket_costs[0]
+
+        bucket = values[-1]
+        cost = bucket_costs[-1]
+        if len(bucket)<len(deltas):
+            # tariff option changed during bucket
+            bucket.extend([0] * (len(deltas) - len(bucket)))
+        if len(cost)<len(deltas):
+            cost.extend([0.0] * (len(deltas) - len(cost)))
+        for position, delta in enumerate(deltas):
+            bucket[position] += delta
+            cost[position] += costs[position]
+
+    def get(self, period, start, end):
+        """
+        Return consumption buckets of specified period starting between specified timestamps
+
+        Args:
+            period (string): rollup period (hour, day, week or month)
+            start (int): start timestamp. Bucket containing start timestamp is returned
+            end (int): end timestamp (included)
+
+        Returns:
+            list: list of buckets::
+
+                [
+                    {
+                        timestamp (int): bucket start timestamp,
+                        consumption (list): consumption per tariff index (Wh),
+                        total (int): total consumption (Wh),
+                    },
+                    ...
+                ]
+
+        """
+        first_start = TeleinfoRollups.get_bucket_bounds(period, start)[0]
+        with self.__lock:
+            starts = self.starts[period]
+            values = self.values[period]
+            first = bisect_left(starts, first_start)
+            last = bisect_right(starts, end)
+            return [
+                {
+                    'timestamp': starts[position],
+                    'consumption': list(values[position]),
+                    'total': sum(values[position]),
+                }
+                for position in range(first, last)
+            ]
+
+    def iter_buckets(self, period, start, end):
+        """
+        Iterate over consumption buckets of specified period starting between specified timestamps
+
+        Args:
+            period (string): rollup period (hour, day, week or month)
+            start (int): start timestamp (included)
+            end (int): end timestamp (included)
+
+        Yields:
+            tuple: bucket start timestamp and consumption per tariff index (timestamp, index1, ..., indexN)
+        """
+        with self.__lock:
+            starts = self.starts[period]
+            first = bisect_left(starts, start)
+            last = bisect_right(starts, end)
+            buckets = list(zip(starts[first:last], [list(values) for values in self.values[period][first:last]]))
+        for timestamp, values in buckets:
+            yield tuple([timestamp] + values)
+
+    def get_current(self, period, timestamp=None):
+        """
+        Return consumption and cost of current bucket of specified period. Only current bucket is read
+
+        Args:
+            period (string): rollup period (hour, day, week or month)
+            timestamp (int): timestamp in current bucket (now if None)
+
+        Returns:
+            dict: current bucket::
+
+                {
+                    timestamp (int): bucket start timestamp,
+                    consumption (list): consumption per tariff index (Wh),
+                    cost (list): cost per tariff index,
+                }
+
+        """
+        bucket_start = TeleinfoRollups.get_bucket_bounds(period, int(time.time() if timestamp is None else timestamp))[0]
+        with self.__lock:
+            starts = self.starts[period]
+            if not starts or starts[-1]!=bucket_start:
+                return {'timestamp': bucket_start, 'consumption': [], 'cost': []}
+            return {
+                'timestamp': bucket_start,
+                'consumption': list(self.values[period][-1]),
+                'cost': list(self.costs[period][-1]),
+            }
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo snapshot
+
+Latest frame of a meter with sequence numbers, to return full frame or changes since a sequence
+"""
+
+class TeleinfoSnapshot():
+    """
+    Teleinfo snapshot
+
+    Each new frame gets next sequence number. Full response (list of key/value items) is built once per
+    frame and sequence of last change (or removal) of each label is kept, so changes since any sequence
+    are returned without comparing frames and without building items again.
+
+    Snapshot can be restored from a frame persisted by a previous run: it is then flagged stale until first live
+    frame is set. Items of restored frame are flagged stale too, so full response tells it without changing its
+    format.
+
+    Note:
+        Snapshot is lock-free: state is an immutable tuple replaced at once on update, so readers always get
+        a consistent state. Only one thread must update snapshot.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        # sequence, raw frame, full response, items by label, change sequence by label, removal sequence by label,
+        # stale flag
+        self.__state = (0, {}, [], {}, {}, {}, False)
+
+    @property
+    def sequence(self):
+        """
+        Return sequence of latest frame (0 if no frame)
+
+        Returns:
+            int: sequence number
+        """
+        return self.__state[0]
+
+    @property
+    def raw(self):
+        """
+        Return latest frame
+
+        Returns:
+            dict: latest raw frame (empty if no frame)
+        """
+        return self.__state[1]
+
+    @property
+    def stale(self):
+        """
+        Return True if snapshot was restored and no live frame was set since
+
+        Returns:
+            bool: stale flag
+        """
+        return self.__state[6]
+
+    def restore(self, raw, sequence):
+        """
+        Restore frame persisted by a previous run. Snapshot is stale until next update
+
+        Args:
+            raw (dict): raw teleinfo frame. It must not be modified afterwards
+            sequence (int): sequence of persisted frame (next frame gets following sequence)
+        """
+        items = [{'key': label, 'value': value, 'stale': True} for label, value in raw.items()]
+        items_by_label = {item['key']: item for item in items}
+        changes = {label: sequence for label in raw}
+
+        self.__state = (sequence, raw, items, items_by_label, changes, {}, True)
+
+    def update(self, raw):
+        """
+        Set latest frame. Nothing is done if frame is the one already set
+
+        Args:
+            raw (dict): raw teleinfo frame. It must not be modified afterwards
+
+        Returns:
+            bool: True if frame is new (sequence incremented)
+        """
+        sequence, previous_raw, _, previous_items, previous_changes, previous_removals, previous_stale = self.__state
+        if raw is previous_raw:
+            return False
+
+        sequence += 1
+        items = []
+        items_by_label = {}
+        changes = {}
+        for label, value in raw.items():
+            item = previous_items.get(label)
+            if item is None or item['value']!=value:
+                item = {'key': label, 'value': value}
+                changes[label] = sequence
+            else:
+                if previous_stale:
+                    # restored item is flagged stale, value is unchanged
+                    item = {'key': label, 'value': value}
+                changes[label] = previous_changes[label]
+            items.append(item)
+            items_by_label[label] = item
+
+        removals = {label: removal for label, removal in previous_removals.items() if label not in raw}
+        for label in previous_raw:
+            if label not in raw:
+                removals[label] = sequence
+
+        self.__state = (sequence, raw, items, items_by_label, changes, removals, False)
+
+        return True
+
+    def get(self):
+        """
+        Return full response of latest frame (built once per frame, it must not be modified)
+
+        Returns:
+            list: list of items ({key, value}, plus stale flag set to True if frame was restored)
+        """
+        return self.__state[2]
+
+    def get_changes(self, since):
+        """
+        Return changes since specified sequence
+
+        Args:
+            since (int): sequence of last frame known by caller
+
+        Returns:
+            dict: changes::
+
+                {
+                    sequence (int): latest frame sequence,
+                    unchanged (bool): True if nothing changed since specified sequence,
+                    full (bool): True if items contain full frame (unknown sequence, caller must drop its data),
+                    items (list): list of changed items ({key, value}),
+                    removed (list): list of removed labels,
+                    stale (bool): True if frame was restored from a previous run (no live frame yet),
+                }
+
+        """
+        sequence, _, items, items_by_label, changes, removals, stale = self.__state
+        if since>sequence or since<0:
+            # sequence from another run
+            return {
+                'sequence': sequence,
+                'unchanged': False,
+                'full': True,
+                'items': items,
+                'removed': [],
+                'stale': stale,
+            }
+
+        changed = [items_by_label[label] for label, change in changes.items() if change>since]
+        removed = [label for label, removal in removals.items() if removal>since]
+
+        return {
+            'sequence': sequence,
+            'unchanged': not changed and not removed,
+            'full': False,
+            'items': changed,
+            'removed': removed,
+            'stale': stale,
+        }
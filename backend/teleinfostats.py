@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo stats
+
+Low overhead per-stage counters and latency histograms
+"""
+
+from bisect import bisect_left
+
+class TeleinfoStats():
+    """
+    Teleinfo stats
+
+    Each stage keeps a call counter, total and max durations and a fixed bucket latency histogram, so
+    recording a duration costs a bisect and a few integer additions and memory usage never grows.
+    Percentiles are approximated with bucket upper bounds.
+
+    Note:
+        Stats are not protected by a lock to keep overhead low: concurrent updates may rarely lose an
+        increment, which is acceptable for monitoring purpose.
+    """
+
+    STAGES = ('read', 'decode', 'process', 'device', 'event')
+    BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000) # us
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.stages = {}
+        self.reset()
+
+    def reset(self):
+        """
+        Reset all stats
+        """
+        self.stages = {
+            stage: {
+                'count': 0,
+                'total': 0.0,
+                'max': 0.0,
+                'histogram': [0] * (len(self.BUCKETS) + 1),
+            }
+            for stage in self.STAGES
+        }
+
+    def add(self, stage, duration):
+        """
+        Record stage duration
+
+        Args:
+            stage (string): stage name
+            duration (float): stage duration in seconds
+        """
+        stats = self.stages[stage]
+        stats['count'] += 1
+        stats['total'] += duration
+        if duration>stats['max']:
+            stats['max'] = duration
+        stats['histogram'][bisect_left(self.BUCKETS, duration * 1000000)] += 1
+
+    def __percentile(self, histogram, count, percent):
+        """
+        Return approximated percentile (bucket upper bound in us, None if percentile is in overflow bucket)
+        """
+        threshold = count * percent / 100.0
+        cumulated = 0
+        for position, bucket_count in enumerate(histogram):
+            cumulated += bucket_count
+            if cumulated>=threshold and bucket_count:
+                return self.BUCKETS[position] if position<len(self.BUCKETS) else None
+        return None
+
+    def get(self):
+        """
+        Return stages stats
+
+        Returns:
+            dict: stats per stage::
+
+                {
+                    stage (string): {
+                        count (int): number of calls,
+                        averageus (float): average duration in us,
+                        maxus (float): max duration in us,
+                        p50us (int): approximated median duration in us,
+                        p99us (int): approximated 99th percentile duration in us,
+                        histogram (list): list of bucket counts ({leus (int|None), count (int)}),
+                    },
+                    ...
+                }
+
+        """
+        result = {}
+        for stage, stats in self.stages.items():
+            count = stats['count']
+            histogram = list(stats['histogram'])
+            result[stage] = {
+                'count': count,
+                'averageus': round(stats['total'] / count * 1000000, 1) if count else 0.0,
+                'maxus': round(stats['max'] * 1000000, 1),
+                'p50us': self.__percentile(histogram, count, 50) if count else 0,
+                'p99us': self.__percentile(histogram, count, 99) if count else 0,
+                'histogram': [
+                    {'leus': self.BUCKETS[position] if position<len(self.BUCKETS) else None, 'count': bucket_count}
+                    for position, bucket_count in enumerate(histogram)
+                ],
+            }
+
+        return result
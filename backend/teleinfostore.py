@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo store
+
+Append-only on-disk time-series store of meter samples
+"""
+
+import os
+import glob
+import mmap
+import struct
+import time
+from bisect import bisect_right
+from threading import Lock
+
+class TeleinfoStore():
+    """
+    Teleinfo store
+
+    Samples are stored as fixed-width binary records (timestamp, instant power and tariff indexes)
+    in segment files. Each segment is preallocated (sparse file) and memory-mapped, records are written
+    sequentially and first record with null timestamp marks the end of a segment, so no header has to be
+    maintained.
+
+    Appended samples are kept in memory and written by batch (on batch size or flush interval), so flash
+    storage is written sequentially and rarely. Data already synced is never rewritten so last flushed state
+    always stays valid.
+
+    Sparse time index (first timestamp of each segment) is kept in memory. A range query bisects this index
+    then bisects records inside memory-mapped segment, so queries are O(log n) and never load whole data in RAM.
+    """
+
+    INDEXES_COUNT = 10
+    RECORD = struct.Struct('<%dI' % (2 + INDEXES_COUNT))
+    SEGMENT_RECORDS = 86400
+    SEGMENT_PATTERN = 'segment_%010d.dat'
+    FLUSH_RECORDS = 60
+    FLUSH_INTERVAL = 60.0 # seconds
+
+    def __init__(self, path, logger, max_segments=90):
+        """
+        Constructor
+
+        Args:
+            path (string): store directory
+            logger (Logger): logger instance
+            max_segments (int): max number of segments to keep (oldest segments are deleted)
+        """
+        self.path = path
+        self.logger = logger
+        self.max_segments = max_segments
+        self.segments = []
+        self.pending = []
+        self.last_timestamp = 0
+        self.__segment_file = None
+        self.__segment_map = None
+        self.__segment_count = 0
+        self.__last_flush = time.time()
+        self.__lock = Lock()
+
+    def open(self):
+        """
+        Open store, create directory if necessary and map last segment
+        """
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+        self.segments = sorted([
+            int(os.path.basename(segment)[8:18])
+            for segment in glob.glob(os.path.join(self.path, 'segment_*.dat'))
+        ])
+        if self.segments:
+            self.__map_segment(self.segments[-1])
+            if self.__segment_count:
+                self.last_timestamp = self.__read_record(self.__segment_map, self.__segment_count - 1)[0]
+        self.logger.debug('Store opened with %s segments' % len(self.segments))
+
+    def close(self):
+        """
+        Flush pending samples and close store
+        """
+        self.flush()
+        with self.__lock:
+            self.__unmap_segment()
+
+    def __segment_path(self, first_timestamp):
+        """
+        Return segment file path
+        """
+        return os.path.join(self.path, self.SEGMENT_PATTERN % first_timestamp)
+
+    def __map_segment(self, first_timestamp):
+        """
+        Map specified segment for writing (create it if necessary)
+        """
+        self.__unmap_segment()
+        path = self.__segment_path(first_timestamp)
+        size = self.SEGMENT_RECORDS * self.RECORD.size
+        self.__segment_file = open(path, 'a+b')
+        if os.path.getsize(path) != size:
+            self.__segment_file.truncate(size)
+        self.__segment_map = mmap.mmap(self.__segment_file.fileno(), size)
+        self.__segment_count = self.__count_records(self.__segment_map)
+
+    def __unmap_segment(self):
+        """
+        Unmap current segment
+        """
+        if self.__segment_map:
+            self.__segment_map.close()
+            self.__segment_file.close()
+        self.__segment_map = None
+        self.__segment_file = None
+        self.__segment_count = 0
+
+    def __read_record(self, segment_map, position):
+        """
+        Read record at specified position
+        """
+        return self.RECORD.unpack_from(segment_map, position * self.RECORD.size)
+
+    def __read_timestamp(self, segment_map, position):
+        """
+        Read record timestamp at specified position
+        """
+        return struct.unpack_from('<I', segment_map, position * self.RECORD.size)[0]
+
+    def __count_records(self, segment_map):
+        """
+        Return number of records in segment (first record with null timestamp ends segment)
+        """
+        low, high = 0, len(segment_map) // self.RECORD.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.__read_timestamp(segment_map, middle):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def __bisect_records(self, segment_map, count, timestamp):
+        """
+        Return position of first record with timestamp greater or equal than specified one
+        """
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if self.__read_timestamp(segment_map, middle) < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def append(self, timestamp, power, indexes):
+        """
+        Append sample. Sample is written on disk at next flush
+
+        Args:
+            timestamp (int): sample timestamp
+            power (int): instant power
+            indexes (list): tariff indexes (max INDEXES_COUNT values)
+        """
+        timestamp = int(timestamp)
+        if timestamp <= 0:
+            return
+        values = list(indexes[:self.INDEXES_COUNT])
+        values += [0] * (self.INDEXES_COUNT - len(values))
+        record = self.RECORD.pack(timestamp, power, *values)
+
+        # store can be flushed at the same time by a reader (iter_records)
+        with self.__lock:
+            if timestamp < self.last_timestamp:
+                # keep store sorted, sample is dropped
+                return
+            self.last_timestamp = timestamp
+            self.pending.append(record)
+
+            if len(self.pending) >= self.FLUSH_RECORDS or time.time() - self.__last_flush >= self.FLUSH_INTERVAL:
+                self.__flush(True)
+
+    def flush(self, sync=True):
+        """
+        Write pending samples to current segment
+
+        Args:
+            sync (bool): sync written data to disk
+        """
+        with self.__lock:
+            self.__flush(sync)
+
+    def __flush(self, sync):
+        """
+        Write pending samples to current segment. Lock must be acquired
+        """
+        pending = self.pending
+        self.pending = []
+        if pending:
+            self.__write(pending, sync)
+        self.__last_flush = time.time()
+
+    def __write(self, records, sync):
+        """
+        Write records sequentially, creating new segments when needed
+        """
+        while records:
+            if not self.__segment_map or self.__segment_count >= self.SEGMENT_RECORDS:
+                first_timestamp = self.RECORD.unpack_from(records[0])[0]
+                if self.__segment_map and sync:
+                    self.__segment_map.flush()
+                self.segments.append(first_timestamp)
+                self.__map_segment(first_timestamp)
+                self.__purge()
+
+            chunk = records[:self.SEGMENT_RECORDS - self.__segment_count]
+            records = records[len(chunk):]
+            offset = self.__segment_count * self.RECORD.size
+            data = b''.join(chunk)
+            self.__segment_map[offset:offset + len(data)] = data
+            self.__segment_count += len(chunk)
+            if sync:
+                page_offset = offset - (offset % mmap.ALLOCATIONGRANULARITY)
+                self.__segment_map.flush(page_offset, offset + len(data) - page_offset)
+
+    def __purge(self):
+        """
+        Delete oldest segments
+        """
+        while len(self.segments) > self.max_segments:
+            first_timestamp = self.segments.pop(0)
+            try:
+                os.remove(self.__segment_path(first_timestamp))
+            except Exception:
+                self.logger.exception('Unable to delete store segment "%s":' % first_timestamp)
+
+    def iter_records(self, start, end):
+        """
+        Iterate over stored samples between specified timestamps. Pending samples are written
+        (without sync) before reading
+
+        Args:
+            start (int): start timestamp (included)
+            end (int): end timestamp (included)
+
+        Yields:
+            tuple: sample (timestamp, power, index1, ..., indexN)
+        """
+        self.flush(sync=False)
+        segments = list(self.segments)
+        first = max(0, bisect_right(segments, start) - 1)
+        for first_timestamp in segments[first:]:
+            if first_timestamp > end:
+                break
+            try:
+                with open(self.__segment_path(first_timestamp), 'rb') as fd:
+                    segment_map = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+            except Exception:
+                # segment purged meanwhile
+                continue
+
+            try:
+                count = self.__count_records(segment_map)
+                position = self.__bisect_records(segment_map, count, start)
+                while position < count:
+                    record = self.__read_record(segment_map, position)
+                    if record[0] > end:
+                        return
+                    yield record
+                    position += 1
+            finally:
+                segment_map.close()
+
+    def get(self, start, end, resolution):
+        """
+        Return stored samples between specified timestamps downsampled to specified resolution
+
+        Args:
+            start (int): start timestamp (included)
+            end (int): end timestamp (included)
+            resolution (int): resolution in seconds. Power is averaged and last indexes are kept
+
+        Returns:
+            list: list of samples::
+
+                [
+                    {
+                        timestamp (int): bucket start timestamp,
+                        power (int): average instant power,
+                        indexes (list): last tariff indexes,
+                    },
+                    ...
+                ]
+
+        """
+        samples = []
+        bucket = None
+        total = 0
+        count = 0
+        last = None
+        for record in self.iter_records(start, end):
+            current_bucket = record[0] - (record[0] % resolution)
+            if current_bucket != bucket and count:
+                samples.append({'timestamp': bucket, 'power': int(round(total / count)), 'indexes': list(last[2:])})
+                total = 0
+                count = 0
+            bucket = current_bucket
+            total += record[1]
+            count += 1
+            last = record
+        if count:
+            samples.append({'timestamp': bucket, 'power': int(round(total / count)), 'indexes': list(last[2:])})
+
+        return samples
@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo streamer
+
+Stream decoded frames to local processes through a Unix domain socket
+"""
+
+import os
+import time
+import shutil
+import socket
+import selectors
+from collections import deque
+from threading import Thread, Lock
+
+class TeleinfoStreamer(Thread):
+    """
+    Teleinfo streamer thread
+
+    Any number of local clients can connect to Unix domain socket and receive every decoded frame of all
+    meters, one line per frame (fields separated by tab)::
+
+        meter TAB timestamp TAB label TAB value [TAB label TAB value ...] LF
+
+    Timestamp is frame reception time (unix time with milliseconds). Client can send a line containing labels
+    it is interested in (separated by spaces or commas): only those labels are then streamed and frames without
+    any of them are skipped. An empty line subscribes to all labels again.
+
+    Frames are published without blocking caller (serial reader): they are queued in a bounded queue and
+    streamer thread is woken up to encode and send them. Each frame is encoded once per distinct label
+    subscription. Each client has a bounded buffer of encoded lines: when a client is too slow its oldest
+    lines are dropped, so a slow client never stalls serial reader nor other clients.
+
+    Stream contains meter identifiers (ADCO, PRM) and consumption, so socket file is only accessible to its
+    owner by default. Access can be granted to a group of local users (mode and group of socket file).
+    """
+
+    QUEUE_SIZE = 64 # frames
+    CLIENT_BUFFER_SIZE = 32 # lines
+    MAX_CLIENTS = 16
+    MAX_REQUEST_SIZE = 1024 # bytes
+    SELECT_TIMEOUT = 1.0 # seconds
+
+    def __init__(self, path, logger, mode=0o600, group=None):
+        """
+        Constructor
+
+        Args:
+            path (string): Unix domain socket path
+            logger (Logger): logger instance
+            mode (int): socket file permissions (write permission is needed to connect)
+            group (string): socket file group name (None to keep process group)
+        """
+        Thread.__init__(self, daemon=True, name='teleinfostreamer')
+
+        self.path = path
+        self.logger = logger
+        self.mode = mode
+        self.group = group
+        self.running = True
+        self.dropped = 0
+        self.frames_count = 0
+        self.clients_count = 0
+        self.__frames = deque(maxlen=self.QUEUE_SIZE)
+        self.__selector = selectors.DefaultSelector()
+        self.__server = None
+        self.__wake_read, self.__wake_write = os.pipe()
+        os.set_blocking(self.__wake_read, False)
+        os.set_blocking(self.__wake_write, False)
+        self.__wake_lock = Lock()
+        self.__wake_closed = False
+
+    def stop(self):
+        """
+        Stop streamer
+        """
+        self.running = False
+        self.__wake()
+
+    def __wake(self):
+        """
+        Wake streamer thread up. Nothing is done once wake pipe is closed (its file descriptors may already be
+        reused by another file)
+        """
+        with self.__wake_lock:
+            if self.__wake_closed:
+                return
+            try:
+                os.write(self.__wake_write, b'\0')
+            except BlockingIOError:
+                # already woken up
+                pass
+
+    def publish(self, meter, frame):
+        """
+        Publish frame to subscribers. Never blocks: nothing is done if there is no subscriber and oldest
+        queued frame is dropped if streamer is late
+
+        Args:
+            meter (string): meter name
+            frame (dict): decoded frame. It must not be modified afterwards
+        """
+        if not self.clients_count:
+            return
+
+        frames = self.__frames
+        if len(frames)==frames.maxlen:
+            self.dropped += 1
+        frames.append((meter, time.time(), frame))
+        self.__wake()
+
+    @staticmethod
+    def encode(meter, timestamp, frame, labels=None):
+        """
+        Encode frame line
+
+        Args:
+            meter (string): meter name
+            timestamp (float): frame timestamp
+            frame (dict): frame label-value
+            labels (frozenset): labels to encode (all labels if None)
+
+        Returns:
+            bytes: encoded line or None if frame contains none of specified labels
+        """
+        fields = [meter, '%.3f' % timestamp]
+        for label, value in frame.items():
+            if labels is None or label in labels:
+                fields.append(label)
+                fields.append(value)
+        if len(fields)==2 and labels is not None:
+            return None
+
+        return ('\t'.join(fields) + '\n').encode('ascii', 'replace')
+
+    def run(self):
+        """
+        Streamer main loop
+        """
+        try:
+            self.__open()
+        except OSError:
+            self.logger.exception('Unable to open teleinfo stream socket "%s":' % self.path)
+            self.__close()
+            return
+
+        self.logger.debug('Teleinfo streamer started on "%s"' % self.path)
+        try:
+            while self.running:
+                for key, events in self.__selector.select(self.SELECT_TIMEOUT):
+                    if key.data is None:
+                        self.__accept()
+                    elif key.data=='wake':
+                        self.__dispatch()
+                    elif self.__is_registered(key):
+                        # client may have been closed while handling previous events of same batch
+                        if events & selectors.EVENT_READ:
+                            self.__read(key.fileobj, key.data)
+                        if events & selectors.EVENT_WRITE and self.__is_registered(key):
+                            self.__flush(key.fileobj, key.data)
+        except Exception:
+            self.logger.exception('Teleinfo streamer failed:')
+        finally:
+            self.__close()
+        self.logger.debug('Teleinfo streamer stopped')
+
+    def __is_registered(self, key):
+        """
+        Return True if selector key is still registered (client not closed)
+        """
+        return self.__selector.get_map().get(key.fd) is key
+
+    def __open(self):
+        """
+        Open listening socket (stale socket file is removed)
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        self.__server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__server.bind(self.path)
+        # access is restricted before listening, so no client can connect meanwhile
+        if self.group is not None:
+            try:
+                shutil.chown(self.path, group=self.group)
+            except (LookupError, OSError) as error:
+                self.logger.warning('Unable to set teleinfo stream socket group to "%s": %s' % (self.group, error))
+        os.chmod(self.path, self.mode)
+        self.__server.listen(self.MAX_CLIENTS)
+        self.__server.setblocking(False)
+        self.__selector.register(self.__server, selectors.EVENT_READ, None)
+        self.__selector.register(self.__wake_read, selectors.EVENT_READ, 'wake')
+
+    def __close(self):
+        """
+        Close all sockets and remove socket file
+        """
+        for key in list(self.__selector.get_map().values()):
+            if isinstance(key.data, dict):
+                self.__close_client(key.fileobj)
+        self.__selector.close()
+        self.clients_count = 0
+        if self.__server:
+            self.__server.close()
+            self.__server = None
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+        with self.__wake_lock:
+            self.__wake_closed = True
+            os.close(self.__wake_read)
+            os.close(self.__wake_write)
+
+    def __accept(self):
+        """
+        Accept new client
+        """
+        try:
+            client_socket, _ = self.__server.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+
+        if self.clients_count>=self.MAX_CLIENTS:
+            self.logger.warning('Too many teleinfo stream clients, connection refused')
+            client_socket.close()
+            return
+
+        client_socket.setblocking(False)
+        client = {
+            'labels': None,
+            'request': bytearray(),
+            'buffer': deque(maxlen=self.CLIENT_BUFFER_SIZE),
+            'pending': b'',
+        }
+        self.__selector.register(client_socket, selectors.EVENT_READ, client)
+        self.clients_count += 1
+        self.logger.debug('Teleinfo stream client connected (%s clients)' % self.clients_count)
+
+    def __close_client(self, client_socket):
+        """
+        Close client connection
+        """
+        self.__selector.unregister(client_socket)
+        client_socket.close()
+        self.clients_count -= 1
+        self.logger.debug('Teleinfo stream client disconnected (%s clients)' % self.clients_count)
+
+    def __read(self, client_socket, client):
+        """
+        Read client subscription request
+        """
+        try:
+            data = client_socket.recv(self.MAX_REQUEST_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.__close_client(client_socket)
+            return
+
+        request = client['request']
+        request += data
+        while True:
+            end = request.find(b'\n')
+            if end<0:
+                break
+            line = request[:end].decode('ascii', 'replace')
+            del request[:end + 1]
+            labels = frozenset(line.replace(',', ' ').split())
+            client['labels'] = labels or None
+        if len(request)>self.MAX_REQUEST_SIZE:
+            self.logger.warning('Invalid teleinfo stream request, client disconnected')
+            self.__close_client(client_socket)
+
+    def __dispatch(self):
+        """
+        Encode queued frames and send them to all clients
+        """
+        try:
+            while os.read(self.__wake_read, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        clients = [
+            (key.fileobj, key.data) for key in list(self.__selector.get_map().values()) if isinstance(key.data, dict)
+        ]
+        frames = self.__frames
+        while frames:
+            meter, timestamp, frame = frames.popleft()
+            self.frames_count += 1
+            lines = {}
+            for _, client in clients:
+                labels = client['labels']
+                if labels not in lines:
+                    lines[labels] = TeleinfoStreamer.encode(meter, timestamp, frame, labels)
+                line = lines[labels]
+                if line is None:
+                    continue
+                buffer = client['buffer']
+                if len(buffer)==buffer.maxlen:
+                    self.dropped += 1
+                buffer.append(line)
+
+        for client_socket, client in clients:
+            self.__flush(client_socket, client)
+
+    def __flush(self, client_socket, client):
+        """
+        Send buffered lines to client. Socket is watched for writing while lines remain
+        """
+        buffer = client['buffer']
+        if not client['pending'] and buffer:
+            client['pending'] = memoryview(b''.join(buffer))
+            buffer.clear()
+
+        pending = client['pending']
+        if pending:
+            try:
+                sent = client_socket.send(pending)
+                client['pending'] = pending[sent:]
+            except (BlockingIOError, InterruptedError):
+                pass
+            except OSError:
+                self.__close_client(client_socket)
+                return
+
+        events = selectors.EVENT_READ
+        if client['pending'] or buffer:
+            events |= selectors.EVENT_WRITE
+        if self.__selector.get_key(client_socket).events!=events:
+            self.__selector.modify(client_socket, events, client)
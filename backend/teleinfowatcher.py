@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo watcher
+
+Watch dongle directory (/dev/serial/by-id/) to detect plugged and unplugged dongles
+"""
+
+import os
+import glob
+import struct
+import select
+import ctypes
+import ctypes.util
+from threading import Thread
+
+class TeleinfoWatcher(Thread):
+    """
+    Teleinfo watcher thread
+
+    Directory is watched with inotify (no dependency, libc is called through ctypes) so dongle changes are
+    reported as soon as udev creates or removes its link. Directory is polled if inotify is not available or
+    if directory does not exist (/dev/serial/by-id/ is removed by udev when last serial device is unplugged),
+    and inotify is used again as soon as directory is created.
+
+    Directory is scanned again after each inotify event and callback is called only when dongle ports change.
+    """
+
+    POLL_INTERVAL = 2.0 # seconds
+    SELECT_TIMEOUT = 1.0 # seconds
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_IGNORED = 0x00008000
+    EVENT_HEADER = struct.Struct('iIII')
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = 0o2000000
+
+    def __init__(self, path, logger, on_change, ports=None, pattern='TINFO'):
+        """
+        Constructor
+
+        Args:
+            path (string): watched directory
+            logger (Logger): logger instance
+            on_change (function): function called when dongle ports change (added ports list, removed ports list)
+            ports (list): already known dongle ports
+            pattern (string): string dongle filename must contain
+        """
+        Thread.__init__(self, daemon=True, name='teleinfowatcher')
+
+        self.path = path
+        self.logger = logger
+        self.on_change = on_change
+        self.pattern = pattern
+        self.ports = set(ports or [])
+        self.running = True
+        self.use_inotify = True
+        self.__libc = None
+
+    def stop(self):
+        """
+        Stop watcher
+        """
+        self.running = False
+
+    def scan(self):
+        """
+        Scan watched directory
+
+        Returns:
+            list: sorted list of dongle ports
+        """
+        return sorted([path for path in glob.glob(os.path.join(self.path, '*')) if self.pattern in os.path.basename(path)])
+
+    def check(self):
+        """
+        Scan watched directory and call callback if dongle ports changed
+
+        Returns:
+            bool: True if dongle ports changed
+        """
+        ports = set(self.scan())
+        added = sorted(ports - self.ports)
+        removed = sorted(self.ports - ports)
+        self.ports = ports
+        if not added and not removed:
+            return False
+
+        self.logger.debug('Dongle ports changed: added=%s removed=%s' % (added, removed))
+        try:
+            self.on_change(added, removed)
+        except Exception:
+            self.logger.exception('Error handling dongle ports change:')
+
+        return True
+
+    def run(self):
+        """
+        Watcher main loop
+        """
+        self.logger.debug('Teleinfo watcher started on "%s"' % self.path)
+        self.check()
+        while self.running:
+            fd = self.__open_inotify() if self.use_inotify and os.path.isdir(self.path) else None
+            if fd is None:
+                self.__poll()
+            else:
+                try:
+                    self.__watch(fd)
+                finally:
+                    os.close(fd)
+        self.logger.debug('Teleinfo watcher stopped')
+
+    def __poll(self):
+        """
+        Wait poll interval and scan directory
+        """
+        end = self.POLL_INTERVAL
+        while self.running and end>0:
+            select.select([], [], [], min(self.SELECT_TIMEOUT, end))
+            end -= self.SELECT_TIMEOUT
+        if self.running:
+            self.check()
+
+    def __watch(self, fd):
+        """
+        Wait for inotify events and scan directory after each one. Returns when directory is removed or
+        watcher stopped
+        """
+        # directory may have changed before watch was added
+        self.check()
+        while self.running:
+            readable, _, _ = select.select([fd], [], [], self.SELECT_TIMEOUT)
+            if not readable:
+                continue
+            events = bytearray()
+            try:
+                while True:
+                    data = os.read(fd, 4096)
+                    if not data:
+                        break
+                    events += data
+            except BlockingIOError:
+                pass
+            # directory is scanned again, events are only parsed to know if watched directory is still the same
+            self.check()
+            if self.__is_watch_removed(events) or not os.path.isdir(self.path):
+                self.logger.debug('Watched directory "%s" removed, watching it again' % self.path)
+                return
+
+    def __is_watch_removed(self, events):
+        """
+        Return True if watched directory was removed or moved (directory may already be created again)
+        """
+        removed = self.IN_DELETE_SELF | self.IN_MOVE_SELF | self.IN_IGNORED
+        offset = 0
+        while offset + self.EVENT_HEADER.size <= len(events):
+            _, mask, _, length = self.EVENT_HEADER.unpack_from(events, offset)
+            if mask & removed:
+                return True
+            offset += self.EVENT_HEADER.size + length
+
+        return False
+
+    def __open_inotify(self):
+        """
+        Open inotify instance watching directory
+
+        Returns:
+            int: inotify file descriptor or None if inotify is not available
+        """
+        try:
+            if self.__libc is None:
+                self.__libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = self.__libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+            if fd<0:
+                raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        except Exception as error:
+            self.logger.info('Inotify not available (%s), dongle directory is polled' % error)
+            self.use_inotify = False
+            return None
+
+        mask = self.IN_CREATE | self.IN_DELETE | self.IN_MOVED_FROM | self.IN_MOVED_TO | self.IN_DELETE_SELF | self.IN_MOVE_SELF
+        if self.__libc.inotify_add_watch(fd, os.fsencode(self.path), mask)<0:
+            # directory removed in the meantime
+            os.close(fd)
+            return None
+
+        return fd
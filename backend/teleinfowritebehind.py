@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Teleinfo write-behind
+
+Collect device and config changes in memory and persist them by batch
+"""
+
+import time
+from threading import Lock
+
+class TeleinfoWriteBehind():
+    """
+    Teleinfo write-behind cache
+
+    Device and config changes are merged in memory (only last value of each field is kept) and persisted
+    when flush interval runs out (checked on each change and periodically by owner calling flush_if_due, so
+    last changes before a quiet period are persisted too), when a critical field changes or when flush is
+    explicitly requested (on module stop). Each flush writes config once and each updated device once, so
+    persisted state is always a complete state at flush time: if device crashes, last flushed state stays
+    valid and only changes since last flush are lost.
+
+    Flushes are serialized, so a value is never persisted after a newer one.
+
+    If persistence fails, changes are kept and retried at next flush (newer values win).
+    """
+
+    def __init__(self, update_device, update_config, logger, interval, critical_fields=None):
+        """
+        Constructor
+
+        Args:
+            update_device (function): function persisting device (uuid, params)
+            update_config (function): function persisting config (config)
+            logger (Logger): logger instance
+            interval (int): flush interval in seconds
+            critical_fields (list): fields that trigger flush when their value changes
+        """
+        self.update_device_func = update_device
+        self.update_config_func = update_config
+        self.logger = logger
+        self.interval = interval
+        self.critical_fields = set(critical_fields or [])
+        self.flushes_count = 0
+        self.writes_count = 0
+        self.__devices = {}
+        self.__config = {}
+        self.__flushed_devices = {}
+        self.__flushed_config = {}
+        self.__last_flush = time.time()
+        self.__lock = Lock()
+        self.__flush_lock = Lock()
+
+    def has_pending(self):
+        """
+        Return True if some changes are not persisted yet
+
+        Returns:
+            bool: True if changes are pending
+        """
+        return bool(self.__devices or self.__config)
+
+    def update_device(self, uuid, params):
+        """
+        Queue device update
+
+        Args:
+            uuid (string): device uuid
+            params (dict): device fields to update
+        """
+        with self.__lock:
+            self.__devices.setdefault(uuid, {}).update(params)
+            critical = self.__is_critical(params, self.__flushed_devices.get(uuid, {}))
+        self.__flush_if_needed(critical)
+
+    def update_config(self, config):
+        """
+        Queue config update
+
+        Args:
+            config (dict): config fields to update
+        """
+        with self.__lock:
+            self.__config.update(config)
+            critical = self.__is_critical(config, self.__flushed_config)
+        self.__flush_if_needed(critical)
+
+    def __is_critical(self, params, flushed):
+        """
+        Return True if a critical field value differs from flushed one
+        """
+        for field in self.critical_fields.intersection(params.keys()):
+            if field not in flushed or flushed[field]!=params[field]:
+                return True
+        return False
+
+    def __flush_if_needed(self, critical):
+        """
+        Flush if critical field changed or interval ran out
+        """
+        if critical or time.time() - self.__last_flush >= self.interval:
+            self.flush()
+
+    def flush_if_due(self):
+        """
+        Persist pending changes if flush interval ran out
+
+        Returns:
+            bool: True if all changes were persisted or nothing was due
+        """
+        if self.has_pending() and time.time() - self.__last_flush >= self.interval:
+            return self.flush()
+
+        return True
+
+    def flush(self):
+        """
+        Persist pending changes. Waits for flush running in another thread
+
+        Returns:
+            bool: True if all changes were persisted
+        """
+        with self.__flush_lock:
+            return self.__flush()
+
+    def __flush(self):
+        """
+        Persist pending changes. Flush lock must be acquired
+        """
+        with self.__lock:
+            devices = self.__devices
+            config = self.__config
+            self.__devices = {}
+            self.__config = {}
+            self.__last_flush = time.time()
+
+        if not devices and not config:
+            return True
+
+        self.flushes_count += 1
+        failed_devices = {}
+        for uuid, params in devices.items():
+            try:
+                self.update_device_func(uuid, params)
+                self.writes_count += 1
+                self.__flushed_devices.setdefault(uuid, {}).update(params)
+            except Exception:
+                self.logger.exception('Unable to persist device "%s":' % uuid)
+                failed_devices[uuid] = params
+
+        failed_config = {}
+        if config:
+            try:
+                self.update_config_func(config)
+                self.writes_count += 1
+                self.__flushed_config.update(config)
+            except Exception:
+                self.logger.exception('Unable to persist config:')
+                failed_config = config
+
+        if failed_devices or failed_config:
+            # requeue failed changes, newer values queued meanwhile are kept
+            with self.__lock:
+                for uuid, params in failed_devices.items():
+                    self.__devices[uuid] = dict(params, **self.__devices.get(uuid, {}))
+                self.__config = dict(failed_config, **self.__config)
+            return False
+
+        return True
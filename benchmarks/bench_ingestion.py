@@ -0,0 +1,379 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark ingestion hot path stages on realistic frame streams
+
+Stages:
+    - decode: raw serial bytes to frame (TeleinfoDecoder.feed)
+    - extract: frame to power device params (Cteleinfo._process_raw_data: profile detection, consumption
+      indexes and instant power extraction)
+    - publish: power event policy, device write-behind and event send (Cteleinfo._update_power_device)
+
+Extract and publish stages run module methods on a Cteleinfo instance created by Cleep test session, so
+events are sent to a stubbed bus and no dongle is probed (module is not configured).
+
+Each stage is run on historic and standard streams, single and three-phase. Reported metrics are frames/s,
+per-frame latency percentiles, peak traced memory and net allocated memory blocks per frame (blocks still
+allocated after stage, a growing value means a leak).
+
+Usage:
+    python3 bench_ingestion.py [-n frames_count] [-o output.json] [-b baseline.json] [-t threshold]
+
+Results are written to output file as json. If a baseline file (previous output) is specified, throughputs are
+compared and command exits with code 1 if a stage regresses more than threshold percent.
+"""
+
+import sys
+import os
+import gc
+import json
+import time
+import argparse
+import platform
+import logging
+import unittest
+import tracemalloc
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from backend.teleinfodecoder import TeleinfoDecoder, MODE_HISTORIC, MODE_STANDARD
+from backend.cteleinfo import Cteleinfo
+from cleep.libs.tests import session
+
+CHUNK_SIZE = 64 # bytes
+DEVICE_UUID = 'bench-instant-power'
+
+HISTORIC_MONO = {
+    'ADCO': '041529016009',
+    'OPTARIF': 'HC..',
+    'ISOUSC': '45',
+    'HCHC': '000643083',
+    'HCHP': '000825429',
+    'PTEC': 'HP..',
+    'IINST': '003',
+    'IMAX': '029',
+    'PAPP': '00620',
+    'HHPHC': 'A',
+    'MOTDETAT': '000000',
+}
+
+HISTORIC_TRI = {
+    'ADCO': '041529016009',
+    'OPTARIF': 'BBR(',
+    'ISOUSC': '30',
+    'BBRHCJB': '002697099',
+    'BBRHPJB': '003494559',
+    'BBRHCJW': '000041241',
+    'BBRHPJW': '000194168',
+    'BBRHCJR': '000000000',
+    'BBRHPJR': '000089736',
+    'PTEC': 'HPJB',
+    'DEMAIN': '----',
+    'IINST1': '001',
+    'IINST2': '002',
+    'IINST3': '003',
+    'IMAX1': '060',
+    'IMAX2': '060',
+    'IMAX3': '060',
+    'PMAX': '03500',
+    'PAPP': '01320',
+    'HHPHC': 'Y',
+    'MOTDETAT': '000000',
+    'PPOT': '00',
+}
+
+STANDARD_MONO = {
+    'ADSC': '041876097737',
+    'VTIC': '02',
+    'DATE': ('H210523131002', ''),
+    'NGTF': '  H PLEINE/CREUSE',
+    'LTARF': '  HEURE  PLEINE  ',
+    'EAST': '008475623',
+    'EASF01': '004121570',
+    'EASF02': '004354053',
+    'EASF03': '000000000',
+    'EASF04': '000000000',
+    'EASF05': '000000000',
+    'EASF06': '000000000',
+    'EASF07': '000000000',
+    'EASF08': '000000000',
+    'EASF09': '000000000',
+    'EASF10': '000000000',
+    'EASD01': '004121570',
+    'EASD02': '004354053',
+    'EASD03': '000000000',
+    'EASD04': '000000000',
+    'IRMS1': '004',
+    'URMS1': '236',
+    'PREF': '09',
+    'PCOUP': '09',
+    'SINSTS': '00910',
+    'SMAXSN': ('H210523073156', '04930'),
+    'SMAXSN-1': ('H210522192024', '05180'),
+    'CCASN': ('H210523130000', '00602'),
+    'CCASN-1': ('H210523123000', '00868'),
+    'UMOY1': ('H210523131000', '235'),
+    'STGE': '003A0001',
+    'MSG1': 'PAS DE          MESSAGE         ',
+    'PRM': '01234567890123',
+    'RELAIS': '000',
+    'NTARF': '02',
+    'NJOURF': '00',
+    'NJOURF+1': '00',
+    'PJOURF+1': '00004001 06004002 22004001 NONUTILE NONUTILE NONUTILE NONUTILE NONUTILE NONUTILE NONUTILE NONUTILE',
+}
+
+STANDARD_TRI = dict(STANDARD_MONO, **{
+    'NGTF': '     TEMPO      ',
+    'IRMS2': '002',
+    'IRMS3': '003',
+    'URMS2': '235',
+    'URMS3': '237',
+    'SINSTS1': '00910',
+    'SINSTS2': '00470',
+    'SINSTS3': '00710',
+    'NTARF': '03',
+})
+
+STREAMS = [
+    ('historic_mono', HISTORIC_MONO, MODE_HISTORIC, 'IINST'),
+    ('historic_tri', HISTORIC_TRI, MODE_HISTORIC, 'IINST1'),
+    ('standard_mono', STANDARD_MONO, MODE_STANDARD, 'IRMS1'),
+    ('standard_tri', STANDARD_TRI, MODE_STANDARD, 'IRMS1'),
+]
+
+def build_frames(frame, current_label, frames_count):
+    """
+    Build realistic frames stream: instant current (and apparent power) varies and first index increases
+
+    Returns:
+        list: list of frames (dict)
+    """
+    index_label = 'HCHC' if 'HCHC' in frame else ('BBRHPJB' if 'BBRHPJB' in frame else 'EASF01')
+    power_label = 'PAPP' if 'PAPP' in frame else 'SINSTS'
+    first_index = int(frame[index_label])
+    frames = []
+    for position in range(frames_count):
+        current = dict(frame)
+        amperes = (position // 10) % 40
+        current[current_label] = '%03d' % amperes
+        if power_label in frame:
+            current[power_label] = '%05d' % (amperes * 230)
+        current[index_label] = '%09d' % (first_index + position // 3)
+        frames.append(current)
+    return frames
+
+def create_module():
+    """
+    Create teleinfo module with Cleep test session (stubbed bus). Module is not configured so no dongle
+    is probed and no task is started
+
+    Returns:
+        tuple: test session and module instance (session, module)
+    """
+    test_session = session.TestSession(unittest.TestCase())
+    module = test_session.setup(Cteleinfo)
+    module.logger.setLevel(logging.WARNING)
+    return test_session, module
+
+def create_meter(module, name):
+    """
+    Create new meter with instant power device (each stage run starts from a fresh meter state)
+
+    Returns:
+        TeleinfoMeter: meter instance
+    """
+    meter = module._create_meter(name, None, False)
+    meter.instant_power_device_uuid = DEVICE_UUID
+    return meter
+
+def build_params(module, frames):
+    """
+    Build power device params of each frame (publish stage input). Frame timestamps are spread one second apart
+
+    Returns:
+        list: list of params (dict)
+    """
+    meter = create_meter(module, 'params')
+    now = int(time.time())
+    params = []
+    for position, frame in enumerate(frames):
+        current = module._process_raw_data(meter, frame)
+        if current:
+            current['lastupdate'] = now + position
+            params.append(current)
+    return params
+
+def stage_decode(stage_input):
+    """
+    Decode raw bytes stream by serial read sized chunks
+
+    Yields:
+        int: number of frames decoded from each chunk (chunk latency is shared between its frames)
+    """
+    _, data = stage_input
+    decoder = TeleinfoDecoder()
+    view = memoryview(data)
+    for offset in range(0, len(data), CHUNK_SIZE):
+        yield len(decoder.feed(view[offset:offset + CHUNK_SIZE]))
+
+def stage_extract(stage_input):
+    """
+    Extract power device params from frames
+
+    Yields:
+        int: 1 for each processed frame
+    """
+    module, frames = stage_input
+    meter = create_meter(module, 'extract')
+    for frame in frames:
+        module._process_raw_data(meter, frame)
+        yield 1
+
+def stage_publish(stage_input):
+    """
+    Apply power event policy, update device through write-behind cache and send event
+
+    Yields:
+        int: 1 for each processed frame
+    """
+    module, params = stage_input
+    meter = create_meter(module, 'publish')
+    for current in params:
+        if meter.event_policy.check(current, current['lastupdate']):
+            module._update_power_device(meter, current)
+        yield 1
+
+STAGES = [
+    ('decode', stage_decode, lambda module, data: (module, data)),
+    ('extract', stage_extract, lambda module, data: (module, TeleinfoDecoder().feed(data))),
+    ('publish', stage_publish, lambda module, data: (module, build_params(module, TeleinfoDecoder().feed(data)))),
+]
+
+def percentile(values, percent):
+    """
+    Return percentile of sorted values
+    """
+    if not values:
+        return 0.0
+    position = min(len(values) - 1, int(round(percent / 100.0 * (len(values) - 1))))
+    return values[position]
+
+def run_stage(stage, stage_input):
+    """
+    Run stage and measure throughput, latencies and allocations
+
+    Returns:
+        dict: stage metrics
+    """
+    # timing pass
+    gc.collect()
+    latencies = []
+    processed = 0
+    clock = time.perf_counter
+    start = clock()
+    last = start
+    for count in stage(stage_input):
+        now = clock()
+        if count:
+            # latency of a chunk decoding several frames is shared between them
+            latency = (now - last) / count
+            latencies.extend([latency] * count)
+            processed += count
+        last = now
+    duration = clock() - start
+
+    # allocation pass
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    for _ in stage(stage_input):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    retained_blocks = sys.getallocatedblocks() - blocks
+
+    latencies.sort()
+    return {
+        'frames': processed,
+        'frames_per_second': processed / duration if duration else 0.0,
+        'latency_us': {
+            'p50': percentile(latencies, 50) * 1000000,
+            'p90': percentile(latencies, 90) * 1000000,
+            'p99': percentile(latencies, 99) * 1000000,
+            'max': (latencies[-1] if latencies else 0.0) * 1000000,
+        },
+        'peak_kib': peak / 1024.0,
+        'peak_bytes_per_frame': peak / processed if processed else 0.0,
+        'retained_blocks_per_frame': retained_blocks / processed if processed else 0.0,
+    }
+
+def compare(results, baseline, threshold):
+    """
+    Compare results throughput with baseline ones
+
+    Returns:
+        list: list of regressions (stream, stage, baseline frames/s, current frames/s)
+    """
+    regressions = []
+    for stream, stages in results['streams'].items():
+        for stage, metrics in stages.items():
+            try:
+                previous = baseline['streams'][stream][stage]['frames_per_second']
+            except KeyError:
+                continue
+            if previous and metrics['frames_per_second'] < previous * (1 - threshold / 100.0):
+                regressions.append((stream, stage, previous, metrics['frames_per_second']))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark teleinfo ingestion hot path')
+    parser.add_argument('-n', '--frames', type=int, default=10000, help='number of frames per stream')
+    parser.add_argument('-o', '--output', default='bench_ingestion.json', help='json output file')
+    parser.add_argument('-b', '--baseline', help='json output of previous run to compare with')
+    parser.add_argument('-t', '--threshold', type=float, default=10.0, help='max throughput regression in percent')
+    args = parser.parse_args()
+
+    results = {
+        'timestamp': int(time.time()),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'frames_count': args.frames,
+        'streams': {},
+    }
+    test_session, module = create_module()
+    for stream_name, frame, mode, current_label in STREAMS:
+        frames = build_frames(frame, current_label, args.frames)
+        data = b''.join([TeleinfoDecoder.encode_frame(current, mode) for current in frames])
+        results['streams'][stream_name] = {}
+        for stage_name, stage, prepare in STAGES:
+            metrics = run_stage(stage, prepare(module, data))
+            results['streams'][stream_name][stage_name] = metrics
+            print('%-14s %-8s %10.0f frames/s  p50 %7.1f us  p99 %7.1f us  %8.1f B/frame peak  %6.2f blocks/frame' % (
+                stream_name,
+                stage_name,
+                metrics['frames_per_second'],
+                metrics['latency_us']['p50'],
+                metrics['latency_us']['p99'],
+                metrics['peak_bytes_per_frame'],
+                metrics['retained_blocks_per_frame'],
+            ))
+
+    test_session.clean()
+
+    with open(args.output, 'w') as fd:
+        json.dump(results, fd, indent=2, sort_keys=True)
+    print('Results written to %s' % args.output)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as fd:
+            baseline = json.load(fd)
+        regressions = compare(results, baseline, args.threshold)
+        for stream, stage, previous, current in regressions:
+            print('REGRESSION %s %s: %.0f -> %.0f frames/s' % (stream, stage, previous, current))
+        if regressions:
+            sys.exit(1)
+        print('No regression greater than %.0f%%' % args.threshold)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark in-project teleinfo decoder against python-teleinfo Parser.get_frame
+
+Usage:
+    python3 bench_teleinfodecoder.py [frames_count]
+
+Note:
+    python-teleinfo library (pip install teleinfo) is required for comparison, otherwise only
+    in-project decoder is benchmarked.
+"""
+
+import sys
+import os
+import time
+import tracemalloc
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from backend.teleinfodecoder import TeleinfoDecoder
+try:
+    from teleinfo import Parser
+    from teleinfo.hw_vendors import HW_vendor
+except ImportError: # pragma: no cover
+    Parser = None
+
+FRAME = {
+    'ADCO': '041529016009',
+    'OPTARIF': 'BBR(',
+    'ISOUSC': '45',
+    'BBRHCJB': '002697099',
+    'BBRHPJB': '003494559',
+    'BBRHCJW': '000041241',
+    'BBRHPJW': '000194168',
+    'BBRHCJR': '000000000',
+    'BBRHPJR': '000089736',
+    'PTEC': 'HPJB',
+    'DEMAIN': '----',
+    'IINST': '002',
+    'IMAX': '030',
+    'PAPP': '00430',
+    'HHPHC': 'Y',
+    'MOTDETAT': '000000',
+}
+CHUNK_SIZE = 64 # bytes, serial read size at 1200 bauds is usually smaller
+
+if Parser:
+    class StreamHw(HW_vendor):
+        """
+        Hardware vendor that serves chars from memory
+        """
+        def __init__(self, text):
+            self.data = text
+            self.pos = 0
+
+        def read_char(self):
+            char = self.data[self.pos]
+            self.pos += 1
+            return char
+
+def bench_decoder(data, frames_count):
+    """
+    Benchmark in-project decoder
+
+    Returns:
+        tuple: (duration in seconds, decoded frames)
+    """
+    decoder = TeleinfoDecoder()
+    view = memoryview(data)
+    decoded = 0
+    start = time.perf_counter()
+    for i in range(0, len(data), CHUNK_SIZE):
+        decoded += len(decoder.feed(view[i:i+CHUNK_SIZE]))
+    return time.perf_counter() - start, decoded
+
+def bench_parser(text, frames_count):
+    """
+    Benchmark python-teleinfo parser (serial stream is given as str because parser expects str chars)
+
+    Returns:
+        tuple: (duration in seconds, decoded frames)
+    """
+    # parser synchronizes on first frame start at init
+    parser = Parser(StreamHw(text))
+    decoded = 0
+    start = time.perf_counter()
+    for _ in range(frames_count - 1):
+        if parser.get_frame():
+            decoded += 1
+    return time.perf_counter() - start, decoded
+
+def peak_memory(bench, data, frames_count):
+    """
+    Return peak memory allocated during benchmark (in bytes)
+    """
+    tracemalloc.start()
+    bench(data, frames_count)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def main():
+    frames_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    data = TeleinfoDecoder.encode_frame(FRAME) * frames_count
+
+    benches = [('TeleinfoDecoder.feed', bench_decoder, data)]
+    if Parser:
+        benches.append(('Parser.get_frame', bench_parser, data.decode('ascii')))
+    else: # pragma: no cover
+        print('python-teleinfo not installed, Parser.get_frame is not benchmarked')
+
+    for name, bench, stream in benches:
+        duration, decoded = bench(stream, frames_count)
+        print('%-22s %8d frames %10.0f frames/s %8.1f us/frame %8.1f KiB peak' % (
+            name,
+            decoded,
+            decoded / duration,
+            duration / decoded * 1000000,
+            peak_memory(bench, stream, frames_count) / 1024,
+        ))
+
+if __name__ == '__main__':
+    main()
@@ -4,14 +4,41 @@
  */
 angular
 .module('Cleep')
-.directive('teleinfoConfigComponent', ['teleinfoService', 'cleepService',
-function(teleinfoService, cleepService) {
+.directive('teleinfoConfigComponent', ['teleinfoService', 'cleepService', '$interval',
+function(teleinfoService, cleepService, $interval) {
 
     var teleinfoController = function() {
         var self = this;
         self.tabIndex = 'teleinfo';
         self.port = '';
+        self.mode = null;
         self.teleinfo = [];
+        self.teleinfoSequence = 0;
+        self.teleinfoStale = false;
+        self.teleinfoPoll = null;
+        self.TELEINFO_POLL_INTERVAL = 2000; // ms
+        self.meters = [];
+        self.meter = null;
+        self.stats = null;
+        self.statsStages = [
+            {'key': 'read', 'label': 'Serial read'},
+            {'key': 'decode', 'label': 'Frame decoding'},
+            {'key': 'process', 'label': 'Frame processing'},
+            {'key': 'device', 'label': 'Device update'},
+            {'key': 'event', 'label': 'Event send'},
+        ];
+        self.statsCounters = [
+            {'key': 'framesread', 'label': 'Frames read'},
+            {'key': 'checksumerrors', 'label': 'Checksum errors'},
+            {'key': 'droppedframes', 'label': 'Dropped frames'},
+            {'key': 'droppeditems', 'label': 'Dropped queue items'},
+            {'key': 'eventssent', 'label': 'Events sent'},
+            {'key': 'eventssuppressed', 'label': 'Events suppressed'},
+            {'key': 'queuedepth', 'label': 'Queue depth'},
+            {'key': 'writes', 'label': 'Storage writes'},
+            {'key': 'streamclients', 'label': 'Stream clients'},
+            {'key': 'streamdropped', 'label': 'Stream dropped items'},
+        ];
         self.extra = {
             'ADCO':     {'label': 'Adresse du concentrateur de téléreport', 'unit': ''},
             'OPTARIF':  {'label': 'Option tarifaire choisie', 'unit': ''},
@@ -36,6 +63,49 @@ function(teleinfoService, cleepService) {
             'IMAX':     {'label': 'Intensité maximale appelée', 'unit': 'A'},
             'HHPHC':    {'label': 'Horaires heures pleines heures creuses', 'unit': ''},
             'PAPP':     {'label': 'Puissance apparente', 'unit': 'VA'},
+            // standard mode (Linky)
+            'ADSC':     {'label': 'Adresse secondaire du compteur', 'unit': ''},
+            'VTIC':     {'label': 'Version de la TIC', 'unit': ''},
+            'DATE':     {'label': 'Date et heure courante', 'unit': ''},
+            'NGTF':     {'label': 'Nom du calendrier tarifaire fournisseur', 'unit': ''},
+            'LTARF':    {'label': 'Libellé tarif fournisseur en cours', 'unit': ''},
+            'EAST':     {'label': 'Energie active soutirée totale', 'unit': 'Wh'},
+            'EASF01':   {'label': 'Energie active soutirée fournisseur index 01', 'unit': 'Wh'},
+            'EASF02':   {'label': 'Energie active soutirée fournisseur index 02', 'unit': 'Wh'},
+            'EASF03':   {'label': 'Energie active soutirée fournisseur index 03', 'unit': 'Wh'},
+            'EASF04':   {'label': 'Energie active soutirée fournisseur index 04', 'unit': 'Wh'},
+            'EASF05':   {'label': 'Energie active soutirée fournisseur index 05', 'unit': 'Wh'},
+            'EASF06':   {'label': 'Energie active soutirée fournisseur index 06', 'unit': 'Wh'},
+            'EASF07':   {'label': 'Energie active soutirée fournisseur index 07', 'unit': 'Wh'},
+            'EASF08':   {'label': 'Energie active soutirée fournisseur index 08', 'unit': 'Wh'},
+            'EASF09':   {'label': 'Energie active soutirée fournisseur index 09', 'unit': 'Wh'},
+            'EASF10':   {'label': 'Energie active soutirée fournisseur index 10', 'unit': 'Wh'},
+            'EASD01':   {'label': 'Energie active soutirée distributeur index 01', 'unit': 'Wh'},
+            'EASD02':   {'label': 'Energie active soutirée distributeur index 02', 'unit': 'Wh'},
+            'EASD03':   {'label': 'Energie active soutirée distributeur index 03', 'unit': 'Wh'},
+            'EASD04':   {'label': 'Energie active soutirée distributeur index 04', 'unit': 'Wh'},
+            'IRMS1':    {'label': 'Courant efficace phase 1', 'unit': 'A'},
+            'IRMS2':    {'label': 'Courant efficace phase 2', 'unit': 'A'},
+            'IRMS3':    {'label': 'Courant efficace phase 3', 'unit': 'A'},
+            'URMS1':    {'label': 'Tension efficace phase 1', 'unit': 'V'},
+            'URMS2':    {'label': 'Tension efficace phase 2', 'unit': 'V'},
+            'URMS3':    {'label': 'Tension efficace phase 3', 'unit': 'V'},
+            'PREF':     {'label': 'Puissance apparente de référence', 'unit': 'kVA'},
+            'PCOUP':    {'label': 'Puissance apparente de coupure', 'unit': 'kVA'},
+            'SINSTS':   {'label': 'Puissance apparente instantanée soutirée', 'unit': 'VA'},
+            'SMAXSN':   {'label': 'Puissance apparente max soutirée du jour', 'unit': 'VA'},
+            'SMAXSN-1': {'label': 'Puissance apparente max soutirée de la veille', 'unit': 'VA'},
+            'CCASN':    {'label': 'Point n de la courbe de charge active soutirée', 'unit': 'W'},
+            'CCASN-1':  {'label': 'Point n-1 de la courbe de charge active soutirée', 'unit': 'W'},
+            'UMOY1':    {'label': 'Tension moyenne phase 1', 'unit': 'V'},
+            'STGE':     {'label': 'Registre de statuts', 'unit': ''},
+            'MSG1':     {'label': 'Message court', 'unit': ''},
+            'PRM':      {'label': 'Point de référence mesure', 'unit': ''},
+            'RELAIS':   {'label': 'Relais', 'unit': ''},
+            'NTARF':    {'label': 'Numéro de l\'index tarifaire en cours', 'unit': ''},
+            'NJOURF':   {'label': 'Numéro du jour en cours calendrier fournisseur', 'unit': ''},
+            'NJOURF+1': {'label': 'Numéro du prochain jour calendrier fournisseur', 'unit': ''},
+            'PJOURF+1': {'label': 'Profil du prochain jour calendrier fournisseur', 'unit': ''},
         };
 
         /**
@@ -46,34 +116,112 @@ function(teleinfoService, cleepService) {
             cleepService.getModuleConfig('teleinfo')
                 .then(function(config) {
                     self.port = config.port
+                    self.mode = config.mode
                     if( !self.port ) {
                         // switch to install tab if port not specified
                         self.tabIndex = 'install';
                     }
                 })
                 .then(function() {
-                    // load current teleinfo data
+                    // load meters and current teleinfo data of primary meter
+                    self.getMeters();
                     self.getTeleinfo();
+                    self.teleinfoPoll = $interval(self.updateTeleinfo, self.TELEINFO_POLL_INTERVAL);
                 });
         };
 
         /**
-         * Get teleinfo data
+         * Destroy controller
+         */
+        self.$onDestroy = function() {
+            if( self.teleinfoPoll ) {
+                $interval.cancel(self.teleinfoPoll);
+                self.teleinfoPoll = null;
+            }
+        };
+
+        /**
+         * Get meters
+         */
+        self.getMeters = function() {
+            teleinfoService.getMeters()
+                .then(function(resp) {
+                    self.meters = resp.data;
+                    if( self.meters.length ) {
+                        self.meter = self.meters[0].name;
+                    }
+                });
+        };
+
+        /**
+         * Get teleinfo data of selected meter
          */
         self.getTeleinfo = function() {
-            teleinfoService.getTeleinfo()
+            self.teleinfo = [];
+            self.teleinfoSequence = 0;
+            self.updateTeleinfo();
+        };
+
+        /**
+         * Update teleinfo data of selected meter with data changed since last update
+         */
+        self.updateTeleinfo = function() {
+            var meter = self.meter;
+            teleinfoService.getTeleinfo(meter, self.teleinfoSequence)
                 .then(function(resp) {
-                    for(var index in resp.data) {
+                    if( meter!==self.meter || resp.data.unchanged ) {
+                        return;
+                    }
+                    if( resp.data.full ) {
+                        self.teleinfo = [];
+                    }
+                    self.teleinfoSequence = resp.data.sequence;
+                    self.teleinfoStale = resp.data.stale;
+
+                    for(var index in resp.data.items) {
+                        var item = resp.data.items[index];
+                        var current = self.teleinfo.find(function(teleinfo) { return teleinfo.key===item.key; });
+                        if( current ) {
+                            current.value = item.value;
+                            continue;
+                        }
+                        var extra = self.extra[item.key] || {'label': item.key, 'unit': ''};
                         self.teleinfo.push({
-                            'key': resp.data[index].key,
-                            'value': resp.data[index].value,
-                            'unit': self.extra[resp.data[index].key].unit,
-                            'label': self.extra[resp.data[index].key].label,
+                            'key': item.key,
+                            'value': item.value,
+                            'unit': extra.unit,
+                            'label': extra.label,
+                        });
+                    }
+                    if( resp.data.removed.length ) {
+                        self.teleinfo = self.teleinfo.filter(function(teleinfo) {
+                            return resp.data.removed.indexOf(teleinfo.key)===-1;
                         });
                     }
                 });
         };
 
+
+        /**
+         * Get ingestion stats
+         */
+        self.getStats = function() {
+            teleinfoService.getStats()
+                .then(function(resp) {
+                    self.stats = resp.data;
+                });
+        };
+
+        /**
+         * Reset ingestion stats
+         */
+        self.resetStats = function() {
+            teleinfoService.resetStats()
+                .then(function() {
+                    self.getStats();
+                });
+        };
+
     };
 
     return {
@@ -4,34 +4,276 @@
  */
 angular
 .module('Cleep')
-.service('teleinfoService', ['$rootScope', 'rpcService', 'cleepService',
-function($rootScope, rpcService, cleepService) {
+.service('teleinfoService', ['$rootScope', '$window', '$timeout', 'rpcService', 'cleepService',
+function($rootScope, $window, $timeout, rpcService, cleepService) {
     var self = this;
+    self.POWER_UPDATE_FIELDS = ['lastupdate', 'power', 'currentmode', 'nextmode', 'heurescreuses', 'heurespleines', 'subscription'];
+    self.FLUSH_DELAY = 250; // ms, used when animation frames are not available
+    self.devicesByUuid = {};
+    self.indexedDevices = null;
+    self.indexedDevicesCount = 0;
+    self.pendingUpdates = {};
+    self.flushScheduled = false;
     
+    /**
+     * Get meters
+     */
+    self.getMeters = function() {
+        return rpcService.sendCommand('get_meters', 'teleinfo');
+    };
+
     /**
      * Get teleinfo data
+     * @param meter: meter name (primary meter if not specified)
+     * @param since: sequence number returned by previous call to get only changed data (all data if not specified)
      */
-    self.getTeleinfo = function() {
-        return rpcService.sendCommand('get_teleinfo', 'teleinfo');
+    self.getTeleinfo = function(meter, since) {
+        return rpcService.sendCommand('get_teleinfo', 'teleinfo', {'meter': meter, 'since': since});
     };
 
     /**
-     * Catch power update event
+     * Get instant power history
+     * @param start: start timestamp
+     * @param end: end timestamp
+     * @param resolution: history resolution in seconds
+     * @param meter: meter name (primary meter if not specified)
+     */
+    self.getPowerHistory = function(start, end, resolution, meter) {
+        return rpcService.sendCommand('get_power_history', 'teleinfo', {'start': start, 'end': end, 'resolution': resolution, 'meter': meter});
+    };
+
+    /**
+     * Get meter history persisted on disk
+     * @param start: start timestamp
+     * @param end: end timestamp
+     * @param resolution: history resolution in seconds
+     * @param meter: meter name (primary meter if not specified)
+     */
+    self.getMeterHistory = function(start, end, resolution, meter) {
+        return rpcService.sendCommand('get_meter_history', 'teleinfo', {'start': start, 'end': end, 'resolution': resolution, 'meter': meter});
+    };
+
+    /**
+     * Get consumption rollups
+     * @param period: rollup period (hour|day|week|month)
+     * @param start: start timestamp
+     * @param end: end timestamp
+     * @param meter: meter name (primary meter if not specified)
+     */
+    self.getConsumption = function(period, start, end, meter) {
+        return rpcService.sendCommand('get_consumption', 'teleinfo', {'period': period, 'start': start, 'end': end, 'meter': meter});
+    };
+
+    /**
+     * Export stored samples or consumption rollups, one chunk per call
+     * @param start: start timestamp
+     * @param end: end timestamp
+     * @param data: exported data (samples|hour|day|week|month)
+     * @param exportFormat: export format (csv|binary)
+     * @param cursor: cursor returned by previous call (undefined for first chunk)
+     * @param meter: meter name (primary meter if not specified)
+     */
+    self.exportHistory = function(start, end, data, exportFormat, cursor, meter) {
+        return rpcService.sendCommand('export_history', 'teleinfo', {
+            'start': start, 'end': end, 'data': data, 'export_format': exportFormat, 'cursor': cursor, 'meter': meter,
+        });
+    };
+
+    /**
+     * Get instant power stats over rolling window
+     * @param window: rolling window (1m|15m|1h|1d)
+     * @param meter: meter name (primary meter if not specified)
+     */
+    self.getPowerStats = function(window, meter) {
+        return rpcService.sendCommand('get_power_stats', 'teleinfo', {'window': window, 'meter': meter});
+    };
+
+    /**
+     * Get consumption and cost of current period per tariff register
+     * @param period: period (hour|day|week|month)
+     * @param meter: meter name (primary meter if not specified)
+     */
+    self.getCost = function(period, meter) {
+        return rpcService.sendCommand('get_cost', 'teleinfo', {'period': period, 'meter': meter});
+    };
+
+    /**
+     * Set price table
+     * @param prices: price of one kWh per tariff register (HC, HP, HCJB...)
+     */
+    self.setPrices = function(prices) {
+        return rpcService.sendCommand('set_prices', 'teleinfo', {'prices': prices});
+    };
+
+    /**
+     * Get price table
+     */
+    self.getPrices = function() {
+        return rpcService.sendCommand('get_prices', 'teleinfo');
+    };
+
+    /**
+     * Set ingestion mode
+     * @param mode: ingestion mode (thread|asyncio)
+     */
+    self.setIngestionMode = function(mode) {
+        return rpcService.sendCommand('set_ingestion_mode', 'teleinfo', {'mode': mode});
+    };
+
+    /**
+     * Get ingestion stats
+     */
+    self.getStats = function() {
+        return rpcService.sendCommand('get_stats', 'teleinfo');
+    };
+
+    /**
+     * Reset ingestion stats
+     */
+    self.resetStats = function() {
+        return rpcService.sendCommand('reset_stats', 'teleinfo');
+    };
+
+    /**
+     * Set group of local users allowed to connect to frames stream socket
+     * @param group: group name (null to allow only Cleep user)
+     */
+    self.setStreamGroup = function(group) {
+        return rpcService.sendCommand('set_stream_group', 'teleinfo', {'group': group});
+    };
+
+    /**
+     * Start raw serial stream capture
+     * @param meter: meter name (primary meter if not specified)
+     */
+    self.startCapture = function(meter) {
+        return rpcService.sendCommand('start_capture', 'teleinfo', {'meter': meter});
+    };
+
+    /**
+     * Stop raw serial stream capture
+     * @param meter: meter name (primary meter if not specified)
+     */
+    self.stopCapture = function(meter) {
+        return rpcService.sendCommand('stop_capture', 'teleinfo', {'meter': meter});
+    };
+
+    /**
+     * Set power event policy
+     * @param deadband: power deadband in VA (0 to disable)
+     * @param deadbandPercent: power deadband in percent (0 to disable)
+     * @param heartbeat: max interval between 2 events in seconds
+     */
+    self.setPowerEventPolicy = function(deadband, deadbandPercent, heartbeat) {
+        return rpcService.sendCommand('set_power_event_policy', 'teleinfo', {'deadband': deadband, 'deadband_percent': deadbandPercent, 'heartbeat': heartbeat});
+    };
+
+    /**
+     * Set device and config write interval
+     * @param interval: write interval in seconds
+     */
+    self.setWriteInterval = function(interval) {
+        return rpcService.sendCommand('set_write_interval', 'teleinfo', {'interval': interval});
+    };
+
+    /**
+     * Get power event policy and statistics
+     */
+    self.getPowerEventPolicy = function() {
+        return rpcService.sendCommand('get_power_event_policy', 'teleinfo');
+    };
+
+    /**
+     * Set overload rules
+     * @param headroom: minimum load headroom in percent of subscription (0 to disable)
+     * @param ramp: power increase in VA (0 to disable)
+     * @param rampWindow: power increase window in seconds
+     */
+    self.setOverloadRules = function(headroom, ramp, rampWindow) {
+        return rpcService.sendCommand('set_overload_rules', 'teleinfo', {'headroom': headroom, 'ramp': ramp, 'ramp_window': rampWindow});
+    };
+
+    /**
+     * Get overload rules and overload state of meters
+     */
+    self.getOverloadRules = function() {
+        return rpcService.sendCommand('get_overload_rules', 'teleinfo');
+    };
+
+    /**
+     * Return device by uuid. Index is rebuilt when devices list changes or when device is not found
+     * @param uuid: device uuid
+     */
+    self.getDevice = function(uuid) {
+        var devices = cleepService.devices;
+        var device = self.devicesByUuid[uuid];
+        if( device && self.indexedDevices===devices && self.indexedDevicesCount===devices.length ) {
+            return device;
+        }
+
+        self.devicesByUuid = {};
+        for( var i=0; i<devices.length; i++ ) {
+            self.devicesByUuid[devices[i].uuid] = devices[i];
+        }
+        self.indexedDevices = devices;
+        self.indexedDevicesCount = devices.length;
+
+        return self.devicesByUuid[uuid];
+    };
+
+    /**
+     * Schedule pending updates flush on next animation frame (or after FLUSH_DELAY)
+     */
+    self.scheduleFlush = function() {
+        if( self.flushScheduled ) {
+            return;
+        }
+        self.flushScheduled = true;
+
+        if( $window.requestAnimationFrame ) {
+            $window.requestAnimationFrame(self.flushUpdates);
+        } else {
+            $timeout(self.flushUpdates, self.FLUSH_DELAY, false);
+        }
+    };
+
+    /**
+     * Apply all pending updates to devices in a single digest
+     */
+    self.flushUpdates = function() {
+        var updates = self.pendingUpdates;
+        self.pendingUpdates = {};
+        self.flushScheduled = false;
+
+        $rootScope.$applyAsync(function() {
+            for( var uuid in updates ) {
+                var device = self.getDevice(uuid);
+                if( !device ) {
+                    continue;
+                }
+                var params = updates[uuid];
+                for( var i=0; i<self.POWER_UPDATE_FIELDS.length; i++ ) {
+                    var field = self.POWER_UPDATE_FIELDS[i];
+                    if( field in params ) {
+                        device[field] = params[field];
+                    }
+                }
+            }
+        });
+    };
+
+    /**
+     * Catch power update event. Params can be a single update or a batch (list) of updates of device.
+     * Updates are merged until next flush so only latest values are applied
      */
     $rootScope.$on('teleinfo.power.update', function(event, uuid, params) {
-        for( var i=0; i<cleepService.devices.length; i++ ) {   
-            if( cleepService.devices[i].uuid===uuid ) {
-                cleepService.devices[i].lastupdate = params.lastupdate;
-                cleepService.devices[i].power = params.power;
-                cleepService.devices[i].currentmode = params.currentmode;
-                cleepService.devices[i].nextmode = params.nextmode;
-                cleepService.devices[i].heurescreuses = params.heurescreuses;
-                cleepService.devices[i].heurespleines = params.heurespleines;
-                cleepService.devices[i].subscription = params.subscription;
-                break;
-            }   
-        }   
+        var pending = self.pendingUpdates[uuid] || {};
+        var batch = angular.isArray(params) ? params : [params];
+        for( var i=0; i<batch.length; i++ ) {
+            angular.extend(pending, batch[i]);
+        }
+        self.pendingUpdates[uuid] = pending;
+        self.scheduleFlush();
     });
 
 }]);
-
@@ -12,6 +12,10 @@ function($mdDialog, cleepService) {
         self.tabIndex = 'instant';
         self.instantPowerDevice = $scope.device;
         self.powerConsumptionDevice = null;
+        self.power = '---';
+        self.currentMode = null;
+        self.nextMode = null;
+        self.lastUpdate = null;
         self.hasCharts = cleepService.isAppInstalled('charts');
         self.chartInstantPowerOptions = {
             'type': 'line',
@@ -71,18 +75,38 @@ function($mdDialog, cleepService) {
             $mdDialog.cancel();
         };
 
+        /**
+         * Update displayed values from instant power device
+         */
+        self.updateDisplay = function() {
+            var device = self.instantPowerDevice;
+            self.power = device.power ? device.power : '---';
+            self.currentMode = device.currentmode ? self.currentModes[device.currentmode] : null;
+            self.nextMode = device.nextmode ? self.currentModes[device.nextmode] : null;
+            self.lastUpdate = device.lastupdate;
+        };
+
         /**
          * Init controller
          */
         self.$onInit = function()
         {
-            // get teleinfo devices
+            // get power consumption device of same meter (primary meter devices have no meter)
+            var meter = $scope.device.meter || null;
             for( var i=0; i<cleepService.devices.length; i++ ) {
-                if( cleepService.devices[i].type==='teleinfopowerconsumption' ) {
+                if( cleepService.devices[i].type==='teleinfopowerconsumption' && (cleepService.devices[i].meter || null)===meter ) {
                     self.powerConsumptionDevice = cleepService.devices[i];
                     break;
                 }
             }
+
+            // displayed values are computed once per device update
+            $scope.$watchGroup([
+                'widgetCtl.instantPowerDevice.lastupdate',
+                'widgetCtl.instantPowerDevice.power',
+                'widgetCtl.instantPowerDevice.currentmode',
+                'widgetCtl.instantPowerDevice.nextmode',
+            ], self.updateDisplay);
         };
 
     }];
@@ -5,23 +5,76 @@ sys.path.append('../')
 from backend import cteleinfo
 from backend.teleinfoconsumptionupdateevent import TeleinfoConsumptionUpdateEvent
 from backend.teleinfopowerupdateevent import TeleinfoPowerUpdateEvent
+from backend.teleinfooverloadevent import TeleinfoOverloadEvent
+from backend.teleinforeader import TeleinfoReader
+from backend.teleinfodecoder import TeleinfoDecoder, MODE_HISTORIC, MODE_STANDARD
+from backend.teleinfoasyncingestion import TeleinfoAsyncIngestion
+from backend.teleinfoexport import TeleinfoExport
+from backend.teleinfosnapshot import TeleinfoSnapshot
+from backend.teleinfoframe import TeleinfoFrame
+from backend.teleinfocapture import TeleinfoCaptureWriter
+from backend.teleinforeplay import TeleinfoReplay
 from cleep.exception import InvalidParameter, MissingParameter, CommandError, Unauthorized
 from cleep.libs.tests import session
 import os, io
+import base64
 import time
-from mock import Mock
+import socket
+import shutil
+import tempfile
+import json
+import threading
+import grp
+import stat
+from mock import Mock, patch
+from serial import Serial
 
+STORE_PATH = os.path.join(tempfile.gettempdir(), 'teleinfo_tests_store')
 
+def tearDownModule():
+    shutil.rmtree(STORE_PATH, ignore_errors=True)
 
-class MockedParser():
-    def __init__(self, get_frame_output):
-        self.get_frame_output = get_frame_output
 
-    def set_get_frame_output(self, get_frame_output):
-        self.get_frame_output = get_frame_output
 
-    def get_frame(self, *args, **kwargs):
-        return self.get_frame_output
+class MockedSerial():
+    """
+    Serial port that returns encoded specified frame each time it is read
+    """
+    BAUDRATES = {
+        MODE_HISTORIC: 1200,
+        MODE_STANDARD: 9600,
+    }
+
+    def __init__(self, frame, mode=MODE_HISTORIC):
+        self.baudrate = 1200
+        self.in_waiting = 0
+        self.set_frame(frame, mode)
+
+    def set_frame(self, frame, mode=MODE_HISTORIC):
+        self.mode = mode
+        self.data = TeleinfoDecoder.encode_frame(frame, mode) if frame else b''
+
+    def read(self, size=1):
+        # nothing valid is received with bad baudrate
+        if self.baudrate != self.BAUDRATES[self.mode]:
+            return b''
+        return self.data
+
+    def reset_input_buffer(self):
+        pass
+
+    def close(self):
+        pass
+
+class MockedTeleinfoReader(TeleinfoReader):
+    """
+    Teleinfo reader that does not run thread. Frames are read on demand calling read_once
+    """
+    def start(self):
+        self.read_once()
+
+    def wait_frame(self, timeout=None):
+        return self.frame is not None
 
 
 
@@ -38,8 +91,9 @@ class TestTeleinfoConfigureHardware(unittest.TestCase):
         self.session = session.TestSession(self)
 
         self.path = os.path.join(os.getcwd(), 'DUMMY_DONGLE_TINFO_USB')
-        cteleinfo.Parser = Mock(return_value=MockedParser(self.DATA))
-        cteleinfo.UTInfo2 = Mock()
+        cteleinfo.Serial = Mock(return_value=MockedSerial(self.DATA))
+        cteleinfo.TeleinfoReader = MockedTeleinfoReader
+        shutil.rmtree(STORE_PATH, ignore_errors=True)
 
     def tearDown(self):
         self.session.clean()
@@ -47,10 +101,13 @@ class TestTeleinfoConfigureHardware(unittest.TestCase):
     def init(self, mock_teleinfo_task=Mock()):
         Teleinfo_ = self.session.clone_class(cteleinfo.Cteleinfo)
         Teleinfo_.USB_PATH = os.path.abspath('./') + '/'
+        Teleinfo_.PROBE_TIMEOUT = 0.1
+        Teleinfo_.STORE_PATH = STORE_PATH
         if mock_teleinfo_task:
             Teleinfo_._teleinfo_task = mock_teleinfo_task
         self.module = self.session.setup(Teleinfo_)
         self.session.start_module(self.module)
+        self.module.startup_thread.join()
 
     def test_configure_hardware_dongle_found(self):
         try:
@@ -60,8 +117,39 @@ class TestTeleinfoConfigureHardware(unittest.TestCase):
         
             self.assertNotEqual(self.module._get_config_field('port'), None)
             self.assertIsNotNone(self.module.teleinfo_task)
+            self.assertIsNotNone(self.module.primary_meter.reader)
+
+        finally:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def test_configure_does_not_wait_hardware(self):
+        connected = threading.Event()
+        try:
+            with io.open(self.path, 'w') as f:
+                f.write(u'')
+            Teleinfo_ = self.session.clone_class(cteleinfo.Cteleinfo)
+            Teleinfo_.USB_PATH = os.path.abspath('./') + '/'
+            Teleinfo_.STORE_PATH = STORE_PATH
+            Teleinfo_._teleinfo_task = Mock()
+            configure_hardware = Teleinfo_._configure_hardware
+            def slow_configure_hardware(module, meter):
+                connected.wait(5.0)
+                return configure_hardware(module, meter)
+            Teleinfo_._configure_hardware = slow_configure_hardware
+            self.module = self.session.setup(Teleinfo_)
+
+            self.session.start_module(self.module)
+
+            self.assertIsNone(self.module.primary_meter.reader)
+            self.assertTrue(self.module.startup_thread.is_alive())
+            connected.set()
+            self.module.startup_thread.join()
+            self.assertIsNotNone(self.module.primary_meter.reader)
+            self.assertIsNotNone(self.module.teleinfo_task)
 
         finally:
+            connected.set()
             if os.path.exists(self.path):
                 os.remove(self.path)
 
@@ -70,21 +158,135 @@ class TestTeleinfoConfigureHardware(unittest.TestCase):
         
         self.assertEqual(self.module._get_config_field('port'), None)
         self.assertIsNotNone(self.module.teleinfo_task)
-        self.assertEqual(self.module._get_teleinfo_raw_data(), {})
+        self.assertIsNone(self.module.primary_meter.reader)
+        self.assertEqual(self.module._get_teleinfo_raw_data(self.module.primary_meter), {})
+
+    def test_configure_hardware_probe_historic_mode(self):
+        try:
+            with io.open(self.path, 'w') as f:
+                f.write(u'')
+            self.init()
+
+            self.assertEqual(self.module._get_config_field('mode'), MODE_HISTORIC)
+            self.assertEqual(self.module._get_config_field('baudrate'), 1200)
+
+        finally:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def test_configure_hardware_probe_standard_mode(self):
+        try:
+            with io.open(self.path, 'w') as f:
+                f.write(u'')
+            cteleinfo.Serial = Mock(return_value=MockedSerial(self.DATA, MODE_STANDARD))
+            self.init()
+
+            self.assertEqual(self.module._get_config_field('mode'), MODE_STANDARD)
+            self.assertEqual(self.module._get_config_field('baudrate'), 9600)
+            self.assertEqual(self.module._get_teleinfo_raw_data(self.module.primary_meter), self.DATA)
+
+        finally:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def test_configure_hardware_probe_no_frame(self):
+        try:
+            with io.open(self.path, 'w') as f:
+                f.write(u'')
+            serial = MockedSerial({})
+            cteleinfo.Serial = Mock(return_value=serial)
+            self.init()
+
+            self.assertIsNone(self.module._get_config_field('mode'))
+            self.assertEqual(serial.baudrate, 1200)
+            self.assertIsNotNone(self.module.primary_meter.reader)
+
+        finally:
+            if os.path.exists(self.path):
+                os.remove(self.path)
 
     def test_configure_hardware_exception(self):
         try:
             with io.open(self.path, 'w') as f:
                 f.write(u'')
-            cteleinfo.Parser.side_effect = Exception('test')
+            cteleinfo.Serial.side_effect = Exception('test')
+            self.init()
+
+            self.assertFalse(self.module._configure_hardware(self.module.primary_meter))
+
+        finally:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def test_configure_hardware_probe_exception(self):
+        try:
+            with io.open(self.path, 'w') as f:
+                f.write(u'')
+            serial = MockedSerial(self.DATA)
+            serial.reset_input_buffer = Mock(side_effect=Exception('test'))
+            serial.close = Mock()
+            cteleinfo.Serial = Mock(return_value=serial)
+            self.init()
+
+            # meter is reconnected later and teleinfo task is started anyway
+            serial.close.assert_called_once()
+            self.assertIsNone(self.module.primary_meter.serial)
+            self.assertIsNone(self.module.primary_meter.reader)
+            self.assertEqual(self.module.primary_meter.reconnect_attempts, 1)
+            self.assertIsNotNone(self.module.teleinfo_task)
+
+        finally:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def test_startup_ingestion_exception(self):
+        try:
+            with io.open(self.path, 'w') as f:
+                f.write(u'')
+            cteleinfo.TeleinfoReader = Mock(side_effect=Exception('test'))
             self.init()
 
-            self.assertFalse(self.module._configure_hardware())
+            self.assertIsNone(self.module.primary_meter.serial)
+            self.assertIsNone(self.module.primary_meter.reader)
+            self.assertEqual(self.module.primary_meter.reconnect_attempts, 1)
+            self.assertIsNotNone(self.module.teleinfo_task)
 
         finally:
             if os.path.exists(self.path):
                 os.remove(self.path)
 
+    def test_configure_hardware_replay(self):
+        directory = tempfile.mkdtemp()
+        replay = None
+        try:
+            path = os.path.join(directory, 'capture.tic')
+            writer = TeleinfoCaptureWriter(path, 1200)
+            writer.open(1000.0)
+            for position in range(5):
+                writer.write(TeleinfoDecoder.encode_frame(self.DATA), 1000.0 + position)
+            writer.close()
+            replay = TeleinfoReplay(path, logging.getLogger('TestTeleinfoReplay'), os.path.abspath('./'), 1000.0, True)
+            replay.open()
+            replay.start()
+            cteleinfo.Serial = Serial
+            cteleinfo.TeleinfoReader = TeleinfoReader
+            self.init()
+
+            # replayed capture is read as a real dongle
+            meter = self.module.primary_meter
+            self.assertEqual(meter.port, replay.link)
+            self.assertEqual(meter.mode, MODE_HISTORIC)
+            self.assertIsNotNone(self.module.teleinfo_task)
+            self.assertTrue(meter.reader.wait_frame(2.0))
+            self.assertEqual(self.module._get_teleinfo_raw_data(meter), self.DATA)
+
+        finally:
+            if replay:
+                replay.stop()
+                replay.join(1.0)
+                replay.close()
+            shutil.rmtree(directory)
+
     def test_teleinfo_task_with_dongle(self):
         # execute test here because dongle is needed
         try:
@@ -93,9 +295,9 @@ class TestTeleinfoConfigureHardware(unittest.TestCase):
             self.init(None)
 
             self.module._teleinfo_task()
-            logging.debug('RAW=%s' % self.module.last_raw)
-            self.assertEqual(len(self.module.last_raw), len(self.DATA))
-            self.assertEqual(list(self.module.last_raw.keys())[0], list(self.DATA.keys())[0])
+            logging.debug('RAW=%s' % self.module.primary_meter.last_raw)
+            self.assertEqual(len(self.module.primary_meter.last_raw), len(self.DATA))
+            self.assertEqual(list(self.module.primary_meter.last_raw.keys())[0], list(self.DATA.keys())[0])
 
         finally:
             if os.path.exists(self.path):
@@ -111,9 +313,9 @@ class TestTeleinfoConfigureHardware(unittest.TestCase):
             self.module._get_teleinfo_raw_data = Mock(return_value={})
 
             self.module._teleinfo_task()
-            logging.debug('RAW=%s' % self.module.last_raw)
+            logging.debug('RAW=%s' % self.module.primary_meter.last_raw)
             # should return last valid raw data (read during startup)
-            self.assertEqual(self.module.last_raw, self.DATA)
+            self.assertEqual(self.module.primary_meter.last_raw, self.DATA)
 
         finally:
             if os.path.exists(self.path):
@@ -122,8 +324,8 @@ class TestTeleinfoConfigureHardware(unittest.TestCase):
     def test_teleinfo_task_without_dongle(self):
         self.init(None)
         self.module._teleinfo_task()
-        logging.debug('RAW=%s' % self.module.last_raw)
-        self.assertEqual(len(self.module.last_raw), 0)
+        logging.debug('RAW=%s' % self.module.primary_meter.last_raw)
+        self.assertEqual(len(self.module.primary_meter.last_raw), 0)
 
 
 
@@ -136,8 +338,8 @@ class TestTeleinfoConfigureDevices(unittest.TestCase):
         self.session = session.TestSession(self)
 
         self.path = os.path.join(os.getcwd(), 'DUMMY_DONGLE_TINFO_USB')
-        cteleinfo.Parser = Mock()
-        cteleinfo.UTInfo2 = Mock()
+        cteleinfo.Serial = Mock(return_value=MockedSerial({}))
+        cteleinfo.TeleinfoReader = MockedTeleinfoReader
 
     def tearDown(self):
         self.session.clean()
@@ -145,9 +347,12 @@ class TestTeleinfoConfigureDevices(unittest.TestCase):
     def init(self):
         Teleinfo_ = self.session.clone_class(cteleinfo.Cteleinfo)
         Teleinfo_.USB_PATH = os.path.abspath('./') + '/'
+        Teleinfo_.PROBE_TIMEOUT = 0.1
+        Teleinfo_.STORE_PATH = STORE_PATH
         Teleinfo_._teleinfo_task = Mock()
         self.module = self.session.setup(Teleinfo_)
         self.session.start_module(self.module)
+        self.module.startup_thread.join()
 
     """
     def test_configure_devices_with_existing_config(self):
@@ -192,16 +397,20 @@ class TestTeleinfo(unittest.TestCase):
         logging.basicConfig(level=logging.CRITICAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
         self.session = session.TestSession(self)
 
-        cteleinfo.UTInfo2 = Mock()
-        cteleinfo.Parser = Mock(return_value=MockedParser(self.DATA))
+        cteleinfo.TeleinfoReader = MockedTeleinfoReader
+        cteleinfo.Serial = Mock(return_value=MockedSerial(self.DATA))
         self.path = os.path.join(os.getcwd(), 'DUMMY_DONGLE_TINFO_USB')
         with io.open(self.path, 'w') as f:
             f.write(u'')
+        shutil.rmtree(STORE_PATH, ignore_errors=True)
         Teleinfo_ = self.session.clone_class(cteleinfo.Cteleinfo)
         Teleinfo_.USB_PATH = os.path.abspath('./') + '/'
+        Teleinfo_.PROBE_TIMEOUT = 0.1
+        Teleinfo_.STORE_PATH = STORE_PATH
         Teleinfo_._teleinfo_task = Mock()
         self.module = self.session.setup(Teleinfo_)
         self.session.start_module(self.module)
+        self.module.startup_thread.join()
 
     def tearDown(self):
         self.session.clean()
@@ -211,13 +420,743 @@ class TestTeleinfo(unittest.TestCase):
         self.module._stop_teleinfo_task()
         self.assertIsNone(self.module.teleinfo_task)
 
+    def test_stop_teleinfo_reader(self):
+        self.assertIsNotNone(self.module.primary_meter.reader)
+        self.module._stop_meter_ingestion(self.module.primary_meter)
+        self.assertIsNone(self.module.primary_meter.reader)
+
+    def test_stop_teleinfo_reader_clears_processed_frame(self):
+        self.assertIsNotNone(self.module.primary_meter.processed)
+        self.module._stop_meter_ingestion(self.module.primary_meter)
+        self.assertIsNone(self.module.primary_meter.processed)
+
+    def test_stop(self):
+        reader = self.module.primary_meter.reader
+        self.module._stop()
+        self.assertFalse(reader.running)
+        self.assertIsNone(self.module.teleinfo_task)
+        self.assertIsNone(self.module.persistence_task)
+        self.assertIsNone(self.module.primary_meter.reader)
+        self.assertIsNone(self.module.primary_meter.store)
+        self.assertIsNone(self.module.streamer)
+
     def test_restart_teleinfo_task(self):
         id_task = id(self.module.teleinfo_task)
         self.module._restart_teleinfo_task()
         self.assertNotEqual(id_task, id(self.module.teleinfo_task))
 
+    def test_set_ingestion_mode_asyncio(self):
+        async_ingestion = Mock()
+        cteleinfo.TeleinfoAsyncIngestion = Mock(return_value=async_ingestion)
+        try:
+            self.module.set_ingestion_mode('asyncio')
+
+            self.assertEqual(self.module._get_config_field('ingestionmode'), 'asyncio')
+            self.assertIsNone(self.module.teleinfo_task)
+            self.assertEqual(self.module.async_ingestion, async_ingestion)
+            self.assertTrue(async_ingestion.start.called)
+            self.assertEqual(async_ingestion.add_meter.call_args[0][0], self.module.PRIMARY_METER)
+            # reader is created but not started (fed by event loop)
+            self.assertIsNotNone(self.module.primary_meter.reader)
+            self.assertEqual(async_ingestion.add_meter.call_args[0][2], self.module.primary_meter.reader)
+            # frames decoded by event loop are returned by module
+            self.module.primary_meter.reader.feed(TeleinfoDecoder.encode_frame(self.DATA, MODE_HISTORIC) * 2)
+            self.assertEqual(self.module._get_teleinfo_raw_data(self.module.primary_meter), self.DATA)
+
+            self.module.set_ingestion_mode('thread')
+
+            self.assertEqual(self.module._get_config_field('ingestionmode'), 'thread')
+            self.assertTrue(async_ingestion.stop.called)
+            self.assertIsNone(self.module.async_ingestion)
+            self.assertIsNotNone(self.module.primary_meter.reader)
+            self.assertIsNotNone(self.module.teleinfo_task)
+        finally:
+            cteleinfo.TeleinfoAsyncIngestion = TeleinfoAsyncIngestion
+
+    def test_set_ingestion_mode_waits_hardware_lock(self):
+        async_ingestion = Mock()
+        cteleinfo.TeleinfoAsyncIngestion = Mock(return_value=async_ingestion)
+        try:
+            # meters are being connected
+            with self.module._Cteleinfo__hardware_lock:
+                thread = threading.Thread(target=self.module.set_ingestion_mode, args=('asyncio',))
+                thread.start()
+                thread.join(0.2)
+                self.assertTrue(thread.is_alive())
+                self.assertIsNotNone(self.module.teleinfo_task)
+                self.assertIsNone(self.module.async_ingestion)
+
+            thread.join(2.0)
+            self.assertIsNone(self.module.teleinfo_task)
+            self.assertEqual(self.module.async_ingestion, async_ingestion)
+        finally:
+            cteleinfo.TeleinfoAsyncIngestion = TeleinfoAsyncIngestion
+
+    def test_set_ingestion_mode_waits_teleinfo_task(self):
+        async_ingestion = Mock()
+        cteleinfo.TeleinfoAsyncIngestion = Mock(return_value=async_ingestion)
+        try:
+            # teleinfo task is running
+            with self.module._Cteleinfo__teleinfo_task_lock:
+                thread = threading.Thread(target=self.module.set_ingestion_mode, args=('asyncio',))
+                thread.start()
+                thread.join(0.2)
+                self.assertTrue(thread.is_alive())
+                self.assertFalse(cteleinfo.TeleinfoAsyncIngestion.called)
+
+            thread.join(2.0)
+            self.assertEqual(self.module.async_ingestion, async_ingestion)
+        finally:
+            cteleinfo.TeleinfoAsyncIngestion = TeleinfoAsyncIngestion
+
+    def test_teleinfo_task_skipped_in_asyncio_mode(self):
+        self.module._update_meter = Mock()
+        self.module._set_config_field('ingestionmode', 'asyncio')
+
+        cteleinfo.Cteleinfo._teleinfo_task(self.module)
+
+        self.assertFalse(self.module._update_meter.called)
+
+    def test_set_ingestion_mode_invalid_parameters(self):
+        with self.assertRaises(MissingParameter) as cm:
+            self.module.set_ingestion_mode(None)
+        self.assertEqual(str(cm.exception), 'Parameter "mode" is missing')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_ingestion_mode('dummy')
+        self.assertEqual(str(cm.exception), 'Parameter "mode" must be "thread" or "asyncio"')
+
+    def test_process_async_frame(self):
+        params = self.module._process_async_frame('main', self.DATA)
+
+        self.assertEqual(params['power'], int(self.DATA['PAPP']))
+        self.assertEqual(self.module.primary_meter.last_raw, self.DATA)
+        # device is updated according to power event policy
+        self.assertIsNone(self.module._process_async_frame('main', self.DATA))
+        self.assertEqual(self.module.get_power_event_policy()['suppressed'], 1)
+
+    def test_async_stages(self):
+        params = self.module._process_async_frame('main', self.DATA)
+
+        self.module._async_update_device('main', params)
+        self.module._async_send_event('main', params)
+
+        self.assertEqual(self.session.event_call_count('teleinfo.power.update'), 1)
+        # device is persisted by write-behind cache
+        self.module.write_behind.flush()
+        self.assertEqual(self.module._get_devices()[self.module.primary_meter.instant_power_device_uuid]['power'], params['power'])
+
+    def test_on_teleinfo_frame_appends_history(self):
+        self.module.primary_meter.history.clear()
+
+        params = self.module._on_teleinfo_frame(self.module.primary_meter, self.DATA)
+
+        history = self.module.get_power_history(resolution=60)
+        self.assertEqual(len(history), 1)
+        self.assertEqual(history[0]['power'], params['power'])
+        self.assertEqual(history[0]['heurescreuses'], int(self.DATA['HCHC']))
+        self.assertEqual(history[0]['heurespleines'], int(self.DATA['HCHP']))
+
+    def test_on_teleinfo_frame_no_power(self):
+        self.module.primary_meter.history.clear()
+
+        self.assertIsNone(self.module._on_teleinfo_frame(self.module.primary_meter, {'ADCO': '041529016009'}))
+        self.assertEqual(self.module.get_power_history(), [])
+
+    def test_get_power_history(self):
+        self.module.primary_meter.history.clear()
+        now = int(time.time())
+        for i in range(10):
+            self.module.primary_meter.history.append(now - 9 + i, 100 * i, 0, 0)
+
+        self.assertEqual(len(self.module.get_power_history()), 10)
+        self.assertEqual(len(self.module.get_power_history(start=now - 4, end=now)), 5)
+        history = self.module.get_power_history(start=now - 9, end=now, resolution=3600)
+        self.assertEqual(len(history), 1 if (now - 9) // 3600 == now // 3600 else 2)
+
+    def test_get_power_history_invalid_parameters(self):
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.get_power_history(start='dummy')
+        self.assertEqual(str(cm.exception), 'Parameter "start" must be a timestamp')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.get_power_history(end='dummy')
+        self.assertEqual(str(cm.exception), 'Parameter "end" must be a timestamp')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.get_power_history(start=2000, end=1000)
+        self.assertEqual(str(cm.exception), 'Parameter "start" must be lower than "end"')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.get_power_history(resolution=0)
+        self.assertEqual(str(cm.exception), 'Parameter "resolution" must be a positive number of seconds')
+
+    def test_on_teleinfo_frame_persists_sample(self):
+        params = self.module._on_teleinfo_frame(self.module.primary_meter, self.DATA)
+
+        history = self.module.get_meter_history()
+        self.assertEqual(len(history), 1)
+        self.assertEqual(history[0]['power'], params['power'])
+        self.assertEqual(history[0]['indexes'][:3], [int(self.DATA['HCHC']), int(self.DATA['HCHP']), 0])
+
+    def test_get_meter_history_no_store(self):
+        self.module._close_store(self.module.primary_meter)
+
+        self.assertEqual(self.module.get_meter_history(), [])
+
+    def test_get_meter_history_invalid_parameters(self):
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.get_meter_history(start=2000, end=1000)
+        self.assertEqual(str(cm.exception), 'Parameter "start" must be lower than "end"')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.get_meter_history(resolution=0)
+        self.assertEqual(str(cm.exception), 'Parameter "resolution" must be a positive number of seconds')
+
+    def test_on_teleinfo_frame_updates_rollups(self):
+        self.module._on_teleinfo_frame(self.module.primary_meter, self.DATA)
+        data = dict(self.DATA, HCHC='%09d' % (int(self.DATA['HCHC']) + 10))
+        self.module._on_teleinfo_frame(self.module.primary_meter, data)
+
+        consumption = self.module.get_consumption('hour')
+        self.assertEqual(len(consumption), 1)
+        self.assertEqual(consumption[0]['consumption'], [10, 0])
+        self.assertEqual(self.module.get_consumption('month')[0]['total'], 10)
+
+    def test_stop_saves_state(self):
+        self.module._update_meter(self.module.primary_meter)
+
+        self.module._stop()
+
+        with open(os.path.join(STORE_PATH, 'state.json')) as fd:
+            state = json.load(fd)
+        self.assertEqual(state['meters']['main']['frame'], self.DATA)
+        self.assertEqual(state['meters']['main']['sequence'], self.module.primary_meter.snapshot.sequence)
+        self.assertEqual(state['meters']['main']['heurescreuses'], int(self.DATA['HCHC']))
+        self.assertEqual(state['meters']['main']['indexes'], [int(self.DATA['HCHC']), int(self.DATA['HCHP'])])
+
+    def test_load_state(self):
+        self.module._update_meter(self.module.primary_meter)
+        self.module._save_state()
+        meter = self.module.primary_meter
+        meter.snapshot = TeleinfoSnapshot()
+        meter.last_conso_heures_creuses = 0
+
+        self.module._load_state()
+
+        self.assertEqual(meter.last_raw, self.DATA)
+        self.assertEqual(meter.last_conso_heures_creuses, int(self.DATA['HCHC']))
+        self.assertEqual(len(self.module.get_teleinfo()), len(self.DATA))
+        self.assertTrue(all([item['stale'] for item in self.module.get_teleinfo()]))
+        self.assertTrue(self.module.get_teleinfo(since=0)['stale'])
+        self.assertTrue(self.module.get_meters()[0]['stale'])
+
+        # live frame received
+        self.module._update_meter(meter)
+        self.assertFalse(any(['stale' in item for item in self.module.get_teleinfo()]))
+        self.assertFalse(self.module.get_teleinfo(since=0)['stale'])
+        self.assertFalse(self.module.get_meters()[0]['stale'])
+
+    def test_load_invalid_state(self):
+        with open(os.path.join(STORE_PATH, 'state.json'), 'w') as fd:
+            json.dump({'meters': {'main': {'frame': self.DATA}}}, fd)
+        meter = self.module.primary_meter
+        meter.snapshot = TeleinfoSnapshot()
+
+        self.module._load_state()
+        self.assertEqual(meter.last_raw, {})
+
+        with open(os.path.join(STORE_PATH, 'state.json'), 'w') as fd:
+            fd.write('dummy')
+        self.module._load_state()
+        self.assertEqual(meter.last_raw, {})
+
+    def test_stop_saves_rollups(self):
+        self.module._on_teleinfo_frame(self.module.primary_meter, self.DATA)
+
+        self.module._stop()
+
+        self.assertTrue(os.path.exists(os.path.join(STORE_PATH, 'rollups.json')))
+
+    def test_get_consumption_invalid_parameters(self):
+        with self.assertRaises(MissingParameter) as cm:
+            self.module.get_consumption(None)
+        self.assertEqual(str(cm.exception), 'Parameter "period" is missing')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.get_consumption('year')
+        self.assertEqual(str(cm.exception), 'Parameter "period" must be "hour", "day", "week", "month"')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.get_consumption('day', start=2000, end=1000)
+        self.assertEqual(str(cm.exception), 'Parameter "start" must be lower than "end"')
+
+    def test_get_power_stats(self):
+        self.module.primary_meter.power_stats.reset()
+        self.module._on_teleinfo_frame(self.module.primary_meter, self.DATA)
+        self.module._on_teleinfo_frame(self.module.primary_meter, dict(self.DATA, PAPP='01620'))
+
+        stats = self.module.get_power_stats('1m')
+
+        self.assertEqual(stats['window'], '1m')
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(stats['min'], 620)
+        self.assertEqual(stats['max'], 1620)
+        self.assertEqual(stats['mean'], 1120.0)
+        self.assertEqual(self.module.get_power_stats('1d', meter='main')['count'], 2)
+
+    def test_get_power_stats_invalid_parameters(self):
+        with self.assertRaises(MissingParameter) as cm:
+            self.module.get_power_stats(None)
+        self.assertEqual(str(cm.exception), 'Parameter "window" is missing')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.get_power_stats('1y')
+        self.assertEqual(str(cm.exception), 'Parameter "window" must be "1m", "15m", "1h", "1d"')
+
+    def test_export_history_samples(self):
+        meter = self.module.primary_meter
+        self.module._get_profile(meter, self.DATA)
+        now = int(time.time())
+        for index in range(5):
+            meter.store.append(now + 1000 + index, 600 + index, [1000 + index, 2000])
+
+        cursor = None
+        lines = []
+        with patch.object(TeleinfoExport, 'CHUNK_ROWS', 2):
+            while True:
+                chunk = self.module.export_history(start=now + 1000, end=now + 2000, cursor=cursor)
+                lines.extend(chunk['data'].splitlines())
+                cursor = chunk['cursor']
+                if cursor is None:
+                    break
+
+        self.assertEqual(lines[0], 'timestamp,power,HC,HP')
+        self.assertEqual(lines[1], '%d,600,1000,2000' % (now + 1000))
+        self.assertEqual(len(lines), 6)
+
+    def test_export_history_binary_rollups(self):
+        meter = self.module.primary_meter
+        self.module._on_teleinfo_frame(meter, self.DATA)
+        self.module._on_teleinfo_frame(meter, dict(self.DATA, HCHC='%09d' % (int(self.DATA['HCHC']) + 10)))
+
+        chunk = self.module.export_history(data='day', export_format='binary')
+
+        self.assertIsNone(chunk['cursor'])
+        columns, rows = TeleinfoExport.decode(base64.b64decode(chunk['data']))
+        self.assertEqual(columns, ['timestamp', 'HC', 'HP'])
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][1:], (10, 0))
+
+    def test_export_history_invalid_parameters(self):
+        with self.assertRaises(MissingParameter) as cm:
+            self.module.export_history(data=None)
+        self.assertEqual(str(cm.exception), 'Parameter "data" is missing')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.export_history(data='year')
+        self.assertEqual(str(cm.exception), 'Parameter "data" must be "samples", "hour", "day", "week", "month"')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.export_history(export_format='json')
+        self.assertEqual(str(cm.exception), 'Parameter "export_format" must be "csv", "binary"')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.export_history(cursor='dummy')
+        self.assertEqual(str(cm.exception), 'Parameter "cursor" is invalid')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.export_history(start=2000, end=1000)
+        self.assertEqual(str(cm.exception), 'Parameter "start" must be lower than "end"')
+
+    def test_get_cost_no_consumption(self):
+        cost = self.module.get_cost('hour')
+
+        self.assertEqual(cost['consumption'], 0)
+        self.assertEqual(cost['cost'], 0.0)
+        self.assertEqual(cost['registers'], [])
+
+    def test_get_cost_invalid_parameters(self):
+        with self.assertRaises(MissingParameter) as cm:
+            self.module.get_cost(None)
+        self.assertEqual(str(cm.exception), 'Parameter "period" is missing')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.get_cost('year')
+        self.assertEqual(str(cm.exception), 'Parameter "period" must be "hour", "day", "week", "month"')
+
+    def test_set_prices_invalid_parameters(self):
+        with self.assertRaises(MissingParameter) as cm:
+            self.module.set_prices(None)
+        self.assertEqual(str(cm.exception), 'Parameter "prices" is missing')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_prices({'HC': -1})
+        self.assertEqual(str(cm.exception), 'Parameter "prices" must be a dict of positive prices per tariff register')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_prices([0.1])
+        self.assertEqual(str(cm.exception), 'Parameter "prices" must be a dict of positive prices per tariff register')
+
+    def test_teleinfo_task_event_policy(self):
+        self.module.primary_meter.event_policy.reset()
+
+        self.module.primary_meter.reader.read_once()
+        cteleinfo.Cteleinfo._teleinfo_task(self.module)
+        self.module.primary_meter.reader.read_once()
+        cteleinfo.Cteleinfo._teleinfo_task(self.module)
+        # no new frame, policy is not checked again
+        cteleinfo.Cteleinfo._teleinfo_task(self.module)
+
+        self.assertEqual(self.session.event_call_count('teleinfo.power.update'), 1)
+        policy = self.module.get_power_event_policy()
+        self.assertEqual(policy['emitted'], 1)
+        self.assertEqual(policy['suppressed'], 1)
+
+    def test_teleinfo_task_does_not_process_frame_again(self):
+        self.module.reset_stats()
+        self.module.primary_meter.event_policy.reset()
+        self.module.primary_meter.reader.read_once()
+
+        cteleinfo.Cteleinfo._teleinfo_task(self.module)
+
+        self.assertEqual(self.module.get_stats()['stages']['process']['count'], 1)
+        self.assertEqual(self.session.event_call_count('teleinfo.power.update'), 1)
+
+    def test_set_power_event_policy(self):
+        self.module.set_power_event_policy(100, 0, 30)
+
+        self.assertEqual(self.module._get_config_field('powereventdeadband'), 100)
+        self.assertEqual(self.module._get_config_field('powereventdeadbandpercent'), 0)
+        self.assertEqual(self.module._get_config_field('powereventheartbeat'), 30)
+        policy = self.module.get_power_event_policy()
+        self.assertEqual(policy['deadband'], 100)
+        self.assertEqual(policy['deadbandpercent'], 0)
+        self.assertEqual(policy['heartbeat'], 30)
+
+    def test_set_power_event_policy_invalid_parameters(self):
+        with self.assertRaises(MissingParameter) as cm:
+            self.module.set_power_event_policy(None, 0, 60)
+        self.assertEqual(str(cm.exception), 'Parameter "deadband" is missing')
+
+        with self.assertRaises(MissingParameter) as cm:
+            self.module.set_power_event_policy(0, None, 60)
+        self.assertEqual(str(cm.exception), 'Parameter "deadband_percent" is missing')
+
+        with self.assertRaises(MissingParameter) as cm:
+            self.module.set_power_event_policy(0, 0, None)
+        self.assertEqual(str(cm.exception), 'Parameter "heartbeat" is missing')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_power_event_policy(-1, 0, 60)
+        self.assertEqual(str(cm.exception), 'Parameter "deadband" must be a positive number of VA')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_power_event_policy(0, 'dummy', 60)
+        self.assertEqual(str(cm.exception), 'Parameter "deadband_percent" must be a positive percentage')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_power_event_policy(0, 0, 0)
+        self.assertEqual(str(cm.exception), 'Parameter "heartbeat" must be greater or equal to 1 seconds')
+
+    def test_on_teleinfo_frame_overload(self):
+        self.module.overload_event = Mock()
+        meter = self.module.primary_meter
+
+        self.module._on_teleinfo_frame(meter, self.DATA)
+        self.module._update_meter(meter)
+        self.assertFalse(self.module.overload_event.send.called)
+
+        # event raised on first frame matching rule, it is sent by teleinfo task
+        self.module._on_teleinfo_frame(meter, dict(self.DATA, IINST='043', ADPS='043'))
+        self.assertFalse(self.module.overload_event.send.called)
+        self.module._update_meter(meter)
+        self.assertEqual(self.module.overload_event.send.call_count, 1)
+        params = self.module.overload_event.send.call_args[1]['params']
+        self.assertEqual(params['meter'], 'main')
+        self.assertTrue(params['overload'])
+        self.assertEqual(params['rules'], ['adps', 'headroom'])
+        self.assertEqual(params['headroom'], 4)
+        self.assertEqual(params['power'], 620)
+        self.assertEqual(self.module.overload_event.send.call_args[1]['device_id'], meter.instant_power_device_uuid)
+        self.assertTrue(self.module.get_meters()[0]['overload']['overload'])
+
+        # no flapping, then cleared
+        for _ in range(3):
+            self.module._on_teleinfo_frame(meter, dict(self.DATA))
+        self.module._update_meter(meter)
+        self.assertEqual(self.module.overload_event.send.call_count, 2)
+        self.assertFalse(self.module.overload_event.send.call_args[1]['params']['overload'])
+
+    def test_process_async_frame_overload(self):
+        self.module.async_ingestion = Mock()
+        meter = self.module.primary_meter
+
+        self.module._process_async_frame('main', dict(self.DATA, ADPS='043'))
+
+        # event is sent by thread pool
+        self.assertEqual(self.module.async_ingestion.execute.call_count, 1)
+        name, function, event_meter, params = self.module.async_ingestion.execute.call_args[0]
+        self.assertEqual(name, 'main')
+        self.assertIs(event_meter, meter)
+        self.assertTrue(params['overload'])
+        self.assertEqual(len(meter.overload_events), 0)
+        self.module.overload_event = Mock()
+        function(event_meter, params)
+        self.assertEqual(self.module.overload_event.send.call_args[1]['params'], params)
+
+    def test_set_overload_rules(self):
+        self.module.set_overload_rules(20, 0, 30)
+
+        self.assertEqual(self.module._get_config_field('overloadheadroom'), 20)
+        self.assertEqual(self.module._get_config_field('overloadramp'), 0)
+        self.assertEqual(self.module._get_config_field('overloadrampwindow'), 30)
+        self.assertEqual(self.module.primary_meter.overload.headroom, 20)
+        rules = self.module.get_overload_rules()
+        self.assertEqual(rules['headroom'], 20)
+        self.assertEqual(rules['ramp'], 0)
+        self.assertEqual(rules['rampwindow'], 30)
+        self.assertEqual(rules['meters']['main']['overload'], False)
+
+    def test_set_overload_rules_invalid_parameters(self):
+        with self.assertRaises(MissingParameter) as cm:
+            self.module.set_overload_rules(None, 0, 10)
+        self.assertEqual(str(cm.exception), 'Parameter "headroom" is missing')
+
+        with self.assertRaises(MissingParameter) as cm:
+            self.module.set_overload_rules(10, None, 10)
+        self.assertEqual(str(cm.exception), 'Parameter "ramp" is missing')
+
+        with self.assertRaises(MissingParameter) as cm:
+            self.module.set_overload_rules(10, 0, None)
+        self.assertEqual(str(cm.exception), 'Parameter "ramp_window" is missing')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_overload_rules(100, 0, 10)
+        self.assertEqual(str(cm.exception), 'Parameter "headroom" must be a percentage lower than 100')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_overload_rules(10, -1, 10)
+        self.assertEqual(str(cm.exception), 'Parameter "ramp" must be a positive number of VA')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_overload_rules(10, 0, 0)
+        self.assertEqual(str(cm.exception), 'Parameter "ramp_window" must be greater or equal to 1 second')
+
+    def test_update_power_device_write_behind(self):
+        self.module._update_device = Mock()
+        self.module.write_behind.update_device_func = self.module._update_device
+        self.module.write_behind.flush()
+        params = self.module._process_raw_data(self.module.primary_meter, self.DATA)
+
+        self.module._update_power_device(self.module.primary_meter, params)
+        self.assertEqual(self.module._update_device.call_count, 1)
+        self.module._update_power_device(self.module.primary_meter, dict(params, power=0))
+        self.assertEqual(self.module._update_device.call_count, 1)
+
+        self.module._stop()
+        self.assertEqual(self.module._update_device.call_count, 2)
+        self.assertEqual(self.module._update_device.call_args[0][1]['power'], 0)
+
+    def test_persistence_task_flushes_write_behind(self):
+        self.assertIsNotNone(self.module.persistence_task)
+        self.module.write_behind.update_device(self.module.primary_meter.instant_power_device_uuid, {'power': 1})
+        self.module._persistence_task()
+        self.assertTrue(self.module.write_behind.has_pending())
+
+        # write interval ran out without any new change
+        self.module.write_behind.interval = 0
+        self.module._persistence_task()
+
+        self.assertFalse(self.module.write_behind.has_pending())
+        self.assertEqual(self.module._get_devices()[self.module.primary_meter.instant_power_device_uuid]['power'], 1)
+
+    def test_persistence_task_checkpoints_rollups(self):
+        rollups = self.module.primary_meter.rollups
+        rollups.CHECKPOINT_INTERVAL = 0
+        self.module._on_teleinfo_frame(self.module.primary_meter, self.DATA)
+        self.module._on_teleinfo_frame(self.module.primary_meter, dict(self.DATA, HCHC='000643093'))
+        self.assertFalse(os.path.exists(rollups.path))
+
+        self.module._persistence_task()
+
+        self.assertTrue(os.path.exists(rollups.path))
+
+    def test_set_write_interval(self):
+        self.module.set_write_interval(60)
+
+        self.assertEqual(self.module._get_config_field('writeinterval'), 60)
+        self.assertEqual(self.module.write_behind.interval, 60)
+
+    def test_set_write_interval_invalid_parameters(self):
+        with self.assertRaises(MissingParameter) as cm:
+            self.module.set_write_interval(None)
+        self.assertEqual(str(cm.exception), 'Parameter "interval" is missing')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_write_interval(-1)
+        self.assertEqual(str(cm.exception), 'Parameter "interval" must be a positive number of seconds')
+
+    def test_process_raw_data_profile(self):
+        self.module._process_raw_data(self.module.primary_meter, self.DATA)
+        profile = self.module._get_profile(self.module.primary_meter, self.DATA)
+
+        self.module._process_raw_data(self.module.primary_meter, self.DATA)
+        self.assertIs(self.module._get_profile(self.module.primary_meter, self.DATA), profile)
+        self.assertEqual(profile.consumption, 'HCHP')
+
+        # tariff option changed
+        data = {'OPTARIF': 'BASE', 'BASE': '000001000', 'IINST': '001'}
+        params = self.module._process_raw_data(self.module.primary_meter, data)
+        self.assertEqual(self.module._get_profile(self.module.primary_meter, data).consumption, 'BASE')
+        self.assertEqual(params['heurescreuses'], 1000)
+        self.assertEqual(params['heurespleines'], 0)
+
+    def test_process_raw_data_frame_layout_changed(self):
+        self.module._process_raw_data(self.module.primary_meter, self.DATA)
+
+        data = dict(self.DATA)
+        del data['IINST']
+        del data['PAPP']
+        data.update({'IINST1': '001', 'IINST2': '002', 'IINST3': '003'})
+        params = self.module._process_raw_data(self.module.primary_meter, data)
+
+        self.assertEqual(params['power'], 6 * self.module.VA_FACTOR)
+
+    def test_process_raw_data_invalid_value(self):
+        self.assertIsNone(self.module._process_raw_data(self.module.primary_meter, dict(self.DATA, IINST='0X1', PAPP='0X1')))
+
+    @patch('backend.cteleinfo.time.monotonic')
+    def test_process_raw_data_index_power(self, monotonic):
+        data = dict(self.DATA)
+        del data['PAPP']
+        self.module.primary_meter.power.reset()
+        monotonic.return_value = 1000.0
+        params = self.module._process_raw_data(self.module.primary_meter, data)
+        self.assertEqual(params['power'], int(self.DATA['IINST']) * self.module.VA_FACTOR)
+
+        for timestamp, index in ((1001.0, 825430), (1003.0, 825432)):
+            monotonic.return_value = timestamp
+            params = self.module._process_raw_data(self.module.primary_meter, dict(data, HCHP='%09d' % index))
+
+        self.assertEqual(params['power'], 3600)
+        self.assertEqual(self.module.get_meters()[0]['powersource'], 'index')
+
+    def test_process_raw_data_tariff_option_changed_resets_power(self):
+        self.module.primary_meter.power.reset = Mock()
+
+        self.module._process_raw_data(self.module.primary_meter, {'OPTARIF': 'BASE', 'BASE': '000001000', 'IINST': '001'})
+
+        self.assertTrue(self.module.primary_meter.power.reset.called)
+
+    def test_capture(self):
+        self.module.CAPTURE_PATH = os.path.join(STORE_PATH, 'captures')
+
+        path = self.module.start_capture()
+        self.module.primary_meter.reader.read_once()
+        infos = self.module.stop_capture()
+
+        self.assertEqual(infos['path'], path)
+        self.assertEqual(infos['chunks'], 1)
+        self.assertEqual(infos['size'], os.path.getsize(path))
+        self.assertIsNone(self.module.primary_meter.reader.capture)
+        self.assertIsNone(self.module.stop_capture())
+
+    def test_start_capture_already_running(self):
+        self.module.CAPTURE_PATH = os.path.join(STORE_PATH, 'captures')
+        self.module.start_capture()
+
+        with self.assertRaises(CommandError) as cm:
+            self.module.start_capture()
+        self.assertEqual(str(cm.exception), 'Capture is already running')
+
+        self.module._stop()
+        self.assertIsNone(self.module.primary_meter.capture)
+
+    def test_start_capture_no_dongle(self):
+        self.module._stop_meter_ingestion(self.module.primary_meter)
+
+        with self.assertRaises(CommandError) as cm:
+            self.module.start_capture()
+        self.assertEqual(str(cm.exception), 'No teleinfo dongle connected')
+
+    def test_get_stats(self):
+        self.module.reset_stats()
+        self.module.primary_meter.reader.read_once()
+        self.module._update_power_device(self.module.primary_meter, self.module._process_raw_data(self.module.primary_meter, self.DATA))
+
+        stats = self.module.get_stats()
+
+        self.assertEqual(stats['stages']['decode']['count'], 1)
+        self.assertEqual(stats['stages']['process']['count'], 1)
+        self.assertEqual(stats['stages']['device']['count'], 1)
+        self.assertEqual(stats['stages']['event']['count'], 1)
+        self.assertEqual(stats['counters']['framesread'], self.module.primary_meter.reader.frames_count)
+        self.assertEqual(stats['counters']['checksumerrors'], 0)
+        self.assertEqual(stats['counters']['queuedepth'], 0)
+        self.assertEqual(stats['counters']['droppeditems'], 0)
+
+    def test_stream_frames(self):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.settimeout(2.0)
+        end = time.time() + 3.0
+        while not os.path.exists(os.path.join(STORE_PATH, 'stream.sock')) and time.time() < end:
+            time.sleep(0.01)
+        client.connect(os.path.join(STORE_PATH, 'stream.sock'))
+        try:
+            while self.module.get_stats()['counters']['streamclients'] == 0 and time.time() < end:
+                time.sleep(0.01)
+
+            self.module._on_teleinfo_frame(self.module.primary_meter, self.DATA)
+
+            line = client.recv(4096)
+            self.assertTrue(line.startswith(b'main\t'))
+            self.assertIn(b'\tPAPP\t00620', line)
+        finally:
+            client.close()
+
+    def test_stream_socket_only_accessible_to_owner(self):
+        path = os.path.join(STORE_PATH, 'stream.sock')
+        end = time.time() + 3.0
+        while not os.path.exists(path) and time.time() < end:
+            time.sleep(0.01)
+
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+
+    def test_set_stream_group(self):
+        group = grp.getgrgid(os.getgid()).gr_name
+        streamer = self.module.streamer
+
+        self.module.set_stream_group(group)
+
+        self.assertEqual(self.module._get_config_field('streamgroup'), group)
+        self.assertFalse(streamer.is_alive())
+        self.assertEqual(self.module.streamer.group, group)
+        self.assertEqual(self.module.streamer.mode, 0o660)
+
+        self.module.set_stream_group(None)
+
+        self.assertIsNone(self.module.streamer.group)
+        self.assertEqual(self.module.streamer.mode, 0o600)
+
+    def test_set_stream_group_invalid_parameters(self):
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_stream_group('teleinfo_unknown_group')
+        self.assertEqual(str(cm.exception), 'Parameter "group" must be an existing group name')
+
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.set_stream_group(1)
+        self.assertEqual(str(cm.exception), 'Parameter "group" must be an existing group name')
+
+    def test_get_stats_no_dongle(self):
+        self.module._stop_meter_ingestion(self.module.primary_meter)
+
+        stats = self.module.get_stats()
+
+        self.assertEqual(stats['counters']['framesread'], 0)
+
     def test_get_teleinfo(self):
-        self.module.last_raw = self.DATA
+        self.module.primary_meter.last_raw = self.DATA
         values = self.module.get_teleinfo()
         self.assertEqual(len(values), len(self.DATA.keys()))
         for value in values:
@@ -228,8 +1167,41 @@ class TestTeleinfo(unittest.TestCase):
         values = self.module.get_teleinfo()
         self.assertEqual(len(values), 0)
 
+    def test_get_teleinfo_since(self):
+        self.module.primary_meter.last_raw = self.DATA
+        sequence = self.module.primary_meter.snapshot.sequence
+        data = dict(self.DATA)
+        data['PAPP'] = '01000'
+        self.module.primary_meter.last_raw = data
+
+        changes = self.module.get_teleinfo(since=sequence)
+
+        self.assertEqual(changes['sequence'], sequence + 1)
+        self.assertFalse(changes['unchanged'])
+        self.assertFalse(changes['full'])
+        self.assertEqual(changes['items'], [{'key': 'PAPP', 'value': '01000'}])
+        self.assertTrue(self.module.get_teleinfo(since=sequence + 1)['unchanged'])
+
+    def test_get_teleinfo_since_unknown_sequence(self):
+        self.module.primary_meter.last_raw = self.DATA
+
+        changes = self.module.get_teleinfo(since=self.module.primary_meter.snapshot.sequence + 10)
+
+        self.assertTrue(changes['full'])
+        self.assertEqual(len(changes['items']), len(self.DATA))
+
+    def test_get_teleinfo_since_invalid_params(self):
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.get_teleinfo(since='dummy')
+        self.assertEqual(str(cm.exception), 'Parameter "since" must be a positive sequence number')
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.get_teleinfo(since=-1)
+        self.assertEqual(str(cm.exception), 'Parameter "since" must be a positive sequence number')
+
     def test_get_teleinfo_raw_data(self):
-        raw = self.module._get_teleinfo_raw_data()
+        # frame is read by reader, not by this function
+        self.module.primary_meter.reader.read_bytes = Mock(side_effect=Exception('Serial port should not be read'))
+        raw = self.module._get_teleinfo_raw_data(self.module.primary_meter)
         logging.debug('RAW=%s' % raw)
         self.assertEqual(len(raw), len(self.DATA))
         for key,value in raw.items():
@@ -241,6 +1213,355 @@ class TestTeleinfo(unittest.TestCase):
 
 
 
+class TestTeleinfoMultipleMeters(unittest.TestCase):
+
+    DATA = {
+        'ADCO': '041529016009',
+        'OPTARIF': 'HC..',
+        'ISOUSC': '45',
+        'HCHC': '000643083',
+        'HCHP': '000825429',
+        'PTEC': 'HP..',
+        'IINST': '003',
+        'IMAX': '029',
+        'PAPP': '00620',
+        'HHPHC': 'A',
+        'MOTDETAT': '000000',
+    }
+    DATA2 = {
+        'ADCO': '041529016010',
+        'OPTARIF': 'BASE',
+        'ISOUSC': '30',
+        'BASE': '001234567',
+        'PTEC': 'TH..',
+        'IINST': '010',
+        'IMAX': '029',
+        'PAPP': '02200',
+        'MOTDETAT': '000000',
+    }
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.session = session.TestSession(self)
+
+        cteleinfo.TeleinfoReader = MockedTeleinfoReader
+        self.serials = {
+            'DUMMY_DONGLE_TINFO_USB': MockedSerial(self.DATA),
+            'DUMMY_DONGLE_TINFO_USB2': MockedSerial(self.DATA2, MODE_STANDARD),
+        }
+        cteleinfo.Serial = Mock(side_effect=lambda port, **kwargs: self.serials[os.path.basename(port)])
+        self.paths = [os.path.join(os.getcwd(), name) for name in self.serials.keys()]
+        for path in self.paths:
+            with io.open(path, 'w') as f:
+                f.write(u'')
+        shutil.rmtree(STORE_PATH, ignore_errors=True)
+        Teleinfo_ = self.session.clone_class(cteleinfo.Cteleinfo)
+        Teleinfo_.USB_PATH = os.path.abspath('./') + '/'
+        Teleinfo_.PROBE_TIMEOUT = 0.1
+        Teleinfo_.STORE_PATH = STORE_PATH
+        self.module = self.session.setup(Teleinfo_)
+        self.session.start_module(self.module)
+        self.module.startup_thread.join()
+        self.meter2 = self.module.meters['DUMMY_DONGLE_TINFO_USB2']
+
+    def tearDown(self):
+        self.session.clean()
+        for path in self.paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_configure_meters(self):
+        self.assertEqual(len(self.module.meters), 2)
+        self.assertTrue(self.module.primary_meter.port.endswith('DUMMY_DONGLE_TINFO_USB'))
+        self.assertEqual(self.module._get_config_field('port'), self.module.primary_meter.port)
+        self.assertIsNotNone(self.meter2.reader)
+        self.assertEqual(self.module._get_config_field('mode'), MODE_HISTORIC)
+        self.assertEqual(self.module._get_config_field('meters')['DUMMY_DONGLE_TINFO_USB2']['mode'], MODE_STANDARD)
+        self.assertEqual(self.module._get_config_field('meters')['DUMMY_DONGLE_TINFO_USB2']['baudrate'], 9600)
+
+    def test_configure_devices(self):
+        devices = self.module._get_devices()
+
+        self.assertEqual(len(devices), 4)
+        self.assertNotEqual(self.module.primary_meter.instant_power_device_uuid, self.meter2.instant_power_device_uuid)
+        self.assertIsNone(devices[self.module.primary_meter.instant_power_device_uuid]['meter'])
+        self.assertEqual(devices[self.meter2.instant_power_device_uuid]['meter'], 'DUMMY_DONGLE_TINFO_USB2')
+        self.assertEqual(devices[self.meter2.power_consumption_device_uuid]['meter'], 'DUMMY_DONGLE_TINFO_USB2')
+
+    def test_configure_hardware_keeps_primary_port(self):
+        self.module._set_config_field('port', self.meter2.port)
+
+        self.module._configure_meters(self.module._scan_ports())
+
+        self.assertEqual(self.module.primary_meter.port, self.meter2.port)
+        self.assertIn('DUMMY_DONGLE_TINFO_USB', self.module.meters)
+
+    def test_teleinfo_task(self):
+        self.module.primary_meter.event_policy.reset()
+        self.meter2.event_policy.reset()
+
+        self.module._teleinfo_task()
+        self.module.write_behind.flush()
+
+        devices = self.module._get_devices()
+        self.assertEqual(devices[self.module.primary_meter.instant_power_device_uuid]['power'], int(self.DATA['PAPP']))
+        self.assertEqual(devices[self.meter2.instant_power_device_uuid]['power'], int(self.DATA2['PAPP']))
+        self.assertEqual(devices[self.meter2.instant_power_device_uuid]['heurescreuses'], int(self.DATA2['BASE']))
+
+    def test_on_teleinfo_frame(self):
+        self.module.primary_meter.history.clear()
+        self.meter2.history.clear()
+
+        self.module._on_teleinfo_frame(self.meter2, self.DATA2)
+
+        self.assertEqual(len(self.module.get_power_history()), 0)
+        self.assertEqual(len(self.module.get_power_history(meter='DUMMY_DONGLE_TINFO_USB2')), 1)
+        self.assertEqual(self.module.primary_meter.last_indexes, [int(self.DATA['HCHC']), int(self.DATA['HCHP'])])
+        self.assertEqual(self.meter2.last_indexes, [int(self.DATA2['BASE'])])
+
+    def test_stores(self):
+        self.assertEqual(self.module.primary_meter.store.path, STORE_PATH)
+        self.assertEqual(self.meter2.store.path, os.path.join(STORE_PATH, 'DUMMY_DONGLE_TINFO_USB2'))
+
+        self.module._stop()
+
+        self.assertTrue(os.path.exists(os.path.join(STORE_PATH, 'DUMMY_DONGLE_TINFO_USB2', 'rollups.json')))
+        self.assertIsNone(self.meter2.store)
+        self.assertIsNone(self.meter2.reader)
+
+    def test_get_meters(self):
+        meters = self.module.get_meters()
+
+        self.assertEqual(len(meters), 2)
+        self.assertEqual(meters[0]['name'], self.module.PRIMARY_METER)
+        self.assertTrue(meters[0]['primary'])
+        self.assertEqual(meters[1]['name'], 'DUMMY_DONGLE_TINFO_USB2')
+        self.assertTrue(meters[1]['connected'])
+        self.assertEqual(meters[1]['mode'], MODE_STANDARD)
+        self.assertEqual(meters[1]['instantpowerdevice'], self.meter2.instant_power_device_uuid)
+
+    def test_get_teleinfo(self):
+        raw = self.module.get_teleinfo(meter='DUMMY_DONGLE_TINFO_USB2')
+
+        self.assertEqual(len(raw), len(self.DATA2))
+        self.assertIn({'key': 'BASE', 'value': self.DATA2['BASE']}, raw)
+
+    def test_get_teleinfo_invalid_meter(self):
+        with self.assertRaises(InvalidParameter) as cm:
+            self.module.get_teleinfo(meter='dummy')
+        self.assertEqual(str(cm.exception), 'Parameter "meter" must be an existing meter name')
+
+    def test_process_async_frame(self):
+        self.meter2.event_policy.reset()
+
+        params = self.module._process_async_frame('DUMMY_DONGLE_TINFO_USB2', self.DATA2)
+
+        self.assertEqual(params['power'], int(self.DATA2['PAPP']))
+        self.assertEqual(self.meter2.last_raw, self.DATA2)
+
+    def test_event_received(self):
+        event = {
+            'event': 'parameters.time.now',
+            'params': {
+                'hour': 0,
+                'minute': 0,
+            }
+        }
+        self.module._update_config(self.module._build_meter_config(self.meter2, {
+            'previousconsoheurescreuses': int(self.DATA2['BASE']) - 666,
+            'previousconsoheurespleines': 0,
+        }))
+
+        self.module.event_received(event)
+
+        self.assertEqual(self.session.event_call_count('teleinfo.consumption.update'), 1)
+        event_params = self.session.get_last_event_params('teleinfo.consumption.update')
+        self.assertEqual(event_params['heurescreuses'], 666)
+        meters = self.module._get_config_field('meters')
+        self.assertEqual(meters['DUMMY_DONGLE_TINFO_USB2']['previousconsoheurescreuses'], int(self.DATA2['BASE']))
+        self.assertEqual(meters['DUMMY_DONGLE_TINFO_USB2']['mode'], MODE_STANDARD)
+        self.assertEqual(self.module._get_config_field('previousconsoheurescreuses'), int(self.DATA['HCHC']))
+
+    def test_get_stats(self):
+        stats = self.module.get_stats()
+
+        self.assertEqual(stats['counters']['framesread'], self.module.primary_meter.reader.frames_count + self.meter2.reader.frames_count)
+
+
+
+
+
+class TestTeleinfoHotplug(unittest.TestCase):
+
+    DATA = {
+        'ADCO': '041529016009',
+        'OPTARIF': 'BASE',
+        'ISOUSC': '30',
+        'BASE': '001234567',
+        'PTEC': 'TH..',
+        'IINST': '010',
+        'IMAX': '029',
+        'PAPP': '02200',
+        'MOTDETAT': '000000',
+    }
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.session = session.TestSession(self)
+
+        cteleinfo.TeleinfoReader = MockedTeleinfoReader
+        cteleinfo.Serial = Mock(return_value=MockedSerial(self.DATA))
+        self.paths = []
+        shutil.rmtree(STORE_PATH, ignore_errors=True)
+        Teleinfo_ = self.session.clone_class(cteleinfo.Cteleinfo)
+        Teleinfo_.USB_PATH = os.path.abspath('./') + '/'
+        Teleinfo_.PROBE_TIMEOUT = 0.1
+        Teleinfo_.STORE_PATH = STORE_PATH
+        Teleinfo_._teleinfo_task = Mock()
+        self.module = self.session.setup(Teleinfo_)
+        self.session.start_module(self.module)
+        self.module.startup_thread.join()
+        # dongle changes are notified by tests, running watcher would notify them a second time
+        self.module.watcher.on_change = Mock()
+
+    def tearDown(self):
+        self.session.clean()
+        for path in self.paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def plug(self, name='DUMMY_DONGLE_TINFO_USB'):
+        path = os.path.join(os.getcwd(), name)
+        with io.open(path, 'w') as f:
+            f.write(u'')
+        self.paths.append(path)
+        return path
+
+    def unplug(self, path):
+        os.remove(path)
+
+    def wait_for(self, condition, timeout=3.0):
+        end = time.time() + timeout
+        while time.time() < end:
+            if condition():
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_no_dongle_at_startup(self):
+        self.assertIsNone(self.module.primary_meter.port)
+        self.assertIsNone(self.module.primary_meter.reader)
+        self.assertIsNotNone(self.module.watcher)
+        self.assertIsNotNone(self.module.hardware_task)
+
+    def test_dongle_plugged(self):
+        path = self.plug()
+
+        self.module._on_ports_changed([path], [])
+
+        self.assertEqual(self.module.primary_meter.port, path)
+        self.assertEqual(self.module._get_config_field('port'), path)
+        self.assertIsNotNone(self.module.primary_meter.reader)
+        self.assertEqual(self.module.primary_meter.get_frame(), self.DATA)
+
+    def test_dongle_plugged_watcher(self):
+        self.module.watcher.on_change = self.module._on_ports_changed
+        self.plug()
+
+        self.assertTrue(self.wait_for(lambda: self.module.primary_meter.reader is not None))
+
+    def test_second_dongle_plugged(self):
+        path = self.plug()
+        self.module._on_ports_changed([path], [])
+        path2 = self.plug('DUMMY_DONGLE_TINFO_USB2')
+
+        self.module._on_ports_changed([path2], [])
+
+        meter = self.module.meters['DUMMY_DONGLE_TINFO_USB2']
+        self.assertIsNotNone(meter.reader)
+        self.assertIsNotNone(meter.store)
+        self.assertEqual(self.module._get_devices()[meter.instant_power_device_uuid]['meter'], 'DUMMY_DONGLE_TINFO_USB2')
+
+    def test_dongle_unplugged_and_plugged_again(self):
+        path = self.plug()
+        self.module._on_ports_changed([path], [])
+        self.unplug(path)
+
+        self.module._on_ports_changed([], [path])
+
+        self.assertIsNone(self.module.primary_meter.reader)
+        self.assertIsNone(self.module.primary_meter.serial)
+        self.assertEqual(self.module.primary_meter.port, path)
+        # dongle not plugged, no reconnection
+        self.module._check_hardware()
+        self.assertIsNone(self.module.primary_meter.reader)
+
+        self.plug()
+        self.module._on_ports_changed([path], [])
+
+        self.assertIsNotNone(self.module.primary_meter.reader)
+        self.assertEqual(len(self.module.meters), 1)
+
+    def test_serial_error_reconnect_with_backoff(self):
+        path = self.plug()
+        self.module._on_ports_changed([path], [])
+
+        self.module._on_meter_error(self.module.PRIMARY_METER, Exception('test'))
+        self.module._check_hardware()
+
+        self.assertIsNone(self.module.primary_meter.reader)
+        self.assertEqual(self.module.primary_meter.reconnect_attempts, 1)
+        self.assertGreater(self.module.primary_meter.reconnect_at, time.time())
+        # backoff delay not elapsed
+        self.module._check_hardware()
+        self.assertIsNone(self.module.primary_meter.reader)
+
+        self.module.primary_meter.reconnect_at = 0.0
+        self.module._check_hardware()
+
+        self.assertIsNotNone(self.module.primary_meter.reader)
+        # frames received, backoff is reset
+        self.module._check_hardware()
+        self.assertEqual(self.module.primary_meter.reconnect_attempts, 0)
+
+    def test_serial_open_error_backoff(self):
+        cteleinfo.Serial = Mock(side_effect=Exception('test'))
+        path = self.plug()
+
+        self.module._on_ports_changed([path], [])
+        attempts = self.module.primary_meter.reconnect_attempts
+        self.module.primary_meter.reconnect_at = 0.0
+        self.module._check_hardware()
+
+        self.assertIsNone(self.module.primary_meter.reader)
+        self.assertEqual(self.module.primary_meter.reconnect_attempts, attempts + 1)
+        self.assertGreater(self.module.primary_meter.reconnect_at, time.time())
+
+    def test_reader_error(self):
+        path = self.plug()
+        self.module._on_ports_changed([path], [])
+        reader = self.module.primary_meter.reader
+        reader.read_bytes = Mock(side_effect=Exception('test'))
+
+        reader.read_once()
+
+        self.assertTrue(self.module.primary_meter.failed)
+        self.assertFalse(reader.running)
+
+    def test_stop(self):
+        self.module._stop()
+
+        self.assertIsNone(self.module.watcher)
+        self.assertIsNone(self.module.hardware_task)
+        # hardware events received after stop are ignored
+        path = self.plug()
+        self.module._on_ports_changed([path], [])
+        self.assertIsNone(self.module.primary_meter.reader)
+
+
+
+
+
 class TestTeleinfoHistoBase(unittest.TestCase):
 
     TI_HISTO_BASE = {
@@ -260,9 +1581,9 @@ class TestTeleinfoHistoBase(unittest.TestCase):
         logging.basicConfig(level=logging.CRITICAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
         self.session = session.TestSession(self)
 
-        cteleinfo.UTInfo2 = Mock()
-        self.mocked_parser = MockedParser({})
-        cteleinfo.Parser = Mock(return_value=self.mocked_parser)
+        cteleinfo.TeleinfoReader = MockedTeleinfoReader
+        self.mocked_serial = MockedSerial({})
+        cteleinfo.Serial = Mock(return_value=self.mocked_serial)
         self.path = os.path.join(os.getcwd(), 'DUMMY_DONGLE_TINFO_USB')
         with io.open(self.path, 'w') as f:
             f.write(u'')
@@ -275,19 +1596,23 @@ class TestTeleinfoHistoBase(unittest.TestCase):
     def init(self):
         Teleinfo_ = self.session.clone_class(cteleinfo.Cteleinfo)
         Teleinfo_.USB_PATH = os.path.abspath('./') + '/'
+        Teleinfo_.PROBE_TIMEOUT = 0.1
+        Teleinfo_.STORE_PATH = STORE_PATH
         self.module = self.session.setup(Teleinfo_)
         self.session.start_module(self.module)
+        self.module.startup_thread.join()
 
     def test_teleinfo_task(self):
         self.init()
-        self.mocked_parser.set_get_frame_output(self.TI_HISTO_BASE)
+        self.mocked_serial.set_frame(self.TI_HISTO_BASE)
+        self.module.primary_meter.reader.read_once()
         self.module._teleinfo_task()
         
         self.assertEqual(self.session.event_call_count('teleinfo.power.update'), 1)
         self.assertEqual(self.session.event_call_count('teleinfo.consumption.update'), 0)
         event_params = self.session.get_last_event_params('teleinfo.power.update')
         logging.debug('Event params: %s' % event_params)
-        self.assertEqual(event_params['power'], int(self.TI_HISTO_BASE['IINST']) * self.module.VA_FACTOR)
+        self.assertEqual(event_params['power'], int(self.TI_HISTO_BASE['PAPP']))
         self.assertEqual(event_params['currentmode'], self.TI_HISTO_BASE['PTEC'])
         self.assertEqual(event_params['subscription'], self.TI_HISTO_BASE['ISOUSC'])
         self.assertEqual(event_params['heurescreuses'], int(self.TI_HISTO_BASE['BASE']))
@@ -317,9 +1642,9 @@ class TestTeleinfoHistoHCHP(unittest.TestCase):
         logging.basicConfig(level=logging.CRITICAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
         self.session = session.TestSession(self)
 
-        cteleinfo.UTInfo2 = Mock()
-        self.mocked_parser = MockedParser({})
-        cteleinfo.Parser = Mock(return_value=self.mocked_parser)
+        cteleinfo.TeleinfoReader = MockedTeleinfoReader
+        self.mocked_serial = MockedSerial({})
+        cteleinfo.Serial = Mock(return_value=self.mocked_serial)
         self.path = os.path.join(os.getcwd(), 'DUMMY_DONGLE_TINFO_USB')
         with io.open(self.path, 'w') as f:
             f.write(u'')
@@ -332,19 +1657,23 @@ class TestTeleinfoHistoHCHP(unittest.TestCase):
     def init(self):
         Teleinfo_ = self.session.clone_class(cteleinfo.Cteleinfo)
         Teleinfo_.USB_PATH = os.path.abspath('./') + '/'
+        Teleinfo_.PROBE_TIMEOUT = 0.1
+        Teleinfo_.STORE_PATH = STORE_PATH
         self.module = self.session.setup(Teleinfo_)
         self.session.start_module(self.module)
+        self.module.startup_thread.join()
 
     def test_teleinfo_task(self):
         self.init()
-        self.mocked_parser.set_get_frame_output(self.TI_HISTO_HCHP)
+        self.mocked_serial.set_frame(self.TI_HISTO_HCHP)
+        self.module.primary_meter.reader.read_once()
         self.module._teleinfo_task()
         
         self.assertEqual(self.session.event_call_count('teleinfo.power.update'), 1)
         self.assertEqual(self.session.event_call_count('teleinfo.consumption.update'), 0)
         event_params = self.session.get_last_event_params('teleinfo.power.update')
         logging.debug('Event params: %s' % event_params)
-        self.assertEqual(event_params['power'], int(self.TI_HISTO_HCHP['IINST']) * self.module.VA_FACTOR)
+        self.assertEqual(event_params['power'], int(self.TI_HISTO_HCHP['PAPP']))
         self.assertEqual(event_params['currentmode'], self.TI_HISTO_HCHP['PTEC'])
         self.assertEqual(event_params['subscription'], self.TI_HISTO_HCHP['ISOUSC'])
         self.assertEqual(event_params['heurescreuses'], int(self.TI_HISTO_HCHP['HCHC']))
@@ -360,7 +1689,8 @@ class TestTeleinfoHistoHCHP(unittest.TestCase):
         }
 
         self.init()
-        self.mocked_parser.set_get_frame_output(self.TI_HISTO_HCHP)
+        self.mocked_serial.set_frame(self.TI_HISTO_HCHP)
+        self.module.primary_meter.reader.read_once()
         self.module._teleinfo_task()
         
         self.module.event_received(event)
@@ -410,9 +1740,9 @@ class TestTeleinfoHistoEJP(unittest.TestCase):
         logging.basicConfig(level=logging.CRITICAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
         self.session = session.TestSession(self)
 
-        cteleinfo.UTInfo2 = Mock()
-        self.mocked_parser = MockedParser({})
-        cteleinfo.Parser = Mock(return_value=self.mocked_parser)
+        cteleinfo.TeleinfoReader = MockedTeleinfoReader
+        self.mocked_serial = MockedSerial({})
+        cteleinfo.Serial = Mock(return_value=self.mocked_serial)
         self.path = os.path.join(os.getcwd(), 'DUMMY_DONGLE_TINFO_USB')
         with io.open(self.path, 'w') as f:
             f.write(u'')
@@ -425,19 +1755,23 @@ class TestTeleinfoHistoEJP(unittest.TestCase):
     def init(self):
         Teleinfo_ = self.session.clone_class(cteleinfo.Cteleinfo)
         Teleinfo_.USB_PATH = os.path.abspath('./') + '/'
+        Teleinfo_.PROBE_TIMEOUT = 0.1
+        Teleinfo_.STORE_PATH = STORE_PATH
         self.module = self.session.setup(Teleinfo_)
         self.session.start_module(self.module)
+        self.module.startup_thread.join()
 
     def test_teleinfo_task(self):
         self.init()
-        self.mocked_parser.set_get_frame_output(self.TI_HISTO_EJP)
+        self.mocked_serial.set_frame(self.TI_HISTO_EJP)
+        self.module.primary_meter.reader.read_once()
         self.module._teleinfo_task()
         
         self.assertEqual(self.session.event_call_count('teleinfo.power.update'), 1)
         self.assertEqual(self.session.event_call_count('teleinfo.consumption.update'), 0)
         event_params = self.session.get_last_event_params('teleinfo.power.update')
         logging.debug('Event params: %s' % event_params)
-        self.assertEqual(event_params['power'], int(self.TI_HISTO_EJP['IINST']) * self.module.VA_FACTOR)
+        self.assertEqual(event_params['power'], int(self.TI_HISTO_EJP['PAPP']))
         self.assertEqual(event_params['currentmode'], self.TI_HISTO_EJP['PTEC'])
         self.assertEqual(event_params['subscription'], self.TI_HISTO_EJP['ISOUSC'])
         self.assertEqual(event_params['heurescreuses'], int(self.TI_HISTO_EJP['EJPHN']))
@@ -472,9 +1806,9 @@ class TestTeleinfoHistoTempo(unittest.TestCase):
         logging.basicConfig(level=logging.CRITICAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
         self.session = session.TestSession(self)
 
-        cteleinfo.UTInfo2 = Mock()
-        self.mocked_parser = MockedParser({})
-        cteleinfo.Parser = Mock(return_value=self.mocked_parser)
+        cteleinfo.TeleinfoReader = MockedTeleinfoReader
+        self.mocked_serial = MockedSerial({})
+        cteleinfo.Serial = Mock(return_value=self.mocked_serial)
         self.path = os.path.join(os.getcwd(), 'DUMMY_DONGLE_TINFO_USB')
         with io.open(self.path, 'w') as f:
             f.write(u'')
@@ -487,24 +1821,47 @@ class TestTeleinfoHistoTempo(unittest.TestCase):
     def init(self):
         Teleinfo_ = self.session.clone_class(cteleinfo.Cteleinfo)
         Teleinfo_.USB_PATH = os.path.abspath('./') + '/'
+        Teleinfo_.PROBE_TIMEOUT = 0.1
+        Teleinfo_.STORE_PATH = STORE_PATH
         self.module = self.session.setup(Teleinfo_)
         self.session.start_module(self.module)
+        self.module.startup_thread.join()
 
     def test_teleinfo_task(self):
         self.init()
-        self.mocked_parser.set_get_frame_output(self.TI_HISTO_TEMPO)
+        self.mocked_serial.set_frame(self.TI_HISTO_TEMPO)
+        self.module.primary_meter.reader.read_once()
         self.module._teleinfo_task()
         
         self.assertEqual(self.session.event_call_count('teleinfo.power.update'), 1)
         self.assertEqual(self.session.event_call_count('teleinfo.consumption.update'), 0)
         event_params = self.session.get_last_event_params('teleinfo.power.update')
         logging.debug('Event params: %s' % event_params)
-        self.assertEqual(event_params['power'], int(self.TI_HISTO_TEMPO['IINST']) * self.module.VA_FACTOR)
+        self.assertEqual(event_params['power'], int(self.TI_HISTO_TEMPO['PAPP']))
         self.assertEqual(event_params['currentmode'], self.TI_HISTO_TEMPO['PTEC'])
         self.assertEqual(event_params['subscription'], self.TI_HISTO_TEMPO['ISOUSC'])
         self.assertEqual(event_params['heurescreuses'], int(self.TI_HISTO_TEMPO['BBRHCJB'])+int(self.TI_HISTO_TEMPO['BBRHCJW'])+int(self.TI_HISTO_TEMPO['BBRHCJR']))
         self.assertEqual(event_params['heurespleines'], int(self.TI_HISTO_TEMPO['BBRHPJB'])+int(self.TI_HISTO_TEMPO['BBRHPJW'])+int(self.TI_HISTO_TEMPO['BBRHPJR']))
 
+    def test_get_cost(self):
+        shutil.rmtree(STORE_PATH, ignore_errors=True)
+        self.init()
+        self.module.set_prices({'HCJB': 0.1, 'HPJB': 0.2, 'HPJR': 0.5})
+        meter = self.module.primary_meter
+
+        self.module._on_teleinfo_frame(meter, self.TI_HISTO_TEMPO)
+        self.module._on_teleinfo_frame(meter, dict(self.TI_HISTO_TEMPO, BBRHPJB='003495559', BBRHCJW='000041741'))
+        self.module.set_prices({'HPJB': 0.4})
+        self.module._on_teleinfo_frame(meter, dict(self.TI_HISTO_TEMPO, BBRHPJB='003496559', BBRHCJW='000041741'))
+
+        cost = self.module.get_cost('day')
+        self.assertEqual(cost['consumption'], 2500)
+        self.assertEqual(cost['cost'], 0.6)
+        self.assertEqual([register['name'] for register in cost['registers']], ['HCJB', 'HPJB', 'HCJW', 'HPJW', 'HCJR', 'HPJR'])
+        self.assertEqual(cost['registers'][1], {'name': 'HPJB', 'consumption': 2000, 'cost': 0.6})
+        self.assertEqual(cost['registers'][2], {'name': 'HCJW', 'consumption': 500, 'cost': 0.0})
+        self.assertEqual(self.module.get_prices(), {'HPJB': 0.4})
+
 
 
 
@@ -534,9 +1891,9 @@ class TestTeleinfoHistoEJPTriphase(unittest.TestCase):
         logging.basicConfig(level=logging.CRITICAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
         self.session = session.TestSession(self)
 
-        cteleinfo.UTInfo2 = Mock()
-        self.mocked_parser = MockedParser({})
-        cteleinfo.Parser = Mock(return_value=self.mocked_parser)
+        cteleinfo.TeleinfoReader = MockedTeleinfoReader
+        self.mocked_serial = MockedSerial({})
+        cteleinfo.Serial = Mock(return_value=self.mocked_serial)
         self.path = os.path.join(os.getcwd(), 'DUMMY_DONGLE_TINFO_USB')
         with io.open(self.path, 'w') as f:
             f.write(u'')
@@ -549,19 +1906,23 @@ class TestTeleinfoHistoEJPTriphase(unittest.TestCase):
     def init(self):
         Teleinfo_ = self.session.clone_class(cteleinfo.Cteleinfo)
         Teleinfo_.USB_PATH = os.path.abspath('./') + '/'
+        Teleinfo_.PROBE_TIMEOUT = 0.1
+        Teleinfo_.STORE_PATH = STORE_PATH
         self.module = self.session.setup(Teleinfo_)
         self.session.start_module(self.module)
+        self.module.startup_thread.join()
 
     def test_teleinfo_task(self):
         self.init()
-        self.mocked_parser.set_get_frame_output(self.TI_HISTO_EJP_TRI)
+        self.mocked_serial.set_frame(self.TI_HISTO_EJP_TRI)
+        self.module.primary_meter.reader.read_once()
         self.module._teleinfo_task()
         
         self.assertEqual(self.session.event_call_count('teleinfo.power.update'), 1)
         self.assertEqual(self.session.event_call_count('teleinfo.consumption.update'), 0)
         event_params = self.session.get_last_event_params('teleinfo.power.update')
         logging.debug('Event params: %s' % event_params)
-        self.assertEqual(event_params['power'], (int(self.TI_HISTO_EJP_TRI['IINST1'])+int(self.TI_HISTO_EJP_TRI['IINST2'])+int(self.TI_HISTO_EJP_TRI['IINST3'])) * self.module.VA_FACTOR)
+        self.assertEqual(event_params['power'], int(self.TI_HISTO_EJP_TRI['PAPP']))
         self.assertEqual(event_params['currentmode'], self.TI_HISTO_EJP_TRI['PTEC'])
         self.assertEqual(event_params['subscription'], self.TI_HISTO_EJP_TRI['ISOUSC'])
         self.assertEqual(event_params['heurescreuses'], int(self.TI_HISTO_EJP_TRI['EJPHN']))
@@ -570,6 +1931,137 @@ class TestTeleinfoHistoEJPTriphase(unittest.TestCase):
 
 
 
+class TestTeleinfoStandard(unittest.TestCase):
+
+    TI_STANDARD_HCHP = {
+        'ADSC': '041876097737',
+        'VTIC': '02',
+        'DATE': ('H210523131002', ''),
+        'NGTF': '  H PLEINE/CREUSE',
+        'LTARF': '  HEURE  PLEINE  ',
+        'EAST': '008475623',
+        'EASF01': '004121570',
+        'EASF02': '004354053',
+        'EASF03': '000000000',
+        'EASF04': '000000000',
+        'EASF05': '000000000',
+        'EASF06': '000000000',
+        'EASF07': '000000000',
+        'EASF08': '000000000',
+        'EASF09': '000000000',
+        'EASF10': '000000000',
+        'IRMS1': '004',
+        'URMS1': '236',
+        'PREF': '09',
+        'PCOUP': '09',
+        'SINSTS': '00910',
+        'SMAXSN': ('H210523073156', '04930'),
+        'NTARF': '02',
+        'NJOURF': '00',
+        'STGE': '003A0001',
+    }
+
+    TI_STANDARD_TEMPO_TRI = {
+        'ADSC': '041876097737',
+        'NGTF': '     TEMPO      ',
+        'EAST': '008475623',
+        'EASF01': '000000100',
+        'EASF02': '000000200',
+        'EASF03': '000000300',
+        'EASF04': '000000400',
+        'EASF05': '000000500',
+        'EASF06': '000000600',
+        'EASF07': '000000000',
+        'EASF08': '000000000',
+        'EASF09': '000000000',
+        'EASF10': '000000000',
+        'IRMS1': '001',
+        'IRMS2': '002',
+        'IRMS3': '003',
+        'PREF': '12',
+        'SINSTS': '01320',
+        'NTARF': '03',
+        # next day is red
+        'STGE': '0C3A0001',
+    }
+
+    def setUp(self):
+        logging.basicConfig(level=logging.CRITICAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.session = session.TestSession(self)
+
+        cteleinfo.TeleinfoReader = MockedTeleinfoReader
+        self.mocked_serial = MockedSerial({})
+        cteleinfo.Serial = Mock(return_value=self.mocked_serial)
+        self.path = os.path.join(os.getcwd(), 'DUMMY_DONGLE_TINFO_USB')
+        with io.open(self.path, 'w') as f:
+            f.write(u'')
+
+    def tearDown(self):
+        self.session.clean()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def init(self, frame):
+        self.mocked_serial.set_frame(frame, MODE_STANDARD)
+        Teleinfo_ = self.session.clone_class(cteleinfo.Cteleinfo)
+        Teleinfo_.USB_PATH = os.path.abspath('./') + '/'
+        Teleinfo_.PROBE_TIMEOUT = 0.1
+        Teleinfo_.STORE_PATH = STORE_PATH
+        self.module = self.session.setup(Teleinfo_)
+        self.session.start_module(self.module)
+        self.module.startup_thread.join()
+
+    def test_teleinfo_task_hchp(self):
+        self.init(self.TI_STANDARD_HCHP)
+        self.module._teleinfo_task()
+
+        self.assertEqual(self.module._get_config_field('mode'), MODE_STANDARD)
+        event_params = self.session.get_last_event_params('teleinfo.power.update')
+        logging.debug('Event params: %s' % event_params)
+        self.assertEqual(event_params['power'], int(self.TI_STANDARD_HCHP['SINSTS']))
+        self.assertEqual(event_params['currentmode'], 'HP..')
+        self.assertIsNone(event_params['nextmode'])
+        self.assertEqual(event_params['subscription'], '45')
+        self.assertEqual(event_params['heurescreuses'], int(self.TI_STANDARD_HCHP['EASF01']))
+        self.assertEqual(event_params['heurespleines'], int(self.TI_STANDARD_HCHP['EASF02']))
+
+    def test_teleinfo_task_tempo_triphase(self):
+        self.init(self.TI_STANDARD_TEMPO_TRI)
+        self.module._teleinfo_task()
+
+        event_params = self.session.get_last_event_params('teleinfo.power.update')
+        logging.debug('Event params: %s' % event_params)
+        self.assertEqual(event_params['power'], 6 * self.module.VA_FACTOR)
+        self.assertEqual(event_params['currentmode'], 'HCJW')
+        self.assertEqual(event_params['nextmode'], 'ROUG')
+        self.assertEqual(event_params['subscription'], '60')
+        self.assertEqual(event_params['heurescreuses'], 100 + 300 + 500)
+        self.assertEqual(event_params['heurespleines'], 200 + 400 + 600)
+
+    def test_get_standard_tariff_option(self):
+        self.assertEqual(cteleinfo.Cteleinfo.get_standard_tariff_option({'NGTF': '     TEMPO      '}), 'TEMPO')
+        self.assertEqual(cteleinfo.Cteleinfo.get_standard_tariff_option({'NGTF': '      BASE      '}), 'BASE')
+        self.assertEqual(cteleinfo.Cteleinfo.get_standard_tariff_option({'NGTF': '  H PLEINE/CREUSE'}), 'HC')
+        self.assertEqual(cteleinfo.Cteleinfo.get_standard_tariff_option({}), 'HC')
+
+    def test_to_int(self):
+        self.assertEqual(cteleinfo.Cteleinfo.to_int({'IINST': '002', 'HHPHC': '3'}, ['IINST', 'HHPHC']), {'IINST': 2, 'HHPHC': 3})
+        self.assertEqual(cteleinfo.Cteleinfo.to_int(TeleinfoFrame({'IINST': '002', 'PTEC': 'TH..'}), ['IINST']), {'IINST': 2})
+        self.assertIsNone(cteleinfo.Cteleinfo.to_int(TeleinfoFrame({'IINST': '0X2'}), ['IINST']))
+        self.assertIsNone(cteleinfo.Cteleinfo.to_int({'PTEC': 'TH..'}, ['PTEC']))
+        self.assertIsNone(cteleinfo.Cteleinfo.to_int({'IINST': '002'}, ['PAPP']))
+
+    def test_get_standard_modes_invalid_values(self):
+        current_mode, next_mode, subscription = cteleinfo.Cteleinfo.get_standard_modes({'NTARF': '12', 'NGTF': 'TEMPO', 'STGE': 'XX'})
+
+        self.assertIsNone(current_mode)
+        self.assertIsNone(next_mode)
+        self.assertIsNone(subscription)
+
+
+
+
+
 class TestsTeleinfoConsumptionUpdateEvent(unittest.TestCase):
 
     def setUp(self):
@@ -621,6 +2113,32 @@ class TestsTeleinfoPowerUpdateEvent(unittest.TestCase):
 
 
 
+
+class TestsTeleinfoOverloadEvent(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        params = {
+            'internal_bus': Mock(),
+            'formatters_broker': Mock(),
+            'get_external_bus_name': None,
+        }
+        self.event = TeleinfoOverloadEvent(params)
+
+    def test_event_params(self):
+        self.assertEqual(self.event.EVENT_PARAMS, ['lastupdate', 'meter', 'overload', 'rules', 'headroom', 'power'])
+
+    def test_event_chart_params(self):
+        self.assertEqual(self.event.EVENT_CHART_PARAMS, [])
+
+    def test_event_chartable(self):
+        self.assertFalse(self.event.EVENT_CHARTABLE)
+
+    def test_event_propagate(self):
+        self.assertTrue(self.event.EVENT_PROPAGATE)
+
+
+
 if __name__ == "__main__":
     # coverage run --omit="*/lib/python*/*","test_*" --concurrency=thread test_teleinfo.py; coverage report -m -i
     unittest.main()
@@ -0,0 +1,247 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinfoasyncingestion import TeleinfoAsyncIngestion
+from backend.teleinforeader import TeleinfoReader
+from backend.teleinfodecoder import TeleinfoDecoder
+import os
+import time
+import fcntl
+import struct
+import termios
+from mock import Mock
+
+
+
+class PipeSerial():
+    """
+    Serial port backed by a pipe
+    """
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+
+    def fileno(self):
+        return self.read_fd
+
+    @property
+    def in_waiting(self):
+        return struct.unpack('I', fcntl.ioctl(self.read_fd, termios.FIONREAD, b'\0\0\0\0'))[0]
+
+    def read(self, size=1):
+        return os.read(self.read_fd, size)
+
+    def write(self, data):
+        os.write(self.write_fd, data)
+
+    def close(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+def wait_for(condition, timeout=2.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+
+class TestTeleinfoAsyncIngestion(unittest.TestCase):
+
+    FRAME = {
+        'IINST': '002',
+        'PTEC': 'TH..',
+    }
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.logger = logging.getLogger('TestTeleinfoAsyncIngestion')
+        self.serials = []
+        self.process_frame = Mock(side_effect=lambda meter, frame: {'meter': meter, 'iinst': frame['IINST']})
+        self.update_device = Mock()
+        self.send_event = Mock()
+        self.ingestion = TeleinfoAsyncIngestion(self.logger, self.process_frame, self.update_device, self.send_event)
+        self.ingestion.start()
+        self.ingestion.wait_started(1.0)
+
+    def tearDown(self):
+        self.ingestion.stop()
+        self.ingestion.join(1.0)
+        for serial in self.serials:
+            serial.close()
+
+    def add_meter(self, name):
+        serial = PipeSerial()
+        self.serials.append(serial)
+        reader = TeleinfoReader(serial.read, self.logger)
+        self.ingestion.add_meter(name, serial, reader)
+        return serial, reader
+
+    def test_ingestion(self):
+        serial, reader = self.add_meter('meter1')
+
+        serial.write(TeleinfoDecoder.encode_frame(self.FRAME))
+
+        self.assertTrue(wait_for(lambda: self.send_event.call_count == 1))
+        self.assertEqual(reader.get_frame(), self.FRAME)
+        self.process_frame.assert_called_once_with('meter1', self.FRAME)
+        self.update_device.assert_called_once_with('meter1', {'meter': 'meter1', 'iinst': '002'})
+        self.send_event.assert_called_once_with('meter1', {'meter': 'meter1', 'iinst': '002'})
+
+    def test_ingestion_stats(self):
+        self.ingestion.stats = Mock()
+        serial, reader = self.add_meter('meter1')
+
+        serial.write(TeleinfoDecoder.encode_frame(self.FRAME))
+
+        self.assertTrue(wait_for(lambda: self.send_event.call_count == 1))
+        self.assertEqual(self.ingestion.stats.add.call_args[0][0], 'read')
+
+    def test_ingestion_frame_in_chunks(self):
+        serial, reader = self.add_meter('meter1')
+        data = TeleinfoDecoder.encode_frame(self.FRAME)
+
+        serial.write(data[:10])
+        time.sleep(0.05)
+        serial.write(data[10:])
+
+        self.assertTrue(wait_for(lambda: reader.get_frame() == self.FRAME))
+
+    def test_ingestion_no_update(self):
+        self.process_frame.side_effect = None
+        self.process_frame.return_value = None
+        serial, reader = self.add_meter('meter1')
+
+        serial.write(TeleinfoDecoder.encode_frame(self.FRAME))
+
+        self.assertTrue(wait_for(lambda: reader.frames_count == 1))
+        time.sleep(0.05)
+        self.assertFalse(self.update_device.called)
+        self.assertFalse(self.send_event.called)
+
+    def test_ingestion_multiple_meters(self):
+        serial1, reader1 = self.add_meter('meter1')
+        serial2, reader2 = self.add_meter('meter2')
+
+        serial1.write(TeleinfoDecoder.encode_frame({'IINST': '001'}))
+        serial2.write(TeleinfoDecoder.encode_frame({'IINST': '002'}))
+
+        self.assertTrue(wait_for(lambda: self.send_event.call_count == 2))
+        self.assertEqual(reader1.get_frame(), {'IINST': '001'})
+        self.assertEqual(reader2.get_frame(), {'IINST': '002'})
+        self.assertEqual(len(self.ingestion.get_queues_size()), 2)
+
+    def test_slow_device_update_does_not_block_serial_read(self):
+        self.update_device.side_effect = lambda meter, params: time.sleep(0.5)
+        serial, reader = self.add_meter('meter1')
+
+        for index in range(3):
+            serial.write(TeleinfoDecoder.encode_frame({'IINST': '%03d' % index}))
+            time.sleep(0.02)
+
+        # all frames are decoded while first device update is still running
+        self.assertTrue(wait_for(lambda: reader.frames_count == 3, 0.3))
+        self.assertEqual(self.send_event.call_count, 0)
+
+    def test_ingestion_exceptions(self):
+        self.update_device.side_effect = Exception('test')
+        self.send_event.side_effect = Exception('test')
+        serial, reader = self.add_meter('meter1')
+
+        serial.write(TeleinfoDecoder.encode_frame(self.FRAME))
+        self.assertTrue(wait_for(lambda: self.send_event.call_count == 1))
+        serial.write(TeleinfoDecoder.encode_frame(self.FRAME))
+        self.assertTrue(wait_for(lambda: self.send_event.call_count == 2))
+
+    def test_execute(self):
+        function = Mock()
+
+        self.ingestion.execute('meter1', function, 'arg')
+
+        self.assertTrue(wait_for(lambda: function.called))
+        function.assert_called_once_with('arg')
+
+    def test_execute_exception(self):
+        function = Mock(side_effect=[Exception('test'), None])
+
+        self.ingestion.execute('meter1', function)
+        self.ingestion.execute('meter1', function)
+
+        self.assertTrue(wait_for(lambda: function.call_count == 2))
+
+    def test_read_error(self):
+        self.ingestion.on_error = Mock()
+        serial, reader = self.add_meter('meter1')
+        self.assertTrue(wait_for(lambda: 'meter1' in self.ingestion.meters))
+        serial.read = Mock(side_effect=Exception('test'))
+
+        serial.write(b'x')
+
+        self.assertTrue(wait_for(lambda: self.ingestion.on_error.called))
+        self.assertEqual(self.ingestion.on_error.call_args[0][0], 'meter1')
+        self.assertNotIn('meter1', self.ingestion.meters)
+
+    def test_queue_drops_oldest_item(self):
+        self.ingestion.QUEUE_SIZE = 2
+        self.update_device.side_effect = lambda meter, params: time.sleep(0.3)
+        serial, reader = self.add_meter('meter1')
+
+        for index in range(6):
+            serial.write(TeleinfoDecoder.encode_frame({'IINST': '%03d' % index}))
+            time.sleep(0.02)
+
+        self.assertTrue(wait_for(lambda: self.ingestion.dropped > 0))
+
+    def test_full_chunks_queue_pauses_serial_read(self):
+        self.ingestion.QUEUE_SIZE = 2
+        self.process_frame.side_effect = lambda meter, frame: time.sleep(0.05)
+        serial, reader = self.add_meter('meter1')
+        data = b''.join([TeleinfoDecoder.encode_frame({'IINST': '%03d' % index}) for index in range(6)])
+
+        for index in range(0, len(data), 4):
+            serial.write(data[index:index + 4])
+            time.sleep(0.005)
+
+        # no raw byte is dropped so all frames are decoded
+        self.assertTrue(wait_for(lambda: self.process_frame.call_count == 6))
+        self.assertEqual(reader.decoder.checksum_errors, 0)
+        self.assertEqual(self.ingestion.dropped, 0)
+
+    def test_slow_processing_does_not_block_serial_read(self):
+        self.process_frame.side_effect = lambda meter, frame: time.sleep(0.5)
+        serial1, reader1 = self.add_meter('meter1')
+        serial2, reader2 = self.add_meter('meter2')
+
+        serial1.write(TeleinfoDecoder.encode_frame({'IINST': '001'}))
+        time.sleep(0.05)
+        serial2.write(TeleinfoDecoder.encode_frame({'IINST': '002'}))
+
+        # frame of other meter is decoded while first frame is still processed
+        self.assertTrue(wait_for(lambda: reader2.frames_count == 1, 0.3))
+
+    def test_processing_exception(self):
+        self.process_frame.side_effect = [Exception('test'), {'iinst': '002'}]
+        serial, reader = self.add_meter('meter1')
+
+        serial.write(TeleinfoDecoder.encode_frame(self.FRAME) * 2)
+
+        self.assertTrue(wait_for(lambda: self.send_event.call_count == 1))
+        self.assertEqual(self.process_frame.call_count, 2)
+
+    def test_remove_meter(self):
+        serial, reader = self.add_meter('meter1')
+        self.assertTrue(wait_for(lambda: 'meter1' in self.ingestion.meters))
+
+        self.ingestion.remove_meter('meter1')
+
+        self.assertTrue(wait_for(lambda: 'meter1' not in self.ingestion.meters))
+        serial.write(TeleinfoDecoder.encode_frame(self.FRAME))
+        time.sleep(0.05)
+        self.assertEqual(reader.frames_count, 0)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinfocapture import TeleinfoCaptureWriter, TeleinfoCaptureReader
+from backend.teleinfodecoder import TeleinfoDecoder
+import os
+import shutil
+import tempfile
+
+
+
+class TestTeleinfoCapture(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'capture.tic')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_write_read(self):
+        data = TeleinfoDecoder.encode_frame({'IINST': '002', 'PTEC': 'TH..'})
+        writer = TeleinfoCaptureWriter(self.path, 1200)
+        writer.open(1000.0)
+        writer.write(data[:10], 1000.5)
+        writer.write(data[10:], 1001.75)
+        writer.close()
+
+        reader = TeleinfoCaptureReader(self.path)
+
+        self.assertEqual(reader.baudrate, 1200)
+        self.assertEqual(reader.timestamp, 1000.0)
+        self.assertEqual(list(reader), [(0.5, data[:10]), (1.25, data[10:])])
+        self.assertEqual(writer.chunks_count, 2)
+        self.assertEqual(writer.size, os.path.getsize(self.path))
+        self.assertEqual(writer.size, TeleinfoCaptureWriter.HEADER.size + 2 * TeleinfoCaptureWriter.RECORD.size + len(data))
+
+    def test_delays_do_not_drift(self):
+        writer = TeleinfoCaptureWriter(self.path, 1200)
+        writer.open(1000.0)
+        for i in range(1, 1001):
+            writer.write(b'a', 1000.0 + i * 0.0014)
+        writer.close()
+
+        total = sum([delay for delay, _ in TeleinfoCaptureReader(self.path)])
+
+        self.assertAlmostEqual(total, 1.4, places=2)
+
+    def test_write_after_close(self):
+        writer = TeleinfoCaptureWriter(self.path, 1200)
+        writer.open()
+        writer.close()
+
+        writer.write(b'data')
+
+        self.assertEqual(list(TeleinfoCaptureReader(self.path)), [])
+
+    def test_write_big_chunk(self):
+        writer = TeleinfoCaptureWriter(self.path, 9600)
+        writer.open()
+        writer.write(b'a' * 70000)
+        writer.close()
+
+        chunks = [chunk for _, chunk in TeleinfoCaptureReader(self.path)]
+
+        self.assertEqual([len(chunk) for chunk in chunks], [65535, 4465])
+
+    def test_read_truncated_capture(self):
+        writer = TeleinfoCaptureWriter(self.path, 1200)
+        writer.open()
+        writer.write(b'data1')
+        writer.write(b'data2')
+        writer.close()
+        with open(self.path, 'r+b') as fd:
+            fd.truncate(os.path.getsize(self.path) - 2)
+
+        self.assertEqual([chunk for _, chunk in TeleinfoCaptureReader(self.path)], [b'data1'])
+
+    def test_read_invalid_file(self):
+        with open(self.path, 'wb') as fd:
+            fd.write(b'dummy content of invalid file')
+
+        with self.assertRaises(ValueError):
+            TeleinfoCaptureReader(self.path)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinfodecoder import TeleinfoDecoder, MODE_HISTORIC, MODE_STANDARD
+from backend.teleinfoframe import TeleinfoFrame
+
+
+
+class TestTeleinfoDecoder(unittest.TestCase):
+
+    FRAME = {
+        'ADCO': '041529016009',
+        'OPTARIF': 'HC..',
+        'ISOUSC': '45',
+        'HCHC': '000643083',
+        'HCHP': '000825429',
+        'PTEC': 'HP..',
+        'IINST': '003',
+        'IMAX': '029',
+        'PAPP': '00620',
+        'HHPHC': 'A',
+        'MOTDETAT': '000000',
+    }
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.decoder = TeleinfoDecoder()
+        self.data = TeleinfoDecoder.encode_frame(self.FRAME)
+
+    def test_checksum(self):
+        # values from Enedis specification
+        self.assertEqual(chr(TeleinfoDecoder.checksum(b'HCHC 000643083')), '^')
+        self.assertEqual(chr(TeleinfoDecoder.checksum(b'IINST 003')), 'Z')
+
+    def test_feed_full_frame(self):
+        frames = self.decoder.feed(self.data)
+
+        self.assertEqual(frames, [self.FRAME])
+        self.assertEqual(self.decoder.frames_count, 1)
+        self.assertEqual(len(self.decoder.buffer), 0)
+
+    def test_feed_typed_frame(self):
+        frame = self.decoder.feed(self.data)[0]
+
+        self.assertIsInstance(frame, TeleinfoFrame)
+        self.assertEqual(frame.numbers['HCHC'], 643083)
+        self.assertEqual(frame.numbers['PAPP'], 620)
+        self.assertNotIn('ADCO', frame.numbers)
+        for label in frame:
+            self.assertIs(label, sys.intern(label))
+
+    def test_feed_byte_per_byte(self):
+        frames = []
+        for i in range(len(self.data)):
+            frames += self.decoder.feed(self.data[i:i+1])
+
+        self.assertEqual(frames, [self.FRAME])
+
+    def test_feed_multiple_frames_in_chunks(self):
+        data = self.data * 5
+        frames = []
+        for i in range(0, len(data), 13):
+            frames += self.decoder.feed(data[i:i+13])
+
+        self.assertEqual(len(frames), 5)
+        for frame in frames:
+            self.assertEqual(frame, self.FRAME)
+
+    def test_feed_drop_leading_garbage(self):
+        frames = self.decoder.feed(self.data[20:] + self.data)
+
+        self.assertEqual(frames, [self.FRAME])
+        self.assertEqual(len(self.decoder.buffer), 0)
+
+    def test_feed_keep_incomplete_frame(self):
+        self.assertEqual(self.decoder.feed(self.data[:30]), [])
+        self.assertEqual(len(self.decoder.buffer), 30)
+
+    def test_feed_invalid_checksum(self):
+        data = bytearray(self.data)
+        # alter ADCO value
+        data[7] = ord('9')
+
+        frames = self.decoder.feed(bytes(data))
+
+        self.assertEqual(len(frames), 1)
+        self.assertNotIn('ADCO', frames[0])
+        self.assertEqual(len(frames[0]), len(self.FRAME) - 1)
+        self.assertEqual(self.decoder.checksum_errors, 1)
+
+    def test_feed_interrupted_frame(self):
+        frames = self.decoder.feed(self.data[:30] + b'\x04' + self.data[30:])
+
+        self.assertEqual(frames, [])
+        self.assertEqual(self.decoder.dropped_frames, 1)
+
+    def test_feed_restarted_frame(self):
+        frames = self.decoder.feed(self.data[:30] + self.data)
+
+        self.assertEqual(frames, [self.FRAME])
+        self.assertEqual(self.decoder.dropped_frames, 1)
+
+    def test_feed_too_long_frame(self):
+        self.decoder.feed(b'\x02' + b'A' * (TeleinfoDecoder.MAX_FRAME_SIZE + 1))
+
+        self.assertEqual(self.decoder.dropped_frames, 1)
+        self.assertEqual(len(self.decoder.buffer), 0)
+
+    def test_feed_historic_mode(self):
+        self.decoder.feed(self.data)
+
+        self.assertEqual(self.decoder.mode, MODE_HISTORIC)
+
+    def test_feed_standard_mode(self):
+        frame = {
+            'ADSC': '041876097737',
+            'DATE': ('H210523131002', ''),
+            'NGTF': '  H PLEINE/CREUSE',
+            'EAST': '008475623',
+            'SMAXSN': ('H210523073156', '04930'),
+        }
+        data = TeleinfoDecoder.encode_frame(frame, MODE_STANDARD)
+
+        frames = self.decoder.feed(data)
+
+        self.assertEqual(self.decoder.mode, MODE_STANDARD)
+        self.assertEqual(frames, [{
+            'ADSC': '041876097737',
+            'DATE': 'H210523131002',
+            'NGTF': '  H PLEINE/CREUSE',
+            'EAST': '008475623',
+            'SMAXSN': '04930',
+        }])
+        self.assertEqual(self.decoder.checksum_errors, 0)
+
+    def test_feed_standard_mode_checksum_covers_last_separator(self):
+        # checksum computed without last separator (historic way) must be rejected
+        data = b'\x02\nEAST\t008475623\t' + bytes([TeleinfoDecoder.checksum(b'EAST\t008475623')]) + b'\r\x03'
+
+        frames = self.decoder.feed(data)
+
+        self.assertEqual(frames, [])
+        self.assertEqual(self.decoder.checksum_errors, 1)
+
+    def test_reset(self):
+        self.decoder.feed(self.data[:30])
+        self.decoder.reset()
+
+        self.assertEqual(self.decoder.feed(self.data[30:]), [])
+
+
+
+if __name__ == "__main__":
+    unittest.main()
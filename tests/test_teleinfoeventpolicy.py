@@ -0,0 +1,84 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinfoeventpolicy import TeleinfoEventPolicy
+
+
+
+class TestTeleinfoEventPolicy(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.policy = TeleinfoEventPolicy(500, 20, 60)
+
+    def params(self, power, currentmode='HP..', nextmode=None):
+        return {'power': power, 'currentmode': currentmode, 'nextmode': nextmode}
+
+    def test_first_sample_emitted(self):
+        self.assertTrue(self.policy.check(self.params(1000), 1000))
+        self.assertEqual(self.policy.emitted, 1)
+
+    def test_small_change_suppressed(self):
+        self.policy.check(self.params(4000), 1000)
+
+        self.assertFalse(self.policy.check(self.params(4400), 1001))
+        self.assertFalse(self.policy.check(self.params(3600), 1002))
+        self.assertEqual(self.policy.suppressed, 2)
+
+    def test_power_deadband(self):
+        self.policy.check(self.params(4000), 1000)
+
+        self.assertTrue(self.policy.check(self.params(4600), 1001))
+
+    def test_percent_deadband(self):
+        self.policy.check(self.params(1000), 1000)
+
+        self.assertFalse(self.policy.check(self.params(1200), 1001))
+        self.assertTrue(self.policy.check(self.params(1300), 1002))
+
+    def test_percent_deadband_from_zero(self):
+        self.policy.check(self.params(0), 1000)
+
+        self.assertTrue(self.policy.check(self.params(220), 1001))
+
+    def test_deadband_compared_to_last_emitted_event(self):
+        self.policy.check(self.params(1000), 1000)
+
+        self.assertFalse(self.policy.check(self.params(1150), 1001))
+        self.assertTrue(self.policy.check(self.params(1300), 1002))
+
+    def test_disabled_deadbands(self):
+        self.policy.configure(0, 0, 60)
+        self.policy.check(self.params(1000), 1000)
+
+        self.assertFalse(self.policy.check(self.params(9000), 1001))
+
+    def test_mode_change(self):
+        self.policy.check(self.params(1000), 1000)
+
+        self.assertTrue(self.policy.check(self.params(1000, currentmode='HC..'), 1001))
+        self.assertTrue(self.policy.check(self.params(1000, currentmode='HC..', nextmode='ROUG'), 1002))
+
+    def test_heartbeat(self):
+        self.policy.check(self.params(1000), 1000)
+
+        self.assertFalse(self.policy.check(self.params(1000), 1059))
+        self.assertTrue(self.policy.check(self.params(1000), 1060))
+        self.assertFalse(self.policy.check(self.params(1000), 1061))
+
+    def test_clock_backward(self):
+        self.policy.check(self.params(1000), 1000)
+
+        self.assertTrue(self.policy.check(self.params(1000), 500))
+
+    def test_reset(self):
+        self.policy.check(self.params(1000), 1000)
+        self.policy.reset()
+
+        self.assertTrue(self.policy.check(self.params(1000), 1001))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinfoexport import TeleinfoExport, FORMAT_CSV, FORMAT_BINARY
+
+
+
+class TestTeleinfoExport(unittest.TestCase):
+
+    COLUMNS = ['timestamp', 'power', 'HC', 'HP']
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+
+    def rows(self, count, start=1000):
+        for index in range(count):
+            yield (start + index, 500 + index, 10000 + index, 20000)
+
+    def export_all(self, export, rows_func):
+        chunks = []
+        cursor = None
+        while True:
+            chunk, cursor = next(export.iter_chunks(rows_func(cursor), cursor))
+            chunks.append(chunk)
+            if cursor is None:
+                return chunks
+
+    def test_csv_single_chunk(self):
+        export = TeleinfoExport(self.COLUMNS, FORMAT_CSV)
+
+        chunks = list(export.iter_chunks(self.rows(2)))
+
+        self.assertEqual(chunks, [(b'timestamp,power,HC,HP\n1000,500,10000,20000\n1001,501,10001,20000\n', None)])
+
+    def test_csv_chunks(self):
+        export = TeleinfoExport(self.COLUMNS, FORMAT_CSV, chunk_rows=2)
+
+        chunks = list(export.iter_chunks(self.rows(5)))
+
+        self.assertEqual([cursor for _, cursor in chunks], ['1001:1', '1003:1', None])
+        self.assertEqual(chunks[1][0], b'1002,502,10002,20000\n1003,503,10003,20000\n')
+        lines = b''.join([chunk for chunk, _ in chunks]).splitlines()
+        self.assertEqual(len(lines), 6)
+
+    def test_chunk_boundary_on_last_row(self):
+        export = TeleinfoExport(self.COLUMNS, FORMAT_CSV, chunk_rows=2)
+
+        chunks = list(export.iter_chunks(self.rows(4)))
+
+        self.assertEqual([cursor for _, cursor in chunks], ['1001:1', None])
+
+    def test_no_rows(self):
+        export = TeleinfoExport(self.COLUMNS, FORMAT_CSV)
+
+        self.assertEqual(list(export.iter_chunks(iter([]))), [(b'timestamp,power,HC,HP\n', None)])
+
+    def test_resume_from_cursor(self):
+        # same second samples
+        rows = [(1000, 1, 0, 0), (1000, 2, 0, 0), (1000, 3, 0, 0), (1001, 4, 0, 0), (1002, 5, 0, 0)]
+        export = TeleinfoExport(self.COLUMNS, FORMAT_CSV, chunk_rows=2)
+
+        def rows_func(cursor):
+            timestamp = TeleinfoExport.parse_cursor(cursor)[0] if cursor else 0
+            return iter([row for row in rows if row[0]>=timestamp])
+        chunks = self.export_all(export, rows_func)
+
+        lines = b''.join(chunks).decode().splitlines()
+        self.assertEqual([int(line.split(',')[1]) for line in lines[1:]], [1, 2, 3, 4, 5])
+
+    def test_generator_is_consumed_lazily(self):
+        consumed = []
+        def rows():
+            for row in self.rows(100):
+                consumed.append(row)
+                yield row
+        export = TeleinfoExport(self.COLUMNS, FORMAT_CSV, chunk_rows=10)
+
+        chunks = export.iter_chunks(rows())
+        next(chunks)
+        chunks.close()
+
+        # one row read ahead to know if another chunk exists
+        self.assertEqual(len(consumed), 11)
+
+    def test_binary(self):
+        export = TeleinfoExport(self.COLUMNS, FORMAT_BINARY, chunk_rows=3)
+
+        chunks = list(export.iter_chunks(self.rows(5)))
+
+        self.assertEqual(len(chunks), 2)
+        columns, rows = TeleinfoExport.decode(chunks[0][0])
+        self.assertEqual(columns, self.COLUMNS)
+        self.assertEqual(rows, list(self.rows(3)))
+        columns, rows = TeleinfoExport.decode(chunks[1][0])
+        self.assertEqual(rows, list(self.rows(5))[3:])
+
+    def test_binary_smaller_than_csv(self):
+        csv = b''.join([chunk for chunk, _ in TeleinfoExport(self.COLUMNS, FORMAT_CSV).iter_chunks(self.rows(1000))])
+        binary = b''.join([chunk for chunk, _ in TeleinfoExport(self.COLUMNS, FORMAT_BINARY).iter_chunks(self.rows(1000))])
+
+        self.assertLess(len(binary), len(csv))
+        self.assertEqual(len(binary), TeleinfoExport.HEADER.size + 2 + len('timestamp,power,HC,HP') + 1000 * 4 * 4)
+
+    def test_decode_invalid_chunk(self):
+        with self.assertRaises(ValueError):
+            TeleinfoExport.decode(b'XXXX' + b'\0' * 20)
+
+    def test_invalid_format(self):
+        with self.assertRaises(ValueError):
+            TeleinfoExport(self.COLUMNS, 'json')
+
+    def test_parse_cursor(self):
+        self.assertEqual(TeleinfoExport.parse_cursor('1000:2'), (1000, 2))
+
+        with self.assertRaises(ValueError):
+            TeleinfoExport.parse_cursor('1000')
+        with self.assertRaises(ValueError):
+            TeleinfoExport.parse_cursor('1000:-1')
+        with self.assertRaises(ValueError):
+            TeleinfoExport.parse_cursor('abc:1')
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinfoframe import TeleinfoFrame
+
+
+
+class TestTeleinfoFrame(unittest.TestCase):
+
+    RAW = {
+        'ADCO': '041529016009',
+        'OPTARIF': 'HC..',
+        'HCHC': '000643083',
+        'PTEC': 'HP..',
+        'IINST': '003',
+        'PAPP': '0X620',
+    }
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+
+    def test_frame_is_dict(self):
+        frame = TeleinfoFrame(self.RAW)
+
+        self.assertEqual(frame, self.RAW)
+        self.assertEqual(frame['PTEC'], 'HP..')
+
+    def test_numbers(self):
+        frame = TeleinfoFrame(self.RAW)
+
+        # ADCO looks like a number but is an address
+        self.assertEqual(frame.numbers, {'HCHC': 643083, 'IINST': 3, 'PAPP': None})
+
+    def test_add(self):
+        frame = TeleinfoFrame()
+
+        frame.add('IINST', '012')
+        frame.add('PTEC', 'HP..')
+
+        self.assertEqual(frame, {'IINST': '012', 'PTEC': 'HP..'})
+        self.assertEqual(frame.numbers, {'IINST': 12})
+
+    def test_labels_interned(self):
+        label = ''.join(['II', 'NST'])
+        frame = TeleinfoFrame({label: '003'})
+
+        self.assertIs(list(frame.keys())[0], sys.intern('IINST'))
+
+    def test_no_instance_dict(self):
+        frame = TeleinfoFrame()
+
+        with self.assertRaises(AttributeError):
+            frame.dummy = 1
+
+    def test_get_numbers(self):
+        frame = TeleinfoFrame(self.RAW)
+
+        self.assertIs(TeleinfoFrame.get_numbers(frame), frame.numbers)
+        self.assertEqual(TeleinfoFrame.get_numbers(self.RAW), frame.numbers)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
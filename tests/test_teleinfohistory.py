@@ -0,0 +1,82 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinfohistory import TeleinfoHistory
+
+
+
+class TestTeleinfoHistory(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.history = TeleinfoHistory(10)
+
+    def test_memory_usage(self):
+        self.assertEqual(self.history.timestamps.itemsize + self.history.powers.itemsize +
+                         self.history.heurescreuses.itemsize + self.history.heurespleines.itemsize, 16)
+
+    def test_get_empty(self):
+        self.assertEqual(self.history.get(0, 2000000000, 1), [])
+
+    def test_get_full_resolution(self):
+        for i in range(5):
+            self.history.append(1000 + i, 100 * i, 10 + i, 20 + i)
+
+        samples = self.history.get(1001, 1003, 1)
+
+        self.assertEqual(samples, [
+            {'timestamp': 1001, 'power': 100, 'heurescreuses': 11, 'heurespleines': 21},
+            {'timestamp': 1002, 'power': 200, 'heurescreuses': 12, 'heurespleines': 22},
+            {'timestamp': 1003, 'power': 300, 'heurescreuses': 13, 'heurespleines': 23},
+        ])
+
+    def test_get_downsampled(self):
+        for i in range(8):
+            self.history.append(1000 + i, 100 * i, 10 + i, 20 + i)
+
+        samples = self.history.get(0, 2000, 4)
+
+        self.assertEqual(samples, [
+            {'timestamp': 1000, 'power': 150, 'heurescreuses': 13, 'heurespleines': 23},
+            {'timestamp': 1004, 'power': 550, 'heurescreuses': 17, 'heurespleines': 27},
+        ])
+
+    def test_ring_buffer_overwrites_oldest_samples(self):
+        for i in range(25):
+            self.history.append(1000 + i, i, i, i)
+
+        samples = self.history.get(0, 2000, 1)
+
+        self.assertEqual(self.history.count, 10)
+        self.assertEqual(len(samples), 10)
+        self.assertEqual(samples[0]['timestamp'], 1015)
+        self.assertEqual(samples[-1]['timestamp'], 1024)
+
+    def test_get_after_wrap_around(self):
+        for i in range(15):
+            self.history.append(1000 + i * 10, i, i, i)
+
+        samples = self.history.get(1075, 1115, 1)
+
+        self.assertEqual([sample['timestamp'] for sample in samples], [1080, 1090, 1100, 1110])
+
+    def test_append_timestamp_backward(self):
+        self.history.append(1000, 1, 1, 1)
+        self.history.append(1001, 1, 1, 1)
+
+        self.history.append(500, 2, 2, 2)
+
+        self.assertEqual(self.history.count, 1)
+        self.assertEqual(self.history.get(0, 2000, 1)[0]['timestamp'], 500)
+
+    def test_clear(self):
+        self.history.append(1000, 1, 1, 1)
+        self.history.clear()
+
+        self.assertEqual(self.history.get(0, 2000, 1), [])
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinfometer import TeleinfoMeter
+from backend.teleinfoeventpolicy import TeleinfoEventPolicy
+from mock import Mock
+
+
+
+class TestTeleinfoMeter(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.meter = TeleinfoMeter('meter', '/dev/ttyUSB0', False, TeleinfoEventPolicy(500, 20, 60), 10)
+        self.meter.serial = Mock()
+        self.meter.stats = Mock()
+
+    def test_read_serial_waiting_bytes(self):
+        self.meter.serial.in_waiting = 12
+        self.meter.serial.read.return_value = b'x' * 12
+
+        self.assertEqual(self.meter.read_serial(), b'x' * 12)
+
+        self.meter.serial.read.assert_called_with(12)
+        self.assertEqual(self.meter.stats.add.call_args[0][0], 'read')
+
+    def test_read_serial_no_waiting_bytes(self):
+        self.meter.serial.in_waiting = 0
+        self.meter.serial.read.return_value = b'x'
+
+        self.assertEqual(self.meter.read_serial(), b'x')
+
+        self.meter.serial.read.assert_called_with(1)
+        self.assertFalse(self.meter.stats.add.called)
+
+    def test_close_serial(self):
+        serial = self.meter.serial
+
+        self.meter.close_serial()
+
+        self.assertTrue(serial.close.called)
+        self.assertIsNone(self.meter.serial)
+        # already closed
+        self.meter.close_serial()
+
+    def test_schedule_reconnect(self):
+        self.assertEqual(self.meter.schedule_reconnect(100.0), 1.0)
+        self.assertEqual(self.meter.reconnect_at, 101.0)
+        self.assertEqual(self.meter.schedule_reconnect(100.0), 2.0)
+        self.assertEqual(self.meter.schedule_reconnect(100.0), 4.0)
+        self.assertEqual(self.meter.reconnect_attempts, 3)
+
+    def test_schedule_reconnect_max_delay(self):
+        self.meter.reconnect_attempts = 100
+
+        self.assertEqual(self.meter.schedule_reconnect(100.0), TeleinfoMeter.RECONNECT_MAX_DELAY)
+
+    def test_reset_reconnect(self):
+        self.meter.schedule_reconnect(100.0)
+
+        self.meter.reset_reconnect()
+
+        self.assertEqual(self.meter.reconnect_attempts, 0)
+        self.assertEqual(self.meter.reconnect_at, 0.0)
+
+    def test_get_frame(self):
+        self.assertEqual(self.meter.get_frame(), {})
+
+        self.meter.reader = Mock()
+        self.meter.reader.get_frame.return_value = {'IINST': '002'}
+
+        self.assertEqual(self.meter.get_frame(), {'IINST': '002'})
+
+    def test_last_raw(self):
+        self.assertEqual(self.meter.last_raw, {})
+        raw = {'IINST': '002'}
+
+        self.meter.last_raw = raw
+        self.meter.last_raw = raw
+
+        self.assertEqual(self.meter.last_raw, raw)
+        self.assertEqual(self.meter.snapshot.sequence, 1)
+
+    def test_to_dict(self):
+        infos = self.meter.to_dict()
+
+        self.assertEqual(infos['name'], 'meter')
+        self.assertEqual(infos['port'], '/dev/ttyUSB0')
+        self.assertFalse(infos['primary'])
+        self.assertFalse(infos['connected'])
+        self.assertEqual(infos['framesread'], 0)
+        self.assertEqual(infos['sequence'], 0)
+        self.assertIsNone(infos['powersource'])
+
+        self.meter.reader = Mock(frames_count=3)
+
+        infos = self.meter.to_dict()
+
+        self.assertTrue(infos['connected'])
+        self.assertEqual(infos['framesread'], 3)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinfooverload import TeleinfoOverload
+
+
+
+class TestTeleinfoOverload(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.overload = TeleinfoOverload(headroom=10, ramp=3000, ramp_window=10)
+
+    def frame(self, iinst):
+        return {'ISOUSC': '30', 'IINST': '%03d' % iinst}
+
+    def test_no_overload(self):
+        self.assertFalse(self.overload.check(0.0, self.frame(10), 2200))
+
+        self.assertEqual(self.overload.to_dict(), {'overload': False, 'rules': [], 'headroom': 67})
+
+    def test_adps_historic(self):
+        self.assertTrue(self.overload.check(0.0, dict(self.frame(10), ADPS='031'), None))
+
+        self.assertTrue(self.overload.overload)
+        self.assertEqual(self.overload.to_dict()['rules'], ['adps'])
+
+    def test_adps_standard(self):
+        self.assertFalse(self.overload.check(0.0, {'STGE': '003A0001'}, None))
+
+        self.assertTrue(self.overload.check(1.0, {'STGE': '003A0081'}, None))
+        self.assertEqual(self.overload.to_dict()['rules'], ['adps'])
+
+    def test_adps_invalid_status(self):
+        self.assertFalse(self.overload.check(0.0, {'STGE': 'XXXXXXXX'}, None))
+
+    def test_adps_hysteresis(self):
+        self.overload.check(0.0, dict(self.frame(10), ADPS='031'), None)
+
+        # cleared after CLEAR_FRAMES frames without ADPS
+        for index in range(TeleinfoOverload.CLEAR_FRAMES - 1):
+            self.assertFalse(self.overload.check(1.0 + index, self.frame(10), None))
+            self.assertTrue(self.overload.overload)
+        self.assertTrue(self.overload.check(10.0, self.frame(10), None))
+        self.assertFalse(self.overload.overload)
+
+    def test_headroom_raised_on_first_frame(self):
+        self.assertTrue(self.overload.check(0.0, self.frame(28), None))
+
+        self.assertEqual(self.overload.to_dict(), {'overload': True, 'rules': ['headroom'], 'headroom': 7})
+
+    def test_headroom_hysteresis(self):
+        self.overload.check(0.0, self.frame(28), None)
+
+        # 13% headroom is still in hysteresis band: never cleared
+        for index in range(10):
+            self.assertFalse(self.overload.check(1.0 + index, self.frame(26), None))
+        self.assertTrue(self.overload.overload)
+
+        # frame back in band resets clear count
+        self.overload.check(20.0, self.frame(20), None)
+        self.overload.check(21.0, self.frame(26), None)
+        self.overload.check(22.0, self.frame(20), None)
+        self.overload.check(23.0, self.frame(20), None)
+        self.assertTrue(self.overload.overload)
+        self.assertTrue(self.overload.check(24.0, self.frame(20), None))
+        self.assertFalse(self.overload.overload)
+
+    def test_headroom_three_phases(self):
+        raw = {'ISOUSC': '20', 'IINST1': '005', 'IINST2': '019', 'IINST3': '002'}
+
+        self.assertTrue(self.overload.check(0.0, raw, None))
+        self.assertEqual(self.overload.to_dict()['headroom'], 5)
+
+    def test_headroom_standard(self):
+        self.assertTrue(self.overload.check(0.0, {'PREF': '06', 'SINSTS': '05700'}, 5700))
+
+        self.assertEqual(self.overload.to_dict(), {'overload': True, 'rules': ['headroom'], 'headroom': 5})
+
+    def test_headroom_not_available(self):
+        self.assertFalse(self.overload.check(0.0, {'IINST': '045'}, None))
+
+        self.assertIsNone(self.overload.to_dict()['headroom'])
+
+    def test_headroom_disabled(self):
+        self.overload.configure(0, 3000, 10)
+
+        self.assertFalse(self.overload.check(0.0, self.frame(30), None))
+
+    def test_ramp(self):
+        self.assertFalse(self.overload.check(0.0, {}, 500))
+        self.assertFalse(self.overload.check(2.0, {}, 2000))
+
+        self.assertTrue(self.overload.check(4.0, {}, 3600))
+        self.assertEqual(self.overload.to_dict()['rules'], ['ramp'])
+
+    def test_ramp_out_of_window(self):
+        self.overload.check(0.0, {}, 500)
+
+        self.assertFalse(self.overload.check(11.0, {}, 3600))
+
+    def test_ramp_hysteresis(self):
+        self.overload.check(0.0, {}, 500)
+        self.overload.check(1.0, {}, 3600)
+
+        # power still more than half ramp above window minimum
+        for index in range(5):
+            self.assertFalse(self.overload.check(2.0 + index, {}, 2100))
+        self.assertTrue(self.overload.overload)
+
+        # window minimum is now 2100
+        for index in range(TeleinfoOverload.CLEAR_FRAMES - 1):
+            self.assertFalse(self.overload.check(20.0 + index, {}, 2100))
+        self.assertTrue(self.overload.check(30.0, {}, 2100))
+        self.assertFalse(self.overload.overload)
+
+    def test_ramp_disabled(self):
+        self.overload.configure(10, 0, 10)
+
+        self.overload.check(0.0, {}, 500)
+        self.assertFalse(self.overload.check(1.0, {}, 9000))
+
+    def test_several_rules(self):
+        self.assertFalse(self.overload.check(0.0, self.frame(5), 1100))
+        self.assertTrue(self.overload.check(1.0, dict(self.frame(28), ADPS='028'), 6160))
+
+        self.assertEqual(self.overload.to_dict()['rules'], ['adps', 'headroom', 'ramp'])
+
+    def test_configure_keeps_state(self):
+        self.overload.check(0.0, self.frame(28), None)
+
+        self.overload.configure(5, 3000, 10)
+
+        self.assertTrue(self.overload.overload)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
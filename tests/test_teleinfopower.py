@@ -0,0 +1,94 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinfopower import TeleinfoPower
+
+
+
+class TestTeleinfoPower(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.power = TeleinfoPower(smoothing=0.5)
+
+    def test_apparent_power_historic(self):
+        self.assertEqual(self.power.update(0.0, {'PAPP': '00620', 'IINST': '003'}, [1000], 3), (620, TeleinfoPower.SOURCE_APPARENT))
+        self.assertEqual(self.power.power, 620)
+        self.assertEqual(self.power.source, TeleinfoPower.SOURCE_APPARENT)
+
+    def test_apparent_power_standard(self):
+        self.assertEqual(self.power.update(0.0, {'SINSTS': '00910', 'IRMS1': '004'}, [1000], 4), (910, TeleinfoPower.SOURCE_APPARENT))
+
+    def test_current_fallback(self):
+        self.assertEqual(self.power.update(0.0, {'IINST': '003'}, None, 3), (3 * TeleinfoPower.VA_FACTOR, TeleinfoPower.SOURCE_CURRENT))
+
+    def test_invalid_apparent_power(self):
+        self.assertEqual(self.power.update(0.0, {'PAPP': '0X620'}, None, 3), (3 * TeleinfoPower.VA_FACTOR, TeleinfoPower.SOURCE_CURRENT))
+
+    def test_no_power(self):
+        self.assertEqual(self.power.update(0.0, {'ADCO': '000000000000'}, None, None), (None, None))
+
+    def test_index_power(self):
+        # first increment only anchors estimation
+        self.power.update(0.0, {}, [1000], 1)
+        self.power.update(2.0, {}, [1001], 1)
+        self.assertEqual(self.power.update(2.5, {}, [1001], 1), (TeleinfoPower.VA_FACTOR, TeleinfoPower.SOURCE_CURRENT))
+
+        # 2Wh in 4 seconds
+        self.assertEqual(self.power.update(6.0, {}, [1003], 1), (1800, TeleinfoPower.SOURCE_INDEX))
+        self.assertEqual(self.power.active_power, 1800.0)
+
+    def test_index_power_several_indexes(self):
+        self.power.update(0.0, {}, [1000, 2000], None)
+        self.power.update(1.0, {}, [1000, 2001], None)
+
+        self.assertEqual(self.power.update(3.0, {}, [1001, 2001], None), (1800, TeleinfoPower.SOURCE_INDEX))
+
+    def test_index_power_smoothing(self):
+        self.power.update(0.0, {}, [1000], None)
+        self.power.update(1.0, {}, [1001], None)
+        self.power.update(3.0, {}, [1003], None)
+
+        # new estimation 7200W smoothed with 3600W
+        self.assertEqual(self.power.update(4.0, {}, [1005], None), (5400, TeleinfoPower.SOURCE_INDEX))
+
+    def test_index_power_decay(self):
+        self.power.update(0.0, {}, [1000], None)
+        self.power.update(1.0, {}, [1001], None)
+        self.power.update(2.0, {}, [1002], None)
+        self.assertEqual(self.power.active_power, 3600.0)
+
+        # no increment for 10 seconds: less than 360W
+        self.assertEqual(self.power.update(12.0, {}, [1002], None), (360, TeleinfoPower.SOURCE_INDEX))
+
+    def test_index_decreased(self):
+        self.power.update(0.0, {}, [1000], None)
+        self.power.update(1.0, {}, [1001], None)
+        self.power.update(2.0, {}, [1002], None)
+
+        self.assertEqual(self.power.update(3.0, {}, [10], 1), (TeleinfoPower.VA_FACTOR, TeleinfoPower.SOURCE_CURRENT))
+        self.assertIsNone(self.power.active_power)
+
+    def test_same_frame(self):
+        raw = {}
+        self.power.update(0.0, {}, [1000], None)
+        self.power.update(1.0, {}, [1001], None)
+        self.power.update(2.0, raw, [1002], None)
+
+        # same frame processed again later is ignored
+        self.assertEqual(self.power.update(20.0, raw, [1002], None), (3600, TeleinfoPower.SOURCE_INDEX))
+
+    def test_reset(self):
+        self.power.update(0.0, {'PAPP': '00620'}, [1000], None)
+
+        self.power.reset()
+
+        self.assertIsNone(self.power.power)
+        self.assertIsNone(self.power.source)
+        self.assertIsNone(self.power.active_power)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
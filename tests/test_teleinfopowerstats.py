@@ -0,0 +1,130 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinfopowerstats import TeleinfoPowerStats
+import math
+import random
+
+
+
+class TestTeleinfoPowerStats(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.stats = TeleinfoPowerStats()
+
+    def test_empty_window(self):
+        self.assertEqual(self.stats.get('1m', 1000.0), {
+            'window': '1m',
+            'count': 0,
+            'min': None,
+            'max': None,
+            'mean': None,
+            'stddev': None,
+            'p50': None,
+            'p95': None,
+            'p99': None,
+        })
+
+    def test_moments(self):
+        for index, power in enumerate([100, 200, 300, 400]):
+            self.stats.add(1000.0 + index, power)
+
+        stats = self.stats.get('1m', 1003.0)
+
+        self.assertEqual(stats['count'], 4)
+        self.assertEqual(stats['min'], 100)
+        self.assertEqual(stats['max'], 400)
+        self.assertEqual(stats['mean'], 250.0)
+        self.assertEqual(stats['stddev'], round(math.sqrt(12500.0), 1))
+
+    def test_moments_merged_over_slots(self):
+        values = [random.randint(100, 5000) for _ in range(600)]
+        for index, power in enumerate(values):
+            self.stats.add(10000.0 + index, power)
+
+        stats = self.stats.get('15m', 10599.0)
+
+        mean = sum(values) / float(len(values))
+        stddev = math.sqrt(sum([(value - mean) ** 2 for value in values]) / len(values))
+        self.assertEqual(stats['count'], 600)
+        self.assertAlmostEqual(stats['mean'], mean, delta=0.1)
+        self.assertAlmostEqual(stats['stddev'], stddev, delta=0.1)
+        self.assertEqual(stats['min'], min(values))
+        self.assertEqual(stats['max'], max(values))
+
+    def test_percentiles(self):
+        values = list(range(1, 1001))
+        random.shuffle(values)
+        for index, power in enumerate(values):
+            self.stats.add(10000.0 + index, power)
+
+        stats = self.stats.get('1h', 10999.0)
+
+        for name, expected in (('p50', 500), ('p95', 950), ('p99', 990)):
+            self.assertAlmostEqual(stats[name], expected, delta=expected * TeleinfoPowerStats.ACCURACY + 1)
+
+    def test_percentiles_constant_power(self):
+        for index in range(100):
+            self.stats.add(1000.0 + index, 620)
+
+        stats = self.stats.get('1h', 1099.0)
+
+        self.assertEqual((stats['p50'], stats['p95'], stats['p99']), (620, 620, 620))
+
+    def test_zero_power(self):
+        self.stats.add(1000.0, 0)
+        self.stats.add(1001.0, 0)
+
+        stats = self.stats.get('1m', 1001.0)
+
+        self.assertEqual((stats['min'], stats['p50'], stats['p99']), (0, 0, 0))
+
+    def test_rolling_window(self):
+        for index in range(120):
+            self.stats.add(1200.0 + index, 100 if index<60 else 1000)
+
+        minute = self.stats.get('1m', 1319.0)
+        self.assertEqual(minute['min'], 1000)
+        self.assertEqual(minute['count'], 60)
+
+        quarter = self.stats.get('15m', 1319.0)
+        self.assertEqual(quarter['min'], 100)
+        self.assertEqual(quarter['count'], 120)
+
+    def test_window_expired(self):
+        self.stats.add(1000.0, 100)
+
+        self.assertEqual(self.stats.get('1m', 1100.0)['count'], 0)
+        self.assertEqual(self.stats.get('1d', 1100.0)['count'], 1)
+
+    def test_constant_memory(self):
+        for index in range(20000):
+            self.stats.add(index * 0.1, random.randint(0, 12000))
+
+        # whatever the samples count, each slot keeps a bounded sketch
+        stats = self.stats.get('1d', 2000.0)
+        self.assertEqual(stats['count'], 20000)
+        max_buckets = math.log(12000) / math.log(self.stats.gamma) + 2
+        windows = getattr(self.stats, '_TeleinfoPowerStats__windows')
+        for _, slots in windows.values():
+            for slot in slots:
+                if slot:
+                    self.assertLessEqual(len(slot[6]), max_buckets)
+
+    def test_invalid_window(self):
+        with self.assertRaises(ValueError):
+            self.stats.get('1y', 1000.0)
+
+    def test_reset(self):
+        self.stats.add(1000.0, 100)
+
+        self.stats.reset()
+
+        self.assertEqual(self.stats.get('1m', 1000.0)['count'], 0)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinfoprofile import TeleinfoProfile
+
+
+
+class TestTeleinfoProfile(unittest.TestCase):
+
+    HCHP = {
+        'OPTARIF': 'HC..',
+        'HCHC': '000643083',
+        'HCHP': '000825429',
+        'PTEC': 'HP..',
+        'IINST': '003',
+    }
+
+    TEMPO_TRI = {
+        'OPTARIF': 'BBR(',
+        'BBRHCJB': '000000001',
+        'BBRHPJB': '000000002',
+        'BBRHCJW': '000000003',
+        'BBRHPJW': '000000004',
+        'BBRHCJR': '000000005',
+        'BBRHPJR': '000000006',
+        'IINST1': '001',
+        'IINST2': '002',
+        'IINST3': '003',
+    }
+
+    STANDARD = {
+        'NGTF': '     TEMPO      ',
+        'EASF01': '000000100',
+        'EASF02': '000000200',
+        'EASF03': '000000300',
+        'EASF04': '000000400',
+        'EASF05': '000000500',
+        'EASF06': '000000600',
+        'IRMS1': '004',
+    }
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+
+    def test_detect_hchp(self):
+        profile = TeleinfoProfile.detect(self.HCHP)
+
+        self.assertEqual(profile.consumption, 'HCHP')
+        self.assertEqual(profile.current, 'MONO')
+        self.assertTrue(profile.complete)
+        self.assertEqual(profile.extract_consumption(self.HCHP), (643083, 825429, [643083, 825429]))
+        self.assertEqual(profile.extract_current(self.HCHP), 3)
+
+    def test_detect_tempo_triphase(self):
+        profile = TeleinfoProfile.detect(self.TEMPO_TRI)
+
+        self.assertEqual(profile.consumption, 'TEMPO')
+        self.assertEqual(profile.current, 'TRI')
+        self.assertEqual(profile.extract_consumption(self.TEMPO_TRI), (9, 12, [1, 2, 3, 4, 5, 6]))
+        self.assertEqual(profile.registers, ('HCJB', 'HPJB', 'HCJW', 'HPJW', 'HCJR', 'HPJR'))
+        self.assertEqual(profile.extract_current(self.TEMPO_TRI), 6)
+
+    def test_detect_base(self):
+        raw = {'BASE': '000001000', 'IINST': '001'}
+        profile = TeleinfoProfile.detect(raw)
+
+        self.assertEqual(profile.extract_consumption(raw), (1000, 0, [1000]))
+
+    def test_detect_standard(self):
+        profile = TeleinfoProfile.detect(self.STANDARD, 'HC')
+
+        self.assertEqual(profile.consumption, 'STANDARD')
+        self.assertEqual(profile.current, 'STANDARD_MONO')
+        self.assertEqual(profile.extract_consumption(self.STANDARD)[:2], (100, 200))
+
+    def test_detect_standard_tempo(self):
+        profile = TeleinfoProfile.detect(self.STANDARD, 'TEMPO')
+
+        self.assertEqual(profile.consumption, 'STANDARD_TEMPO')
+        self.assertEqual(profile.registers, ('HCJB', 'HPJB', 'HCJW', 'HPJW', 'HCJR', 'HPJR'))
+        self.assertEqual(profile.extract_consumption(self.STANDARD)[:2], (900, 1200))
+
+    def test_detect_incomplete_frame(self):
+        raw = {'IINST': '001'}
+        profile = TeleinfoProfile.detect(raw)
+
+        self.assertFalse(profile.complete)
+        self.assertFalse(profile.is_valid(raw))
+        self.assertIsNone(profile.extract_consumption(raw))
+        self.assertEqual(profile.extract_current(raw), 1)
+
+    def test_is_valid(self):
+        profile = TeleinfoProfile.detect(self.HCHP)
+
+        self.assertTrue(profile.is_valid(self.HCHP))
+        self.assertFalse(profile.is_valid(dict(self.HCHP, OPTARIF='BASE')))
+        self.assertTrue(TeleinfoProfile.detect(self.STANDARD).is_valid(self.STANDARD))
+
+    def test_extract_missing_label(self):
+        profile = TeleinfoProfile.detect(self.HCHP)
+
+        with self.assertRaises(KeyError):
+            profile.extract_consumption({'IINST': '001'})
+
+    def test_extract_invalid_value(self):
+        profile = TeleinfoProfile.detect(self.HCHP)
+
+        with self.assertRaises(ValueError):
+            profile.extract_current(dict(self.HCHP, IINST='0X1'))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinforeader import TeleinfoReader
+from backend.teleinfodecoder import TeleinfoDecoder
+import time
+from mock import Mock
+
+
+
+class TestTeleinfoReader(unittest.TestCase):
+
+    FRAME = {
+        'IINST': '002',
+        'PTEC': 'TH..',
+    }
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.logger = logging.getLogger('TestTeleinfoReader')
+        self.reader = None
+
+    def tearDown(self):
+        if self.reader:
+            self.reader.stop()
+
+    def init(self, read_bytes, on_frame=None):
+        self.reader = TeleinfoReader(read_bytes, self.logger, on_frame)
+        self.reader.EMPTY_READ_DELAY = 0.0
+        self.reader.ERROR_DELAY = 0.0
+
+    def test_get_frame_no_frame(self):
+        self.init(Mock(return_value=b''))
+
+        self.assertEqual(self.reader.get_frame(), {})
+        self.assertFalse(self.reader.wait_frame(0.0))
+
+    def test_read_once(self):
+        on_frame = Mock()
+        self.init(Mock(return_value=TeleinfoDecoder.encode_frame(self.FRAME)), on_frame)
+
+        self.assertEqual(self.reader.read_once(), 1)
+
+        self.assertEqual(self.reader.get_frame(), self.FRAME)
+        self.assertEqual(self.reader.frames_count, 1)
+        self.assertTrue(self.reader.wait_frame(0.0))
+        on_frame.assert_called_once_with(self.FRAME)
+
+    def test_read_once_multiple_frames(self):
+        on_frame = Mock()
+        frames = [{'IINST': '%03d' % i} for i in range(3)]
+        self.init(Mock(return_value=b''.join([TeleinfoDecoder.encode_frame(frame) for frame in frames])), on_frame)
+
+        self.assertEqual(self.reader.read_once(), 3)
+
+        self.assertEqual(self.reader.get_frame(), frames[2])
+        self.assertEqual(self.reader.frames_count, 3)
+        self.assertEqual(on_frame.call_count, 3)
+
+    def test_read_once_partial_frame(self):
+        data = TeleinfoDecoder.encode_frame(self.FRAME)
+        self.init(Mock(side_effect=[data[:10], data[10:]]))
+
+        self.assertEqual(self.reader.read_once(), 0)
+        self.assertEqual(self.reader.get_frame(), {})
+        self.assertEqual(self.reader.read_once(), 1)
+        self.assertEqual(self.reader.get_frame(), self.FRAME)
+
+    def test_read_once_nothing_read(self):
+        on_frame = Mock()
+        self.init(Mock(side_effect=[TeleinfoDecoder.encode_frame(self.FRAME), b'']), on_frame)
+
+        self.reader.read_once()
+        self.assertEqual(self.reader.read_once(), 0)
+
+        # latest valid frame is kept
+        self.assertEqual(self.reader.get_frame(), self.FRAME)
+        self.assertEqual(self.reader.frames_count, 1)
+        self.assertEqual(on_frame.call_count, 1)
+
+    def test_read_once_read_exception(self):
+        self.init(Mock(side_effect=Exception('test')))
+
+        self.assertEqual(self.reader.read_once(), 0)
+        self.assertEqual(self.reader.get_frame(), {})
+
+    def test_read_once_read_exception_on_error(self):
+        error = Exception('test')
+        self.init(Mock(side_effect=error))
+        self.reader.on_error = Mock()
+
+        self.assertEqual(self.reader.read_once(), 0)
+
+        self.reader.on_error.assert_called_once_with(error)
+        self.assertFalse(self.reader.running)
+
+    def test_read_once_on_frame_exception(self):
+        self.init(Mock(return_value=TeleinfoDecoder.encode_frame(self.FRAME)), Mock(side_effect=Exception('test')))
+
+        self.assertEqual(self.reader.read_once(), 1)
+        self.assertEqual(self.reader.get_frame(), self.FRAME)
+
+    def test_feed_capture(self):
+        self.init(Mock(return_value=b''))
+        self.reader.capture = Mock()
+        data = TeleinfoDecoder.encode_frame(self.FRAME)
+
+        self.assertEqual(len(self.reader.feed(data)), 1)
+
+        self.reader.capture.write.assert_called_once_with(data)
+
+    def test_feed_capture_exception(self):
+        self.init(Mock(return_value=b''))
+        self.reader.capture = Mock()
+        self.reader.capture.write.side_effect = Exception('test')
+
+        self.assertEqual(len(self.reader.feed(TeleinfoDecoder.encode_frame(self.FRAME))), 1)
+        self.assertIsNone(self.reader.capture)
+
+    def test_feed_stats(self):
+        self.init(Mock(return_value=b''))
+        self.reader.stats = Mock()
+
+        self.reader.feed(TeleinfoDecoder.encode_frame(self.FRAME))
+
+        self.assertEqual(self.reader.stats.add.call_args[0][0], 'decode')
+
+    def test_run(self):
+        frames = [{'IINST': '%03d' % i} for i in range(10)]
+        def read_bytes():
+            if frames:
+                return TeleinfoDecoder.encode_frame(frames.pop(0))
+            time.sleep(0.01)
+            return b''
+        self.init(read_bytes)
+
+        self.reader.start()
+        self.assertTrue(self.reader.wait_frame(1.0))
+        time.sleep(0.2)
+        self.reader.stop()
+        self.reader.join(1.0)
+
+        self.assertFalse(self.reader.is_alive())
+        self.assertEqual(self.reader.frames_count, 10)
+        self.assertEqual(self.reader.get_frame(), {'IINST': '009'})
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinforeplay import TeleinfoReplay
+from backend.teleinfocapture import TeleinfoCaptureWriter
+from backend.teleinfodecoder import TeleinfoDecoder
+import os
+import time
+import select
+import shutil
+import tempfile
+
+
+
+class TestTeleinfoReplay(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.logger = logging.getLogger('TestTeleinfoReplay')
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'capture.tic')
+        self.frames = [{'IINST': '%03d' % i, 'PTEC': 'TH..'} for i in range(5)]
+        writer = TeleinfoCaptureWriter(self.path, 1200)
+        writer.open(1000.0)
+        for position, frame in enumerate(self.frames):
+            writer.write(TeleinfoDecoder.encode_frame(frame), 1000.0 + position * 1.0)
+        writer.close()
+        self.replay = None
+
+    def tearDown(self):
+        if self.replay:
+            self.replay.stop()
+            if self.replay.is_alive():
+                self.replay.join(1.0)
+            self.replay.close()
+        shutil.rmtree(self.directory)
+
+    def init(self, speed, loop=False):
+        self.replay = TeleinfoReplay(self.path, self.logger, os.path.join(self.directory, 'by-id'), speed, loop)
+        return self.replay.open()
+
+    def read_frames(self, link, count, timeout=2.0):
+        decoder = TeleinfoDecoder()
+        frames = []
+        fd = os.open(link, os.O_RDONLY | os.O_NOCTTY)
+        try:
+            end = time.time() + timeout
+            while len(frames) < count and time.time() < end:
+                if select.select([fd], [], [], 0.1)[0]:
+                    frames.extend(decoder.feed(os.read(fd, 1024)))
+        finally:
+            os.close(fd)
+        return frames
+
+    def test_open_creates_dongle_link(self):
+        link = self.init(1.0)
+
+        self.assertTrue(os.path.islink(link))
+        self.assertTrue(link.find('TINFO') > 0)
+
+        self.replay.close()
+        self.assertFalse(os.path.lexists(link))
+
+    def test_replay_max_speed(self):
+        link = self.init(0)
+
+        self.replay.start()
+        frames = self.read_frames(link, 5)
+
+        self.assertEqual(frames, self.frames)
+
+    def test_replay_speed_factor(self):
+        link = self.init(20.0)
+
+        start = time.time()
+        self.replay.start()
+        frames = self.read_frames(link, 5)
+        duration = time.time() - start
+
+        # 4 seconds capture replayed at 20x
+        self.assertEqual(len(frames), 5)
+        self.assertGreaterEqual(duration, 0.18)
+        self.assertLess(duration, 1.0)
+
+    def test_replay_loop(self):
+        link = self.init(0, loop=True)
+
+        self.replay.start()
+        frames = self.read_frames(link, 12)
+
+        self.assertGreaterEqual(len(frames), 12)
+
+    def test_stop(self):
+        self.init(1.0)
+
+        self.replay.start()
+        self.replay.stop()
+        self.replay.join(2.0)
+
+        self.assertFalse(self.replay.is_alive())
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,208 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinforollups import TeleinfoRollups
+import os
+import json
+import time
+import shutil
+import tempfile
+
+
+
+class TestTeleinfoRollups(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.logger = logging.getLogger('TestTeleinfoRollups')
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'rollups.json')
+        self.rollups = TeleinfoRollups(self.path, self.logger)
+        # monday 2021-05-03 10:00 local time
+        self.monday = int(time.mktime((2021, 5, 3, 10, 0, 0, 0, 0, -1)))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_bucket_bounds(self):
+        start, end = TeleinfoRollups.get_bucket_bounds('hour', self.monday + 1800)
+        self.assertEqual((start, end), (self.monday, self.monday + 3600))
+
+        start, end = TeleinfoRollups.get_bucket_bounds('day', self.monday)
+        self.assertEqual(start, int(time.mktime((2021, 5, 3, 0, 0, 0, 0, 0, -1))))
+        self.assertEqual(end, int(time.mktime((2021, 5, 4, 0, 0, 0, 0, 0, -1))))
+
+        # thursday belongs to week starting on monday
+        start, end = TeleinfoRollups.get_bucket_bounds('week', self.monday + 3 * 86400)
+        self.assertEqual(start, int(time.mktime((2021, 5, 3, 0, 0, 0, 0, 0, -1))))
+        self.assertEqual(end, int(time.mktime((2021, 5, 10, 0, 0, 0, 0, 0, -1))))
+
+        start, end = TeleinfoRollups.get_bucket_bounds('month', self.monday)
+        self.assertEqual(start, int(time.mktime((2021, 5, 1, 0, 0, 0, 0, 0, -1))))
+        self.assertEqual(end, int(time.mktime((2021, 6, 1, 0, 0, 0, 0, 0, -1))))
+
+    def test_get_bucket_bounds_invalid_period(self):
+        with self.assertRaises(ValueError):
+            TeleinfoRollups.get_bucket_bounds('year', self.monday)
+
+    def test_update(self):
+        self.rollups.update(self.monday, [1000, 2000])
+        self.rollups.update(self.monday + 60, [1010, 2000])
+        self.rollups.update(self.monday + 3600, [1010, 2005])
+
+        hours = self.rollups.get('hour', self.monday, self.monday + 7200)
+        self.assertEqual(hours, [
+            {'timestamp': self.monday, 'consumption': [10, 0], 'total': 10},
+            {'timestamp': self.monday + 3600, 'consumption': [0, 5], 'total': 5},
+        ])
+        days = self.rollups.get('day', self.monday, self.monday)
+        self.assertEqual(len(days), 1)
+        self.assertEqual(days[0]['consumption'], [10, 5])
+        self.assertEqual(self.rollups.get('month', self.monday, self.monday)[0]['total'], 15)
+        self.assertEqual(self.rollups.get('week', self.monday, self.monday)[0]['total'], 15)
+
+    def test_get_range(self):
+        self.rollups.update(self.monday, [0])
+        for hour in range(1, 6):
+            self.rollups.update(self.monday + hour * 3600, [hour * 100])
+
+        hours = self.rollups.get('hour', self.monday + 2 * 3600 + 10, self.monday + 4 * 3600)
+
+        self.assertEqual([hour['timestamp'] for hour in hours], [self.monday + 2 * 3600, self.monday + 3 * 3600, self.monday + 4 * 3600])
+
+    def test_update_indexes_decrease(self):
+        self.rollups.update(self.monday, [1000])
+        self.rollups.update(self.monday + 60, [10])
+        self.rollups.update(self.monday + 120, [15])
+
+        self.assertEqual(self.rollups.get('hour', self.monday, self.monday)[0]['consumption'], [5])
+
+    def test_update_tariff_option_changed(self):
+        self.rollups.update(self.monday, [1000])
+        self.rollups.update(self.monday + 60, [1000, 2000])
+        self.rollups.update(self.monday + 120, [1001, 2002])
+
+        self.assertEqual(self.rollups.get('hour', self.monday, self.monday)[0]['consumption'], [1, 2])
+
+    def test_retention(self):
+        self.rollups.RETENTION = dict(self.rollups.RETENTION, hour=3)
+        for hour in range(6):
+            self.rollups.update(self.monday + hour * 3600, [hour])
+
+        self.assertEqual(len(self.rollups.starts['hour']), 3)
+
+    def test_checkpoint(self):
+        self.rollups.update(self.monday, [1000, 2000])
+        self.rollups.update(self.monday + 60, [1010, 2020])
+        self.rollups.save()
+
+        rollups = TeleinfoRollups(self.path, self.logger)
+        rollups.load()
+        # consumption while stopped is added to first bucket after restart
+        rollups.update(self.monday + 120, [1015, 2020])
+
+        self.assertEqual(rollups.get('hour', self.monday, self.monday)[0]['consumption'], [15, 20])
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_checkpoint_interval(self):
+        self.rollups.CHECKPOINT_INTERVAL = 0
+        self.assertFalse(self.rollups.checkpoint_if_due())
+
+        self.rollups.update(self.monday, [1000])
+        self.rollups.update(self.monday + 60, [1010])
+
+        # update never writes checkpoint
+        self.assertFalse(os.path.exists(self.path))
+        self.assertTrue(self.rollups.checkpoint_if_due())
+        self.assertTrue(os.path.exists(self.path))
+        # nothing changed since last checkpoint
+        self.assertFalse(self.rollups.checkpoint_if_due())
+
+    def test_checkpoint_not_due(self):
+        self.rollups.update(self.monday, [1000])
+        self.rollups.update(self.monday + 60, [1010])
+
+        self.assertFalse(self.rollups.checkpoint_if_due())
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_load_invalid_checkpoint(self):
+        with open(self.path, 'w') as fd:
+            fd.write('invalid')
+
+        self.rollups.load()
+
+        self.assertEqual(self.rollups.get('day', self.monday, self.monday), [])
+
+
+    def test_costs(self):
+        self.rollups.set_prices([0.1, 0.2])
+        self.rollups.update(self.monday, [1000, 2000])
+        self.rollups.update(self.monday + 60, [1500, 3000])
+
+        current = self.rollups.get_current('hour', self.monday + 120)
+        self.assertEqual(current['timestamp'], self.monday)
+        self.assertEqual(current['consumption'], [500, 1000])
+        self.assertAlmostEqual(current['cost'][0], 0.05)
+        self.assertAlmostEqual(current['cost'][1], 0.2)
+
+    def test_costs_price_change(self):
+        self.rollups.set_prices([0.1, 0.2])
+        self.rollups.update(self.monday, [1000, 2000])
+        self.rollups.update(self.monday + 60, [2000, 2000])
+
+        # cost already accounted is kept
+        self.rollups.set_prices([1.0, 0.2])
+        self.rollups.update(self.monday + 120, [3000, 2000])
+
+        current = self.rollups.get_current('day', self.monday + 120)
+        self.assertEqual(current['consumption'], [2000, 0])
+        self.assertAlmostEqual(current['cost'][0], 1.1)
+
+    def test_costs_without_prices(self):
+        self.rollups.update(self.monday, [1000])
+        self.rollups.update(self.monday + 60, [2000])
+
+        self.assertEqual(self.rollups.get_current('month', self.monday)['cost'], [0.0])
+
+    def test_get_current_new_bucket(self):
+        self.rollups.update(self.monday, [1000])
+        self.rollups.update(self.monday + 60, [2000])
+
+        current = self.rollups.get_current('hour', self.monday + 3600)
+
+        self.assertEqual(current, {'timestamp': self.monday + 3600, 'consumption': [], 'cost': []})
+
+    def test_save_and_load_costs(self):
+        self.rollups.set_prices([0.1])
+        self.rollups.update(self.monday, [1000])
+        self.rollups.update(self.monday + 60, [2000])
+        self.rollups.save()
+
+        rollups = TeleinfoRollups(self.path, self.logger)
+        rollups.load()
+
+        self.assertAlmostEqual(rollups.get_current('week', self.monday)['cost'][0], 0.1)
+
+    def test_load_checkpoint_without_costs(self):
+        self.rollups.update(self.monday, [1000])
+        self.rollups.update(self.monday + 60, [2000])
+        self.rollups.save()
+        with open(self.path) as fd:
+            content = json.load(fd)
+        del content['costs']
+        with open(self.path, 'w') as fd:
+            json.dump(content, fd)
+
+        rollups = TeleinfoRollups(self.path, self.logger)
+        rollups.load()
+        rollups.update(self.monday + 120, [3000])
+
+        current = rollups.get_current('hour', self.monday)
+        self.assertEqual(current['consumption'], [2000])
+        self.assertEqual(current['cost'], [0.0])
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinfosnapshot import TeleinfoSnapshot
+
+
+
+class TestTeleinfoSnapshot(unittest.TestCase):
+
+    FRAME1 = {'ADCO': '000000000000', 'IINST': '002', 'PAPP': '00450', 'PTEC': 'HP..'}
+    FRAME2 = {'ADCO': '000000000000', 'IINST': '003', 'PAPP': '00690', 'PTEC': 'HP..'}
+    FRAME3 = {'ADCO': '000000000000', 'IINST': '003', 'PAPP': '00690', 'PTEC': 'HP..', 'ADPS': '045'}
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.snapshot = TeleinfoSnapshot()
+
+    def test_no_frame(self):
+        self.assertEqual(self.snapshot.sequence, 0)
+        self.assertEqual(self.snapshot.raw, {})
+        self.assertEqual(self.snapshot.get(), [])
+
+        changes = self.snapshot.get_changes(0)
+
+        self.assertTrue(changes['unchanged'])
+        self.assertEqual(changes['sequence'], 0)
+
+    def test_update(self):
+        self.assertTrue(self.snapshot.update(self.FRAME1))
+
+        self.assertEqual(self.snapshot.sequence, 1)
+        self.assertEqual(self.snapshot.raw, self.FRAME1)
+        self.assertEqual(self.snapshot.get(), [{'key': key, 'value': value} for key, value in self.FRAME1.items()])
+
+    def test_update_same_frame(self):
+        self.snapshot.update(self.FRAME1)
+
+        self.assertFalse(self.snapshot.update(self.FRAME1))
+
+        self.assertEqual(self.snapshot.sequence, 1)
+
+    def test_update_same_values(self):
+        self.snapshot.update(self.FRAME1)
+        self.assertTrue(self.snapshot.update(dict(self.FRAME1)))
+
+        self.assertEqual(self.snapshot.sequence, 2)
+        self.assertTrue(self.snapshot.get_changes(1)['unchanged'])
+
+    def test_get_is_prebuilt(self):
+        self.snapshot.update(self.FRAME1)
+
+        self.assertIs(self.snapshot.get(), self.snapshot.get())
+
+    def test_get_changes(self):
+        self.snapshot.update(self.FRAME1)
+        self.snapshot.update(self.FRAME2)
+
+        changes = self.snapshot.get_changes(1)
+
+        self.assertEqual(changes['sequence'], 2)
+        self.assertFalse(changes['unchanged'])
+        self.assertFalse(changes['full'])
+        self.assertCountEqual(changes['items'], [{'key': 'IINST', 'value': '003'}, {'key': 'PAPP', 'value': '00690'}])
+        self.assertEqual(changes['removed'], [])
+
+    def test_get_changes_from_start(self):
+        self.snapshot.update(self.FRAME1)
+        self.snapshot.update(self.FRAME2)
+
+        changes = self.snapshot.get_changes(0)
+
+        self.assertFalse(changes['full'])
+        self.assertEqual(len(changes['items']), len(self.FRAME2))
+
+    def test_get_changes_unchanged(self):
+        self.snapshot.update(self.FRAME1)
+        self.snapshot.update(self.FRAME2)
+
+        changes = self.snapshot.get_changes(2)
+
+        self.assertTrue(changes['unchanged'])
+        self.assertEqual(changes['items'], [])
+        self.assertEqual(changes['removed'], [])
+
+    def test_get_changes_several_frames(self):
+        self.snapshot.update(self.FRAME1)
+        self.snapshot.update(self.FRAME2)
+        self.snapshot.update(self.FRAME3)
+
+        changes = self.snapshot.get_changes(1)
+
+        self.assertCountEqual([item['key'] for item in changes['items']], ['IINST', 'PAPP', 'ADPS'])
+
+    def test_get_changes_removed_label(self):
+        self.snapshot.update(self.FRAME3)
+        self.snapshot.update(self.FRAME2)
+
+        changes = self.snapshot.get_changes(1)
+
+        self.assertFalse(changes['unchanged'])
+        self.assertEqual(changes['items'], [])
+        self.assertEqual(changes['removed'], ['ADPS'])
+        self.assertTrue(self.snapshot.get_changes(2)['unchanged'])
+
+    def test_get_changes_label_added_again(self):
+        self.snapshot.update(self.FRAME3)
+        self.snapshot.update(self.FRAME2)
+        self.snapshot.update(self.FRAME3)
+
+        changes = self.snapshot.get_changes(1)
+
+        self.assertEqual(changes['removed'], [])
+        self.assertEqual(changes['items'], [{'key': 'ADPS', 'value': '045'}])
+
+    def test_get_changes_unknown_sequence(self):
+        self.snapshot.update(self.FRAME1)
+
+        changes = self.snapshot.get_changes(10)
+
+        self.assertTrue(changes['full'])
+        self.assertFalse(changes['unchanged'])
+        self.assertIs(changes['items'], self.snapshot.get())
+
+
+    def test_restore(self):
+        self.snapshot.restore(self.FRAME1, 42)
+
+        self.assertTrue(self.snapshot.stale)
+        self.assertEqual(self.snapshot.sequence, 42)
+        self.assertEqual(self.snapshot.raw, self.FRAME1)
+        self.assertEqual(len(self.snapshot.get()), len(self.FRAME1))
+        self.assertTrue(all([item['stale'] for item in self.snapshot.get()]))
+        changes = self.snapshot.get_changes(0)
+        self.assertTrue(changes['stale'])
+        self.assertEqual(len(changes['items']), len(self.FRAME1))
+        self.assertTrue(self.snapshot.get_changes(42)['unchanged'])
+
+    def test_update_after_restore(self):
+        self.snapshot.restore(self.FRAME1, 42)
+
+        self.snapshot.update(self.FRAME2)
+
+        self.assertFalse(self.snapshot.stale)
+        changes = self.snapshot.get_changes(42)
+        self.assertEqual(changes['sequence'], 43)
+        self.assertFalse(changes['stale'])
+        self.assertEqual(sorted([item['key'] for item in changes['items']]), ['IINST', 'PAPP'])
+        self.assertFalse(any(['stale' in item for item in self.snapshot.get()]))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinfostats import TeleinfoStats
+
+
+
+class TestTeleinfoStats(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.stats = TeleinfoStats()
+
+    def test_get_empty(self):
+        stats = self.stats.get()
+
+        self.assertEqual(sorted(stats.keys()), sorted(TeleinfoStats.STAGES))
+        self.assertEqual(stats['read']['count'], 0)
+        self.assertEqual(stats['read']['averageus'], 0.0)
+        self.assertEqual(stats['read']['p50us'], 0)
+        self.assertEqual(len(stats['read']['histogram']), len(TeleinfoStats.BUCKETS) + 1)
+
+    def test_add(self):
+        self.stats.add('decode', 0.000005)
+        self.stats.add('decode', 0.000030)
+        self.stats.add('decode', 0.000040)
+
+        stats = self.stats.get()['decode']
+
+        self.assertEqual(stats['count'], 3)
+        self.assertEqual(stats['averageus'], 25.0)
+        self.assertEqual(stats['maxus'], 40.0)
+        self.assertEqual(stats['histogram'][0], {'leus': 10, 'count': 1})
+        self.assertEqual(stats['histogram'][2], {'leus': 50, 'count': 2})
+
+    def test_percentiles(self):
+        for _ in range(98):
+            self.stats.add('event', 0.000005)
+        self.stats.add('event', 0.002)
+        self.stats.add('event', 2.0)
+
+        stats = self.stats.get()['event']
+
+        self.assertEqual(stats['p50us'], 10)
+        self.assertEqual(stats['p99us'], 2500)
+        self.assertEqual(stats['histogram'][-1], {'leus': None, 'count': 1})
+
+    def test_percentile_overflow_bucket(self):
+        self.stats.add('device', 5.0)
+
+        self.assertIsNone(self.stats.get()['device']['p99us'])
+
+    def test_reset(self):
+        self.stats.add('read', 0.001)
+
+        self.stats.reset()
+
+        self.assertEqual(self.stats.get()['read']['count'], 0)
+
+    def test_invalid_stage(self):
+        with self.assertRaises(KeyError):
+            self.stats.add('dummy', 0.001)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
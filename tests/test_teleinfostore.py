@@ -0,0 +1,140 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinfostore import TeleinfoStore
+import os
+import shutil
+import tempfile
+import threading
+
+
+
+class TestTeleinfoStore(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.logger = logging.getLogger('TestTeleinfoStore')
+        self.path = os.path.join(tempfile.mkdtemp(), 'store')
+        self.store = None
+
+    def tearDown(self):
+        if self.store:
+            self.store.close()
+        shutil.rmtree(os.path.dirname(self.path))
+
+    def init(self, segment_records=10, max_segments=90):
+        self.store = TeleinfoStore(self.path, self.logger, max_segments)
+        self.store.SEGMENT_RECORDS = segment_records
+        self.store.FLUSH_RECORDS = 5
+        self.store.open()
+
+    def fill(self, count, start=1000):
+        for i in range(count):
+            self.store.append(start + i, 100 + i, [10 + i, 20 + i])
+
+    def test_open_creates_directory(self):
+        self.init()
+
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(self.store.segments, [])
+
+    def test_append_batches_writes(self):
+        self.init()
+
+        self.fill(4)
+        self.assertEqual(len(self.store.pending), 4)
+        self.assertEqual(self.store.segments, [])
+
+        self.fill(1, 1004)
+        self.assertEqual(len(self.store.pending), 0)
+        self.assertEqual(self.store.segments, [1000])
+
+    def test_iter_records(self):
+        self.init()
+        self.fill(25)
+
+        records = list(self.store.iter_records(1008, 1012))
+
+        self.assertEqual([record[0] for record in records], [1008, 1009, 1010, 1011, 1012])
+        self.assertEqual(records[0][1], 108)
+        self.assertEqual(list(records[0][2:]), [18, 28, 0, 0, 0, 0, 0, 0, 0, 0])
+        self.assertEqual(len(self.store.segments), 3)
+
+    def test_iter_records_includes_pending_samples(self):
+        self.init()
+        self.fill(3)
+
+        self.assertEqual(len(list(self.store.iter_records(0, 2000))), 3)
+
+    def test_append_while_flushing(self):
+        self.init(segment_records=10000)
+        self.store.FLUSH_RECORDS = 1000
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(0.000001)
+        try:
+            thread = threading.Thread(target=self.fill, args=(5000,))
+            thread.start()
+            while thread.is_alive():
+                self.store.flush(sync=False)
+            thread.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+        # no sample is lost
+        self.assertEqual(len(list(self.store.iter_records(0, 10000))), 5000)
+
+    def test_get_downsampled(self):
+        self.init()
+        self.fill(20)
+
+        samples = self.store.get(1000, 1019, 10)
+
+        self.assertEqual(len(samples), 2)
+        self.assertEqual(samples[0]['timestamp'], 1000)
+        self.assertEqual(samples[0]['power'], int(round(104.5)))
+        self.assertEqual(samples[0]['indexes'][:2], [19, 29])
+        self.assertEqual(samples[1]['timestamp'], 1010)
+
+    def test_reopen_store(self):
+        self.init()
+        self.fill(17)
+        self.store.close()
+
+        self.init()
+
+        self.assertEqual(self.store.last_timestamp, 1016)
+        self.fill(5, 1017)
+        records = list(self.store.iter_records(0, 2000))
+        self.assertEqual([record[0] for record in records], list(range(1000, 1022)))
+
+    def test_append_drops_older_samples(self):
+        self.init()
+        self.fill(3)
+
+        self.store.append(500, 1, [])
+
+        self.assertEqual(len(list(self.store.iter_records(0, 2000))), 3)
+
+    def test_purge_oldest_segments(self):
+        self.init(max_segments=2)
+        self.fill(35)
+        self.store.flush()
+
+        self.assertEqual(self.store.segments, [1020, 1030])
+        self.assertEqual(len(os.listdir(self.path)), 2)
+        records = list(self.store.iter_records(0, 2000))
+        self.assertEqual(records[0][0], 1020)
+
+    def test_segment_files_are_sparse_and_fixed_size(self):
+        self.init()
+        self.fill(5)
+
+        path = os.path.join(self.path, os.listdir(self.path)[0])
+        self.assertEqual(os.path.getsize(path), 10 * TeleinfoStore.RECORD.size)
+        self.assertEqual(TeleinfoStore.RECORD.size, 48)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,310 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinfostreamer import TeleinfoStreamer
+import os
+import stat
+import time
+import socket
+import shutil
+import tempfile
+import selectors
+import grp
+import threading
+
+def wait_for(condition, timeout=3.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+class HeldSelector(selectors.DefaultSelector):
+    """
+    Selector that can be held before selecting, so several events are returned in the same batch
+    """
+    instance = None
+
+    def __init__(self):
+        super().__init__()
+        self.hold = threading.Event()
+        self.hold.set()
+        self.held = threading.Event()
+        HeldSelector.instance = self
+
+    def select(self, timeout=None):
+        if not self.hold.is_set():
+            self.held.set()
+            self.hold.wait()
+        return super().select(timeout)
+
+
+
+class TestTeleinfoStreamer(unittest.TestCase):
+
+    FRAME = {
+        'ADCO': '041529016009',
+        'PTEC': 'HP..',
+        'IINST': '003',
+        'PAPP': '00620',
+    }
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'stream.sock')
+        self.clients = []
+        self.streamer = TeleinfoStreamer(self.path, logging.getLogger('test'))
+        self.streamer.start()
+        self.assertTrue(wait_for(lambda: os.path.exists(self.path)))
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.streamer.stop()
+        self.streamer.join(2.0)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def connect(self, request=None):
+        count = self.streamer.clients_count
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.settimeout(2.0)
+        client.connect(self.path)
+        self.clients.append(client)
+        self.assertTrue(wait_for(lambda: self.streamer.clients_count == count + 1))
+        if request is not None:
+            client.sendall(request)
+            # request is processed before next frames
+            time.sleep(0.1)
+        return client
+
+    def read_line(self, client):
+        data = b''
+        while not data.endswith(b'\n'):
+            chunk = client.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    def test_encode(self):
+        line = TeleinfoStreamer.encode('main', 1621771200.5, self.FRAME)
+
+        self.assertEqual(line, b'main\t1621771200.500\tADCO\t041529016009\tPTEC\tHP..\tIINST\t003\tPAPP\t00620\n')
+
+    def test_encode_labels(self):
+        line = TeleinfoStreamer.encode('main', 1621771200.0, self.FRAME, frozenset(['PAPP', 'IINST']))
+
+        self.assertEqual(line, b'main\t1621771200.000\tIINST\t003\tPAPP\t00620\n')
+
+    def test_encode_no_label(self):
+        self.assertIsNone(TeleinfoStreamer.encode('main', 1621771200.0, self.FRAME, frozenset(['SINSTS'])))
+
+    def test_stream_frame(self):
+        client = self.connect()
+
+        self.streamer.publish('main', self.FRAME)
+
+        fields = self.read_line(client).decode().rstrip('\n').split('\t')
+        self.assertEqual(fields[0], 'main')
+        self.assertAlmostEqual(float(fields[1]), time.time(), delta=5)
+        self.assertEqual(fields[2:], ['ADCO', '041529016009', 'PTEC', 'HP..', 'IINST', '003', 'PAPP', '00620'])
+        self.assertEqual(self.streamer.frames_count, 1)
+
+    def test_stream_several_clients(self):
+        client1 = self.connect()
+        client2 = self.connect(b'PAPP,IINST\n')
+
+        self.streamer.publish('main', self.FRAME)
+
+        self.assertIn(b'\tADCO\t', self.read_line(client1))
+        line = self.read_line(client2)
+        self.assertTrue(line.endswith(b'\tIINST\t003\tPAPP\t00620\n'))
+        self.assertNotIn(b'ADCO', line)
+
+    def test_stream_labels_subscription(self):
+        client = self.connect(b'SINSTS\n')
+
+        # frame without subscribed label is skipped
+        self.streamer.publish('main', self.FRAME)
+        self.streamer.publish('other', {'SINSTS': '01000'})
+
+        line = self.read_line(client)
+        self.assertTrue(line.startswith(b'other\t'))
+        self.assertTrue(line.endswith(b'\tSINSTS\t01000\n'))
+
+    def test_stream_all_labels_again(self):
+        client = self.connect(b'PAPP\n')
+        client.sendall(b'\n')
+        time.sleep(0.1)
+
+        self.streamer.publish('main', self.FRAME)
+
+        self.assertIn(b'\tADCO\t', self.read_line(client))
+
+    def test_publish_without_client(self):
+        self.streamer.publish('main', self.FRAME)
+
+        time.sleep(0.1)
+        self.assertEqual(self.streamer.frames_count, 0)
+
+    def test_slow_client_drops_oldest_lines(self):
+        TeleinfoStreamer.CLIENT_BUFFER_SIZE = 4
+        try:
+            slow = self.connect()
+            fast = self.connect()
+            slow.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024)
+            frame = dict(self.FRAME, MOTDETAT='x' * 1000)
+
+            for index in range(2000):
+                self.streamer.publish('main', dict(frame, IINST='%04d' % index))
+                if index % 10 == 0:
+                    # keep fast client up to date
+                    fast.setblocking(False)
+                    try:
+                        while fast.recv(65536):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    time.sleep(0.001)
+
+            self.assertTrue(wait_for(lambda: self.streamer.dropped > 0))
+            # streamer is still responsive
+            fast.settimeout(2.0)
+            self.streamer.publish('main', dict(self.FRAME, IINST='last'))
+            data = b''
+            while b'\tlast\t' not in data:
+                data += fast.recv(65536)
+        finally:
+            TeleinfoStreamer.CLIENT_BUFFER_SIZE = 32
+
+    def test_client_disconnect(self):
+        client = self.connect()
+
+        client.close()
+
+        self.assertTrue(wait_for(lambda: self.streamer.clients_count == 0))
+        self.streamer.publish('main', self.FRAME)
+
+    def test_invalid_request(self):
+        client = self.connect()
+
+        client.sendall(b'x' * (TeleinfoStreamer.MAX_REQUEST_SIZE * 3))
+
+        self.assertTrue(wait_for(lambda: self.streamer.clients_count == 0))
+
+    def test_too_many_clients(self):
+        TeleinfoStreamer.MAX_CLIENTS = 1
+        try:
+            self.connect()
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.settimeout(2.0)
+            client.connect(self.path)
+            self.clients.append(client)
+
+            self.assertEqual(client.recv(10), b'')
+            self.assertEqual(self.streamer.clients_count, 1)
+        finally:
+            TeleinfoStreamer.MAX_CLIENTS = 16
+
+    def test_stop(self):
+        self.streamer.stop()
+        self.streamer.join(2.0)
+
+        self.assertFalse(self.streamer.is_alive())
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_stale_socket_file(self):
+        self.streamer.stop()
+        self.streamer.join(2.0)
+        with open(self.path, 'w') as fd:
+            fd.write('')
+
+        self.streamer = TeleinfoStreamer(self.path, logging.getLogger('test'))
+        self.streamer.start()
+
+        # stale file is replaced by socket
+        self.assertTrue(wait_for(lambda: stat.S_ISSOCK(os.stat(self.path).st_mode) if os.path.exists(self.path) else False))
+        self.connect()
+
+
+    def test_socket_only_accessible_to_owner(self):
+        self.assertTrue(wait_for(lambda: stat.S_IMODE(os.stat(self.path).st_mode) == 0o600))
+        self.connect()
+
+    def test_socket_group_access(self):
+        self.streamer.stop()
+        self.streamer.join(2.0)
+        group = grp.getgrgid(os.getgid()).gr_name
+
+        self.streamer = TeleinfoStreamer(self.path, logging.getLogger('test'), 0o660, group)
+        self.streamer.start()
+
+        self.assertTrue(wait_for(lambda: os.path.exists(self.path) and stat.S_IMODE(os.stat(self.path).st_mode) == 0o660))
+        self.assertEqual(os.stat(self.path).st_gid, os.getgid())
+        self.connect()
+
+    def test_socket_unknown_group(self):
+        self.streamer.stop()
+        self.streamer.join(2.0)
+
+        self.streamer = TeleinfoStreamer(self.path, logging.getLogger('test'), 0o660, 'teleinfo_unknown_group')
+        self.streamer.start()
+
+        # stream is served anyway with process group
+        self.assertTrue(wait_for(lambda: os.path.exists(self.path)))
+        self.connect()
+
+    def test_stop_after_open_error(self):
+        self.streamer.stop()
+        self.streamer.join(2.0)
+        path = os.path.join(self.directory, 'file')
+        with open(path, 'w') as fd:
+            fd.write('')
+        self.streamer = TeleinfoStreamer(os.path.join(path, 'stream.sock'), logging.getLogger('test'))
+        self.streamer.start()
+        self.streamer.join(2.0)
+        self.assertFalse(self.streamer.is_alive())
+
+        # closed wake pipe file descriptors are reused by other files
+        fds = [os.open(os.path.join(self.directory, 'file%d' % i), os.O_WRONLY | os.O_CREAT) for i in range(4)]
+        try:
+            self.streamer.stop()
+            for fd in fds:
+                self.assertEqual(os.fstat(fd).st_size, 0)
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    def test_client_closed_while_dispatching(self):
+        self.streamer.stop()
+        self.streamer.join(2.0)
+        default_selector = selectors.DefaultSelector
+        selectors.DefaultSelector = HeldSelector
+        try:
+            self.streamer = TeleinfoStreamer(self.path, logging.getLogger('test'))
+        finally:
+            selectors.DefaultSelector = default_selector
+        selector = HeldSelector.instance
+        self.streamer.start()
+        self.assertTrue(wait_for(lambda: os.path.exists(self.path)))
+        client = self.connect()
+
+        # frame dispatch and client close are handled in the same batch
+        selector.hold.clear()
+        self.assertTrue(selector.held.wait(2.0))
+        self.streamer.publish('main', self.FRAME)
+        client.close()
+        selector.hold.set()
+
+        self.assertTrue(wait_for(lambda: self.streamer.clients_count == 0))
+        self.assertTrue(self.streamer.is_alive())
+        client = self.connect()
+        self.streamer.publish('main', self.FRAME)
+        self.assertIn(b'\tPAPP\t00620', client.recv(4096))
+
+
+if __name__ == "__main__":
+    unittest.main()
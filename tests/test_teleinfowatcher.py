@@ -0,0 +1,144 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinfowatcher import TeleinfoWatcher
+from mock import Mock
+import os
+import io
+import time
+import shutil
+import tempfile
+
+def wait_for(condition, timeout=3.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+
+class TestTeleinfoWatcher(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'by-id')
+        os.makedirs(self.path)
+        self.on_change = Mock()
+        self.watcher = None
+
+    def tearDown(self):
+        if self.watcher:
+            self.watcher.stop()
+            if self.watcher.is_alive():
+                self.watcher.join(2.0)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def init(self, use_inotify=True, ports=None):
+        TeleinfoWatcher.POLL_INTERVAL = 0.05
+        TeleinfoWatcher.SELECT_TIMEOUT = 0.05
+        self.watcher = TeleinfoWatcher(self.path, logging.getLogger('test'), self.on_change, ports)
+        self.watcher.use_inotify = use_inotify
+        self.watcher.start()
+
+    def create_dongle(self, name):
+        path = os.path.join(self.path, name)
+        with io.open(path, 'w') as f:
+            f.write(u'')
+        return path
+
+    def test_scan(self):
+        dongle = self.create_dongle('usb-TINFO-1234')
+        self.create_dongle('usb-FTDI-1234')
+        watcher = TeleinfoWatcher(self.path, logging.getLogger('test'), self.on_change)
+
+        self.assertEqual(watcher.scan(), [dongle])
+
+    def test_check(self):
+        watcher = TeleinfoWatcher(self.path, logging.getLogger('test'), self.on_change)
+        dongle = self.create_dongle('usb-TINFO-1234')
+
+        self.assertTrue(watcher.check())
+        self.on_change.assert_called_with([dongle], [])
+        self.assertFalse(watcher.check())
+
+        os.remove(dongle)
+
+        self.assertTrue(watcher.check())
+        self.on_change.assert_called_with([], [dongle])
+
+    def test_check_callback_exception(self):
+        self.on_change.side_effect = Exception('test')
+        watcher = TeleinfoWatcher(self.path, logging.getLogger('test'), self.on_change)
+        self.create_dongle('usb-TINFO-1234')
+
+        self.assertTrue(watcher.check())
+
+    def test_known_ports(self):
+        dongle = self.create_dongle('usb-TINFO-1234')
+        self.init(ports=[dongle])
+
+        time.sleep(0.2)
+
+        self.assertFalse(self.on_change.called)
+
+    def test_inotify(self):
+        self.init()
+        self.assertTrue(wait_for(lambda: not self.watcher.is_alive() or self.watcher.use_inotify))
+
+        dongle = self.create_dongle('usb-TINFO-1234')
+        self.assertTrue(wait_for(lambda: self.on_change.call_count == 1))
+        self.on_change.assert_called_with([dongle], [])
+
+        os.remove(dongle)
+        self.assertTrue(wait_for(lambda: self.on_change.call_count == 2))
+        self.on_change.assert_called_with([], [dongle])
+
+    def test_polling(self):
+        self.init(use_inotify=False)
+
+        dongle = self.create_dongle('usb-TINFO-1234')
+        self.assertTrue(wait_for(lambda: self.on_change.call_count == 1))
+        self.on_change.assert_called_with([dongle], [])
+
+    def test_directory_removed_and_created(self):
+        dongle = self.create_dongle('usb-TINFO-1234')
+        self.init()
+        self.assertTrue(wait_for(lambda: self.on_change.call_count == 1))
+
+        shutil.rmtree(self.path)
+        self.assertTrue(wait_for(lambda: self.on_change.call_count == 2))
+        self.on_change.assert_called_with([], [dongle])
+
+        os.makedirs(self.path)
+        self.create_dongle('usb-TINFO-1234')
+        self.assertTrue(wait_for(lambda: self.on_change.call_count == 3))
+        self.on_change.assert_called_with([dongle], [])
+
+    def test_directory_recreated(self):
+        self.init()
+        time.sleep(0.2)
+
+        shutil.rmtree(self.path)
+        os.makedirs(self.path)
+        time.sleep(0.2)
+        dongle = self.create_dongle('usb-TINFO-1234')
+
+        self.assertTrue(wait_for(lambda: self.on_change.call_count == 1))
+        self.on_change.assert_called_with([dongle], [])
+
+    def test_stop(self):
+        self.init()
+
+        self.watcher.stop()
+        self.watcher.join(1.0)
+
+        self.assertFalse(self.watcher.is_alive())
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+import logging
+import sys
+sys.path.append('../')
+from backend.teleinfowritebehind import TeleinfoWriteBehind
+import threading
+from mock import Mock
+
+
+
+class TestTeleinfoWriteBehind(unittest.TestCase):
+
+    def setUp(self):
+        logging.basicConfig(level=logging.FATAL, format=u'%(asctime)s %(name)s:%(lineno)d %(levelname)s : %(message)s')
+        self.logger = logging.getLogger('TestTeleinfoWriteBehind')
+        self.update_device = Mock()
+        self.update_config = Mock()
+        self.write_behind = TeleinfoWriteBehind(self.update_device, self.update_config, self.logger, 300, ['currentmode', 'previousconso'])
+
+    def test_updates_are_batched(self):
+        for power in range(10):
+            self.write_behind.update_device('uuid1', {'power': power, 'lastupdate': power})
+        self.write_behind.update_config({'field': 1})
+
+        self.assertFalse(self.update_device.called)
+        self.assertFalse(self.update_config.called)
+        self.assertTrue(self.write_behind.has_pending())
+
+        self.assertTrue(self.write_behind.flush())
+
+        self.update_device.assert_called_once_with('uuid1', {'power': 9, 'lastupdate': 9})
+        self.update_config.assert_called_once_with({'field': 1})
+        self.assertFalse(self.write_behind.has_pending())
+        self.assertEqual(self.write_behind.flushes_count, 1)
+        self.assertEqual(self.write_behind.writes_count, 2)
+
+    def test_flush_nothing_pending(self):
+        self.assertTrue(self.write_behind.flush())
+
+        self.assertEqual(self.write_behind.flushes_count, 0)
+
+    def test_flush_on_interval(self):
+        self.write_behind.interval = 0
+
+        self.write_behind.update_device('uuid1', {'power': 1})
+
+        self.update_device.assert_called_once_with('uuid1', {'power': 1})
+
+    def test_flush_if_due(self):
+        self.write_behind.update_device('uuid1', {'power': 1})
+
+        self.assertTrue(self.write_behind.flush_if_due())
+        self.assertFalse(self.update_device.called)
+
+        self.write_behind.interval = 0
+        self.assertTrue(self.write_behind.flush_if_due())
+        self.update_device.assert_called_once_with('uuid1', {'power': 1})
+
+    def test_concurrent_flushes_are_serialized(self):
+        persisted = []
+        writing = threading.Event()
+        release = threading.Event()
+        def update_device(uuid, params):
+            if self.update_device.call_count==1:
+                writing.set()
+                release.wait(2.0)
+            persisted.append(params['power'])
+        self.update_device.side_effect = update_device
+        self.write_behind.update_device('uuid1', {'power': 1})
+        first = threading.Thread(target=self.write_behind.flush)
+        first.start()
+        self.assertTrue(writing.wait(1.0))
+
+        self.write_behind.update_device('uuid1', {'power': 2})
+        second = threading.Thread(target=self.write_behind.flush)
+        second.start()
+        second.join(0.2)
+        self.assertTrue(second.is_alive())
+        release.set()
+        first.join(1.0)
+        second.join(1.0)
+
+        # newest value is persisted last
+        self.assertEqual(persisted, [1, 2])
+
+    def test_flush_on_critical_device_field_change(self):
+        self.write_behind.update_device('uuid1', {'power': 1, 'currentmode': 'HP..'})
+        self.assertEqual(self.update_device.call_count, 1)
+
+        # same critical value
+        self.write_behind.update_device('uuid1', {'power': 2, 'currentmode': 'HP..'})
+        self.assertEqual(self.update_device.call_count, 1)
+
+        self.write_behind.update_device('uuid1', {'power': 3, 'currentmode': 'HC..'})
+        self.assertEqual(self.update_device.call_count, 2)
+        self.update_device.assert_called_with('uuid1', {'power': 3, 'currentmode': 'HC..'})
+
+    def test_flush_on_critical_config_field_change(self):
+        self.write_behind.update_device('uuid1', {'power': 1, 'currentmode': 'HP..'})
+        self.write_behind.update_device('uuid1', {'power': 2})
+
+        self.write_behind.update_config({'previousconso': 10})
+
+        # pending device changes are flushed too
+        self.update_config.assert_called_once_with({'previousconso': 10})
+        self.update_device.assert_called_with('uuid1', {'power': 2})
+
+    def test_failed_flush_is_retried(self):
+        self.update_device.side_effect = Exception('test')
+        self.write_behind.update_device('uuid1', {'power': 1, 'lastupdate': 1})
+
+        self.assertFalse(self.write_behind.flush())
+        self.assertTrue(self.write_behind.has_pending())
+
+        self.update_device.side_effect = None
+        self.write_behind.update_device('uuid1', {'power': 2})
+        self.assertTrue(self.write_behind.flush())
+
+        self.update_device.assert_called_with('uuid1', {'power': 2, 'lastupdate': 1})
+
+    def test_failed_config_flush_is_retried(self):
+        self.update_config.side_effect = Exception('test')
+        self.write_behind.update_config({'field': 1, 'other': 1})
+
+        self.assertFalse(self.write_behind.flush())
+
+        self.update_config.side_effect = None
+        self.write_behind.update_config({'field': 2})
+        self.assertTrue(self.write_behind.flush())
+
+        self.update_config.assert_called_with({'field': 2, 'other': 1})
+
+
+
+if __name__ == "__main__":
+    unittest.main()